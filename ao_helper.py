@@ -0,0 +1,162 @@
+import numpy as np
+import pyscf.scf
+import direct_adc_spin_integrated.pack_helper as pack_helper
+
+
+# Chemist pairs of <pq|rs> = (pr|qs): positions 0, 2 and 1, 3
+PARTNER = (2, 3, 0, 1)
+
+# <pq|sr>, the exchange part of <pq||rs>
+EXCHANGE = (0, 1, 3, 2)
+
+
+############################################################
+### vvvv contracted through AO integrals, never stored ###
+############################################################
+# Two indices of the amplitude or trial vector are back-transformed to the AO
+# basis, contracted with the AO integrals as a J or K build (pyscf's direct
+# shell-quartet driver with screening) and the result is transformed to MOs.
+# Contracting a chemist pair is a J build, one index from each pair a K build.
+# Batches of vectors are sized by max_memory (MB).
+class AOBlock:
+
+    def __init__(self, mol, mo, antisymmetrize, max_memory = 2000):
+
+        self.mol = mol
+        self.mo = mo
+        self.antisymmetrize = antisymmetrize
+        self.max_memory = max_memory
+
+        self.shape = tuple(c.shape[1] for c in mo)
+        self.ndim = 4
+        self.dtype = np.dtype('f8')
+        self.size = int(np.prod(self.shape))
+        self.nbytes = 0
+
+    def batches(self, nvec, dtype):
+
+        nao = self.mol.nao_nr()
+        vec_size = 4 * nao * nao * np.dtype(dtype).itemsize
+        blksize = max(1, int(self.max_memory * 1e6 / vec_size))
+        for k0 in range(0, nvec, blksize):
+            yield k0, min(k0 + blksize, nvec)
+
+    # sum_ij <pq|rs> x_ij for MO positions axes = (i, j); the result keeps the
+    # other two positions in increasing order
+    def contract_plain(self, x, axes):
+
+        i, j = axes
+        rest = [k for k in range(4) if k not in axes]
+        C = self.mo
+
+        if PARTNER[i] == j:
+            a, b = rest
+        else:
+            a, b = PARTNER[i], PARTNER[j]
+
+        out = np.empty((x.shape[0], C[a].shape[1], C[b].shape[1]), dtype=np.result_type(x.dtype, self.dtype))
+        for k0, k1 in self.batches(x.shape[0], out.dtype):
+            dm = np.matmul(np.matmul(C[i], x[k0:k1]), C[j].T)
+            if PARTNER[i] == j:
+                v_ao = pyscf.scf.hf.get_jk(self.mol, dm, hermi=0, with_k=False)[0]
+            else:
+                v_ao = pyscf.scf.hf.get_jk(self.mol, dm, hermi=0, with_j=False)[1]
+            out[k0:k1] = np.matmul(np.matmul(C[a].T, v_ao), C[b])
+
+        if a > b:
+            out = out.transpose(0,2,1)
+
+        return out
+
+    def contract(self, x, axes):
+
+        out = self.contract_plain(x, axes)
+
+        # <pq||rs> = <pq|rs> - <pq|sr>
+        if self.antisymmetrize:
+            axes_ex = tuple(EXCHANGE[k] for k in axes)
+            rest_ex = [EXCHANGE[k] for k in range(4) if k not in axes]
+            out_ex = self.contract_plain(x, axes_ex)
+            if rest_ex[0] > rest_ex[1]:
+                out_ex = out_ex.transpose(0,2,1)
+            out = out - out_ex
+
+        return out
+
+    # x @ v2e_vvvv.reshape(nab, ncd).T
+    def dot(self, x):
+
+        x = x.reshape(x.shape[0], self.shape[2], self.shape[3])
+        return self.contract(x, (2, 3)).reshape(x.shape[0], -1)
+
+    # 0.5 * sum_cd <ab||cd> x_cd for x antisymmetric in cd, on pairs a > b, c > d:
+    # the exchange term equals the direct one, so a single K build is needed
+    def pair_dot(self, x):
+
+        x = pack_helper.unpack_pairs(x, self.shape[2])
+        if not self.antisymmetrize:
+            return 0.5*pack_helper.pack_pairs(self.contract(x, (2, 3)))
+
+        return pack_helper.pack_pairs(self.contract_plain(x, (2, 3)))
+
+    # np.einsum(subscripts, *operands, block) without forming the block: an
+    # operand sharing two indices with the block (or the product of all other
+    # operands) is contracted with it first. The MO contractions around the
+    # J/K builds run through the contraction plans, when given.
+    def einsum(self, subscripts, *operands, contractions = None):
+
+        def einsum(subscripts, *operands):
+            if contractions is None:
+                return np.einsum(subscripts, *operands, optimize=True)
+            return contractions.einsum(subscripts, *operands)
+
+        inputs, output = subscripts.split('->')
+        inputs = inputs.split(',')
+        idx_v = inputs[-1]
+        inputs = inputs[:-1]
+        operands = list(operands)
+
+        def shared(n):
+            idx = [x for x in inputs[n] if x in idx_v]
+            others = "".join(inputs[:n] + inputs[n+1:]) + output
+            return idx if len(idx) == 2 and not any(x in others for x in idx) else None
+
+        n = next((n for n in range(len(inputs)) if shared(n) is not None), None)
+        if n is None:
+            keep = "".join(x for x in dict.fromkeys("".join(inputs)) if x in idx_v + output)
+            operands = [einsum(",".join(inputs) + "->" + keep, *operands)]
+            inputs = [keep]
+            n = 0
+            if shared(n) is None:
+                raise Exception("vvvv contraction is not supported with AO-direct integrals")
+
+        idx = shared(n)
+        other = "".join(x for x in inputs[n] if x not in idx)
+        x = einsum(inputs[n] + "->" + other + "".join(idx), operands[n])
+        dims = x.shape[:len(other)]
+        x = x.reshape(-1, x.shape[-2], x.shape[-1])
+
+        axes = (idx_v.index(idx[0]), idx_v.index(idx[1]))
+        z = self.contract(x, axes)
+        rest = "".join(idx_v[k] for k in range(4) if k not in axes)
+        z = z.reshape(dims + z.shape[1:])
+
+        inputs = inputs[:n] + inputs[n+1:] + [other + rest]
+        operands = operands[:n] + operands[n+1:] + [z]
+
+        return einsum(",".join(inputs) + "->" + output, *operands)
+
+
+def blocks(mol, mo, nocc, closed_shell = False, max_memory = 2000):
+
+    mo_a, mo_b = mo
+    nocc_a, nocc_b = nocc
+
+    vir_a = mo_a[:,nocc_a:]
+    vir_b = mo_b[:,nocc_b:]
+
+    v2e_a = AOBlock(mol, (vir_a, vir_a, vir_a, vir_a), True, max_memory)
+    v2e_b = v2e_a if closed_shell else AOBlock(mol, (vir_b, vir_b, vir_b, vir_b), True, max_memory)
+    v2e_ab = AOBlock(mol, (vir_a, vir_b, vir_a, vir_b), False, max_memory)
+
+    return (v2e_a, v2e_ab, v2e_b)
@@ -0,0 +1,75 @@
+###########################################################################
+### Amplitude benchmark: t_amp computed once and read from a checkpoint ###
+###########################################################################
+# Times the amplitude stage of a job that writes amplitude_file against a
+# second job on the same reference that reads it, e.g. an EA or GF run after
+# an IP run, and checks that both give the same amplitudes.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_amplitude_checkpoint --basis cc-pvtz
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def time_amplitudes(mf, args, amplitude_file):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.precision = args.precision
+    direct_adc.amplitude_file = amplitude_file
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.transform_integrals()
+        t_start = time.time()
+        t_amp = direct_adc_compute.checkpointed_amplitudes(direct_adc)
+        t_amp_time = time.time() - t_start
+
+    return t_amp_time, t_amp
+
+def max_diff(t_amp_1, t_amp_2):
+
+    diff = 0.0
+    for blocks_1, blocks_2 in zip(t_amp_1, t_amp_2):
+        if blocks_1 is None:
+            continue
+        for x, y in zip(blocks_1, blocks_2):
+            diff = max(diff, np.max(np.absolute(np.asarray(x, dtype=np.float64) - np.asarray(y, dtype=np.float64)), initial=0.0))
+
+    return diff
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvtz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--precision", default="double")
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    with tempfile.TemporaryDirectory() as dirname:
+        amplitude_file = os.path.join(dirname, "t_amp.h5")
+        t_none, t_amp = time_amplitudes(mf, args, None)
+        t_write, t_amp_write = time_amplitudes(mf, args, amplitude_file)
+        size = os.path.getsize(amplitude_file)
+        t_read, t_amp_read = time_amplitudes(mf, args, amplitude_file)
+
+    print ("Number of basis functions:       ", mol.nao_nr())
+    print ("Checkpoint size (MB):            ", round(size / 1e6, 2))
+    print ("%12s %12s %12s" % ("job", "time (s)", "max diff"))
+    print ("%12s %12.3f %12.2e" % ("compute", t_none, 0.0))
+    print ("%12s %12.3f %12.2e" % ("write", t_write, max_diff(t_amp, t_amp_write)))
+    print ("%12s %12.3f %12.2e" % ("read", t_read, max_diff(t_amp, t_amp_read)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+##############################################################
+### Memory report: peak allocation of the amplitude stages ###
+##############################################################
+# Traces the allocations of compute_amplitudes (memory_report = True) and
+# prints the peak and held memory of the t2_1, t1_2, t2_2 and t1_3 stages
+# against the size of the amplitudes, with the MP2 energy as a check.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_amplitude_memory --basis aug-cc-pvtz
+import argparse
+import contextlib
+import io
+import time
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="aug-cc-pvtz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--precision", default="double")
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.precision = args.precision
+    direct_adc.memory_report = True
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.transform_integrals()
+        t_start = time.time()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        t_amp_time = time.time() - t_start
+        e_mp2 = direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+
+    print ("Number of basis functions:       ", mol.nao_nr())
+    print ("Amplitude time (s, traced):      ", round(t_amp_time, 3))
+    print ("MP2 correlation energy:          ", e_mp2)
+    direct_adc.amplitude_allocations.report("Memory allocated in the amplitude stages:", direct_adc_compute.amplitude_nbytes(t_amp))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+##################################################################
+### EA sigma benchmark: MO vvvv vs AO-direct ladder contraction ###
+##################################################################
+# With vvvv_integrals = "AO" the vvvv class is never transformed; the ladder
+# terms are J/K builds over the AO integrals.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_ao_direct_vvvv --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def time_sigma(mf, args, vvvv_integrals):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.vvvv_integrals = vvvv_integrals
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_start = time.time()
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        sigma, precond, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+        t_setup = time.time() - t_start
+
+    vvvv_mb = sum(direct_adc.v2e.nbytes("vvvv")) / 1e6
+
+    r = np.random.RandomState(1).rand(args.nvec, precond.size)
+
+    t_start = time.time()
+    s = [sigma(x) for x in r]
+    t_sigma = (time.time() - t_start) / args.nvec
+
+    return t_setup, t_sigma, vvvv_mb, np.array(s)
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nvec", type=int, default=3)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    t_setup_mo, t_mo, mb_mo, s_mo = time_sigma(mf, args, "MO")
+    t_setup_ao, t_ao, mb_ao, s_ao = time_sigma(mf, args, "AO")
+
+    print ("Number of basis functions:     ", mol.nao_nr())
+    print ("vvvv held, MO (MB):            ", mb_mo)
+    print ("vvvv held, AO-direct (MB):     ", mb_ao)
+    print ("Setup to EA sigma, MO (sec):   ", t_setup_mo)
+    print ("Setup to EA sigma, AO (sec):   ", t_setup_ao)
+    print ("EA sigma call, MO (sec):       ", t_mo)
+    print ("EA sigma call, AO (sec):       ", t_ao)
+    print ("Max sigma difference:          ", np.max(np.absolute(s_ao - s_mo)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#############################################################
+### Sigma benchmark: H applied to a block of vectors ###
+#############################################################
+# Times the IP/EA sigma of nstates vectors applied one at a time against the
+# same vectors applied as one block, then the Davidson and GF solves with
+# sigma_block = 1 and the default block, checking that the results agree.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_block_sigma --basis cc-pvdz --nstates 10
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def setup(mf, args, sigma_block):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.nstates = args.nstates
+    direct_adc.freq_range = (args.freq_start, args.freq_end)
+    direct_adc.step = args.step
+    direct_adc.sigma_block = sigma_block
+    # davidson1 logs through pyscf's logger, which redirect_stdout does not catch
+    direct_adc.verbose = 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+
+    return direct_adc, t_amp
+
+def time_sigma(direct_adc, t_amp, define_H):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        apply_H, precond, M = define_H(direct_adc, t_amp)
+    r = np.random.RandomState(7).rand(direct_adc.nstates, precond.size)
+    apply_H(r[0])
+
+    t_start = time.time()
+    s_single = np.array([apply_H(x) for x in r])
+    t_single = time.time() - t_start
+
+    t_start = time.time()
+    s_block = apply_H(r)
+    t_block = time.time() - t_start
+
+    return t_single, t_block, np.max(np.absolute(s_block - s_single))
+
+def time_solves(mf, args, sigma_block):
+
+    direct_adc, t_amp = setup(mf, args, sigma_block)
+
+    t_start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        apply_H, precond, x0 = direct_adc_compute.setup_davidson_ip(direct_adc, t_amp)
+    E, U = direct_adc_compute.davidson(direct_adc, apply_H, x0, precond)
+    t_davidson = time.time() - t_start
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.algorithm = "GF"
+        apply_H_ip, precond_ip, M_ij = direct_adc_compute.define_H_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+        t_start = time.time()
+        dos_ip, dos_ea = direct_adc_compute.calc_density_of_states(direct_adc, apply_H_ip, apply_H_ea, precond_ip, precond_ea, t_amp)
+        t_gf = time.time() - t_start
+
+    return t_davidson, t_gf, np.array(E), np.array(dos_ip), np.array(dos_ea)
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nstates", type=int, default=10)
+    parser.add_argument("--sigma-block", type=int, default=16)
+    parser.add_argument("--freq-start", type=float, default=-0.6)
+    parser.add_argument("--freq-end", type=float, default=-0.4)
+    parser.add_argument("--step", type=float, default=0.1)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    direct_adc, t_amp = setup(mf, args, args.sigma_block)
+    ip_single, ip_block, ip_diff = time_sigma(direct_adc, t_amp, direct_adc_compute.define_H_ip)
+    ea_single, ea_block, ea_diff = time_sigma(direct_adc, t_amp, direct_adc_compute.define_H_ea)
+
+    d_single, gf_single, E_single, ip_dos_single, ea_dos_single = time_solves(mf, args, 1)
+    d_block, gf_block, E_block, ip_dos_block, ea_dos_block = time_solves(mf, args, args.sigma_block)
+
+    print ("Number of basis functions:          ", mol.nao_nr())
+    print ("Vectors per sigma call:             ", args.nstates)
+    print ("%12s %14s %14s %12s" % ("", "single (sec)", "block (sec)", "max diff"))
+    print ("%12s %14.3f %14.3f %12.2e" % ("IP sigma", ip_single, ip_block, ip_diff))
+    print ("%12s %14.3f %14.3f %12.2e" % ("EA sigma", ea_single, ea_block, ea_diff))
+    print ("%12s %14.3f %14.3f %12.2e" % ("Davidson", d_single, d_block, np.max(np.absolute(E_block - E_single))))
+    print ("%12s %14.3f %14.3f %12.2e" % ("GF", gf_single, gf_block, max(np.max(np.absolute(ip_dos_block - ip_dos_single)), np.max(np.absolute(ea_dos_block - ea_dos_single)))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+##################################################################
+### Sigma benchmark: einsum contraction plans cached per job ###
+##################################################################
+# Times the IP and EA sigma calls with each contraction backend and prints
+# the planning/lookup time against the time spent in the contractions. With
+# the uncached einsum backend the path search is part of the contraction time.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_contraction_plans --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.einsum_helper as einsum_helper
+
+def time_sigma(mf, args, backend):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.einsum_backend = backend
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_start = time.time()
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        sigma_ip, precond_ip, M_ij = direct_adc_compute.define_H_ip(direct_adc, t_amp)
+        sigma_ea, precond_ea, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+        t_setup = time.time() - t_start
+
+    result = {"setup": t_setup}
+    for name, sigma, precond in (("IP", sigma_ip, precond_ip), ("EA", sigma_ea, precond_ea)):
+        r = np.random.RandomState(1).rand(args.nvec, precond.size)
+
+        # The first call makes the plans, the timed calls reuse them
+        sigma(r[0])
+        contractions = direct_adc.contractions
+        ncalls, plan_time, exec_time = contractions.ncalls, contractions.plan_time, contractions.exec_time
+
+        t_start = time.time()
+        s = [sigma(x) for x in r]
+        result[name] = (time.time() - t_start) / args.nvec
+        result[name + " plan"] = (contractions.plan_time - plan_time) / args.nvec
+        result[name + " exec"] = (contractions.exec_time - exec_time) / args.nvec
+        result[name + " calls"] = (contractions.ncalls - ncalls) // args.nvec
+        result[name + " sigma"] = np.array(s)
+
+    result["plans"] = direct_adc.contractions.nplans
+
+    return result
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nvec", type=int, default=10)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    backends = ["einsum", "numpy", "tensordot"]
+    if einsum_helper.opt_einsum is not None:
+        backends.append("opt_einsum")
+
+    results = dict((backend, time_sigma(mf, args, backend)) for backend in backends)
+    ref = results["einsum"]
+
+    print ("Number of basis functions:       ", mol.nao_nr())
+    print ("%12s %10s %8s %10s %10s %10s %10s %12s" % ("backend", "setup (s)", "plans", "sigma", "calls",
+                                                       "plan (ms)", "exec (ms)", "max diff"))
+    for backend, result in results.items():
+        for name in ("IP", "EA"):
+            diff = np.max(np.absolute(result[name + " sigma"] - ref[name + " sigma"]))
+            print ("%12s %10.3f %8d %10s %10d %10.3f %10.3f %12.2e" % (backend, result["setup"], result["plans"],
+                   name + " %.2f ms" % (result[name] * 1e3), result[name + " calls"],
+                   result[name + " plan"] * 1e3, result[name + " exec"] * 1e3, diff))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+##############################################################
+### EA sigma benchmark: HDF5 vs np.memmap disk integrals ###
+##############################################################
+# The vovv/ovvv-type classes (and vvvv) are disk resident with disk = True
+# and read in slabs of at most --max-memory MB, the next slab on a background
+# thread. Prints the I/O wait and the compute time on slabs in sigma calls.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_disk_backends --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.disk_helper as disk_helper
+
+def time_sigma(mf, args, disk, backend):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.disk = disk
+    direct_adc.disk_backend = backend
+    direct_adc.max_memory = args.max_memory
+
+    with disk_helper.scratch_store(backend, args.scratch_dir) as direct_adc.scratch:
+        with contextlib.redirect_stdout(io.StringIO()):
+            direct_adc.transform_integrals()
+            t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+
+            t_start = time.time()
+            sigma, precond, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+            t_setup = time.time() - t_start
+
+        r = np.random.RandomState(1).rand(args.nvec, precond.size)
+        io_stats = direct_adc.v2e.io_stats = disk_helper.IOStats()
+
+        t_sigma = []
+        for n in range(args.repeat):
+            t_start = time.time()
+            s = [sigma(x) for x in r]
+            t_sigma.append((time.time() - t_start) / args.nvec)
+
+    return t_setup, min(t_sigma), np.array(s), io_stats
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nvec", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scratch-dir", default=None)
+    parser.add_argument("--max-memory", type=float, default=2000)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    t_setup_mem, t_mem, s_mem, io_mem = time_sigma(mf, args, False, "hdf5")
+    t_setup_h5, t_h5, s_h5, io_h5 = time_sigma(mf, args, True, "hdf5")
+    t_setup_mm, t_mm, s_mm, io_mm = time_sigma(mf, args, True, "memmap")
+
+    print ("Number of basis functions:        ", mol.nao_nr())
+    print ("EA sigma setup, in memory (sec):  ", t_setup_mem)
+    print ("EA sigma setup, hdf5 (sec):       ", t_setup_h5)
+    print ("EA sigma setup, memmap (sec):     ", t_setup_mm)
+    print ("EA sigma call, in memory (sec):   ", t_mem)
+    print ("EA sigma call, hdf5 (sec):        ", t_h5)
+    print ("EA sigma call, memmap (sec):      ", t_mm)
+    print ("memmap speedup over hdf5:         ", t_h5 / t_mm)
+    for name, io_stats in (("hdf5", io_h5), ("memmap", io_mm)):
+        print ("Slabs read in sigma, %-7s       " % name, io_stats.nreads, "(%.2f MB)" % (io_stats.nbytes / 1e6))
+        print ("MB read per sigma call, %-7s    " % name, io_stats.call_nbytes / max(1, io_stats.ncalls) / 1e6)
+        print ("I/O wait / compute, %-7s (sec): " % name, io_stats.wait_time, "/", io_stats.compute_time)
+    print ("Max sigma difference (hdf5):      ", np.max(np.absolute(s_h5 - s_mem)))
+    print ("Max sigma difference (memmap):    ", np.max(np.absolute(s_mm - s_mem)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+###################################################################
+### Accuracy report: MP2 frozen natural orbital virtual truncation ###
+###################################################################
+# For each occupation threshold the active virtuals are replaced by the MP2
+# natural orbitals above it. Prints the virtuals kept, the MP2 energy
+# recovered, the IP/EA energy errors against the untruncated calculation and
+# the Davidson timings. EA states dominated by the dropped low-occupation
+# virtuals are not described in the truncated space.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_fno --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def run(mf, args, threshold):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.nstates = args.nstates
+    direct_adc.verbose = 0
+    direct_adc.fno = threshold is not None
+    if threshold is not None:
+        direct_adc.fno_threshold = threshold
+
+    result = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_start = time.time()
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        result["mp2"] = direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+        result["setup time"] = time.time() - t_start
+
+        apply_H_ip, precond_ip, x0_ip = direct_adc_compute.setup_davidson_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, x0_ea = direct_adc_compute.setup_davidson_ea(direct_adc, t_amp)
+
+        for name, apply_H, precond, x0 in (("IP", apply_H_ip, precond_ip, x0_ip), ("EA", apply_H_ea, precond_ea, x0_ea)):
+            # A larger space keeps degenerate pairs of roots converged in all runs
+            t_start = time.time()
+            E, U = direct_adc.davidson(apply_H, x0, precond, nroots = direct_adc.nstates, verbose = 0,
+                                       max_cycle = direct_adc.max_cycle, max_space = max(direct_adc.max_space, 4 * direct_adc.nstates))
+            result[name] = np.array(E)
+            result[name + " time"] = time.time() - t_start
+
+    result["nvir"] = (direct_adc.nvir_a, direct_adc.nvir_b)
+    if direct_adc.fno:
+        result["recovered"] = direct_adc.fno_info["e_mp2_fno"] / direct_adc.fno_info["e_mp2"]
+
+    return result
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nstates", type=int, default=4)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[1e-5, 1e-4, 1e-3])
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.conv_tol = 1e-12
+    mf.kernel()
+
+    ref = run(mf, args, None)
+
+    print ("Number of basis functions:       ", mol.nao_nr())
+    print ("Active virtuals (alpha, beta):   ", ref["nvir"])
+    print ("Setup to sigma, full (sec):      ", ref["setup time"])
+    print ("IP/EA Davidson, full (sec):      ", ref["IP time"], ref["EA time"])
+    print ("%10s %10s %10s %12s %12s %12s %12s %12s" % ("threshold", "kept", "fraction", "MP2 recov.",
+                                                        "max IP err", "max EA err", "setup (s)", "Davidson (s)"))
+    for threshold in args.thresholds:
+        new = run(mf, args, threshold)
+        fraction = sum(new["nvir"]) / sum(ref["nvir"])
+        print ("%10.1e %10s %10.3f %12.6f %12.2e %12.2e %12.3f %12.3f" % (threshold, "%d/%d" % new["nvir"], fraction,
+               new["recovered"], np.max(np.absolute(new["IP"] - ref["IP"])), np.max(np.absolute(new["EA"] - ref["EA"])),
+               new["setup time"], new["IP time"] + new["EA time"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+###################################################################
+### Accuracy report: precision = "mixed" vs the float64 path ###
+###################################################################
+# Integrals and t2 amplitudes are stored in float32, contractions run in
+# float64. Prints the MP2 and IP/EA energy errors, the storage of integrals
+# and amplitudes, the memory allocated at the peak of one sigma call and the
+# sigma timings for both paths.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_mixed_precision --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def run(mf, args, precision):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.nstates = args.nstates
+    direct_adc.verbose = 0
+    direct_adc.precision = precision
+
+    result = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        result["mp2"] = direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+
+        apply_H_ip, precond_ip, x0_ip = direct_adc_compute.setup_davidson_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, x0_ea = direct_adc_compute.setup_davidson_ea(direct_adc, t_amp)
+
+        for name, apply_H, precond, x0 in (("IP", apply_H_ip, precond_ip, x0_ip), ("EA", apply_H_ea, precond_ea, x0_ea)):
+            t_start = time.time()
+            E, U = direct_adc.davidson(apply_H, x0, precond, nroots = direct_adc.nstates, verbose = 0,
+                                       max_cycle = direct_adc.max_cycle, max_space = direct_adc.max_space)
+            result[name] = np.array(E)
+            result[name + " time"] = time.time() - t_start
+
+            # Scratch of one sigma call on top of the stored blocks
+            tracemalloc.start()
+            apply_H(x0[0])
+            result[name + " peak MB"] = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+
+    result["v2e MB"] = sum(sum(direct_adc.v2e.nbytes(x)) for x in direct_adc.v2e.blocks) / 1e6
+    t2 = [x for block in t_amp[:2] if block is not None for x in block[:2 if direct_adc.closed_shell else 3]]
+    result["t2 MB"] = sum(x.nbytes for x in t2) / 1e6
+
+    return result
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nstates", type=int, default=6)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.conv_tol = 1e-12
+    mf.kernel()
+
+    ref = run(mf, args, "double")
+    new = run(mf, args, "mixed")
+
+    print ("Number of basis functions:       ", mol.nao_nr())
+    print ("Integrals held, double (MB):     ", ref["v2e MB"])
+    print ("Integrals held, mixed (MB):      ", new["v2e MB"])
+    print ("t2 amplitudes, double (MB):      ", ref["t2 MB"])
+    print ("t2 amplitudes, mixed (MB):       ", new["t2 MB"])
+    print ("MP2 energy error (a.u.):         ", abs(new["mp2"] - ref["mp2"]))
+    for name in ("IP", "EA"):
+        err = np.absolute(new[name] - ref[name])
+        print ("%s energies, double (a.u.):      " % name, ref[name])
+        print ("%s energy errors (a.u.):         " % name, err)
+        print ("Max %s energy error (eV):        " % name, np.max(err) * 27.211386)
+        print ("%s Davidson, double (sec):       " % name, ref[name + " time"])
+        print ("%s Davidson, mixed (sec):        " % name, new[name + " time"])
+        print ("%s sigma peak, double (MB):      " % name, ref[name + " peak MB"])
+        print ("%s sigma peak, mixed (MB):       " % name, new[name + " peak MB"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+###########################################################
+### Setup-time benchmark: serial vs threaded transform ###
+###########################################################
+# All 16 integral classes are built with prefetch(), once with one worker and
+# once with --workers threads of --blas-threads OpenMP/BLAS threads each.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_parallel_transform --basis cc-pvtz --spin 2 --workers 8
+import argparse
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+
+def time_transform(mf, args, workers, blas_threads):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.transform_workers = workers
+    direct_adc.blas_threads = blas_threads
+
+    t_transform = []
+    for n in range(args.repeat):
+        t_start = time.time()
+        direct_adc.transform_integrals()
+        direct_adc.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+        t_transform.append(time.time() - t_start)
+
+    return min(t_transform), direct_adc
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--blas-threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    t_serial, serial = time_transform(mf, args, 1, None)
+    t_threaded, threaded = time_transform(mf, args, args.workers, args.blas_threads)
+
+    max_diff = 0.0
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for ref, new in zip(getattr(serial.v2e, spaces), getattr(threaded.v2e, spaces)):
+            max_diff = max(max_diff, np.max(np.absolute(np.asarray(ref) - np.asarray(new))))
+
+    print ("Number of basis functions:   ", mol.nao_nr())
+    print ("Workers x BLAS threads:       %d x %d" % (threaded.scheduler.nworkers, threaded.scheduler.blas_threads))
+    print ("Serial transform (sec):      ", t_serial)
+    print ("Threaded transform (sec):    ", t_threaded)
+    print ("Speedup:                     ", t_serial / t_threaded)
+    print ("Job time / wall time (last): ", threaded.scheduler.job_time / threaded.scheduler.wall_time)
+    print ("Max integral difference:     ", max_diff)
+
+if __name__ == "__main__":
+    main()
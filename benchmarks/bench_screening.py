@@ -0,0 +1,86 @@
+###################################################################
+### Accuracy report: magnitude screening of integrals and t2 ###
+###################################################################
+# For each threshold, tiles of the in-memory vvvv, vvvo, vvov blocks with no
+# element above it are dropped and such tiles of t2_1 are zeroed. Only the
+# integral blocks are stored and contracted block-sparse; t2_1 stays dense.
+# Prints the tiles kept, the compression of the screened integral blocks and
+# the MP2 and IP/EA energy errors against the unscreened calculation.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_screening --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+def run(mf, args, threshold):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.nstates = args.nstates
+    direct_adc.verbose = 0
+    direct_adc.screening = threshold
+    direct_adc.screening_block = args.block
+
+    result = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        result["mp2"] = direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+
+        apply_H_ip, precond_ip, x0_ip = direct_adc_compute.setup_davidson_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, x0_ea = direct_adc_compute.setup_davidson_ea(direct_adc, t_amp)
+
+        for name, apply_H, precond, x0 in (("IP", apply_H_ip, precond_ip, x0_ip), ("EA", apply_H_ea, precond_ea, x0_ea)):
+            # A larger space keeps degenerate pairs of roots converged in all runs
+            t_start = time.time()
+            E, U = direct_adc.davidson(apply_H, x0, precond, nroots = direct_adc.nstates, verbose = 0,
+                                       max_cycle = direct_adc.max_cycle, max_space = max(direct_adc.max_space, 4 * direct_adc.nstates))
+            result[name] = np.array(E)
+            result[name + " time"] = time.time() - t_start
+
+    screening = direct_adc.v2e.screening
+    v2e = [x for name, x in screening.items() if not name.startswith("t2")]
+    t2 = [x for name, x in screening.items() if name.startswith("t2")]
+    result["v2e ratio"] = sum(x[2] for x in v2e) / max(1, sum(x[3] for x in v2e)) if len(v2e) > 0 else 1.0
+    result["v2e tiles"] = (sum(x[0] for x in v2e), sum(x[1] for x in v2e)) if len(v2e) > 0 else None
+    result["t2 tiles"] = (sum(x[0] for x in t2), sum(x[1] for x in t2)) if len(t2) > 0 else None
+
+    return result
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nstates", type=int, default=6)
+    parser.add_argument("--block", type=int, default=8)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[1e-8, 1e-6, 1e-4, 1e-3])
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.conv_tol = 1e-12
+    mf.kernel()
+
+    ref = run(mf, args, 0.0)
+
+    print ("Number of basis functions:       ", mol.nao_nr())
+    print ("Tile size:                       ", args.block)
+    print ("%10s %14s %12s %12s %12s %12s %12s" % ("threshold", "v2e tiles", "compression", "t2 nonzero",
+                                                   "MP2 err", "max IP err", "max EA err"))
+    for threshold in args.thresholds:
+        new = run(mf, args, threshold)
+        tiles = ["%d/%d" % x if x is not None else "-" for x in (new["v2e tiles"], new["t2 tiles"])]
+        print ("%10.1e %14s %12.2f %12s %12.2e %12.2e %12.2e" % (threshold, tiles[0], new["v2e ratio"], tiles[1],
+               abs(new["mp2"] - ref["mp2"]), np.max(np.absolute(new["IP"] - ref["IP"])),
+               np.max(np.absolute(new["EA"] - ref["EA"]))))
+
+if __name__ == "__main__":
+    main()
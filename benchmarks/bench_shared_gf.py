@@ -0,0 +1,78 @@
+#############################################################
+### GF benchmark: orbital workers with shared integrals ###
+#############################################################
+# With gf_workers > 1 the integral classes and amplitudes are published once in
+# shared memory and the worker processes attach to them. Prints the shared
+# size next to the data each worker would otherwise receive as a pickled copy.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_shared_gf --basis cc-pvdz --workers 4
+import argparse
+import contextlib
+import io
+import pickle
+import time
+import numpy as np
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.shm_helper as shm_helper
+
+def run(mf, args, workers):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.algorithm = "GF"
+    direct_adc.freq_range = (args.freq_start, args.freq_end)
+    direct_adc.step = args.step
+    direct_adc.gf_workers = workers
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        direct_adc.transform_integrals()
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H_ip, precond_ip, M_ij = direct_adc_compute.define_H_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+
+        t_start = time.time()
+        dos_ip, dos_ea = direct_adc_compute.calc_density_of_states(direct_adc, apply_H_ip, apply_H_ea, precond_ip, precond_ea, t_amp)
+        t_gf = time.time() - t_start
+
+    return direct_adc, t_amp, t_gf, np.array(dos_ip), np.array(dos_ea)
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(2)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--freq-start", type=float, default=-0.6)
+    parser.add_argument("--freq-end", type=float, default=-0.4)
+    parser.add_argument("--step", type=float, default=0.1)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    serial, t_amp, t_serial, ip_serial, ea_serial = run(mf, args, 1)
+    shared, t_amp, t_shared, ip_shared, ea_shared = run(mf, args, args.workers)
+
+    blocks = dict((x, shared.v2e.blocks[x]) for x in shared.v2e.blocks if x not in direct_adc_init.DERIVED_CLASSES)
+    with shm_helper.SharedStore() as store:
+        state, manifest = shared.share(store, t_amp)
+        shared_mb = store.nbytes / 1e6
+        manifest_mb = len(pickle.dumps((state, manifest))) / 1e6
+    copy_mb = len(pickle.dumps((blocks, t_amp))) / 1e6
+
+    print ("Number of basis functions:          ", mol.nao_nr())
+    print ("GF worker processes:                ", args.workers)
+    print ("Shared integrals and amplitudes (MB):", shared_mb)
+    print ("Sent to each worker, shared (MB):   ", manifest_mb)
+    print ("Sent to each worker, pickled (MB):  ", copy_mb)
+    print ("GF, serial (sec):                   ", t_serial)
+    print ("GF, %d workers (sec):                " % args.workers, t_shared)
+    print ("Max IP/EA DOS difference:           ", max(np.max(np.absolute(ip_shared - ip_serial)), np.max(np.absolute(ea_shared - ea_serial))))
+
+if __name__ == "__main__":
+    main()
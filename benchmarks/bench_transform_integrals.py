@@ -0,0 +1,132 @@
+##########################################################
+### Setup-time benchmark: shared vs per-class pipeline ###
+##########################################################
+# Times the production transform (per orbital space, shared half-transformed
+# intermediates) against one set of ao2mo passes per integral class, checks
+# that the integrals agree, and prints the peak of numpy allocations through
+# DirectADC.kernel with the integrals in memory and on disk.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m direct_adc_spin_integrated.benchmarks.bench_transform_integrals --basis cc-pvdz
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pyscf.ao2mo
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+
+# <pq||rs> of one class, one ao2mo pass per spin block and exchange term
+def legacy_transform_integrals(direct_adc):
+
+    occ = direct_adc.mo_a[:,:direct_adc.nocc_a], direct_adc.mo_b[:,:direct_adc.nocc_b]
+    vir = direct_adc.mo_a[:,direct_adc.nocc_a:], direct_adc.mo_b[:,direct_adc.nocc_b:]
+    space = {"o": occ, "v": vir}
+
+    def block(mo_1, mo_2, mo_3, mo_4, antisymmetrize):
+        shape = (mo_1.shape[1], mo_2.shape[1], mo_3.shape[1], mo_4.shape[1])
+        v2e = pyscf.ao2mo.general(direct_adc.v2e_ao, (mo_1, mo_3, mo_2, mo_4), compact=False)
+        v2e = v2e.reshape(shape[0], shape[2], shape[1], shape[3]).transpose(0,2,1,3)
+        if antisymmetrize:
+            v2e_ex = pyscf.ao2mo.general(direct_adc.v2e_ao, (mo_1, mo_4, mo_2, mo_3), compact=False)
+            v2e = v2e - v2e_ex.reshape(shape[0], shape[3], shape[1], shape[2]).transpose(0,2,3,1)
+        return v2e
+
+    v2e = {}
+    for spaces in direct_adc_init.V2E_CLASSES:
+        mo_1, mo_2, mo_3, mo_4 = (space[x] for x in spaces)
+        v2e_a = block(mo_1[0], mo_2[0], mo_3[0], mo_4[0], True)
+        v2e_ab = block(mo_1[0], mo_2[1], mo_3[0], mo_4[1], False)
+        v2e_b = block(mo_1[1], mo_2[1], mo_3[1], mo_4[1], True)
+        v2e[spaces] = (v2e_a, v2e_ab, v2e_b)
+
+    return v2e
+
+# Peak of numpy allocations through DirectADC.kernel, run in a scratch directory
+def kernel_peak(mf, args, disk):
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = args.method
+    direct_adc.nstates = args.nstates
+    direct_adc.freq_range = (args.freq_start, args.freq_end)
+    direct_adc.step = args.step
+    direct_adc.disk = disk
+    direct_adc.max_memory = args.max_memory
+    direct_adc.verbose = 0
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                tracemalloc.start()
+                t_start = time.time()
+                direct_adc.kernel()
+                t_kernel = time.time() - t_start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    return t_kernel, peak
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--atom", default="O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587")
+    parser.add_argument("--basis", default="cc-pvdz")
+    parser.add_argument("--spin", type=int, default=0)
+    parser.add_argument("--method", default="adc(3)")
+    parser.add_argument("--nstates", type=int, default=4)
+    parser.add_argument("--freq-start", type=float, default=-0.6)
+    parser.add_argument("--freq-end", type=float, default=-0.5)
+    parser.add_argument("--step", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-memory", type=float, default=2000)
+    args = parser.parse_args()
+
+    mol = gto.M(atom=args.atom, basis=args.basis, spin=args.spin, verbose=0)
+    mf = scf.RHF(mol) if args.spin == 0 else scf.UHF(mol)
+    mf.kernel()
+
+    direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.max_memory = args.max_memory
+
+    t_legacy = []
+    t_shared = []
+    for n in range(args.repeat):
+        t_start = time.time()
+        v2e = legacy_transform_integrals(direct_adc)
+        t_legacy.append(time.time() - t_start)
+
+        t_start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            direct_adc.transform_integrals()
+            direct_adc.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+        t_shared.append(time.time() - t_start)
+
+    max_diff = 0.0
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for ref, new in zip(v2e[spaces], getattr(direct_adc.v2e, spaces)):
+            max_diff = max(max_diff, np.max(np.absolute(ref - np.asarray(new[:]))))
+    final = sum(x.nbytes for spaces in direct_adc_init.V2E_CLASSES for x in v2e[spaces])
+
+    t_memory, peak_memory = kernel_peak(mf, args, False)
+    t_disk, peak_disk = kernel_peak(mf, args, True)
+
+    print ("Number of basis functions:         ", mol.nao_nr())
+    print ("Per-class transform (sec):         ", min(t_legacy))
+    print ("Shared transform (sec):            ", min(t_shared))
+    print ("Speedup:                           ", min(t_legacy) / min(t_shared))
+    print ("Max integral difference:           ", max_diff)
+    print ("All classes, unpacked (MB):        ", final / 1e6)
+    print ("Kernel, integrals in memory (sec): ", t_memory)
+    print ("Kernel, integrals on disk (sec):   ", t_disk)
+    print ("Kernel peak, in memory (MB):       ", peak_memory / 1e6)
+    print ("Kernel peak, on disk (MB):         ", peak_disk / 1e6)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import os
+import glob
+import hashlib
+import tempfile
+import h5py
+import numpy as np
+import direct_adc_spin_integrated.pack_helper as pack_helper
+import direct_adc_spin_integrated.precision_helper as precision_helper
+
+
+### Hash of everything the antisymmetrized MO integrals depend on ###
+def fingerprint(mo, nocc, v2e_ao, closed_shell = False, precision = "double", options = ()):
+
+    h = hashlib.sha256()
+
+    for x in mo + (np.asarray(nocc),):
+        x = np.ascontiguousarray(x)
+        h.update(str((x.shape, x.dtype.str)).encode())
+        h.update(x.tobytes())
+
+    # AO integral source: the molecule (atoms, shells, basis data) or stored ERIs
+    if isinstance(v2e_ao, np.ndarray):
+        sources = (v2e_ao,)
+    else:
+        sources = (v2e_ao._atm, v2e_ao._bas, v2e_ao._env, np.asarray(v2e_ao.cart))
+    for x in sources:
+        x = np.ascontiguousarray(x)
+        h.update(str((x.shape, x.dtype.str)).encode())
+        h.update(x.tobytes())
+
+    h.update(str(closed_shell).encode())
+    h.update(precision.encode())
+
+    # Further settings the cached data depend on (e.g. method of the amplitudes)
+    for x in options:
+        h.update(repr(x).encode())
+
+    return h.hexdigest()
+
+
+def copy_rows(dst, src, max_memory = 2000):
+
+    if src.size == 0:
+        return
+
+    row_size = max(1, int(np.prod(src.shape[1:]))) * src.dtype.itemsize
+    blksize = max(1, int(max_memory * 1e6 / row_size))
+    for p0 in range(0, src.shape[0], blksize):
+        p1 = min(p0 + blksize, src.shape[0])
+        dst[p0:p1] = src[p0:p1]
+
+
+#######################################################
+### On-disk cache of antisymmetrized integral classes ###
+#######################################################
+# cache_dir/<fingerprint>/<class>.h5 holds the a, ab and b blocks of one class
+# (b is omitted for closed shells). Files are written under a temporary name
+# and renamed, so concurrent jobs never read a partial entry. The modification
+# time marks the last use; the least recently used entries are removed when the
+# cache grows beyond max_size (MB).
+class IntegralCache:
+
+    def __init__(self, cache_dir, max_size = 10000, max_memory = 2000):
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_memory = max_memory
+
+    def path(self, key, spaces):
+
+        return os.path.join(self.cache_dir, key, spaces + ".h5")
+
+    def load(self, key, spaces, scratch = None, closed_shell = False):
+
+        path = self.path(key, spaces)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with h5py.File(path, mode='r') as f:
+                v2e = []
+                for name in ("a", "ab", "b"):
+                    if name == "b" and closed_shell:
+                        v2e.append(v2e[0])
+                        continue
+                    v2e.append(self.read(f[name], spaces + "/" + name, scratch))
+        except (OSError, KeyError):
+            return None
+
+        os.utime(path)
+
+        return tuple(v2e)
+
+    def read(self, dset, name, scratch):
+
+        if scratch is None:
+            block = dset[()]
+        else:
+            block = scratch.empty_dataset(name, dset.shape, dset.dtype)
+            copy_rows(block, dset, self.max_memory)
+
+        if "shape" in dset.attrs:
+            shape = dset.attrs["shape"]
+            block = pack_helper.TrilBlock(block, shape[0], shape[2])
+
+        return block
+
+    def store(self, key, spaces, v2e, closed_shell = False):
+
+        dirname = os.path.join(self.cache_dir, key)
+        os.makedirs(dirname, exist_ok=True)
+
+        fd, tmpname = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        os.close(fd)
+
+        try:
+            with h5py.File(tmpname, mode='w') as f:
+                for name, block in zip(("a", "ab", "b"), v2e):
+                    if name == "b" and closed_shell:
+                        continue
+                    shape = None
+                    if isinstance(block, pack_helper.TrilBlock):
+                        shape = block.shape
+                        block = block.packed
+                    dset = f.create_dataset(name, block.shape, dtype=block.dtype)
+                    copy_rows(dset, block, self.max_memory)
+                    if shape is not None:
+                        dset.attrs["shape"] = shape
+            os.replace(tmpname, self.path(key, spaces))
+        except OSError:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            return
+
+        self.evict()
+
+    def evict(self):
+
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*", "*.h5")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(x[1] for x in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size * 1e6:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+            dirname = os.path.dirname(path)
+            if not os.listdir(dirname):
+                os.rmdir(dirname)
+
+
+#############################################
+### Checkpoint of the amplitudes (t_amp) ###
+#############################################
+# One HDF5 file holds the groups t2_1, t2_2, t1_2 and t1_3 of t_amp with one
+# dataset per spin block (missing groups are None, e.g. t2_2 for ADC(2)) and
+# the fingerprint of the job they belong to. For closed shells the last (beta)
+# block is not written and is restored as a read-only alias of the first.
+# float32 blocks of precision = "mixed" keep their float64 contractions.
+AMPLITUDES = ("t2_1", "t2_2", "t1_2", "t1_3")
+
+
+def load_amplitudes(path, key, closed_shell = False):
+
+    if path is None or not os.path.exists(path):
+        return None
+
+    try:
+        with h5py.File(path, mode='r') as f:
+            if f.attrs.get("fingerprint") != key:
+                return None
+            t_amp = []
+            for name in AMPLITUDES:
+                if name not in f:
+                    t_amp.append(None)
+                    continue
+                group = f[name]
+                nblocks = int(group.attrs["nblocks"])
+                blocks = [read_amplitude(group[str(i)]) for i in range(nblocks - closed_shell)]
+                if closed_shell:
+                    blocks.append(blocks[0].view())
+                    blocks[-1].flags.writeable = False
+                t_amp.append(tuple(blocks))
+    except (OSError, KeyError):
+        return None
+
+    return tuple(t_amp)
+
+
+def read_amplitude(dset):
+
+    block = dset[()]
+    if block.dtype == np.float32:
+        block = block.view(precision_helper.Single)
+
+    return block
+
+
+def store_amplitudes(path, key, t_amp, closed_shell = False):
+
+    dirname = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dirname, exist_ok=True)
+
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+    os.close(fd)
+
+    try:
+        with h5py.File(tmpname, mode='w') as f:
+            f.attrs["fingerprint"] = key
+            for name, blocks in zip(AMPLITUDES, t_amp):
+                if blocks is None:
+                    continue
+                group = f.create_group(name)
+                group.attrs["nblocks"] = len(blocks)
+                for i, block in enumerate(blocks):
+                    if closed_shell and i == len(blocks) - 1:
+                        continue
+                    group.create_dataset(str(i), data=np.asarray(block).view(np.ndarray))
+        os.replace(tmpname, path)
+    except OSError:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
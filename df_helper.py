@@ -0,0 +1,154 @@
+import bisect
+import numpy as np
+import pyscf.df
+import pyscf.lib
+
+
+### Three-index factors of the AO integrals: (mn|ls) = sum_Q L^Q_mn L^Q_ls ###
+def density_fitting_eri(mol, auxbasis=None):
+
+    if auxbasis is None:
+        auxbasis = pyscf.df.make_auxbasis(mol, mp2fit=True)
+
+    return pyscf.df.incore.cholesky_eri(mol, auxbasis=auxbasis)
+
+
+def cholesky_eri(mol, threshold=1e-6):
+
+    nao = mol.nao_nr()
+    nbas = mol.nbas
+    ao_loc = mol.ao_loc_nr()
+
+    # Diagonal (mn|mn) over the lower triangle of AO pairs
+    diag = np.zeros((nao, nao))
+    for i in range(nbas):
+        for j in range(i+1):
+            eri = mol.intor('int2e', shls_slice=(i,i+1,j,j+1,i,i+1,j,j+1))
+            di, dj = eri.shape[:2]
+            d = eri.reshape(di*dj, di*dj).diagonal().reshape(di, dj)
+            diag[ao_loc[i]:ao_loc[i+1],ao_loc[j]:ao_loc[j+1]] = d
+            diag[ao_loc[j]:ao_loc[j+1],ao_loc[i]:ao_loc[i+1]] = d.T
+
+    tril = np.tril_indices(nao)
+    D = diag[tril]
+
+    # Pivoted incomplete Cholesky decomposition, one column (.|mn) at a time
+    L = np.zeros((nao, D.size))
+    naux = 0
+    shell_pair = None
+    col_ao = None
+
+    while naux < D.size:
+
+        piv = np.argmax(D)
+        if D[piv] < threshold:
+            break
+
+        m, n = tril[0][piv], tril[1][piv]
+        I = bisect.bisect_right(ao_loc, m) - 1
+        J = bisect.bisect_right(ao_loc, n) - 1
+
+        if shell_pair != (I, J):
+            col_ao = mol.intor('int2e', shls_slice=(0,nbas,0,nbas,I,I+1,J,J+1))
+            shell_pair = (I, J)
+
+        col = col_ao[:,:,m-ao_loc[I],n-ao_loc[J]][tril]
+        col -= np.dot(L[:naux,piv], L[:naux])
+        vec = col / np.sqrt(D[piv])
+
+        D -= vec**2
+        D[piv] = 0.0
+
+        if naux == L.shape[0]:
+            L = np.vstack((L, np.zeros_like(L)))
+        L[naux] = vec
+        naux += 1
+
+    return L[:naux].copy()
+
+
+def mo_factors(cderi, mo):
+
+    L = pyscf.lib.unpack_tril(cderi)
+    return np.matmul(mo.T, np.matmul(L, mo))
+
+
+########################################################
+### Integral block assembled on demand from factors ###
+########################################################
+# Behaves like an h5py dataset: rows along the first index are built from
+# the three-index factors when sliced, nothing four-index is kept in memory.
+class DFBlock:
+
+    def __init__(self, factors, ranges, antisymmetrize):
+
+        B_1, B_2 = factors
+        p, q, r, s = ranges
+
+        self.B_1 = B_1
+        self.B_2 = B_2
+        self.ranges = ranges
+        self.antisymmetrize = antisymmetrize
+
+        self.shape = tuple(len(range(*x.indices(B.shape[1]))) for x, B in zip(ranges, (B_1, B_2, B_1, B_2)))
+        self.ndim = 4
+        self.dtype = np.result_type(B_1.dtype, B_2.dtype)
+        self.size = int(np.prod(self.shape))
+
+    def _rows(self, ind):
+
+        p, q, r, s = self.ranges
+
+        B_pr = self.B_1[:,p,r][:,ind,:]
+        B_qs = self.B_2[:,q,s]
+
+        naux, n_p, n_r = B_pr.shape
+        n_q, n_s = B_qs.shape[1:]
+
+        # <pq|rs> = (pr|qs)
+        v2e = pyscf.lib.dot(B_pr.reshape(naux,-1).T, B_qs.reshape(naux,-1))
+        v2e = v2e.reshape(n_p,n_r,n_q,n_s).transpose(0,2,1,3)
+
+        # <pq||rs> = (pr|qs) - (ps|qr)
+        if self.antisymmetrize:
+            B_ps = self.B_1[:,p,s][:,ind,:]
+            B_qr = self.B_2[:,q,r]
+            v2e_ex = pyscf.lib.dot(B_ps.reshape(naux,-1).T, B_qr.reshape(naux,-1))
+            v2e = v2e - v2e_ex.reshape(n_p,n_s,n_q,n_r).transpose(0,2,3,1)
+
+        return np.ascontiguousarray(v2e)
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        ind = np.arange(self.shape[0])[key[0]]
+        if np.ndim(ind) == 0:
+            return self._rows([ind])[0][key[1:]]
+
+        return self._rows(ind)[(slice(None),) + key[1:]]
+
+    def __array__(self, dtype=None, copy=None):
+
+        v2e = self[:]
+        return v2e if dtype is None else v2e.astype(dtype)
+
+
+def blocks(factors, nocc, spaces, closed_shell=False):
+
+    B_a, B_b = factors
+    nocc_a, nocc_b = nocc
+
+    occ_a, vir_a = slice(0, nocc_a), slice(nocc_a, None)
+    occ_b, vir_b = slice(0, nocc_b), slice(nocc_b, None)
+
+    ranges_a = tuple(occ_a if x == "o" else vir_a for x in spaces)
+    ranges_b = tuple(occ_b if x == "o" else vir_b for x in spaces)
+    ranges_ab = ranges_a[0], ranges_b[1], ranges_a[2], ranges_b[3]
+
+    v2e_a = DFBlock((B_a, B_a), ranges_a, True)
+    v2e_b = v2e_a if closed_shell else DFBlock((B_b, B_b), ranges_b, True)
+    v2e_ab = DFBlock((B_a, B_b), ranges_ab, False)
+
+    return (v2e_a, v2e_ab, v2e_b)
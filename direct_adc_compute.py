@@ -1,7 +1,39 @@
 import sys
 import numpy as np
 import time
-from functools import reduce
+import multiprocessing
+from functools import reduce, wraps
+from pyscf.lib import linalg_helper
+import direct_adc_spin_integrated.pack_helper as pack_helper
+import direct_adc_spin_integrated.disk_helper as disk_helper
+import direct_adc_spin_integrated.shm_helper as shm_helper
+import direct_adc_spin_integrated.ao_helper as ao_helper
+import direct_adc_spin_integrated.precision_helper as precision_helper
+import direct_adc_spin_integrated.sparse_helper as sparse_helper
+import direct_adc_spin_integrated.cache_helper as cache_helper
+
+#######################################################
+# Record which integral classes each stage touches #
+#######################################################
+def integral_stage(stage):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(direct_adc, *args, **kwargs):
+            previous = direct_adc.v2e.stage
+            direct_adc.v2e.stage = stage
+            try:
+                return func(direct_adc, *args, **kwargs)
+            finally:
+                direct_adc.v2e.stage = previous
+        return wrapper
+    return decorator
+
+# Parent integral classes read by each method; the views are built from them.
+# ADC(2) lists vvvo and vvov because t1_2 and the EA-ADC(2) terms read them
+# through their vovv and ovvv views (DERIVED_CLASSES in direct_adc_init).
+METHOD_CLASSES = {"adc(2)": ("oovv", "ooov", "oovo", "vvvo", "vvov")}
+METHOD_CLASSES["adc(2)-e"] = METHOD_CLASSES["adc(2)"] + ("vvvv", "oooo", "voov", "ovov", "vovo")
+METHOD_CLASSES["adc(3)"] = METHOD_CLASSES["adc(2)-e"]
 
 ###########################################
 # Computing GF IP/EA-ADC #
@@ -23,6 +55,9 @@ def kernel(direct_adc):
     print ("Number of beta occupied orbitals:  ", direct_adc.nocc_b)
     print ("Number of alpha virtual orbitals:  ", direct_adc.nvir_a)
     print ("Number of beta virtual orbitals:   ", direct_adc.nvir_b)
+    print ("Number of frozen core orbitals:    ", direct_adc.frozen_core)
+    print ("Number of frozen virtual orbitals: ", direct_adc.frozen_virtual)
+    print_fno_summary(direct_adc)
     print ("Nuclear repulsion energy:          ", direct_adc.enuc,"\n")
     print ("Number of states:            ", direct_adc.nstates)
     print ("Frequency step:              ", direct_adc.step)
@@ -37,8 +72,11 @@ def kernel(direct_adc):
 
     t_start = time.time()
 
+    # Build the integral classes of the method as concurrent transform jobs
+    direct_adc.v2e.prefetch(METHOD_CLASSES[direct_adc.method])
+
     # Compute amplitudes
-    t_amp = compute_amplitudes(direct_adc)
+    t_amp = checkpointed_amplitudes(direct_adc)
 
     # Compute MP2 energy
     e_mp2 = compute_mp2_energy(direct_adc, t_amp)
@@ -63,6 +101,8 @@ def kernel(direct_adc):
         # Compute the sigma vector for EA
         apply_H_ea, precond_ea, M_ab = define_H_ea(direct_adc,t_amp)
 
+    direct_adc.v2e.release()
+
     # Compute Green's functions directly
     #dos,orbital = calc_density_of_states(direct_adc, apply_H,precond,t_amp)
     dos_ip, dos_ea = calc_density_of_states(direct_adc, apply_H_ip, apply_H_ea, precond_ip, precond_ea,t_amp)
@@ -77,9 +117,27 @@ def kernel(direct_adc):
     if direct_adc.IP == True and direct_adc.EA == True:
         np.savetxt('total_density_of_states.txt',density, fmt='%.8f')
 
+    direct_adc.contractions.report()
+    direct_adc.amplitude_allocations.report("Memory allocated in the amplitude stages:", amplitude_nbytes(t_amp))
+    direct_adc.v2e.report()
+
     print ("Computation successfully finished")
     print ("Total time:", (time.time() - t_start, "sec"))
 
+def print_fno_summary(direct_adc):
+
+    if not direct_adc.fno:
+        return
+
+    info = direct_adc.fno_info
+    print ("FNO occupation threshold:          ", direct_adc.fno_threshold)
+    print ("FNO alpha virtual orbitals kept:   ", info["nkeep"][0], "of", info["nvir"][0])
+    print ("FNO beta virtual orbitals kept:    ", info["nkeep"][1], "of", info["nvir"][1])
+    print ("FNO retained virtual fraction:     ", sum(info["nkeep"]) / sum(info["nvir"]))
+    print ("FNO MP2 energy, full virtuals:     ", info["e_mp2"])
+    print ("FNO MP2 energy, kept virtuals:     ", info["e_mp2_fno"])
+    print ("FNO MP2 energy recovered:          ", info["e_mp2_fno"] / info["e_mp2"] if info["e_mp2"] != 0.0 else 1.0)
+
 ###########################################
 # Computing conventional IP/EA-ADC #
 ###########################################
@@ -101,6 +159,9 @@ def conventional(direct_adc):
     print ("Number of beta occupied orbitals:  ", direct_adc.nocc_b)
     print ("Number of alpha virtual orbitals:  ", direct_adc.nvir_a)
     print ("Number of beta virtual orbitals:   ", direct_adc.nvir_b)
+    print ("Number of frozen core orbitals:    ", direct_adc.frozen_core)
+    print ("Number of frozen virtual orbitals: ", direct_adc.frozen_virtual)
+    print_fno_summary(direct_adc)
     print ("Number of states:                  ", direct_adc.nstates)
     print ("Nuclear repulsion energy:          ", direct_adc.enuc,"\n")
     print ("SCF orbital energies(alpha):\n", direct_adc.mo_energy_a, "\n")
@@ -108,9 +169,14 @@ def conventional(direct_adc):
 
     t_start = time.time()
 
+    # Build the integral classes of the method as concurrent transform jobs
+    direct_adc.v2e.prefetch(METHOD_CLASSES[direct_adc.method])
+    print ("time to transform integrals:", (time.time() - t_start, "sec"))
+
     # Compute amplitudes
-    t_amp = compute_amplitudes(direct_adc)
-    print ("time to calculate amplitudes:", (time.time() - t_start, "sec"))
+    t_amp_start = time.time()
+    t_amp = checkpointed_amplitudes(direct_adc)
+    print ("time to calculate amplitudes:", (time.time() - t_amp_start, "sec"))
 
     # Compute MP2 energy
     e_mp2 = compute_mp2_energy(direct_adc, t_amp)
@@ -129,13 +195,15 @@ def conventional(direct_adc):
     if direct_adc.EA == True:
         apply_H_ea, precond_ea, x0_ea = setup_davidson_ea(direct_adc, t_amp)
 
+    direct_adc.v2e.release()
+
     # Compute ionization and electron-attachment energies using Davidson algorithm
 
     if direct_adc.IP == True:
-        E_ip, U_ip = direct_adc.davidson(apply_H_ip, x0_ip, precond_ip, nroots = direct_adc.nstates, verbose = direct_adc.verbose, max_cycle = direct_adc.max_cycle, max_space = direct_adc.max_space)
+        E_ip, U_ip = davidson(direct_adc, apply_H_ip, x0_ip, precond_ip)
 
     if direct_adc.EA == True:
-        E_ea, U_ea = direct_adc.davidson(apply_H_ea, x0_ea, precond_ea, nroots = direct_adc.nstates, verbose = direct_adc.verbose, max_cycle = direct_adc.max_cycle, max_space = direct_adc.max_space)
+        E_ea, U_ea = davidson(direct_adc, apply_H_ea, x0_ea, precond_ea)
 
     if direct_adc.IP == True:
         print ("\n%s ionization energies (a.u.):" % (direct_adc.method))
@@ -163,13 +231,40 @@ def conventional(direct_adc):
         print ("%s spectroscopic intensity:" % (direct_adc.method))
         print (P.reshape(-1,1))
 
+    direct_adc.contractions.report()
+    direct_adc.amplitude_allocations.report("Memory allocated in the amplitude stages:", amplitude_nbytes(t_amp))
+    direct_adc.v2e.report()
+
     print ("Computation successfully finished")
     print ("Total time:", (time.time() - t_start, "sec"))
 
+###########################################
+# Amplitudes read from or written to a checkpoint #
+###########################################
+# With amplitude_file set, amplitudes of a previous job with the same
+# fingerprint (orbitals, integrals, method, precision) are read instead of
+# computed; otherwise they are computed and written for later jobs
+def checkpointed_amplitudes(direct_adc):
+
+    if direct_adc.amplitude_file is None:
+        return compute_amplitudes(direct_adc)
+
+    t_amp = cache_helper.load_amplitudes(direct_adc.amplitude_file, direct_adc.amplitude_fingerprint, direct_adc.closed_shell)
+    if t_amp is not None:
+        print ("Amplitudes read from:              ", direct_adc.amplitude_file)
+        return t_amp
+
+    t_amp = compute_amplitudes(direct_adc)
+    cache_helper.store_amplitudes(direct_adc.amplitude_file, direct_adc.amplitude_fingerprint, t_amp, direct_adc.closed_shell)
+    print ("Amplitudes written to:             ", direct_adc.amplitude_file)
+
+    return t_amp
+
 ###########################################
 # Calculate t-amplitudes  #
 ###########################################
 #@profile
+@integral_stage("amplitudes")
 def compute_amplitudes(direct_adc):
 
     t2_1, t2_2, t1_2, t1_3 = (None,) * 4
@@ -179,27 +274,36 @@ def compute_amplitudes(direct_adc):
     nvir_a = direct_adc.nvir_a
     nvir_b = direct_adc.nvir_b
 
+    # For closed-shell references the beta amplitudes alias the alpha ones
+    closed_shell = direct_adc.closed_shell
+
     v2e_oovv_a,v2e_oovv_ab,v2e_oovv_b  = direct_adc.v2e.oovv
-    v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b  = direct_adc.v2e.vvvv
-    v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b  = direct_adc.v2e.oooo
-    v2e_voov_a,v2e_voov_ab,v2e_voov_b  = direct_adc.v2e.voov
     v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b  = direct_adc.v2e.ooov
     v2e_vovv_a,v2e_vovv_ab,v2e_vovv_b  = direct_adc.v2e.vovv
-    v2e_vvoo_a,v2e_vvoo_ab,v2e_vvoo_b  = direct_adc.v2e.vvoo
     v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b  = direct_adc.v2e.oovo
-    v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b  = direct_adc.v2e.ovov
-    v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b  = direct_adc.v2e.vovo
-    v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b  = direct_adc.v2e.vvvo
-    v2e_vvov_a,v2e_vvov_ab,v2e_vvov_b  = direct_adc.v2e.vvov
-    v2e_vooo_a,v2e_vooo_ab,v2e_vooo_b  = direct_adc.v2e.vooo
-    v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b  = direct_adc.v2e.ovoo
     v2e_ovvv_a,v2e_ovvv_ab,v2e_ovvv_b  = direct_adc.v2e.ovvv
-    v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b  = direct_adc.v2e.oovo
-    v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b  = direct_adc.v2e.ovvo
+
+    if (direct_adc.method == "adc(2)-e" or direct_adc.method == "adc(3)"):
+        v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b  = direct_adc.v2e.vvvv
+        v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b  = direct_adc.v2e.oooo
+        v2e_voov_a,v2e_voov_ab,v2e_voov_b  = direct_adc.v2e.voov
+        v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b  = direct_adc.v2e.ovov
+        v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b  = direct_adc.v2e.vovo
+        v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b  = direct_adc.v2e.ovvo
+
+    if (direct_adc.method == "adc(3)"):
+        v2e_vvoo_a,v2e_vvoo_ab,v2e_vvoo_b  = direct_adc.v2e.vvoo
+        v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b  = direct_adc.v2e.vvvo
+        v2e_vvov_a,v2e_vvov_ab,v2e_vvov_b  = direct_adc.v2e.vvov
+        v2e_vooo_a,v2e_vooo_ab,v2e_vooo_b  = direct_adc.v2e.vooo
+        v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b  = direct_adc.v2e.ovoo
 
     e_a = direct_adc.mo_energy_a
     e_b = direct_adc.mo_energy_b
 
+    allocations = direct_adc.amplitude_allocations
+    allocations.start()
+
     d_ij_a = e_a[:nocc_a][:,None] + e_a[:nocc_a]
     d_ij_b = e_b[:nocc_b][:,None] + e_b[:nocc_b]
     d_ij_ab = e_a[:nocc_a][:,None] + e_b[:nocc_b]
@@ -208,13 +312,7 @@ def compute_amplitudes(direct_adc):
     d_ab_b = e_b[nocc_b:][:,None] + e_b[nocc_b:]
     d_ab_ab = e_a[nocc_a:][:,None] + e_b[nocc_b:]
 
-    D2_a = d_ij_a.reshape(-1,1) - d_ab_a.reshape(-1)
-    D2_b = d_ij_b.reshape(-1,1) - d_ab_b.reshape(-1)
-    D2_ab = d_ij_ab.reshape(-1,1) - d_ab_ab.reshape(-1)
-
-    D2_a = D2_a.reshape((nocc_a,nocc_a,nvir_a,nvir_a))
-    D2_b = D2_b.reshape((nocc_b,nocc_b,nvir_b,nvir_b))
-    D2_ab = D2_ab.reshape((nocc_a,nocc_b,nvir_a,nvir_b))
+    # The o^2v^2 denominators d_ij - d_ab are applied in place by divide_D2
 
     D1_a = e_a[:nocc_a][:None].reshape(-1,1) - e_a[nocc_a:].reshape(-1)
     D1_b = e_b[:nocc_b][:None].reshape(-1,1) - e_b[nocc_b:].reshape(-1)
@@ -223,26 +321,44 @@ def compute_amplitudes(direct_adc):
 
 ############ Compute t2_1, t1_2 ##############################
 
-    t2_1_a = v2e_oovv_a/D2_a
-    t2_1_b = v2e_oovv_b/D2_b
-    t2_1_ab = v2e_oovv_ab/D2_ab
+    t2_1_a = divide_D2(np.array(v2e_oovv_a, dtype=np.float64), d_ij_a, d_ab_a)
+    t2_1_ab = divide_D2(np.array(v2e_oovv_ab, dtype=np.float64), d_ij_ab, d_ab_ab)
+    if closed_shell:
+        t2_1_b = readonly_view(t2_1_a)
+    else:
+        t2_1_b = divide_D2(np.array(v2e_oovv_b, dtype=np.float64), d_ij_b, d_ab_b)
+
+    # Screening: (i,j) tiles of t2_1 with no element above threshold are zeroed.
+    # t2_1 stays dense, so it takes the same memory and contractions still run
+    # over the zero tiles; only the screened integral blocks are stored sparse.
+    if direct_adc.screening > 0.0:
+        names = ("t2_1_a", "t2_1_ab") if closed_shell else ("t2_1_a", "t2_1_ab", "t2_1_b")
+        for name, t2 in zip(names, (t2_1_a, t2_1_ab, t2_1_b)):
+            kept, total = sparse_helper.screen_dense(t2, direct_adc.screening, direct_adc.screening_block)
+            direct_adc.v2e.screening[name] = (kept, total, t2.nbytes, t2.nbytes)
 
     t2_1 = (t2_1_a , t2_1_ab, t2_1_b)
+    allocations.mark("t2_1")
+
+    t1_2_a = 0.5*block_einsum(direct_adc, 'akcd,ikcd->ia',v2e_vovv_a,t2_1_a)
+    t1_2_a -= 0.5*einsum(direct_adc, 'klic,klac->ia',v2e_ooov_a,t2_1_a)
+    t1_2_a += block_einsum(direct_adc, 'akcd,ikcd->ia',v2e_vovv_ab,t2_1_ab)
+    t1_2_a -= einsum(direct_adc, 'klic,klac->ia',v2e_ooov_ab,t2_1_ab)
 
-    t1_2_a = 0.5*np.einsum('akcd,ikcd->ia',v2e_vovv_a,t2_1_a)
-    t1_2_a -= 0.5*np.einsum('klic,klac->ia',v2e_ooov_a,t2_1_a)
-    t1_2_a += np.einsum('akcd,ikcd->ia',v2e_vovv_ab,t2_1_ab)
-    t1_2_a -= np.einsum('klic,klac->ia',v2e_ooov_ab,t2_1_ab)
+    t1_2_a /= D1_a
 
-    t1_2_b = 0.5*np.einsum('akcd,ikcd->ia',v2e_vovv_b,t2_1_b)
-    t1_2_b -= 0.5*np.einsum('klic,klac->ia',v2e_ooov_b,t2_1_b)
-    t1_2_b += np.einsum('kadc,kidc->ia',v2e_ovvv_ab,t2_1_ab)
-    t1_2_b -= np.einsum('lkci,lkca->ia',v2e_oovo_ab,t2_1_ab)
+    if closed_shell:
+        t1_2_b = readonly_view(t1_2_a)
+    else:
+        t1_2_b = 0.5*block_einsum(direct_adc, 'akcd,ikcd->ia',v2e_vovv_b,t2_1_b)
+        t1_2_b -= 0.5*einsum(direct_adc, 'klic,klac->ia',v2e_ooov_b,t2_1_b)
+        t1_2_b += block_einsum(direct_adc, 'kadc,kidc->ia',v2e_ovvv_ab,t2_1_ab)
+        t1_2_b -= einsum(direct_adc, 'lkci,lkca->ia',v2e_oovo_ab,t2_1_ab)
 
-    t1_2_a = t1_2_a/D1_a
-    t1_2_b = t1_2_b/D1_b
+        t1_2_b /= D1_b
 
     t1_2 = (t1_2_a , t1_2_b)
+    allocations.mark("t1_2")
 
 ############ Compute t2_2 ##############################
 
@@ -250,206 +366,519 @@ def compute_amplitudes(direct_adc):
 
         #print("Calculating additional amplitudes for adc(2)-e and adc(3)")
 
-        temp = t2_1_a.reshape(nocc_a*nocc_a,nvir_a*nvir_a)
-        temp_1 = v2e_vvvv_a[:].reshape(nvir_a*nvir_a,nvir_a*nvir_a)
-        t2_2_a = 0.5*np.dot(temp,temp_1.T).reshape(nocc_a,nocc_a,nvir_a,nvir_a)
-        del temp_1
-        t2_2_a += 0.5*np.einsum('klij,klab->ijab',v2e_oooo_a,t2_1_a,optimize=True)
+        temp = pack_helper.pack_pairs(t2_1_a).reshape(nocc_a*nocc_a,-1)
+        t2_2_a = pack_helper.unpack_pairs(vvvv_pair_dot(direct_adc,temp,v2e_vvvv_a), nvir_a).reshape(nocc_a,nocc_a,nvir_a,nvir_a)
+        temp = einsum(direct_adc, 'klij,klab->ijab',v2e_oooo_a,t2_1_a)
+        temp *= 0.5
+        t2_2_a += temp
 
-        temp = np.einsum('bkjc,kica->ijab',v2e_voov_a,t2_1_a,optimize=True)
-        temp_1 = np.einsum('bkjc,ikac->ijab',v2e_voov_ab,t2_1_ab,optimize=True)
+        # One buffer holds each antisymmetrized term before it is added
+        buf = np.empty_like(t2_2_a)
 
-        t2_2_a += temp - temp.transpose(1,0,2,3) - temp.transpose(0,1,3,2) + temp.transpose(1,0,3,2)
-        t2_2_a += temp_1 - temp_1.transpose(1,0,2,3) - temp_1.transpose(0,1,3,2) + temp_1.transpose(1,0,3,2)
+        temp = einsum(direct_adc, 'bkjc,kica->ijab',v2e_voov_a,t2_1_a)
+        add_antisymmetrized(t2_2_a, temp, buf)
+        temp = einsum(direct_adc, 'bkjc,ikac->ijab',v2e_voov_ab,t2_1_ab)
+        add_antisymmetrized(t2_2_a, temp, buf)
 
-        temp = t2_1_b.reshape(nocc_b*nocc_b,nvir_b*nvir_b)
-        temp_1 = v2e_vvvv_b[:].reshape(nvir_b*nvir_b,nvir_b*nvir_b)
-        t2_2_b = 0.5*np.dot(temp,temp_1.T).reshape(nocc_b,nocc_b,nvir_b,nvir_b)
-        del temp_1
-        t2_2_b += 0.5*np.einsum('klij,klab->ijab',v2e_oooo_b,t2_1_b,optimize=True)
+        if not closed_shell:
+            temp = pack_helper.pack_pairs(t2_1_b).reshape(nocc_b*nocc_b,-1)
+            t2_2_b = pack_helper.unpack_pairs(vvvv_pair_dot(direct_adc,temp,v2e_vvvv_b), nvir_b).reshape(nocc_b,nocc_b,nvir_b,nvir_b)
+            temp = einsum(direct_adc, 'klij,klab->ijab',v2e_oooo_b,t2_1_b)
+            temp *= 0.5
+            t2_2_b += temp
 
-        temp = np.einsum('bkjc,kica->ijab',v2e_voov_b,t2_1_b,optimize=True)
-        temp_1 = np.einsum('kbcj,kica->ijab',v2e_ovvo_ab,t2_1_ab,optimize=True)
+            if buf.shape != t2_2_b.shape:
+                buf = np.empty_like(t2_2_b)
 
-        t2_2_b += temp - temp.transpose(1,0,2,3) - temp.transpose(0,1,3,2) + temp.transpose(1,0,3,2)
-        t2_2_b += temp_1 - temp_1.transpose(1,0,2,3) - temp_1.transpose(0,1,3,2) + temp_1.transpose(1,0,3,2)
+            temp = einsum(direct_adc, 'bkjc,kica->ijab',v2e_voov_b,t2_1_b)
+            add_antisymmetrized(t2_2_b, temp, buf)
+            temp = einsum(direct_adc, 'kbcj,kica->ijab',v2e_ovvo_ab,t2_1_ab)
+            add_antisymmetrized(t2_2_b, temp, buf)
+
+        del temp, buf
 
         temp = t2_1_ab.reshape(nocc_a*nocc_b,nvir_a*nvir_b)
-        temp_1 = v2e_vvvv_ab[:].reshape(nvir_a*nvir_b,nvir_a*nvir_b)
-        t2_2_ab = np.dot(temp,temp_1.T).reshape(nocc_a,nocc_b,nvir_a,nvir_b)
-        del temp_1
-        t2_2_ab += np.einsum('klij,klab->ijab',v2e_oooo_ab,t2_1_ab,optimize=True)
-        t2_2_ab += np.einsum('kbcj,kica->ijab',v2e_ovvo_ab,t2_1_a,optimize=True)
-        t2_2_ab += np.einsum('bkjc,ikac->ijab',v2e_voov_b,t2_1_ab,optimize=True)
-        t2_2_ab -= np.einsum('kbic,kjac->ijab',v2e_ovov_ab,t2_1_ab,optimize=True)
-        t2_2_ab -= np.einsum('akcj,ikcb->ijab',v2e_vovo_ab,t2_1_ab,optimize=True)
-        t2_2_ab += np.einsum('akic,kjcb->ijab',v2e_voov_ab,t2_1_b,optimize=True)
-        t2_2_ab += np.einsum('akic,kjcb->ijab',v2e_voov_a,t2_1_ab,optimize=True)
-
-        t2_2_a = t2_2_a/D2_a
-        t2_2_b = t2_2_b/D2_b
-        t2_2_ab = t2_2_ab/D2_ab
+        t2_2_ab = vvvv_dot(direct_adc,temp,v2e_vvvv_ab).reshape(nocc_a,nocc_b,nvir_a,nvir_b)
+        t2_2_ab += einsum(direct_adc, 'klij,klab->ijab',v2e_oooo_ab,t2_1_ab)
+        t2_2_ab += einsum(direct_adc, 'kbcj,kica->ijab',v2e_ovvo_ab,t2_1_a)
+        t2_2_ab += einsum(direct_adc, 'bkjc,ikac->ijab',v2e_voov_b,t2_1_ab)
+        t2_2_ab -= einsum(direct_adc, 'kbic,kjac->ijab',v2e_ovov_ab,t2_1_ab)
+        t2_2_ab -= einsum(direct_adc, 'akcj,ikcb->ijab',v2e_vovo_ab,t2_1_ab)
+        t2_2_ab += einsum(direct_adc, 'akic,kjcb->ijab',v2e_voov_ab,t2_1_b)
+        t2_2_ab += einsum(direct_adc, 'akic,kjcb->ijab',v2e_voov_a,t2_1_ab)
+
+        divide_D2(t2_2_a, d_ij_a, d_ab_a)
+        divide_D2(t2_2_ab, d_ij_ab, d_ab_ab)
+        if closed_shell:
+            t2_2_b = readonly_view(t2_2_a)
+        else:
+            divide_D2(t2_2_b, d_ij_b, d_ab_b)
 
         t2_2 = (t2_2_a , t2_2_ab, t2_2_b)
+        allocations.mark("t2_2")
 
 ############ Compute t1_3 ##############################
 
     if (direct_adc.method == "adc(3)"):
 
         #print("Calculating additional amplitudes for adc(3)"
-        t1_3_a = np.einsum('d,ilad,ld->ia',e_a[nocc_a:],t2_1_a,t1_2_a,optimize=True)
-        t1_3_a += np.einsum('d,ilad,ld->ia',e_b[nocc_b:],t2_1_ab,t1_2_b,optimize=True)
+        # Intermediates shared between the alpha and beta terms
+        shared = {}
+
+        # Orbital energy terms: (e_d - e_l) = -D1[l,d] on t1_2, (e_a - e_i)/2 = -D1[i,a]/2 on the result
+        t1_2_D1_a = t1_2_a * D1_a
+        t1_2_D1_b = t1_2_b * D1_b
+
+        temp = einsum(direct_adc, 'ilad,ld->ia',t2_1_a,t1_2_a)
+        temp += einsum(direct_adc, 'ilad,ld->ia',t2_1_ab,t1_2_b)
+        t1_3_a = -0.5*D1_a*temp
+        t1_3_a -= einsum(direct_adc, 'ilad,ld->ia',t2_1_a,t1_2_D1_a)
+        t1_3_a -= einsum(direct_adc, 'ilad,ld->ia',t2_1_ab,t1_2_D1_b)
+
+        t1_3_a += einsum(direct_adc, 'ld,adil->ia',t1_2_a,v2e_vvoo_a )
+        t1_3_a += einsum(direct_adc, 'ld,adil->ia',t1_2_b,v2e_vvoo_ab)
+
+        t1_3_a += einsum(direct_adc, 'ld,alid->ia',t1_2_a,v2e_voov_a )
+        t1_3_a += einsum(direct_adc, 'ld,alid->ia',t1_2_b,v2e_voov_ab)
+
+        t1_3_a -= 0.5*einsum(direct_adc, 'lmad,lmid->ia',t2_2_a,v2e_ooov_a)
+        t1_3_a -=     einsum(direct_adc, 'lmad,lmid->ia',t2_2_ab,v2e_ooov_ab)
+
+        t1_3_a += 0.5*block_einsum(direct_adc, 'ilde,alde->ia',t2_2_a,v2e_vovv_a)
+        t1_3_a += block_einsum(direct_adc, 'ilde,alde->ia',t2_2_ab,v2e_vovv_ab)
+
+        t1_3_a -= staged_einsum(direct_adc, shared, 'ildf,aefm,lmde->ia',t2_1_a,v2e_vvvo_a,  t2_1_a )
+        t1_3_a += staged_einsum(direct_adc, shared, 'ilfd,aefm,mled->ia',t2_1_ab,v2e_vvvo_a, t2_1_ab)
+        t1_3_a -= staged_einsum(direct_adc, shared, 'ildf,aefm,lmde->ia',t2_1_a,v2e_vvvo_ab, t2_1_ab)
+        t1_3_a += staged_einsum(direct_adc, shared, 'ilfd,aefm,lmde->ia',t2_1_ab,v2e_vvvo_ab,t2_1_b )
+        t1_3_a -= staged_einsum(direct_adc, shared, 'ildf,aemf,mlde->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab)
+
+        t1_3_a += 0.5*staged_einsum(direct_adc, shared, 'ilaf,defm,lmde->ia',t2_1_a,v2e_vvvo_a,t2_1_a)
+        t1_3_a += 0.5*staged_einsum(direct_adc, shared, 'ilaf,defm,lmde->ia',t2_1_ab,v2e_vvvo_b,t2_1_b)
+        t1_3_a += staged_einsum(direct_adc, shared, 'ilaf,edmf,mled->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab)
+        t1_3_a += staged_einsum(direct_adc, shared, 'ilaf,defm,lmde->ia',t2_1_a,v2e_vvvo_ab,t2_1_ab)
+
+        t1_3_a += 0.25*staged_einsum(direct_adc, shared, 'inde,anlm,lmde->ia',t2_1_a,v2e_vooo_a,t2_1_a)
+        t1_3_a += staged_einsum(direct_adc, shared, 'inde,anlm,lmde->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab)
+
+        t1_3_a += 0.5*staged_einsum(direct_adc, shared, 'inad,enlm,lmde->ia',t2_1_a,v2e_vooo_a,t2_1_a)
+        t1_3_a -= 0.5 * staged_einsum(direct_adc, shared, 'inad,neml,mlde->ia',t2_1_a,v2e_ovoo_ab,t2_1_ab)
+        t1_3_a -= 0.5 * staged_einsum(direct_adc, shared, 'inad,nelm,lmde->ia',t2_1_a,v2e_ovoo_ab,t2_1_ab)
+        t1_3_a -= 0.5 *staged_einsum(direct_adc, shared, 'inad,enlm,lmed->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab)
+        t1_3_a -= 0.5*staged_einsum(direct_adc, shared, 'inad,enml,mled->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab)
+        t1_3_a += 0.5*staged_einsum(direct_adc, shared, 'inad,enlm,lmde->ia',t2_1_ab,v2e_vooo_b,t2_1_b)
+
+        t1_3_a -= 0.5*staged_einsum(direct_adc, shared, 'lnde,amin,lmde->ia',t2_1_a,v2e_vooo_a,t2_1_a)
+        t1_3_a -= staged_einsum(direct_adc, shared, 'nled,amin,mled->ia',t2_1_ab,v2e_vooo_a,t2_1_ab)
+        t1_3_a -= 0.5*staged_einsum(direct_adc, shared, 'lnde,amin,lmde->ia',t2_1_b,v2e_vooo_ab,t2_1_b)
+        t1_3_a -= staged_einsum(direct_adc, shared, 'lnde,amin,lmde->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab)
+
+        t1_3_a += 0.5*staged_einsum(direct_adc, shared, 'lmdf,afie,lmde->ia',t2_1_a,v2e_vvov_a,t2_1_a)
+        t1_3_a += staged_einsum(direct_adc, shared, 'mlfd,afie,mled->ia',t2_1_ab,v2e_vvov_a,t2_1_ab)
+        t1_3_a += 0.5*staged_einsum(direct_adc, shared, 'lmdf,afie,lmde->ia',t2_1_b,v2e_vvov_ab,t2_1_b)
+        t1_3_a += staged_einsum(direct_adc, shared, 'lmdf,afie,lmde->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab)
+
+        t1_3_a -= staged_einsum(direct_adc, shared, 'lnde,emin,lmad->ia',t2_1_a,v2e_vooo_a,t2_1_a)
+        t1_3_a += staged_einsum(direct_adc, shared, 'lnde,mein,lmad->ia',t2_1_ab,v2e_ovoo_ab,t2_1_a)
+        t1_3_a += staged_einsum(direct_adc, shared, 'nled,emin,mlad->ia',t2_1_ab,v2e_vooo_a,t2_1_ab)
+        t1_3_a += staged_einsum(direct_adc, shared, 'lned,emin,lmad->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab)
+        t1_3_a -= staged_einsum(direct_adc, shared, 'lnde,mein,mlad->ia',t2_1_b,v2e_ovoo_ab,t2_1_ab)
+
+        t1_3_a -= 0.25*staged_einsum(direct_adc, shared, 'lmef,efid,lmad->ia',t2_1_a,v2e_vvov_a,t2_1_a)
+        t1_3_a -= staged_einsum(direct_adc, shared, 'lmef,efid,lmad->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab)
+
+        t1_3_a /= D1_a
+
+        if closed_shell:
+            t1_3_b = readonly_view(t1_3_a)
+        else:
+            temp = einsum(direct_adc, 'ilad,ld->ia',t2_1_b,t1_2_b)
+            temp += einsum(direct_adc, 'lida,ld->ia',t2_1_ab,t1_2_a)
+            t1_3_b = -0.5*D1_b*temp
+            t1_3_b -= einsum(direct_adc, 'ilad,ld->ia',t2_1_b,t1_2_D1_b)
+            t1_3_b -= einsum(direct_adc, 'lida,ld->ia',t2_1_ab,t1_2_D1_a)
+
+            t1_3_b += einsum(direct_adc, 'ld,adil->ia',t1_2_b,v2e_vvoo_b )
+            t1_3_b += einsum(direct_adc, 'ld,dali->ia',t1_2_a,v2e_vvoo_ab)
+
+            t1_3_b += einsum(direct_adc, 'ld,alid->ia',t1_2_b,v2e_voov_b )
+            t1_3_b += einsum(direct_adc, 'ld,ladi->ia',t1_2_a,v2e_ovvo_ab)
+
+            t1_3_b -= 0.5*einsum(direct_adc, 'lmad,lmid->ia',t2_2_b,v2e_ooov_b)
+            t1_3_b -=     einsum(direct_adc, 'mlda,mldi->ia',t2_2_ab,v2e_oovo_ab)
+
+            t1_3_b += 0.5*block_einsum(direct_adc, 'ilde,alde->ia',t2_2_b,v2e_vovv_b)
+            t1_3_b += block_einsum(direct_adc, 'lied,laed->ia',t2_2_ab,v2e_ovvv_ab)
+
+            t1_3_b -= staged_einsum(direct_adc, shared, 'ildf,aefm,lmde->ia',t2_1_b,v2e_vvvo_b,t2_1_b)
+            t1_3_b += staged_einsum(direct_adc, shared, 'lidf,aefm,lmde->ia',t2_1_ab,v2e_vvvo_b,t2_1_ab)
+            t1_3_b -= staged_einsum(direct_adc, shared, 'ildf,eamf,mled->ia',t2_1_b,v2e_vvov_ab,t2_1_ab)
+            t1_3_b += staged_einsum(direct_adc, shared, 'lidf,eamf,lmde->ia',t2_1_ab,v2e_vvov_ab,t2_1_a)
+            t1_3_b -= staged_einsum(direct_adc, shared, 'lifd,eafm,lmed->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab)
+
+            t1_3_b += 0.5*staged_einsum(direct_adc, shared, 'ilaf,defm,lmde->ia',t2_1_b,v2e_vvvo_b,t2_1_b)
+            t1_3_b += 0.5*staged_einsum(direct_adc, shared, 'lifa,defm,lmde->ia',t2_1_ab,v2e_vvvo_a,t2_1_a)
+            t1_3_b += staged_einsum(direct_adc, shared, 'lifa,defm,lmde->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab)
+            t1_3_b += staged_einsum(direct_adc, shared, 'ilaf,edmf,mled->ia',t2_1_b,v2e_vvov_ab,t2_1_ab)
+
+            t1_3_b += 0.25*staged_einsum(direct_adc, shared, 'inde,anlm,lmde->ia',t2_1_b,v2e_vooo_b,t2_1_b)
+            t1_3_b += staged_einsum(direct_adc, shared, 'nied,naml,mled->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab)
+
+            t1_3_b += 0.5*staged_einsum(direct_adc, shared, 'inad,enlm,lmde->ia',t2_1_b,v2e_vooo_b,t2_1_b)
+            t1_3_b -= 0.5 * staged_einsum(direct_adc, shared, 'inad,enml,mled->ia',t2_1_b,v2e_vooo_ab,t2_1_ab)
+            t1_3_b -= 0.5 * staged_einsum(direct_adc, shared, 'inad,enlm,lmed->ia',t2_1_b,v2e_vooo_ab,t2_1_ab)
+            t1_3_b -= 0.5 *staged_einsum(direct_adc, shared, 'nida,nelm,lmde->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab)
+            t1_3_b -= 0.5*staged_einsum(direct_adc, shared, 'nida,neml,mlde->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab)
+            t1_3_b += 0.5*staged_einsum(direct_adc, shared, 'nida,enlm,lmde->ia',t2_1_ab,v2e_vooo_a,t2_1_a)
+
+            t1_3_b -= 0.5*staged_einsum(direct_adc, shared, 'lnde,amin,lmde->ia',t2_1_b,v2e_vooo_b,t2_1_b)
+            t1_3_b -= staged_einsum(direct_adc, shared, 'lnde,amin,lmde->ia',t2_1_ab,v2e_vooo_b,t2_1_ab)
+            t1_3_b -= 0.5*staged_einsum(direct_adc, shared, 'lnde,mani,lmde->ia',t2_1_a,v2e_ovoo_ab,t2_1_a)
+            t1_3_b -= staged_einsum(direct_adc, shared, 'nled,mani,mled->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab)
+
+            t1_3_b += 0.5*staged_einsum(direct_adc, shared, 'lmdf,afie,lmde->ia',t2_1_b,v2e_vvov_b,t2_1_b)
+            t1_3_b += staged_einsum(direct_adc, shared, 'lmdf,afie,lmde->ia',t2_1_ab,v2e_vvov_b,t2_1_ab)
+            t1_3_b += 0.5*staged_einsum(direct_adc, shared, 'lmdf,faei,lmde->ia',t2_1_a,v2e_vvvo_ab,t2_1_a)
+            t1_3_b += staged_einsum(direct_adc, shared, 'mlfd,faei,mled->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab)
+
+            t1_3_b -= staged_einsum(direct_adc, shared, 'lnde,emin,lmad->ia',t2_1_b,v2e_vooo_b,t2_1_b)
+            t1_3_b += staged_einsum(direct_adc, shared, 'nled,emni,lmad->ia',t2_1_ab,v2e_vooo_ab,t2_1_b)
+            t1_3_b += staged_einsum(direct_adc, shared, 'lnde,emin,lmda->ia',t2_1_ab,v2e_vooo_b,t2_1_ab)
+            t1_3_b += staged_einsum(direct_adc, shared, 'nlde,meni,mlda->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab)
+            t1_3_b -= staged_einsum(direct_adc, shared, 'lnde,emni,lmda->ia',t2_1_a,v2e_vooo_ab,t2_1_ab)
+
+            t1_3_b -= 0.25*staged_einsum(direct_adc, shared, 'lmef,efid,lmad->ia',t2_1_b,v2e_vvov_b,t2_1_b)
+            t1_3_b -= staged_einsum(direct_adc, shared, 'lmef,efdi,lmda->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab)
+
+            t1_3_b /= D1_b
 
-        t1_3_b  = np.einsum('d,ilad,ld->ia',e_b[nocc_b:],t2_1_b, t1_2_b,optimize=True)
-        t1_3_b += np.einsum('d,lida,ld->ia',e_a[nocc_a:],t2_1_ab,t1_2_a,optimize=True)
+        t1_3 = (t1_3_a , t1_3_b)
+        del shared
+        allocations.mark("t1_3")
 
-        t1_3_a -= np.einsum('l,ilad,ld->ia',e_a[:nocc_a],t2_1_a, t1_2_a,optimize=True)
-        t1_3_a -= np.einsum('l,ilad,ld->ia',e_b[:nocc_b],t2_1_ab,t1_2_b,optimize=True)
+    # Mixed precision: doubles amplitudes are stored in float32
+    if direct_adc.precision == "mixed":
+        t2_1 = precision_helper.single_blocks(t2_1, closed_shell)
+        t2_2 = precision_helper.single_blocks(t2_2, closed_shell)
+        allocations.mark("float32 copies")
 
-        t1_3_b -= np.einsum('l,ilad,ld->ia',e_b[:nocc_b],t2_1_b, t1_2_b,optimize=True)
-        t1_3_b -= np.einsum('l,lida,ld->ia',e_a[:nocc_a],t2_1_ab,t1_2_a,optimize=True)
+    allocations.stop()
 
-        t1_3_a += 0.5*np.einsum('a,ilad,ld->ia',e_a[nocc_a:],t2_1_a, t1_2_a,optimize=True)
-        t1_3_a += 0.5*np.einsum('a,ilad,ld->ia',e_a[nocc_a:],t2_1_ab,t1_2_b,optimize=True)
+    t_amp = (t2_1, t2_2, t1_2, t1_3)
 
-        t1_3_b += 0.5*np.einsum('a,ilad,ld->ia',e_b[nocc_b:],t2_1_b, t1_2_b,optimize=True)
-        t1_3_b += 0.5*np.einsum('a,lida,ld->ia',e_b[nocc_b:],t2_1_ab,t1_2_a,optimize=True)
+    return t_amp
 
-        t1_3_a -= 0.5*np.einsum('i,ilad,ld->ia',e_a[:nocc_a],t2_1_a, t1_2_a,optimize=True)
-        t1_3_a -= 0.5*np.einsum('i,ilad,ld->ia',e_a[:nocc_a],t2_1_ab,t1_2_b,optimize=True)
-
-        t1_3_b -= 0.5*np.einsum('i,ilad,ld->ia',e_b[:nocc_b],t2_1_b, t1_2_b,optimize=True)
-        t1_3_b -= 0.5*np.einsum('i,lida,ld->ia',e_b[:nocc_b],t2_1_ab,t1_2_a,optimize=True)
-
-        t1_3_a += np.einsum('ld,adil->ia',t1_2_a,v2e_vvoo_a ,optimize=True)
-        t1_3_a += np.einsum('ld,adil->ia',t1_2_b,v2e_vvoo_ab,optimize=True)
+###########################################
+# In-place steps of the amplitude equations #
+###########################################
+# t2[i,j,a,b] /= d_ij[i,j] - d_ab[a,b] one row of i at a time, so no o^2v^2
+# denominator is formed (the values are those of the full d_ij - d_ab)
+def divide_D2(t2, d_ij, d_ab):
 
-        t1_3_b += np.einsum('ld,adil->ia',t1_2_b,v2e_vvoo_b ,optimize=True)
-        t1_3_b += np.einsum('ld,dali->ia',t1_2_a,v2e_vvoo_ab,optimize=True)
-
-        t1_3_a += np.einsum('ld,alid->ia',t1_2_a,v2e_voov_a ,optimize=True)
-        t1_3_a += np.einsum('ld,alid->ia',t1_2_b,v2e_voov_ab,optimize=True)
-
-        t1_3_b += np.einsum('ld,alid->ia',t1_2_b,v2e_voov_b ,optimize=True)
-        t1_3_b += np.einsum('ld,ladi->ia',t1_2_a,v2e_ovvo_ab,optimize=True)
-
-        t1_3_a -= 0.5*np.einsum('lmad,lmid->ia',t2_2_a,v2e_ooov_a,optimize=True)
-        t1_3_a -=     np.einsum('lmad,lmid->ia',t2_2_ab,v2e_ooov_ab,optimize=True)
-
-        t1_3_b -= 0.5*np.einsum('lmad,lmid->ia',t2_2_b,v2e_ooov_b,optimize=True)
-        t1_3_b -=     np.einsum('mlda,mldi->ia',t2_2_ab,v2e_oovo_ab,optimize=True)
-
-        t1_3_a += 0.5*np.einsum('ilde,alde->ia',t2_2_a,v2e_vovv_a,optimize=True)
-        t1_3_a += np.einsum('ilde,alde->ia',t2_2_ab,v2e_vovv_ab,optimize=True)
-
-        t1_3_b += 0.5*np.einsum('ilde,alde->ia',t2_2_b,v2e_vovv_b,optimize=True)
-        t1_3_b += np.einsum('lied,laed->ia',t2_2_ab,v2e_ovvv_ab,optimize=True)
-
-        t1_3_a -= np.einsum('ildf,aefm,lmde->ia',t2_1_a,v2e_vvvo_a,  t2_1_a ,optimize=True)
-        t1_3_a += np.einsum('ilfd,aefm,mled->ia',t2_1_ab,v2e_vvvo_a, t2_1_ab,optimize=True)
-        t1_3_a -= np.einsum('ildf,aefm,lmde->ia',t2_1_a,v2e_vvvo_ab, t2_1_ab,optimize=True)
-        t1_3_a += np.einsum('ilfd,aefm,lmde->ia',t2_1_ab,v2e_vvvo_ab,t2_1_b ,optimize=True)
-        t1_3_a -= np.einsum('ildf,aemf,mlde->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab,optimize=True)
-
-        t1_3_b -= np.einsum('ildf,aefm,lmde->ia',t2_1_b,v2e_vvvo_b,t2_1_b,optimize=True)
-        t1_3_b += np.einsum('lidf,aefm,lmde->ia',t2_1_ab,v2e_vvvo_b,t2_1_ab,optimize=True)
-        t1_3_b -= np.einsum('ildf,eamf,mled->ia',t2_1_b,v2e_vvov_ab,t2_1_ab,optimize=True)
-        t1_3_b += np.einsum('lidf,eamf,lmde->ia',t2_1_ab,v2e_vvov_ab,t2_1_a,optimize=True)
-        t1_3_b -= np.einsum('lifd,eafm,lmed->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab,optimize=True)
-
-        t1_3_a += 0.5*np.einsum('ilaf,defm,lmde->ia',t2_1_a,v2e_vvvo_a,t2_1_a,optimize=True)
-        t1_3_a += 0.5*np.einsum('ilaf,defm,lmde->ia',t2_1_ab,v2e_vvvo_b,t2_1_b,optimize=True)
-        t1_3_a += np.einsum('ilaf,edmf,mled->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab,optimize=True)
-        t1_3_a += np.einsum('ilaf,defm,lmde->ia',t2_1_a,v2e_vvvo_ab,t2_1_ab,optimize=True)
-
-        t1_3_b += 0.5*np.einsum('ilaf,defm,lmde->ia',t2_1_b,v2e_vvvo_b,t2_1_b,optimize=True)
-        t1_3_b += 0.5*np.einsum('lifa,defm,lmde->ia',t2_1_ab,v2e_vvvo_a,t2_1_a,optimize=True)
-        t1_3_b += np.einsum('lifa,defm,lmde->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab,optimize=True)
-        t1_3_b += np.einsum('ilaf,edmf,mled->ia',t2_1_b,v2e_vvov_ab,t2_1_ab,optimize=True)
-
-        t1_3_a += 0.25*np.einsum('inde,anlm,lmde->ia',t2_1_a,v2e_vooo_a,t2_1_a,optimize=True)
-        t1_3_a += np.einsum('inde,anlm,lmde->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab,optimize=True)
-
-        t1_3_b += 0.25*np.einsum('inde,anlm,lmde->ia',t2_1_b,v2e_vooo_b,t2_1_b,optimize=True)
-        t1_3_b += np.einsum('nied,naml,mled->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab,optimize=True)
-
-        t1_3_a += 0.5*np.einsum('inad,enlm,lmde->ia',t2_1_a,v2e_vooo_a,t2_1_a,optimize=True)
-        t1_3_a -= 0.5 * np.einsum('inad,neml,mlde->ia',t2_1_a,v2e_ovoo_ab,t2_1_ab,optimize=True)
-        t1_3_a -= 0.5 * np.einsum('inad,nelm,lmde->ia',t2_1_a,v2e_ovoo_ab,t2_1_ab,optimize=True)
-        t1_3_a -= 0.5 *np.einsum('inad,enlm,lmed->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab,optimize=True)
-        t1_3_a -= 0.5*np.einsum('inad,enml,mled->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab,optimize=True)
-        t1_3_a += 0.5*np.einsum('inad,enlm,lmde->ia',t2_1_ab,v2e_vooo_b,t2_1_b,optimize=True)
-
-        t1_3_b += 0.5*np.einsum('inad,enlm,lmde->ia',t2_1_b,v2e_vooo_b,t2_1_b,optimize=True)
-        t1_3_b -= 0.5 * np.einsum('inad,enml,mled->ia',t2_1_b,v2e_vooo_ab,t2_1_ab,optimize=True)
-        t1_3_b -= 0.5 * np.einsum('inad,enlm,lmed->ia',t2_1_b,v2e_vooo_ab,t2_1_ab,optimize=True)
-        t1_3_b -= 0.5 *np.einsum('nida,nelm,lmde->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab,optimize=True)
-        t1_3_b -= 0.5*np.einsum('nida,neml,mlde->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab,optimize=True)
-        t1_3_b += 0.5*np.einsum('nida,enlm,lmde->ia',t2_1_ab,v2e_vooo_a,t2_1_a,optimize=True)
-
-        t1_3_a -= 0.5*np.einsum('lnde,amin,lmde->ia',t2_1_a,v2e_vooo_a,t2_1_a,optimize=True)
-        t1_3_a -= np.einsum('nled,amin,mled->ia',t2_1_ab,v2e_vooo_a,t2_1_ab,optimize=True)
-        t1_3_a -= 0.5*np.einsum('lnde,amin,lmde->ia',t2_1_b,v2e_vooo_ab,t2_1_b,optimize=True)
-        t1_3_a -= np.einsum('lnde,amin,lmde->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab,optimize=True)
-
-        t1_3_b -= 0.5*np.einsum('lnde,amin,lmde->ia',t2_1_b,v2e_vooo_b,t2_1_b,optimize=True)
-        t1_3_b -= np.einsum('lnde,amin,lmde->ia',t2_1_ab,v2e_vooo_b,t2_1_ab,optimize=True)
-        t1_3_b -= 0.5*np.einsum('lnde,mani,lmde->ia',t2_1_a,v2e_ovoo_ab,t2_1_a,optimize=True)
-        t1_3_b -= np.einsum('nled,mani,mled->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab,optimize=True)
-
-        t1_3_a += 0.5*np.einsum('lmdf,afie,lmde->ia',t2_1_a,v2e_vvov_a,t2_1_a,optimize=True)
-        t1_3_a += np.einsum('mlfd,afie,mled->ia',t2_1_ab,v2e_vvov_a,t2_1_ab,optimize=True)
-        t1_3_a += 0.5*np.einsum('lmdf,afie,lmde->ia',t2_1_b,v2e_vvov_ab,t2_1_b,optimize=True)
-        t1_3_a += np.einsum('lmdf,afie,lmde->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab,optimize=True)
-
-        t1_3_b += 0.5*np.einsum('lmdf,afie,lmde->ia',t2_1_b,v2e_vvov_b,t2_1_b,optimize=True)
-        t1_3_b += np.einsum('lmdf,afie,lmde->ia',t2_1_ab,v2e_vvov_b,t2_1_ab,optimize=True)
-        t1_3_b += 0.5*np.einsum('lmdf,faei,lmde->ia',t2_1_a,v2e_vvvo_ab,t2_1_a,optimize=True)
-        t1_3_b += np.einsum('mlfd,faei,mled->ia',t2_1_ab,v2e_vvvo_ab,t2_1_ab,optimize=True)
-
-        t1_3_a -= np.einsum('lnde,emin,lmad->ia',t2_1_a,v2e_vooo_a,t2_1_a,optimize=True)
-        t1_3_a += np.einsum('lnde,mein,lmad->ia',t2_1_ab,v2e_ovoo_ab,t2_1_a,optimize=True)
-        t1_3_a += np.einsum('nled,emin,mlad->ia',t2_1_ab,v2e_vooo_a,t2_1_ab,optimize=True)
-        t1_3_a += np.einsum('lned,emin,lmad->ia',t2_1_ab,v2e_vooo_ab,t2_1_ab,optimize=True)
-        t1_3_a -= np.einsum('lnde,mein,mlad->ia',t2_1_b,v2e_ovoo_ab,t2_1_ab,optimize=True)
-
-        t1_3_b -= np.einsum('lnde,emin,lmad->ia',t2_1_b,v2e_vooo_b,t2_1_b,optimize=True)
-        t1_3_b += np.einsum('nled,emni,lmad->ia',t2_1_ab,v2e_vooo_ab,t2_1_b,optimize=True)
-        t1_3_b += np.einsum('lnde,emin,lmda->ia',t2_1_ab,v2e_vooo_b,t2_1_ab,optimize=True)
-        t1_3_b += np.einsum('nlde,meni,mlda->ia',t2_1_ab,v2e_ovoo_ab,t2_1_ab,optimize=True)
-        t1_3_b -= np.einsum('lnde,emni,lmda->ia',t2_1_a,v2e_vooo_ab,t2_1_ab,optimize=True)
-
-        t1_3_a -= 0.25*np.einsum('lmef,efid,lmad->ia',t2_1_a,v2e_vvov_a,t2_1_a,optimize=True)
-        t1_3_a -= np.einsum('lmef,efid,lmad->ia',t2_1_ab,v2e_vvov_ab,t2_1_ab,optimize=True)
-
-        t1_3_b -= 0.25*np.einsum('lmef,efid,lmad->ia',t2_1_b,v2e_vvov_b,t2_1_b,optimize=True)
-        temp = t2_1_ab.reshape(nocc_a*nocc_b,-1)
-        temp_1 = v2e_vvvo_ab[:].reshape(nvir_a*nvir_b,-1)
-        temp_2 = t2_1_ab.reshape(nocc_a*nocc_b*nvir_a,-1)
-        int_1 = np.dot(temp,temp_1).reshape(nocc_a*nocc_b*nvir_a,-1)
-        t1_3_b -= np.dot(int_1.T,temp_2).reshape(nocc_b,nvir_b)
-        del temp_1
-        t1_3_a = t1_3_a/D1_a
-        t1_3_b = t1_3_b/D1_b
+    for i in range(t2.shape[0]):
+        t2[i] /= d_ij[i][:,None,None] - d_ab
 
-        t1_3 = (t1_3_a , t1_3_b)
+    return t2
 
-    t_amp = (t2_1, t2_2, t1_2, t1_3)
+# out += temp - temp[j,i,a,b] - temp[i,j,b,a] + temp[j,i,b,a], formed in buf
+def add_antisymmetrized(out, temp, buf):
 
-    return t_amp
+    np.subtract(temp, temp.transpose(1,0,2,3), out=buf)
+    np.subtract(buf, temp.transpose(0,1,3,2), out=buf)
+    np.add(buf, temp.transpose(1,0,3,2), out=buf)
+    out += buf
+
+# Memory held by the amplitudes, closed-shell aliases counted once
+def amplitude_nbytes(t_amp):
+
+    owners = {}
+    for blocks in t_amp:
+        for x in blocks or ():
+            owner = x if x.base is None else x.base
+            owners[id(owner)] = x.nbytes
+
+    return sum(owners.values())
+
+###########################################
+# Contractions with cached plans           #
+###########################################
+# np.einsum through direct_adc.contractions: the path (and for the tensordot
+# backend the GEMM steps) is made once per subscripts and operand shapes and
+# reused by every later call, e.g. in each sigma call
+def einsum(direct_adc, subscripts, *operands):
+
+    return direct_adc.contractions.einsum(subscripts, *operands)
+
+###########################################
+# Sigma vectors of a block of vectors      #
+###########################################
+# sigma_block applies H to the rows of a 2D array, so that the contractions
+# with integrals and amplitudes are matrix-matrix products over all vectors.
+# Rows are passed direct_adc.sigma_block at a time; a 1D vector is a block of one.
+def apply_blocks(direct_adc, sigma_block, r):
+
+    r = np.asarray(r)
+    if r.ndim == 1:
+        return sigma_block(r[None])[0]
+
+    nblock = max(1, direct_adc.sigma_block)
+    s = [sigma_block(r[p0:p0+nblock]) for p0 in range(0, r.shape[0], nblock)]
+
+    return np.concatenate(s) if len(s) > 1 else s[0]
+
+###########################################
+# Read-only alias for closed-shell blocks  #
+###########################################
+def readonly_view(a):
+
+    if not isinstance(a, np.ndarray):
+        return a
+
+    view = a.view()
+    view.flags.writeable = False
+    return view
+
+###########################################
+# Row-blocked contractions with vvvv       #
+###########################################
+# Blocks that are not in-memory arrays (density-fitted, memmap, HDF5) are read in
+# slabs along their first stored index so that they are never formed as a
+# whole. The next slab is read on a background thread while the current one
+# is contracted; waits and compute time go to direct_adc.v2e.io_stats.
+# AO-direct blocks contract the other operand through the AO integrals.
+# Screened (block-sparse) blocks are contracted over their kept tiles only.
+# float32 blocks held in memory (precision = "mixed") go by slabs as well, so
+# that only one slab at a time is upcast to float64 for the GEMM.
+
+def block_chunks(direct_adc, v2e_block, axis = 0):
+
+    n = v2e_block.shape[axis]
+    row_size = max(1, np.prod(v2e_block.shape) // max(1, n)) * 8
+    blksize = max(1, int(direct_adc.max_memory * 1e6 / (2 * row_size)))
+    if isinstance(v2e_block, precision_helper.Single):
+        blksize = min(blksize, max(1, n // precision_helper.UPCAST_SLABS))
+
+    for p0 in range(0, n, blksize):
+        yield p0, min(p0 + blksize, n)
+
+def in_memory(v2e_block):
+
+    return isinstance(v2e_block, np.ndarray) and not isinstance(v2e_block, (np.memmap, precision_helper.Single))
+
+def block_rows(direct_adc, v2e_block, axis = 0):
+
+    stats = getattr(direct_adc.v2e, "io_stats", None)
+    return disk_helper.prefetch_rows(v2e_block, block_chunks(direct_adc, v2e_block, axis), stats, axis)
+
+# (cuts, chunk) pairs covering a block, where cuts lists the (axis, p0, p1)
+# ranges of the stored block that chunk holds
+def block_slabs(direct_adc, v2e_block, axis = 0):
+
+    if isinstance(v2e_block, sparse_helper.SparseBlock):
+        for (p0, p1), (q0, q1), x in v2e_block.items():
+            yield ((0, p0, p1), (1, q0, q1)), x
+        return
+
+    for p0, p1, rows in block_rows(direct_adc, v2e_block, axis):
+        yield ((axis, p0, p1),), rows
+
+# Index of a memmap view along which the file is stored by rows
+def stored_axis(v2e_block):
+
+    if isinstance(v2e_block, np.ndarray):
+        return int(np.argmax(v2e_block.strides))
+
+    return 0
+
+def vvvv_dot(direct_adc, x, v2e_vvvv):
+
+    # x @ v2e_vvvv.reshape(nab, ncd).T
+    n_1, n_2, n_3, n_4 = v2e_vvvv.shape
+
+    if in_memory(v2e_vvvv):
+        return np.dot(x, v2e_vvvv.reshape(n_1*n_2, n_3*n_4).T)
+
+    if isinstance(v2e_vvvv, ao_helper.AOBlock):
+        return v2e_vvvv.dot(x)
+
+    if isinstance(v2e_vvvv, pack_helper.TrilBlock):
+        x = x.reshape(-1, n_3, n_4)
+        x = pack_helper.pack_pairs(x) - pack_helper.pack_pairs(x.transpose(0,2,1))
+        return pack_helper.unpack_pairs(vvvv_pair_dot(direct_adc, x, v2e_vvvv), n_1).reshape(-1, n_1*n_2)
+
+    if isinstance(v2e_vvvv, sparse_helper.SparseBlock):
+        out = np.zeros((x.shape[0], n_1, n_2), dtype=np.result_type(x.dtype, v2e_vvvv.dtype))
+        for (p0, p1), (q0, q1), temp in v2e_vvvv.items():
+            temp = temp.reshape((p1-p0)*(q1-q0), n_3*n_4)
+            out[:,p0:p1,q0:q1] = np.dot(x, temp.T).reshape(-1, p1-p0, q1-q0)
+        return out.reshape(-1, n_1*n_2)
+
+    out = np.empty((x.shape[0], n_1*n_2), dtype=np.result_type(x.dtype, v2e_vvvv.dtype))
+    for p0, p1, temp in block_rows(direct_adc, v2e_vvvv):
+        temp = temp.reshape((p1-p0)*n_2, n_3*n_4)
+        out[:,p0*n_2:p1*n_2] = np.dot(x, temp.T)
+
+    return out
+
+# 0.5 * sum_cd <ab||cd> x_cd for x antisymmetric in cd, with both x and the
+# result given on pairs a > b, c > d only
+def vvvv_pair_dot(direct_adc, x, v2e_vvvv):
+
+    if isinstance(v2e_vvvv, ao_helper.AOBlock):
+        return v2e_vvvv.pair_dot(x)
+
+    if isinstance(v2e_vvvv, pack_helper.TrilBlock):
+        packed = v2e_vvvv.packed
+        if in_memory(packed):
+            return np.dot(x, packed.T)
+
+        if isinstance(packed, sparse_helper.SparseBlock):
+            out = np.zeros((x.shape[0], packed.shape[0]), dtype=np.result_type(x.dtype, packed.dtype))
+            for (p0, p1), (q0, q1), temp in packed.items():
+                out[:,p0:p1] += np.dot(x[:,q0:q1], temp.T)
+            return out
+
+        # Packed block on disk: stream rows of pairs under max_memory
+        out = np.empty((x.shape[0], packed.shape[0]), dtype=np.result_type(x.dtype, packed.dtype))
+        for p0, p1, temp in block_rows(direct_adc, packed):
+            out[:,p0:p1] = np.dot(x, temp.T)
+        return out
+
+    n_1, n_3 = v2e_vvvv.shape[0], v2e_vvvv.shape[2]
+    x = pack_helper.unpack_pairs(x, n_3).reshape(x.shape[0], -1)
+    return 0.5*pack_helper.pack_pairs(vvvv_dot(direct_adc, x, v2e_vvvv).reshape(-1, n_1, n_1))
+
+def vvvv_einsum(direct_adc, subscripts, *operands):
+
+    # The last operand is the vvvv block
+    v2e_vvvv = operands[-1]
+
+    if isinstance(v2e_vvvv, ao_helper.AOBlock):
+        return v2e_vvvv.einsum(subscripts, *operands[:-1], contractions=direct_adc.contractions)
+
+    return block_einsum(direct_adc, subscripts, *operands)
+
+# np.einsum where one operand may be a block that is not an in-memory array
+# (vvvv, vovv, vvvo, vvov, ovvv on disk or density-fitted)
+def block_einsum(direct_adc, subscripts, *operands):
+
+    return block_einsums(direct_adc, [(subscripts,) + operands])[0]
+
+# Several such contractions, given as a list or dict of (subscripts, *operands).
+# Terms on the same block, or on transposed views of the same parent block,
+# share a single pass over its slabs.
+def block_einsums(direct_adc, terms):
+
+    keys = list(terms.keys()) if isinstance(terms, dict) else list(range(len(terms)))
+    results = {}
+    passes = {}
+
+    for key in keys:
+        subscripts, *operands = terms[key]
+        streamed = [n for n, op in enumerate(operands) if not in_memory(op)]
+        if len(streamed) == 0:
+            results[key] = einsum(direct_adc, subscripts, *operands)
+            continue
+
+        # A block that is not an array goes by slabs before any float32 array,
+        # and of those the largest
+        n = max(streamed, key=lambda n: (not isinstance(operands[n], np.ndarray), np.prod(operands[n].shape)))
+
+        v2e_block = operands[n]
+        operands = [op if k == n or in_memory(op) else np.asarray(op) for k, op in enumerate(operands)]
+
+        # Transposed views are read through their parent, by rows
+        axes = getattr(v2e_block, "axes", None)
+        if isinstance(axes, tuple):
+            stored, axis = v2e_block.base, 0
+        else:
+            stored, axis, axes = v2e_block, stored_axis(v2e_block), None
+
+        inputs, output = subscripts.split('->')
+        inputs = inputs.split(',')
+        letters = inputs[n] if axes is None else "".join(inputs[n][axes.index(k)] for k in range(len(axes)))
+
+        dims = {}
+        for idx, op in zip(inputs, operands):
+            dims.update(zip(idx, op.shape))
+        dtype = np.result_type(np.float64, *[op.dtype for op in operands])
+        results[key] = np.zeros([dims[x] for x in output], dtype=dtype)
+
+        term = (key, subscripts, inputs, output, operands, n, axes, letters)
+        passes.setdefault((id(stored), axis), (stored, axis, []))[2].append(term)
+
+    for stored, axis, group in passes.values():
+        for cuts, rows in block_slabs(direct_adc, stored, axis):
+            for key, subscripts, inputs, output, operands, n, axes, letters in group:
+                cut = dict((letters[k], slice(p0, p1)) for k, p0, p1 in cuts)
+                ops = []
+                for k, (idx, op) in enumerate(zip(inputs, operands)):
+                    if k == n:
+                        op = rows if axes is None else rows.transpose(axes)
+                    elif any(x in cut for x in idx):
+                        op = op[tuple(cut.get(x, slice(None)) for x in idx)]
+                    ops.append(op)
+
+                out = results[key]
+                out[tuple(cut.get(x, slice(None)) for x in output)] += einsum(direct_adc, subscripts, *ops)
+
+    if isinstance(terms, dict):
+        return results
+
+    return [results[key] for key in keys]
+
+###########################################
+# Staged contractions with shared pairs    #
+###########################################
+# A three-operand term runs as two pairwise contractions (GEMMs), the first
+# pair being the one of the cheapest path. Its result
+# is kept in `shared`, keyed by the two operands and the subscripts relabelled
+# in order of appearance, so that every other term, alpha or beta, needing
+# the same intermediate reuses it. The intermediate is laid out with the
+# indices of the third operand first, in its order, so that the second GEMM
+# reads the third operand (usually an integral block) without a transposed
+# copy. Blocks that are not in-memory arrays are contracted through block_einsum.
+def staged_einsum(direct_adc, shared, subscripts, *operands):
+
+    inputs, output = subscripts.split('->')
+    inputs = inputs.split(',')
+
+    first = sorted(direct_adc.contractions.path(subscripts, *operands)[0])
+    rest = [k for k in range(len(operands)) if k not in first]
+    other = "".join(inputs[k] for k in rest)
+
+    # The pair in a fixed order, so that (x, y) and (y, x) give the same key
+    pair = sorted(first, key=lambda k: (id(operands[k]), inputs[k]))
+    letters = inputs[pair[0]] + inputs[pair[1]]
+    idx = "".join(dict.fromkeys([x for x in other if x in letters] + [x for x in output if x in letters]))
+
+    labels = {}
+    for x in letters:
+        labels.setdefault(x, chr(ord('a') + len(labels)))
+    key = (id(operands[pair[0]]), id(operands[pair[1]]),
+           "".join(labels[x] for x in inputs[pair[0]]) + "," + "".join(labels[x] for x in inputs[pair[1]]) + "->" +
+           "".join(labels[x] for x in idx))
+
+    if key not in shared:
+        shared[key] = np.ascontiguousarray(block_einsum(direct_adc, inputs[pair[0]] + "," + inputs[pair[1]] + "->" + idx,
+                                                        operands[pair[0]], operands[pair[1]]))
+
+    ops = [shared[key]] + [operands[k] for k in rest]
+    return block_einsum(direct_adc, ",".join([idx] + [inputs[k] for k in rest]) + "->" + output, *ops)
 
 ###########################################
 # Calculate mp2 energy  #
 ###########################################
+@integral_stage("MP2")
 def compute_mp2_energy(direct_adc, t_amp):
 
     v2e_oovv_a, v2e_oovv_ab, v2e_oovv_b = direct_adc.v2e.oovv
 
     t2_1_a, t2_1_ab, t2_1_b  = t_amp[0]
 
-    e_mp2 = 0.25 * np.einsum('ijab,ijab', t2_1_a, v2e_oovv_a)
-    e_mp2 += np.einsum('ijab,ijab', t2_1_ab, v2e_oovv_ab)
-    e_mp2 += 0.25 * np.einsum('ijab,ijab', t2_1_b, v2e_oovv_b)
+    e_mp2 = 0.25 * einsum(direct_adc, 'ijab,ijab', t2_1_a, v2e_oovv_a)
+    e_mp2 += einsum(direct_adc, 'ijab,ijab', t2_1_ab, v2e_oovv_ab)
+    e_mp2 += 0.25 * einsum(direct_adc, 'ijab,ijab', t2_1_b, v2e_oovv_b)
     return e_mp2
 
 ###########################################
@@ -466,6 +895,9 @@ def calc_density_of_states(direct_adc,apply_H_ip,apply_H_ea,precond_ip,precond_e
 
 	freq_range = np.arange(freq_range[0],freq_range[1],step)
 
+	if direct_adc.gf_workers > 1:
+	    return calc_density_of_states_shared(direct_adc, t_amp, freq_range)
+
 	k_a = np.zeros((nmo_a,nmo_a))
 	k_b = np.zeros((nmo_b,nmo_b))
 	gf_ip_a = np.array(k_a,dtype = complex)
@@ -499,25 +931,20 @@ def calc_density_of_states(direct_adc,apply_H_ip,apply_H_ea,precond_ip,precond_e
 	    	omega = freq
 	    	iomega = freq + broadening*1j
 
-	    	for orb in range(nmo_a):
-	                    r_guess = None
-	                    # Calculate GF for IP
-	                    if direct_adc.IP == True:
+	    	for orbs in orbital_blocks(direct_adc, nmo_a):
+	    	    # Calculate T and GF for alpha spin, IP
+	    	    if direct_adc.IP == True:
+	    	        T_a = np.array([calculate_T_ip(direct_adc, t_amp, orb, spin = "alpha") for orb in orbs])
+	    	        gf_ip_a[orbs,orbs] = calculate_GF_block(direct_adc,apply_H_ip,precond_ip,omega,T_a,None)[0]
 
-	    	             # Calculate T and GF for alpha spin
-	                         T_a = calculate_T_ip(direct_adc, t_amp, orb, spin = "alpha")
-	                         gf_ip_a[orb,orb] = calculate_GF_ip(direct_adc,apply_H_ip,precond_ip,omega,orb,T_a,r_guess)
-
-	                    # Calculate GF for EA
-	                    if direct_adc.EA == True:
-
-	    	             # Calculate T and GF for alpha spin
-	                         T_a = calculate_T_ea(direct_adc, t_amp, orb, spin = "alpha")
-	                         gf_ea_a[orb,orb] = calculate_GF_ea(direct_adc,apply_H_ea,precond_ea,omega,orb,T_a,r_guess)
+	    	    # Calculate T and GF for alpha spin, EA
+	    	    if direct_adc.EA == True:
+	    	        T_a = np.array([calculate_T_ea(direct_adc, t_amp, orb, spin = "alpha") for orb in orbs])
+	    	        gf_ea_a[orbs,orbs] = calculate_GF_block(direct_adc,apply_H_ea,precond_ea,omega,T_a,None)[0]
 
 	    	if closed_shell == True :
-	    	    gf_ip_a_trace = -(1/(np.pi))*np.trace(gf_ip_a.imag)
-	    	    gf_ea_a_trace = -(1/(np.pi))*np.trace(gf_ea_a.imag)
+	    	    gf_ip_a_trace = -(1/(np.pi))*(np.trace(gf_ip_a.imag) + frozen_gf(direct_adc, iomega, "alpha", "IP").imag)
+	    	    gf_ea_a_trace = -(1/(np.pi))*(np.trace(gf_ea_a.imag) + frozen_gf(direct_adc, iomega, "alpha", "EA").imag)
 	    	    gf_ip_trace = 2 * gf_ip_a_trace
 	    	    gf_ea_trace = 2 * gf_ea_a_trace
 	    	    gf_ip_im_trace.append(gf_ip_trace)
@@ -525,26 +952,21 @@ def calc_density_of_states(direct_adc,apply_H_ip,apply_H_ea,precond_ip,precond_e
 
 	    	if closed_shell == False :
 
-	    	    for orb in range(nmo_b):
-	                        r_guess = None
-	                        # Calculate GF for IP
-	                        if direct_adc.IP == True:
-
-	    	                  # Calculate T and GF for beta spin
-	                             T_b = calculate_T_ip(direct_adc, t_amp, orb, spin = "beta")
-	                             gf_ip_b[orb,orb] = calculate_GF_ip(direct_adc,apply_H_ip,precond_ip,omega,orb,T_b,r_guess)
-
-	                        # Calculate GF for EA
-	                        if direct_adc.EA == True:
-
-   	                  # Calculate T and GF for beta spin
-	                             T_b = calculate_T_ea(direct_adc, t_amp, orb, spin = "beta")
-	                             gf_ea_b[orb,orb] = calculate_GF_ea(direct_adc,apply_H_ea,precond_ea,omega,orb,T_b,r_guess)
-
-	    	    gf_ip_a_trace = -(1/(np.pi))*np.trace(gf_ip_a.imag)
-	    	    gf_ip_b_trace = -(1/(np.pi))*np.trace(gf_ip_b.imag)
-	    	    gf_ea_a_trace = -(1/(np.pi))*np.trace(gf_ea_a.imag)
-	    	    gf_ea_b_trace = -(1/(np.pi))*np.trace(gf_ea_b.imag)
+	    	    for orbs in orbital_blocks(direct_adc, nmo_b):
+	    	        # Calculate T and GF for beta spin, IP
+	    	        if direct_adc.IP == True:
+	    	            T_b = np.array([calculate_T_ip(direct_adc, t_amp, orb, spin = "beta") for orb in orbs])
+	    	            gf_ip_b[orbs,orbs] = calculate_GF_block(direct_adc,apply_H_ip,precond_ip,omega,T_b,None)[0]
+
+	    	        # Calculate T and GF for beta spin, EA
+	    	        if direct_adc.EA == True:
+	    	            T_b = np.array([calculate_T_ea(direct_adc, t_amp, orb, spin = "beta") for orb in orbs])
+	    	            gf_ea_b[orbs,orbs] = calculate_GF_block(direct_adc,apply_H_ea,precond_ea,omega,T_b,None)[0]
+
+	    	    gf_ip_a_trace = -(1/(np.pi))*(np.trace(gf_ip_a.imag) + frozen_gf(direct_adc, iomega, "alpha", "IP").imag)
+	    	    gf_ip_b_trace = -(1/(np.pi))*(np.trace(gf_ip_b.imag) + frozen_gf(direct_adc, iomega, "beta", "IP").imag)
+	    	    gf_ea_a_trace = -(1/(np.pi))*(np.trace(gf_ea_a.imag) + frozen_gf(direct_adc, iomega, "alpha", "EA").imag)
+	    	    gf_ea_b_trace = -(1/(np.pi))*(np.trace(gf_ea_b.imag) + frozen_gf(direct_adc, iomega, "beta", "EA").imag)
 	    	    gf_ip_trace = np.sum([gf_ip_a_trace,gf_ip_b_trace])
 	    	    gf_ea_trace = np.sum([gf_ea_a_trace,gf_ea_b_trace])
 	    	    gf_ip_im_trace.append(gf_ip_trace)
@@ -566,29 +988,31 @@ def calc_density_of_states(direct_adc,apply_H_ip,apply_H_ea,precond_ip,precond_e
 		gf_ip_a = []
 		gf_ea_a = []
 
-		for orb in range(nmo_a):
+		for orbs in orbital_blocks(direct_adc, nmo_a):
+
+			# T vectors of the block, used at every frequency
+			if direct_adc.IP == True:
+			     T_ip = np.array([calculate_T_ip(direct_adc, t_amp, orb, spin = "alpha") for orb in orbs])
+			if direct_adc.EA == True:
+			     T_ea = np.array([calculate_T_ea(direct_adc, t_amp, orb, spin = "alpha") for orb in orbs])
 
 			r_guess_ip = None
 			r_guess_ea = None
 			for freq in range(freq_p):
 
 				omega = freq_range[freq]
-				iomega = freq_range[freq] + broadening*1j
 
-                		# Calculate GF for IP
+				# Calculate GF for IP
 				if direct_adc.IP == True:
-				# Calculate T and GF for alpha spin
-				     T_a = calculate_T_ip(direct_adc, t_amp, orb, spin = "alpha")
-				     gf_ip_a_f[orb,freq],r_guess_ip = calculate_GF_ip(direct_adc,apply_H_ip,precond_ip,omega,orb,T_a,r_guess_ip)
+				     gf_ip_a_f[orbs,freq],r_guess_ip = calculate_GF_block(direct_adc,apply_H_ip,precond_ip,omega,T_ip,r_guess_ip)
 
 				# Calculate GF for EA
 				if direct_adc.EA == True:
-				 # Calculate T and GF for alpha spin
-				     T_a = calculate_T_ea(direct_adc, t_amp, orb, spin = "alpha")
-				     gf_ea_a_f[orb,freq],r_guess_ea = calculate_GF_ea(direct_adc,apply_H_ea,precond_ea,omega,orb,T_a,r_guess_ea)
+				     gf_ea_a_f[orbs,freq],r_guess_ea = calculate_GF_block(direct_adc,apply_H_ea,precond_ea,omega,T_ea,r_guess_ea)
 
-		gf_ip_a = np.sum(gf_ip_a_f,axis=0)
-		gf_ea_a = np.sum(gf_ea_a_f,axis=0)
+		iomega = freq_range + broadening*1j
+		gf_ip_a = np.sum(gf_ip_a_f,axis=0) + frozen_gf(direct_adc, iomega, "alpha", "IP")
+		gf_ea_a = np.sum(gf_ea_a_f,axis=0) + frozen_gf(direct_adc, iomega, "alpha", "EA")
 
 		if closed_shell == True :
 
@@ -599,29 +1023,30 @@ def calc_density_of_states(direct_adc,apply_H_ip,apply_H_ea,precond_ip,precond_e
 
 		if closed_shell == False :
 
-			for orb in range(nmo_b):
+			for orbs in orbital_blocks(direct_adc, nmo_b):
+
+				if direct_adc.IP == True:
+				     T_ip = np.array([calculate_T_ip(direct_adc, t_amp, orb, spin = "beta") for orb in orbs])
+				if direct_adc.EA == True:
+				     T_ea = np.array([calculate_T_ea(direct_adc, t_amp, orb, spin = "beta") for orb in orbs])
+
 				r_guess_ip = None
 				r_guess_ea = None
 				for freq in range(freq_p):
+
 					omega = freq_range[freq]
-					iomega = freq_range[freq] + broadening*1j
 
 					# Calculate GF for IP
 					if direct_adc.IP == True:
-
-					 # Calculate T and GF for alpha spin
-					     T_b = calculate_T_ip(direct_adc, t_amp, orb, spin = "beta")
-					     gf_ip_b_f[orb,freq],r_guess_ip = calculate_GF_ip(direct_adc,apply_H_ip,precond_ip,omega,orb,T_b,r_guess_ip)
+					     gf_ip_b_f[orbs,freq],r_guess_ip = calculate_GF_block(direct_adc,apply_H_ip,precond_ip,omega,T_ip,r_guess_ip)
 
 					# Calculate GF for EA
 					if direct_adc.EA == True:
+					     gf_ea_b_f[orbs,freq],r_guess_ea = calculate_GF_block(direct_adc,apply_H_ea,precond_ea,omega,T_ea,r_guess_ea)
 
-					 # Calculate T and GF for alpha spin
-					     T_b = calculate_T_ea(direct_adc, t_amp, orb, spin = "beta")
-					     gf_ea_b_f[orb,freq],r_guess_ea = calculate_GF_ea(direct_adc,apply_H_ea,precond_ea,omega,orb,T_b,r_guess_ea)
-
-			gf_ip_b = np.sum(gf_ip_b_f,axis=0)
-			gf_ea_b = np.sum(gf_ea_b_f,axis=0)
+			iomega = freq_range + broadening*1j
+			gf_ip_b = np.sum(gf_ip_b_f,axis=0) + frozen_gf(direct_adc, iomega, "beta", "IP")
+			gf_ea_b = np.sum(gf_ea_b_f,axis=0) + frozen_gf(direct_adc, iomega, "beta", "EA")
 
 			gf_ip_a_trace = -(1/(np.pi))*(gf_ip_a.imag)
 			gf_ip_b_trace = -(1/(np.pi))*(gf_ip_b.imag)
@@ -632,9 +1057,127 @@ def calc_density_of_states(direct_adc,apply_H_ip,apply_H_ea,precond_ip,precond_e
 
 		return gf_ip_im_trace,gf_ea_im_trace
 
+#####################################################
+# Zeroth-order GF diagonal of the frozen orbitals  #
+#####################################################
+# A frozen orbital is not coupled to the active space, so its diagonal GF
+# element is the bare pole 1/(omega + i*eta - e_p): frozen core orbitals
+# contribute to the IP part and frozen virtual orbitals to the EA part.
+# Virtual natural orbitals dropped by FNO enter with their semicanonical energies.
+def frozen_gf(direct_adc, iomega, spin, gf_type):
+
+	if spin == "alpha":
+	    mo_energy = direct_adc.mo_energy_a_full
+	    fno_energy = direct_adc.fno_energy_a
+	else:
+	    mo_energy = direct_adc.mo_energy_b_full
+	    fno_energy = direct_adc.fno_energy_b
+
+	if gf_type == "IP":
+	    e_frozen = mo_energy[:direct_adc.frozen_core]
+	else:
+	    e_frozen = np.concatenate((mo_energy[len(mo_energy)-direct_adc.frozen_virtual:], fno_energy))
+
+	return np.sum(1.0/np.subtract.outer(iomega, e_frozen), axis=-1)
+
+###########################################################
+# GF orbitals on worker processes sharing the integrals  #
+###########################################################
+# With gf_workers > 1 the diagonal GF elements are computed orbital by orbital
+# in a process pool. The integral classes and t_amp are published once in
+# shared memory; each worker attaches read-only views and sets up its own
+# IP/EA sigma functions. The traces are formed as in calc_density_of_states.
+GF_WORKER = {}
+
+def gf_worker_init(direct_adc_class, state, manifest):
+
+    segments = []
+    direct_adc, t_amp = direct_adc_class.attach(state, manifest, segments)
+
+    GF_WORKER["segments"] = segments
+    GF_WORKER["direct_adc"] = direct_adc
+    GF_WORKER["t_amp"] = t_amp
+    if direct_adc.IP == True:
+        GF_WORKER["IP"] = define_H_ip(direct_adc, t_amp)[:2]
+    if direct_adc.EA == True:
+        GF_WORKER["EA"] = define_H_ea(direct_adc, t_amp)[:2]
+
+def gf_worker_task(task):
+
+    gf_type, spin, orb, freq_range = task
+    apply_H, precond = GF_WORKER[gf_type]
+
+    return gf_orbital(GF_WORKER["direct_adc"], apply_H, precond, GF_WORKER["t_amp"], orb, spin, gf_type, freq_range)
+
+# Diagonal GF element of one orbital over all frequencies, with the solution
+# at the previous frequency as guess when orbitals form the outer loop
+def gf_orbital(direct_adc, apply_H, precond, t_amp, orb, spin, gf_type, freq_range):
+
+    if gf_type == "IP":
+        T = calculate_T_ip(direct_adc, t_amp, orb, spin = spin)
+        calculate_GF = calculate_GF_ip
+    else:
+        T = calculate_T_ea(direct_adc, t_amp, orb, spin = spin)
+        calculate_GF = calculate_GF_ea
+
+    gf = np.zeros(len(freq_range), dtype=complex)
+    r_guess = None
+    for n, omega in enumerate(freq_range):
+        if direct_adc.freq_outer_loop:
+            gf[n] = calculate_GF(direct_adc, apply_H, precond, omega, orb, T, None)
+        else:
+            gf[n], r_guess = calculate_GF(direct_adc, apply_H, precond, omega, orb, T, r_guess)
+
+    return gf
+
+def calc_density_of_states_shared(direct_adc, t_amp, freq_range):
+
+    closed_shell = direct_adc.nelec_a == direct_adc.nelec_b
+
+    spins = [("alpha", direct_adc.nmo_a)]
+    if not closed_shell:
+        spins.append(("beta", direct_adc.nmo_b))
+    gf_types = [x for x, flag in (("IP", direct_adc.IP), ("EA", direct_adc.EA)) if flag == True]
+    tasks = [(gf_type, spin, orb, freq_range) for spin, nmo in spins for orb in range(nmo) for gf_type in gf_types]
+
+    with shm_helper.SharedStore() as store:
+        state, manifest = direct_adc.share(store, t_amp)
+        print ("GF worker processes:               ", direct_adc.gf_workers)
+        print ("Shared integrals and amplitudes (MB):", store.nbytes / 1e6)
+        sys.stdout.flush()
+
+        initargs = (type(direct_adc), state, manifest)
+        with multiprocessing.Pool(direct_adc.gf_workers, gf_worker_init, initargs) as pool:
+            rows = pool.map(gf_worker_task, tasks, chunksize=1)
+
+    iomega = freq_range + direct_adc.broadening*1j
+    traces = {}
+    for gf_type in ("IP", "EA"):
+        traces[gf_type] = []
+        for spin, nmo in spins:
+            gf = sum(row for task, row in zip(tasks, rows) if task[:2] == (gf_type, spin))
+            gf = gf + frozen_gf(direct_adc, iomega, spin, gf_type)
+            traces[gf_type].append(-(1/(np.pi))*gf.imag)
+
+    gf_im_trace = []
+    for gf_type in ("IP", "EA"):
+        if closed_shell:
+            trace = 2 * traces[gf_type][0]
+        elif direct_adc.freq_outer_loop:
+            trace = traces[gf_type][0] + traces[gf_type][1]
+        else:
+            # Same reduction as the serial loop over orbitals
+            trace = np.sum(traces[gf_type])
+        if direct_adc.freq_outer_loop:
+            trace = list(trace)
+        gf_im_trace.append(trace)
+
+    return gf_im_trace[0], gf_im_trace[1]
+
 ##############################################
 # Calculate Transition moments matrix for IP #
 ##############################################
+@integral_stage("T vectors")
 def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
 
     t_start = time.time()
@@ -668,14 +1211,6 @@ def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
     idn_vir_a = np.identity(nvir_a)
     idn_vir_b = np.identity(nvir_b)
 
-    v2e_oovv_a , v2e_oovv_ab, v2e_oovv_b = direct_adc.v2e.oovv
-    v2e_vvvo_a , v2e_vvvo_ab, v2e_vvvo_b = direct_adc.v2e.vvvo
-    v2e_ovoo_a , v2e_ovoo_ab, v2e_ovoo_b = direct_adc.v2e.ovoo
-    v2e_voov_a , v2e_voov_ab, v2e_voov_b = direct_adc.v2e.voov
-    v2e_ovov_a , v2e_ovov_ab, v2e_ovov_b = direct_adc.v2e.ovov
-    v2e_vovv_a , v2e_vovv_ab, v2e_vovv_b = direct_adc.v2e.vovv
-    v2e_ooov_a , v2e_ooov_ab, v2e_ooov_b = direct_adc.v2e.ooov
-
     s_a = 0
     f_a = n_singles_a
     s_b = f_a
@@ -697,9 +1232,9 @@ def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
 
         if orb < nocc_a:
             T[s_a:f_a]  = idn_occ_a[orb, :]
-            T[s_a:f_a] += 0.25*np.einsum('kdc,ikdc->i',t2_1_a[:,orb,:,:], t2_1_a, optimize = True)
-            T[s_a:f_a] -= 0.25*np.einsum('kdc,ikdc->i',t2_1_ab[orb,:,:,:], t2_1_ab, optimize = True)
-            T[s_a:f_a] -= 0.25*np.einsum('kcd,ikcd->i',t2_1_ab[orb,:,:,:], t2_1_ab, optimize = True)
+            T[s_a:f_a] += 0.25*einsum(direct_adc, 'kdc,ikdc->i',t2_1_a[:,orb,:,:], t2_1_a)
+            T[s_a:f_a] -= 0.25*einsum(direct_adc, 'kdc,ikdc->i',t2_1_ab[orb,:,:,:], t2_1_ab)
+            T[s_a:f_a] -= 0.25*einsum(direct_adc, 'kcd,ikcd->i',t2_1_ab[orb,:,:,:], t2_1_ab)
         else :
             T[s_a:f_a] += t1_2_a[:,(orb-nocc_a)]
 
@@ -733,16 +1268,16 @@ def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
             t1_3_a, t1_3_b = t1_3
 
             if orb < nocc_a:
-                T[s_a:f_a] += 0.25*np.einsum('kdc,ikdc->i',t2_1_a[:,orb,:,:], t2_2_a, optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('kdc,ikdc->i',t2_1_ab[orb,:,:,:], t2_2_ab, optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('kcd,ikcd->i',t2_1_ab[orb,:,:,:], t2_2_ab, optimize = True)
+                T[s_a:f_a] += 0.25*einsum(direct_adc, 'kdc,ikdc->i',t2_1_a[:,orb,:,:], t2_2_a)
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'kdc,ikdc->i',t2_1_ab[orb,:,:,:], t2_2_ab)
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'kcd,ikcd->i',t2_1_ab[orb,:,:,:], t2_2_ab)
 
-                T[s_a:f_a] += 0.25*np.einsum('ikdc,kdc->i',t2_1_a, t2_2_a[:,orb,:,:],optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('ikcd,kcd->i',t2_1_ab, t2_2_ab[orb,:,:,:],optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('ikdc,kdc->i',t2_1_ab, t2_2_ab[orb,:,:,:],optimize = True)
+                T[s_a:f_a] += 0.25*einsum(direct_adc, 'ikdc,kdc->i',t2_1_a, t2_2_a[:,orb,:,:])
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'ikcd,kcd->i',t2_1_ab, t2_2_ab[orb,:,:,:])
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'ikdc,kdc->i',t2_1_ab, t2_2_ab[orb,:,:,:])
             else:
-                T[s_a:f_a] += 0.5*np.einsum('ikc,kc->i',t2_1_a[:,:,(orb-nocc_a),:], t1_2_a,optimize = True)
-                T[s_a:f_a] += 0.5*np.einsum('ikc,kc->i',t2_1_ab[:,:,(orb-nocc_a),:], t1_2_b,optimize = True)
+                T[s_a:f_a] += 0.5*einsum(direct_adc, 'ikc,kc->i',t2_1_a[:,:,(orb-nocc_a),:], t1_2_a)
+                T[s_a:f_a] += 0.5*einsum(direct_adc, 'ikc,kc->i',t2_1_ab[:,:,(orb-nocc_a),:], t1_2_b)
                 T[s_a:f_a] += t1_3_a[:,(orb-nocc_a)]
 
 ######## spin = beta  ############################################
@@ -751,9 +1286,9 @@ def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
 
         if orb < nocc_b:
             T[s_b:f_b] = idn_occ_b[orb, :]
-            T[s_b:f_b]+= 0.25*np.einsum('kdc,ikdc->i',t2_1_b[:,orb,:,:], t2_1_b, optimize = True)
-            T[s_b:f_b]-= 0.25*np.einsum('kdc,kidc->i',t2_1_ab[:,orb,:,:], t2_1_ab, optimize = True)
-            T[s_b:f_b]-= 0.25*np.einsum('kcd,kicd->i',t2_1_ab[:,orb,:,:], t2_1_ab, optimize = True)
+            T[s_b:f_b]+= 0.25*einsum(direct_adc, 'kdc,ikdc->i',t2_1_b[:,orb,:,:], t2_1_b)
+            T[s_b:f_b]-= 0.25*einsum(direct_adc, 'kdc,kidc->i',t2_1_ab[:,orb,:,:], t2_1_ab)
+            T[s_b:f_b]-= 0.25*einsum(direct_adc, 'kcd,kicd->i',t2_1_ab[:,orb,:,:], t2_1_ab)
         else :
             T[s_b:f_b] += t1_2_b[:,(orb-nocc_b)]
 
@@ -789,16 +1324,16 @@ def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
             t2_2_a, t2_2_ab, t2_2_b = t2_2
 
             if orb < nocc_b:
-                T[s_b:f_b] += 0.25*np.einsum('kdc,ikdc->i',t2_1_b[:,orb,:,:], t2_2_b, optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('kdc,kidc->i',t2_1_ab[:,orb,:,:], t2_2_ab, optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('kcd,kicd->i',t2_1_ab[:,orb,:,:], t2_2_ab, optimize = True)
+                T[s_b:f_b] += 0.25*einsum(direct_adc, 'kdc,ikdc->i',t2_1_b[:,orb,:,:], t2_2_b)
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'kdc,kidc->i',t2_1_ab[:,orb,:,:], t2_2_ab)
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'kcd,kicd->i',t2_1_ab[:,orb,:,:], t2_2_ab)
 
-                T[s_b:f_b] += 0.25*np.einsum('ikdc,kdc->i',t2_1_b, t2_2_b[:,orb,:,:],optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('kicd,kcd->i',t2_1_ab, t2_2_ab[:,orb,:,:],optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('kidc,kdc->i',t2_1_ab, t2_2_ab[:,orb,:,:],optimize = True)
+                T[s_b:f_b] += 0.25*einsum(direct_adc, 'ikdc,kdc->i',t2_1_b, t2_2_b[:,orb,:,:])
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'kicd,kcd->i',t2_1_ab, t2_2_ab[:,orb,:,:])
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'kidc,kdc->i',t2_1_ab, t2_2_ab[:,orb,:,:])
             else:
-                T[s_b:f_b] += 0.5*np.einsum('ikc,kc->i',t2_1_b[:,:,(orb-nocc_b),:], t1_2_b,optimize = True)
-                T[s_b:f_b] += 0.5*np.einsum('kic,kc->i',t2_1_ab[:,:,:,(orb-nocc_b)], t1_2_a,optimize = True)
+                T[s_b:f_b] += 0.5*einsum(direct_adc, 'ikc,kc->i',t2_1_b[:,:,(orb-nocc_b),:], t1_2_b)
+                T[s_b:f_b] += 0.5*einsum(direct_adc, 'kic,kc->i',t2_1_ab[:,:,:,(orb-nocc_b)], t1_2_a)
                 T[s_b:f_b] += t1_3_b[:,(orb-nocc_b)]
 
     return T
@@ -806,6 +1341,7 @@ def calculate_T_ip(direct_adc, t_amp, orb, spin=None):
 ###############################################
 # Calculate Transition moments matrix for EA #
 ###############################################
+@integral_stage("T vectors")
 def calculate_T_ea(direct_adc, t_amp, orb, spin=None):
 
     method = direct_adc.method
@@ -837,14 +1373,6 @@ def calculate_T_ea(direct_adc, t_amp, orb, spin=None):
     idn_vir_a = np.identity(nvir_a)
     idn_vir_b = np.identity(nvir_b)
 
-    v2e_oovv_a , v2e_oovv_ab, v2e_oovv_b = direct_adc.v2e.oovv
-    v2e_vvvo_a , v2e_vvvo_ab, v2e_vvvo_b = direct_adc.v2e.vvvo
-    v2e_ovoo_a , v2e_ovoo_ab, v2e_ovoo_b = direct_adc.v2e.ovoo
-    v2e_voov_a , v2e_voov_ab, v2e_voov_b = direct_adc.v2e.voov
-    v2e_ovov_a , v2e_ovov_ab, v2e_ovov_b = direct_adc.v2e.ovov
-    v2e_vovv_a , v2e_vovv_ab, v2e_vovv_b = direct_adc.v2e.vovv
-    v2e_ooov_a , v2e_ooov_ab, v2e_ooov_b = direct_adc.v2e.ooov
-
     s_a = 0
     f_a = n_singles_a
     s_b = f_a
@@ -877,9 +1405,9 @@ def calculate_T_ea(direct_adc, t_amp, orb, spin=None):
         else :
 
             T[s_a:f_a] += idn_vir_a[(orb-nocc_a), :]
-            T[s_a:f_a] -= 0.25*np.einsum('klc,klac->a',t2_1_a[:,:,(orb-nocc_a),:], t2_1_a, optimize = True)
-            T[s_a:f_a] -= 0.25*np.einsum('klc,klac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_1_ab, optimize = True)
-            T[s_a:f_a] -= 0.25*np.einsum('lkc,lkac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_1_ab, optimize = True)
+            T[s_a:f_a] -= 0.25*einsum(direct_adc, 'klc,klac->a',t2_1_a[:,:,(orb-nocc_a),:], t2_1_a)
+            T[s_a:f_a] -= 0.25*einsum(direct_adc, 'klc,klac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_1_ab)
+            T[s_a:f_a] -= 0.25*einsum(direct_adc, 'lkc,lkac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_1_ab)
 
 ######## ADC(3) 2p-1h  part  ############################################
 
@@ -903,20 +1431,20 @@ def calculate_T_ea(direct_adc, t_amp, orb, spin=None):
 
             if orb < nocc_a:
 
-                T[s_a:f_a] += 0.5*np.einsum('kac,ck->a',t2_1_a[:,orb,:,:], t1_2_a.T,optimize = True)
-                T[s_a:f_a] -= 0.5*np.einsum('kac,ck->a',t2_1_ab[orb,:,:,:], t1_2_b.T,optimize = True)
+                T[s_a:f_a] += 0.5*einsum(direct_adc, 'kac,ck->a',t2_1_a[:,orb,:,:], t1_2_a.T)
+                T[s_a:f_a] -= 0.5*einsum(direct_adc, 'kac,ck->a',t2_1_ab[orb,:,:,:], t1_2_b.T)
 
                 T[s_a:f_a] -= t1_3_a[orb,:]
 
             else:
 
-                T[s_a:f_a] -= 0.25*np.einsum('klc,klac->a',t2_1_a[:,:,(orb-nocc_a),:], t2_2_a, optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('klc,klac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_2_ab, optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('lkc,lkac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_2_ab, optimize = True)
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'klc,klac->a',t2_1_a[:,:,(orb-nocc_a),:], t2_2_a)
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'klc,klac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_2_ab)
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'lkc,lkac->a',t2_1_ab[:,:,(orb-nocc_a),:], t2_2_ab)
 
-                T[s_a:f_a] -= 0.25*np.einsum('klac,klc->a',t2_1_a, t2_2_a[:,:,(orb-nocc_a),:],optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('klac,klc->a',t2_1_ab, t2_2_ab[:,:,(orb-nocc_a),:],optimize = True)
-                T[s_a:f_a] -= 0.25*np.einsum('lkac,lkc->a',t2_1_ab, t2_2_ab[:,:,(orb-nocc_a),:],optimize = True)
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'klac,klc->a',t2_1_a, t2_2_a[:,:,(orb-nocc_a),:])
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'klac,klc->a',t2_1_ab, t2_2_ab[:,:,(orb-nocc_a),:])
+                T[s_a:f_a] -= 0.25*einsum(direct_adc, 'lkac,lkc->a',t2_1_ab, t2_2_ab[:,:,(orb-nocc_a),:])
 
 ######### spin = beta  ############################################
     if spin=="beta":
@@ -936,9 +1464,9 @@ def calculate_T_ea(direct_adc, t_amp, orb, spin=None):
         else :
 
             T[s_b:f_b] += idn_vir_b[(orb-nocc_b), :]
-            T[s_b:f_b] -= 0.25*np.einsum('klc,klac->a',t2_1_b[:,:,(orb-nocc_b),:], t2_1_b, optimize = True)
-            T[s_b:f_b] -= 0.25*np.einsum('lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_1_ab, optimize = True)
-            T[s_b:f_b] -= 0.25*np.einsum('lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_1_ab, optimize = True)
+            T[s_b:f_b] -= 0.25*einsum(direct_adc, 'klc,klac->a',t2_1_b[:,:,(orb-nocc_b),:], t2_1_b)
+            T[s_b:f_b] -= 0.25*einsum(direct_adc, 'lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_1_ab)
+            T[s_b:f_b] -= 0.25*einsum(direct_adc, 'lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_1_ab)
 
 ######### ADC(3) 2p-1h part  ############################################
 
@@ -962,20 +1490,20 @@ def calculate_T_ea(direct_adc, t_amp, orb, spin=None):
 
             if orb < nocc_b:
 
-                T[s_b:f_b] += 0.5*np.einsum('kac,ck->a',t2_1_b[:,orb,:,:], t1_2_b.T,optimize = True)
-                T[s_b:f_b] -= 0.5*np.einsum('kca,ck->a',t2_1_ab[:,orb,:,:], t1_2_a.T,optimize = True)
+                T[s_b:f_b] += 0.5*einsum(direct_adc, 'kac,ck->a',t2_1_b[:,orb,:,:], t1_2_b.T)
+                T[s_b:f_b] -= 0.5*einsum(direct_adc, 'kca,ck->a',t2_1_ab[:,orb,:,:], t1_2_a.T)
 
                 T[s_b:f_b] -= t1_3_b[orb,:]
 
             else:
 
-                T[s_b:f_b] -= 0.25*np.einsum('klc,klac->a',t2_1_b[:,:,(orb-nocc_b),:], t2_2_b, optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_2_ab, optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_2_ab, optimize = True)
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'klc,klac->a',t2_1_b[:,:,(orb-nocc_b),:], t2_2_b)
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_2_ab)
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'lkc,lkca->a',t2_1_ab[:,:,:,(orb-nocc_b)], t2_2_ab)
 
-                T[s_b:f_b] -= 0.25*np.einsum('klac,klc->a',t2_1_b, t2_2_b[:,:,(orb-nocc_b),:],optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('lkca,lkc->a',t2_1_ab, t2_2_ab[:,:,:,(orb-nocc_b)],optimize = True)
-                T[s_b:f_b] -= 0.25*np.einsum('klca,klc->a',t2_1_ab, t2_2_ab[:,:,:,(orb-nocc_b)],optimize = True)
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'klac,klc->a',t2_1_b, t2_2_b[:,:,(orb-nocc_b),:])
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'lkca,lkc->a',t2_1_ab, t2_2_ab[:,:,:,(orb-nocc_b)])
+                T[s_b:f_b] -= 0.25*einsum(direct_adc, 'klca,klc->a',t2_1_ab, t2_2_ab[:,:,:,(orb-nocc_b)])
     return T
 
 ###########################################
@@ -1051,6 +1579,33 @@ def calculate_GF_ip(direct_adc,apply_H,precond,omega,orb,T,r_guess):
     else :
         return gf,new_r
 
+# GF elements <T_p|(omega - H)^-1|T_p> of the orbitals with the rows of T
+# as transition moments, solved together (the guess is that of calculate_GF_ip)
+def calculate_GF_block(direct_adc,apply_H,precond,omega,T,r_guess):
+
+    broadening = direct_adc.broadening
+
+    if r_guess is None:
+        imag_r = -(np.real(T))/broadening
+        sigma = apply_H(imag_r)
+        real_r =  (-omega*imag_r  - np.real(sigma))/broadening
+        r_guess = np.zeros(T.shape, dtype = complex)
+        r_guess.real = real_r
+        r_guess.imag = imag_r
+
+    new_r = solve_conjugate_gradients_block(direct_adc,apply_H,precond,T,r_guess,omega)
+
+    gf = np.array([np.dot(x, y) for x, y in zip(T, new_r)])
+
+    return gf, new_r
+
+# Orbitals whose GF equations are solved together
+def orbital_blocks(direct_adc, nmo):
+
+    nblock = max(1, direct_adc.sigma_block)
+
+    return [np.arange(p0, min(p0 + nblock, nmo)) for p0 in range(0, nmo, nblock)]
+
 def calculate_GF_ea(direct_adc,apply_H,precond,omega,orb,T,r_guess):
 
     method = direct_adc.method
@@ -1108,6 +1663,7 @@ def calculate_GF_ea(direct_adc,apply_H,precond,omega,orb,T,r_guess):
 ###########################################
 # Precompute M_ij block   #
 ###########################################
+@integral_stage("M_ij")
 def get_Mij(direct_adc,t_amp):
 
     t_start = time.time()
@@ -1136,235 +1692,241 @@ def get_Mij(direct_adc,t_amp):
 
     v2e_oovv_a,v2e_oovv_ab,v2e_oovv_b = direct_adc.v2e.oovv
     v2e_vvoo_a,v2e_vvoo_ab,v2e_vvoo_b = direct_adc.v2e.vvoo
-    v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
-    v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b = direct_adc.v2e.ovoo
-    v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
-    v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
-    v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
-    v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
-    v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b = direct_adc.v2e.vvvv
-    v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
-    v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b = direct_adc.v2e.oovo
-    v2e_vooo_a,v2e_vooo_ab,v2e_vooo_b = direct_adc.v2e.vooo
+
+    if (method == "adc(3)"):
+        v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
+        v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b = direct_adc.v2e.ovoo
+        v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
+        v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
+        v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
+        v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
+        v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b = direct_adc.v2e.vvvv
+        v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
+        v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b = direct_adc.v2e.oovo
+        v2e_vooo_a,v2e_vooo_ab,v2e_vooo_b = direct_adc.v2e.vooo
 
     # i-j block
     # Zeroth-order terms
 
-    M_ij_a = np.einsum('ij,j->ij', idn_occ_a ,e_occ_a)
-    M_ij_b = np.einsum('ij,j->ij', idn_occ_b ,e_occ_b)
+    M_ij_a = einsum(direct_adc, 'ij,j->ij', idn_occ_a ,e_occ_a)
+    M_ij_b = einsum(direct_adc, 'ij,j->ij', idn_occ_b ,e_occ_b)
 
     # Second-order terms
 
-    M_ij_a +=  np.einsum('d,ilde,jlde->ij',e_vir_a,t2_1_a, t2_1_a)
-    M_ij_a +=  np.einsum('d,ilde,jlde->ij',e_vir_a,t2_1_ab, t2_1_ab)
-    M_ij_a +=  np.einsum('d,iled,jled->ij',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ij_a +=  einsum(direct_adc, 'd,ilde,jlde->ij',e_vir_a,t2_1_a, t2_1_a)
+    M_ij_a +=  einsum(direct_adc, 'd,ilde,jlde->ij',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ij_a +=  einsum(direct_adc, 'd,iled,jled->ij',e_vir_b,t2_1_ab, t2_1_ab)
 
-    M_ij_b +=  np.einsum('d,ilde,jlde->ij',e_vir_b,t2_1_b, t2_1_b)
-    M_ij_b +=  np.einsum('d,lide,ljde->ij',e_vir_a,t2_1_ab, t2_1_ab)
-    M_ij_b +=  np.einsum('d,lied,ljed->ij',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ij_b +=  einsum(direct_adc, 'd,ilde,jlde->ij',e_vir_b,t2_1_b, t2_1_b)
+    M_ij_b +=  einsum(direct_adc, 'd,lide,ljde->ij',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ij_b +=  einsum(direct_adc, 'd,lied,ljed->ij',e_vir_b,t2_1_ab, t2_1_ab)
 
-    M_ij_a -= 0.5 *  np.einsum('l,ilde,jlde->ij',e_occ_a,t2_1_a, t2_1_a)
-    M_ij_a -= 0.5*np.einsum('l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_1_ab)
-    M_ij_a -= 0.5*np.einsum('l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ij_a -= 0.5 *  einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_a,t2_1_a, t2_1_a)
+    M_ij_a -= 0.5*einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ij_a -= 0.5*einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_1_ab)
 
-    M_ij_b -= 0.5 *  np.einsum('l,ilde,jlde->ij',e_occ_b,t2_1_b, t2_1_b)
-    M_ij_b -= 0.5*np.einsum('l,lide,ljde->ij',e_occ_a,t2_1_ab, t2_1_ab)
-    M_ij_b -= 0.5*np.einsum('l,lied,ljed->ij',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ij_b -= 0.5 *  einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_b,t2_1_b, t2_1_b)
+    M_ij_b -= 0.5*einsum(direct_adc, 'l,lide,ljde->ij',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ij_b -= 0.5*einsum(direct_adc, 'l,lied,ljed->ij',e_occ_a,t2_1_ab, t2_1_ab)
 
-    M_ij_a -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_a,t2_1_a, t2_1_a)
-    M_ij_a -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
-    M_ij_a -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ij_a -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_a,t2_1_a, t2_1_a)
+    M_ij_a -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ij_a -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
 
-    M_ij_b -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_b,t2_1_b, t2_1_b)
-    M_ij_b -= 0.25 *  np.einsum('i,lied,ljed->ij',e_occ_b,t2_1_ab, t2_1_ab)
-    M_ij_b -= 0.25 *  np.einsum('i,lide,ljde->ij',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ij_b -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_b,t2_1_b, t2_1_b)
+    M_ij_b -= 0.25 *  einsum(direct_adc, 'i,lied,ljed->ij',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ij_b -= 0.25 *  einsum(direct_adc, 'i,lide,ljde->ij',e_occ_b,t2_1_ab, t2_1_ab)
 
-    M_ij_a -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_a,t2_1_a, t2_1_a)
-    M_ij_a -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
-    M_ij_a -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ij_a -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_a,t2_1_a, t2_1_a)
+    M_ij_a -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ij_a -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_1_ab)
 
-    M_ij_b -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_b,t2_1_b, t2_1_b)
-    M_ij_b -= 0.25 *  np.einsum('j,lied,ljed->ij',e_occ_b,t2_1_ab, t2_1_ab)
-    M_ij_b -= 0.25 *  np.einsum('j,lide,ljde->ij',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ij_b -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_b,t2_1_b, t2_1_b)
+    M_ij_b -= 0.25 *  einsum(direct_adc, 'j,lied,ljed->ij',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ij_b -= 0.25 *  einsum(direct_adc, 'j,lide,ljde->ij',e_occ_b,t2_1_ab, t2_1_ab)
 
-    M_ij_a += 0.5 *  np.einsum('ilde,jlde->ij',t2_1_a, v2e_oovv_a)
-    M_ij_a += np.einsum('ilde,jlde->ij',t2_1_ab, v2e_oovv_ab)
+    M_ij_a += 0.5 *  einsum(direct_adc, 'ilde,jlde->ij',t2_1_a, v2e_oovv_a)
+    M_ij_a += einsum(direct_adc, 'ilde,jlde->ij',t2_1_ab, v2e_oovv_ab)
 
-    M_ij_b += 0.5 *  np.einsum('ilde,jlde->ij',t2_1_b, v2e_oovv_b)
-    M_ij_b += np.einsum('lied,ljed->ij',t2_1_ab, v2e_oovv_ab)
+    M_ij_b += 0.5 *  einsum(direct_adc, 'ilde,jlde->ij',t2_1_b, v2e_oovv_b)
+    M_ij_b += einsum(direct_adc, 'lied,ljed->ij',t2_1_ab, v2e_oovv_ab)
 
-    M_ij_a += 0.5 *  np.einsum('jlde,deil->ij',t2_1_a, v2e_vvoo_a)
-    M_ij_a += np.einsum('jlde,deil->ij',t2_1_ab, v2e_vvoo_ab)
+    M_ij_a += 0.5 *  einsum(direct_adc, 'jlde,deil->ij',t2_1_a, v2e_vvoo_a)
+    M_ij_a += einsum(direct_adc, 'jlde,deil->ij',t2_1_ab, v2e_vvoo_ab)
 
-    M_ij_b += 0.5 *  np.einsum('jlde,deil->ij',t2_1_b, v2e_vvoo_b)
-    M_ij_b += np.einsum('ljed,edli->ij',t2_1_ab, v2e_vvoo_ab)
+    M_ij_b += 0.5 *  einsum(direct_adc, 'jlde,deil->ij',t2_1_b, v2e_vvoo_b)
+    M_ij_b += einsum(direct_adc, 'ljed,edli->ij',t2_1_ab, v2e_vvoo_ab)
 
     # Third-order terms
 
     if (method == "adc(3)"):
 
         t2_2_a, t2_2_ab, t2_2_b = t2_2
-        M_ij_a += np.einsum('ld,jlid->ij',t1_2_a, v2e_ooov_a)
-        M_ij_a += np.einsum('ld,jlid->ij',t1_2_b, v2e_ooov_ab)
-
-        M_ij_b += np.einsum('ld,jlid->ij',t1_2_b, v2e_ooov_b)
-        M_ij_b += np.einsum('ld,ljdi->ij',t1_2_a, v2e_oovo_ab)
-
-        M_ij_a += np.einsum('ld,jdil->ij',t1_2_a, v2e_ovoo_a)
-        M_ij_a += np.einsum('ld,jdil->ij',t1_2_b, v2e_ovoo_ab)
-
-        M_ij_b += np.einsum('ld,jdil->ij',t1_2_b, v2e_ovoo_b)
-        M_ij_b += np.einsum('ld,djli->ij',t1_2_a, v2e_vooo_ab)
-
-        M_ij_a += 0.5* np.einsum('ilde,jlde->ij',t2_2_a, v2e_oovv_a)
-        M_ij_a += np.einsum('ilde,jlde->ij',t2_2_ab, v2e_oovv_ab)
-
-        M_ij_b += 0.5* np.einsum('ilde,jlde->ij',t2_2_b, v2e_oovv_b)
-        M_ij_b += np.einsum('lied,ljed->ij',t2_2_ab, v2e_oovv_ab)
-
-        M_ij_a += 0.5* np.einsum('jlde,deil->ij',t2_2_a, v2e_vvoo_a)
-        M_ij_a += np.einsum('jlde,deil->ij',t2_2_ab, v2e_vvoo_ab)
+        M_ij_a += einsum(direct_adc, 'ld,jlid->ij',t1_2_a, v2e_ooov_a)
+        M_ij_a += einsum(direct_adc, 'ld,jlid->ij',t1_2_b, v2e_ooov_ab)
 
-        M_ij_b += 0.5* np.einsum('jlde,deil->ij',t2_2_b, v2e_vvoo_b)
-        M_ij_b += np.einsum('ljed,edli->ij',t2_2_ab, v2e_vvoo_ab)
+        M_ij_b += einsum(direct_adc, 'ld,jlid->ij',t1_2_b, v2e_ooov_b)
+        M_ij_b += einsum(direct_adc, 'ld,ljdi->ij',t1_2_a, v2e_oovo_ab)
 
-        M_ij_a +=  np.einsum('d,ilde,jlde->ij',e_vir_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a +=  np.einsum('d,ilde,jlde->ij',e_vir_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a +=  np.einsum('d,iled,jled->ij',e_vir_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_a += einsum(direct_adc, 'ld,jdil->ij',t1_2_a, v2e_ovoo_a)
+        M_ij_a += einsum(direct_adc, 'ld,jdil->ij',t1_2_b, v2e_ovoo_ab)
 
-        M_ij_b +=  np.einsum('d,ilde,jlde->ij',e_vir_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b +=  np.einsum('d,lide,ljde->ij',e_vir_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b +=  np.einsum('d,lied,ljed->ij',e_vir_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_b += einsum(direct_adc, 'ld,jdil->ij',t1_2_b, v2e_ovoo_b)
+        M_ij_b += einsum(direct_adc, 'ld,djli->ij',t1_2_a, v2e_vooo_ab)
 
-        M_ij_a +=  np.einsum('d,jlde,ilde->ij',e_vir_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a +=  np.einsum('d,jlde,ilde->ij',e_vir_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a +=  np.einsum('d,jled,iled->ij',e_vir_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_a += 0.5* einsum(direct_adc, 'ilde,jlde->ij',t2_2_a, v2e_oovv_a)
+        M_ij_a += einsum(direct_adc, 'ilde,jlde->ij',t2_2_ab, v2e_oovv_ab)
 
-        M_ij_b +=  np.einsum('d,jlde,ilde->ij',e_vir_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b +=  np.einsum('d,ljde,lide->ij',e_vir_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b +=  np.einsum('d,ljed,lied->ij',e_vir_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_b += 0.5* einsum(direct_adc, 'ilde,jlde->ij',t2_2_b, v2e_oovv_b)
+        M_ij_b += einsum(direct_adc, 'lied,ljed->ij',t2_2_ab, v2e_oovv_ab)
 
-        M_ij_a -= 0.5 *  np.einsum('l,ilde,jlde->ij',e_occ_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a -= 0.5*np.einsum('l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a -= 0.5*np.einsum('l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_a += 0.5* einsum(direct_adc, 'jlde,deil->ij',t2_2_a, v2e_vvoo_a)
+        M_ij_a += einsum(direct_adc, 'jlde,deil->ij',t2_2_ab, v2e_vvoo_ab)
 
-        M_ij_b -= 0.5 *  np.einsum('l,ilde,jlde->ij',e_occ_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b -= 0.5*np.einsum('l,lied,ljed->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b -= 0.5*np.einsum('l,lied,ljed->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_b += 0.5* einsum(direct_adc, 'jlde,deil->ij',t2_2_b, v2e_vvoo_b)
+        M_ij_b += einsum(direct_adc, 'ljed,edli->ij',t2_2_ab, v2e_vvoo_ab)
 
-        M_ij_a -= 0.5 *  np.einsum('l,jlde,ilde->ij',e_occ_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a -= 0.5*np.einsum('l,jlde,ilde->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a -= 0.5*np.einsum('l,jlde,ilde->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_a +=  einsum(direct_adc, 'd,ilde,jlde->ij',e_vir_a,t2_1_a, t2_2_a)
+        M_ij_a +=  einsum(direct_adc, 'd,ilde,jlde->ij',e_vir_a,t2_1_ab, t2_2_ab)
+        M_ij_a +=  einsum(direct_adc, 'd,iled,jled->ij',e_vir_b,t2_1_ab, t2_2_ab)
 
-        M_ij_b -= 0.5 *  np.einsum('l,jlde,ilde->ij',e_occ_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b -= 0.5*np.einsum('l,ljed,lied->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b -= 0.5*np.einsum('l,ljed,lied->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-
-        M_ij_a -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-
-        M_ij_b -= 0.25 *  np.einsum('i,ilde,jlde->ij',e_occ_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('i,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('i,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_b +=  einsum(direct_adc, 'd,ilde,jlde->ij',e_vir_b,t2_1_b, t2_2_b)
+        M_ij_b +=  einsum(direct_adc, 'd,lide,ljde->ij',e_vir_a,t2_1_ab, t2_2_ab)
+        M_ij_b +=  einsum(direct_adc, 'd,lied,ljed->ij',e_vir_b,t2_1_ab, t2_2_ab)
 
-        M_ij_a -= 0.25 *  np.einsum('i,jlde,ilde->ij',e_occ_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('i,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('i,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_a +=  einsum(direct_adc, 'd,jlde,ilde->ij',e_vir_a,t2_1_a, t2_2_a)
+        M_ij_a +=  einsum(direct_adc, 'd,jlde,ilde->ij',e_vir_a,t2_1_ab, t2_2_ab)
+        M_ij_a +=  einsum(direct_adc, 'd,jled,iled->ij',e_vir_b,t2_1_ab, t2_2_ab)
 
-        M_ij_b -= 0.25 *  np.einsum('i,jlde,ilde->ij',e_occ_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('i,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('i,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_b +=  einsum(direct_adc, 'd,jlde,ilde->ij',e_vir_b,t2_1_b, t2_2_b)
+        M_ij_b +=  einsum(direct_adc, 'd,ljde,lide->ij',e_vir_a,t2_1_ab, t2_2_ab)
+        M_ij_b +=  einsum(direct_adc, 'd,ljed,lied->ij',e_vir_b,t2_1_ab, t2_2_ab)
 
-        M_ij_a -= 0.25 *  np.einsum('j,jlde,ilde->ij',e_occ_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('j,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('j,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
+        M_ij_a -= 0.5 *  einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_a,t2_1_a, t2_2_a)
+        M_ij_a -= 0.5*einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_2_ab)
+        M_ij_a -= 0.5*einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_b,t2_1_ab, t2_2_ab)
 
-        M_ij_b -= 0.25 *  np.einsum('j,jlde,ilde->ij',e_occ_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('j,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('j,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-
-        M_ij_a -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_a,t2_1_a, t2_2_a,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_a -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab,optimize=True)
-
-        M_ij_b -= 0.25 *  np.einsum('j,ilde,jlde->ij',e_occ_b,t2_1_b, t2_2_b,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('j,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-        M_ij_b -= 0.25 *  np.einsum('j,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab,optimize=True)
-
-        M_ij_a -= np.einsum('lmde,jldf,fmie->ij',t2_1_a, t2_1_a, v2e_voov_a ,optimize = True)
-        M_ij_a += np.einsum('mled,jlfd,fmie->ij',t2_1_ab, t2_1_ab, v2e_voov_a ,optimize = True)
-        M_ij_a -= np.einsum('lmde,jldf,fmie->ij',t2_1_ab, t2_1_a, v2e_voov_ab,optimize = True)
-        M_ij_a -= np.einsum('mlde,jldf,mfie->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab ,optimize = True)
-        M_ij_a += np.einsum('lmde,jlfd,fmie->ij',t2_1_b, t2_1_ab, v2e_voov_ab ,optimize = True)
-
-        M_ij_b -= np.einsum('lmde,jldf,fmie->ij',t2_1_b, t2_1_b, v2e_voov_b ,optimize = True)
-        M_ij_b += np.einsum('lmde,ljdf,fmie->ij',t2_1_ab, t2_1_ab, v2e_voov_b ,optimize = True)
-        M_ij_b -= np.einsum('mled,jldf,mfei->ij',t2_1_ab, t2_1_b, v2e_ovvo_ab,optimize = True)
-        M_ij_b -= np.einsum('lmed,ljfd,fmei->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab ,optimize = True)
-        M_ij_b += np.einsum('lmde,ljdf,mfei->ij',t2_1_a, t2_1_ab, v2e_ovvo_ab ,optimize = True)
-
-        M_ij_a -= np.einsum('lmde,ildf,fmje->ij',t2_1_a, t2_1_a, v2e_voov_a ,optimize = True)
-        M_ij_a += np.einsum('mled,ilfd,fmje->ij',t2_1_ab, t2_1_ab, v2e_voov_a ,optimize = True)
-        M_ij_a -= np.einsum('lmde,ildf,fmje->ij',t2_1_ab, t2_1_a, v2e_voov_ab,optimize = True)
-        M_ij_a -= np.einsum('mlde,ildf,mfje->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab ,optimize = True)
-        M_ij_a += np.einsum('lmde,ilfd,fmje->ij',t2_1_b, t2_1_ab, v2e_voov_ab ,optimize = True)
-
-        M_ij_b -= np.einsum('lmde,ildf,fmje->ij',t2_1_b, t2_1_b, v2e_voov_b ,optimize = True)
-        M_ij_b += np.einsum('lmde,lidf,fmje->ij',t2_1_ab, t2_1_ab, v2e_voov_b ,optimize = True)
-        M_ij_b -= np.einsum('mled,ildf,mfej->ij',t2_1_ab, t2_1_b, v2e_ovvo_ab,optimize = True)
-        M_ij_b -= np.einsum('lmed,lifd,fmej->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab ,optimize = True)
-        M_ij_b += np.einsum('lmde,lidf,mfej->ij',t2_1_a, t2_1_ab, v2e_ovvo_ab ,optimize = True)
-
-        M_ij_a += 0.25*np.einsum('lmde,jnde,lmin->ij',t2_1_a, t2_1_a,v2e_oooo_a, optimize = True)
-        M_ij_a += np.einsum('lmde,jnde,lmin->ij',t2_1_ab ,t2_1_ab,v2e_oooo_ab, optimize = True)
-
-        M_ij_b += 0.25*np.einsum('lmde,jnde,lmin->ij',t2_1_b, t2_1_b,v2e_oooo_b, optimize = True)
-        M_ij_b += np.einsum('mled,njed,mlni->ij',t2_1_ab ,t2_1_ab,v2e_oooo_ab, optimize = True)
-
-        M_ij_a += 0.25*np.einsum('ilde,jlgf,gfde->ij',t2_1_a, t2_1_a,v2e_vvvv_a, optimize = True)
-        M_ij_a +=np.einsum('ilde,jlgf,gfde->ij',t2_1_ab, t2_1_ab,v2e_vvvv_ab, optimize = True)
-
-        M_ij_b += 0.25*np.einsum('ilde,jlgf,gfde->ij',t2_1_b, t2_1_b,v2e_vvvv_b, optimize = True)
-        M_ij_b +=np.einsum('lied,ljfg,fged->ij',t2_1_ab, t2_1_ab,v2e_vvvv_ab, optimize = True)
-
-        M_ij_a += 0.25*np.einsum('inde,lmde,jnlm->ij',t2_1_a, t2_1_a,v2e_oooo_a, optimize = True)
-        M_ij_a +=np.einsum('inde,lmde,jnlm->ij',t2_1_ab, t2_1_ab,v2e_oooo_ab, optimize = True)
-
-        M_ij_b += 0.25*np.einsum('inde,lmde,jnlm->ij',t2_1_b, t2_1_b,v2e_oooo_b, optimize = True)
-        M_ij_b +=np.einsum('nied,mled,njml->ij',t2_1_ab, t2_1_ab,v2e_oooo_ab, optimize = True)
-
-        M_ij_a += 0.5*np.einsum('lmdf,lmde,jeif->ij',t2_1_a, t2_1_a, v2e_ovov_a , optimize = True)
-        M_ij_a +=np.einsum('mlfd,mled,jeif->ij',t2_1_ab, t2_1_ab, v2e_ovov_a , optimize = True)
-        M_ij_a +=np.einsum('lmdf,lmde,jeif->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab , optimize = True)
-        M_ij_a +=0.5*np.einsum('lmdf,lmde,jeif->ij',t2_1_b, t2_1_b, v2e_ovov_ab , optimize = True)
-
-        M_ij_b += 0.5*np.einsum('lmdf,lmde,jeif->ij',t2_1_b, t2_1_b, v2e_ovov_b , optimize = True)
-        M_ij_b +=np.einsum('lmdf,lmde,jeif->ij',t2_1_ab, t2_1_ab, v2e_ovov_b , optimize = True)
-        M_ij_b +=np.einsum('lmfd,lmed,ejfi->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab , optimize = True)
-        M_ij_b +=0.5*np.einsum('lmdf,lmde,ejfi->ij',t2_1_a, t2_1_a, v2e_vovo_ab , optimize = True)
-
-        M_ij_a -= np.einsum('ilde,jmdf,flem->ij',t2_1_a, t2_1_a, v2e_vovo_a, optimize = True)
-        M_ij_a += np.einsum('ilde,jmdf,lfem->ij',t2_1_a, t2_1_ab, v2e_ovvo_ab, optimize = True)
-        M_ij_a += np.einsum('ilde,jmdf,flme->ij',t2_1_ab, t2_1_a, v2e_voov_ab, optimize = True)
-        M_ij_a -= np.einsum('ilde,jmdf,flem->ij',t2_1_ab, t2_1_ab, v2e_vovo_b, optimize = True)
-        M_ij_a -= np.einsum('iled,jmfd,flem->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab, optimize = True)
-
-        M_ij_b -= np.einsum('ilde,jmdf,flem->ij',t2_1_b, t2_1_b, v2e_vovo_b, optimize = True)
-        M_ij_b += np.einsum('ilde,mjfd,flme->ij',t2_1_b, t2_1_ab, v2e_voov_ab, optimize = True)
-        M_ij_b += np.einsum('lied,jmdf,lfem->ij',t2_1_ab, t2_1_b, v2e_ovvo_ab, optimize = True)
-        M_ij_b -= np.einsum('lied,mjfd,flem->ij',t2_1_ab, t2_1_ab, v2e_vovo_a, optimize = True)
-        M_ij_b -= np.einsum('lide,mjdf,lfme->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab, optimize = True)
-
-        M_ij_a -= 0.5*np.einsum('lnde,lmde,jnim->ij',t2_1_a, t2_1_a, v2e_oooo_a, optimize = True)
-        M_ij_a -= np.einsum('nled,mled,jnim->ij',t2_1_ab, t2_1_ab, v2e_oooo_a, optimize = True)
-        M_ij_a -= np.einsum('lnde,lmde,jnim->ij',t2_1_ab, t2_1_ab, v2e_oooo_ab, optimize = True)
-        M_ij_a -= 0.5 * np.einsum('lnde,lmde,jnim->ij',t2_1_b, t2_1_b, v2e_oooo_ab, optimize = True)
-
-        M_ij_b -= 0.5*np.einsum('lnde,lmde,jnim->ij',t2_1_b, t2_1_b, v2e_oooo_b, optimize = True)
-        M_ij_b -= np.einsum('lnde,lmde,jnim->ij',t2_1_ab, t2_1_ab, v2e_oooo_b, optimize = True)
-        M_ij_b -= np.einsum('nled,mled,njmi->ij',t2_1_ab, t2_1_ab, v2e_oooo_ab, optimize = True)
-        M_ij_b -= 0.5 * np.einsum('lnde,lmde,njmi->ij',t2_1_a, t2_1_a, v2e_oooo_ab, optimize = True)
+        M_ij_b -= 0.5 *  einsum(direct_adc, 'l,ilde,jlde->ij',e_occ_b,t2_1_b, t2_2_b)
+        M_ij_b -= 0.5*einsum(direct_adc, 'l,lied,ljed->ij',e_occ_a,t2_1_ab, t2_2_ab)
+        M_ij_b -= 0.5*einsum(direct_adc, 'l,lied,ljed->ij',e_occ_a,t2_1_ab, t2_2_ab)
+
+        M_ij_a -= 0.5 *  einsum(direct_adc, 'l,jlde,ilde->ij',e_occ_a,t2_1_a, t2_2_a)
+        M_ij_a -= 0.5*einsum(direct_adc, 'l,jlde,ilde->ij',e_occ_b,t2_1_ab, t2_2_ab)
+        M_ij_a -= 0.5*einsum(direct_adc, 'l,jlde,ilde->ij',e_occ_b,t2_1_ab, t2_2_ab)
+
+        M_ij_b -= 0.5 *  einsum(direct_adc, 'l,jlde,ilde->ij',e_occ_b,t2_1_b, t2_2_b)
+        M_ij_b -= 0.5*einsum(direct_adc, 'l,ljed,lied->ij',e_occ_a,t2_1_ab, t2_2_ab)
+        M_ij_b -= 0.5*einsum(direct_adc, 'l,ljed,lied->ij',e_occ_a,t2_1_ab, t2_2_ab)
+
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_a,t2_1_a, t2_2_a)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'i,ilde,jlde->ij',e_occ_b,t2_1_b, t2_2_b)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'i,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'i,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab)
+
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'i,jlde,ilde->ij',e_occ_a,t2_1_a, t2_2_a)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'i,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'i,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'i,jlde,ilde->ij',e_occ_b,t2_1_b, t2_2_b)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'i,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'i,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab)
+
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'j,jlde,ilde->ij',e_occ_a,t2_1_a, t2_2_a)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'j,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'j,jlde,ilde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'j,jlde,ilde->ij',e_occ_b,t2_1_b, t2_2_b)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'j,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'j,ljed,lied->ij',e_occ_b,t2_1_ab, t2_2_ab)
+
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_a,t2_1_a, t2_2_a)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+        M_ij_a -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_a,t2_1_ab, t2_2_ab)
+
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'j,ilde,jlde->ij',e_occ_b,t2_1_b, t2_2_b)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'j,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab)
+        M_ij_b -= 0.25 *  einsum(direct_adc, 'j,lied,ljed->ij',e_occ_b,t2_1_ab, t2_2_ab)
+
+        M_ij_a -= einsum(direct_adc, 'lmde,jldf,fmie->ij',t2_1_a, t2_1_a, v2e_voov_a )
+        M_ij_a += einsum(direct_adc, 'mled,jlfd,fmie->ij',t2_1_ab, t2_1_ab, v2e_voov_a )
+        M_ij_a -= einsum(direct_adc, 'lmde,jldf,fmie->ij',t2_1_ab, t2_1_a, v2e_voov_ab)
+        M_ij_a -= einsum(direct_adc, 'mlde,jldf,mfie->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab )
+        M_ij_a += einsum(direct_adc, 'lmde,jlfd,fmie->ij',t2_1_b, t2_1_ab, v2e_voov_ab )
+
+        M_ij_b -= einsum(direct_adc, 'lmde,jldf,fmie->ij',t2_1_b, t2_1_b, v2e_voov_b )
+        M_ij_b += einsum(direct_adc, 'lmde,ljdf,fmie->ij',t2_1_ab, t2_1_ab, v2e_voov_b )
+        M_ij_b -= einsum(direct_adc, 'mled,jldf,mfei->ij',t2_1_ab, t2_1_b, v2e_ovvo_ab)
+        M_ij_b -= einsum(direct_adc, 'lmed,ljfd,fmei->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab )
+        M_ij_b += einsum(direct_adc, 'lmde,ljdf,mfei->ij',t2_1_a, t2_1_ab, v2e_ovvo_ab )
+
+        M_ij_a -= einsum(direct_adc, 'lmde,ildf,fmje->ij',t2_1_a, t2_1_a, v2e_voov_a )
+        M_ij_a += einsum(direct_adc, 'mled,ilfd,fmje->ij',t2_1_ab, t2_1_ab, v2e_voov_a )
+        M_ij_a -= einsum(direct_adc, 'lmde,ildf,fmje->ij',t2_1_ab, t2_1_a, v2e_voov_ab)
+        M_ij_a -= einsum(direct_adc, 'mlde,ildf,mfje->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab )
+        M_ij_a += einsum(direct_adc, 'lmde,ilfd,fmje->ij',t2_1_b, t2_1_ab, v2e_voov_ab )
+
+        M_ij_b -= einsum(direct_adc, 'lmde,ildf,fmje->ij',t2_1_b, t2_1_b, v2e_voov_b )
+        M_ij_b += einsum(direct_adc, 'lmde,lidf,fmje->ij',t2_1_ab, t2_1_ab, v2e_voov_b )
+        M_ij_b -= einsum(direct_adc, 'mled,ildf,mfej->ij',t2_1_ab, t2_1_b, v2e_ovvo_ab)
+        M_ij_b -= einsum(direct_adc, 'lmed,lifd,fmej->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab )
+        M_ij_b += einsum(direct_adc, 'lmde,lidf,mfej->ij',t2_1_a, t2_1_ab, v2e_ovvo_ab )
+
+        M_ij_a += 0.25*einsum(direct_adc, 'lmde,jnde,lmin->ij',t2_1_a, t2_1_a,v2e_oooo_a)
+        M_ij_a += einsum(direct_adc, 'lmde,jnde,lmin->ij',t2_1_ab ,t2_1_ab,v2e_oooo_ab)
+
+        M_ij_b += 0.25*einsum(direct_adc, 'lmde,jnde,lmin->ij',t2_1_b, t2_1_b,v2e_oooo_b)
+        M_ij_b += einsum(direct_adc, 'mled,njed,mlni->ij',t2_1_ab ,t2_1_ab,v2e_oooo_ab)
+
+        temp = pack_helper.pack_pairs(t2_1_a)
+        temp_1 = vvvv_pair_dot(direct_adc, temp.reshape(nocc_a*nocc_a,-1), v2e_vvvv_a).reshape(temp.shape)
+        M_ij_a += einsum(direct_adc, 'ilp,jlp->ij', temp_1, temp)
+        M_ij_a +=vvvv_einsum(direct_adc, 'ilde,jlgf,gfde->ij', t2_1_ab, t2_1_ab,v2e_vvvv_ab)
+
+        temp = pack_helper.pack_pairs(t2_1_b)
+        temp_1 = vvvv_pair_dot(direct_adc, temp.reshape(nocc_b*nocc_b,-1), v2e_vvvv_b).reshape(temp.shape)
+        M_ij_b += einsum(direct_adc, 'ilp,jlp->ij', temp_1, temp)
+        M_ij_b +=vvvv_einsum(direct_adc, 'lied,ljfg,fged->ij', t2_1_ab, t2_1_ab,v2e_vvvv_ab)
+
+        M_ij_a += 0.25*einsum(direct_adc, 'inde,lmde,jnlm->ij',t2_1_a, t2_1_a,v2e_oooo_a)
+        M_ij_a +=einsum(direct_adc, 'inde,lmde,jnlm->ij',t2_1_ab, t2_1_ab,v2e_oooo_ab)
+
+        M_ij_b += 0.25*einsum(direct_adc, 'inde,lmde,jnlm->ij',t2_1_b, t2_1_b,v2e_oooo_b)
+        M_ij_b +=einsum(direct_adc, 'nied,mled,njml->ij',t2_1_ab, t2_1_ab,v2e_oooo_ab)
+
+        M_ij_a += 0.5*einsum(direct_adc, 'lmdf,lmde,jeif->ij',t2_1_a, t2_1_a, v2e_ovov_a )
+        M_ij_a +=einsum(direct_adc, 'mlfd,mled,jeif->ij',t2_1_ab, t2_1_ab, v2e_ovov_a )
+        M_ij_a +=einsum(direct_adc, 'lmdf,lmde,jeif->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab )
+        M_ij_a +=0.5*einsum(direct_adc, 'lmdf,lmde,jeif->ij',t2_1_b, t2_1_b, v2e_ovov_ab )
+
+        M_ij_b += 0.5*einsum(direct_adc, 'lmdf,lmde,jeif->ij',t2_1_b, t2_1_b, v2e_ovov_b )
+        M_ij_b +=einsum(direct_adc, 'lmdf,lmde,jeif->ij',t2_1_ab, t2_1_ab, v2e_ovov_b )
+        M_ij_b +=einsum(direct_adc, 'lmfd,lmed,ejfi->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab )
+        M_ij_b +=0.5*einsum(direct_adc, 'lmdf,lmde,ejfi->ij',t2_1_a, t2_1_a, v2e_vovo_ab )
+
+        M_ij_a -= einsum(direct_adc, 'ilde,jmdf,flem->ij',t2_1_a, t2_1_a, v2e_vovo_a)
+        M_ij_a += einsum(direct_adc, 'ilde,jmdf,lfem->ij',t2_1_a, t2_1_ab, v2e_ovvo_ab)
+        M_ij_a += einsum(direct_adc, 'ilde,jmdf,flme->ij',t2_1_ab, t2_1_a, v2e_voov_ab)
+        M_ij_a -= einsum(direct_adc, 'ilde,jmdf,flem->ij',t2_1_ab, t2_1_ab, v2e_vovo_b)
+        M_ij_a -= einsum(direct_adc, 'iled,jmfd,flem->ij',t2_1_ab, t2_1_ab, v2e_vovo_ab)
+
+        M_ij_b -= einsum(direct_adc, 'ilde,jmdf,flem->ij',t2_1_b, t2_1_b, v2e_vovo_b)
+        M_ij_b += einsum(direct_adc, 'ilde,mjfd,flme->ij',t2_1_b, t2_1_ab, v2e_voov_ab)
+        M_ij_b += einsum(direct_adc, 'lied,jmdf,lfem->ij',t2_1_ab, t2_1_b, v2e_ovvo_ab)
+        M_ij_b -= einsum(direct_adc, 'lied,mjfd,flem->ij',t2_1_ab, t2_1_ab, v2e_vovo_a)
+        M_ij_b -= einsum(direct_adc, 'lide,mjdf,lfme->ij',t2_1_ab, t2_1_ab, v2e_ovov_ab)
+
+        M_ij_a -= 0.5*einsum(direct_adc, 'lnde,lmde,jnim->ij',t2_1_a, t2_1_a, v2e_oooo_a)
+        M_ij_a -= einsum(direct_adc, 'nled,mled,jnim->ij',t2_1_ab, t2_1_ab, v2e_oooo_a)
+        M_ij_a -= einsum(direct_adc, 'lnde,lmde,jnim->ij',t2_1_ab, t2_1_ab, v2e_oooo_ab)
+        M_ij_a -= 0.5 * einsum(direct_adc, 'lnde,lmde,jnim->ij',t2_1_b, t2_1_b, v2e_oooo_ab)
+
+        M_ij_b -= 0.5*einsum(direct_adc, 'lnde,lmde,jnim->ij',t2_1_b, t2_1_b, v2e_oooo_b)
+        M_ij_b -= einsum(direct_adc, 'lnde,lmde,jnim->ij',t2_1_ab, t2_1_ab, v2e_oooo_b)
+        M_ij_b -= einsum(direct_adc, 'nled,mled,njmi->ij',t2_1_ab, t2_1_ab, v2e_oooo_ab)
+        M_ij_b -= 0.5 * einsum(direct_adc, 'lnde,lmde,njmi->ij',t2_1_a, t2_1_a, v2e_oooo_ab)
 
     M_ij = (M_ij_a, M_ij_b)
 
@@ -1373,6 +1935,7 @@ def get_Mij(direct_adc,t_amp):
 ###########################################
 # Compute sigma vector #
 ###########################################
+@integral_stage("IP sigma")
 def define_H_ip(direct_adc,t_amp):
 
     method = direct_adc.method
@@ -1409,21 +1972,21 @@ def define_H_ip(direct_adc,t_amp):
     idn_vir_a = np.identity(nvir_a)
     idn_vir_b = np.identity(nvir_b)
 
-    v2e_oovv_a,v2e_oovv_ab,v2e_oovv_b = direct_adc.v2e.oovv
     v2e_vooo_a,v2e_vooo_ab,v2e_vooo_b = direct_adc.v2e.vooo
     v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b = direct_adc.v2e.oovo
-    v2e_vvoo_a,v2e_vvoo_ab,v2e_vvoo_b = direct_adc.v2e.vvoo
-    v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
     v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b = direct_adc.v2e.ovoo
-    v2e_vovv_a,v2e_vovv_ab,v2e_vovv_b = direct_adc.v2e.vovv
-    v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
-    v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
-    v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b = direct_adc.v2e.vvvo
-    v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
-    v2e_ovvv_a,v2e_ovvv_ab,v2e_ovvv_b = direct_adc.v2e.ovvv
-    v2e_vvov_a,v2e_vvov_ab,v2e_vvov_b = direct_adc.v2e.vvov
-    v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
-    v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
+
+    if (method == "adc(2)-e" or method == "adc(3)"):
+        v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
+        v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
+        v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
+        v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
+        v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
+
+    if (method == "adc(3)"):
+        v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
+        v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b = direct_adc.v2e.vvvo
+        v2e_vvov_a,v2e_vvov_ab,v2e_vvov_b = direct_adc.v2e.vvov
 
     v2e_vooo_1_a = v2e_vooo_a[:,:,ij_ind_a[0],ij_ind_a[1]].transpose(1,0,2).reshape(nocc_a,-1)
     v2e_vooo_1_b = v2e_vooo_b[:,:,ij_ind_b[0],ij_ind_b[1]].transpose(1,0,2).reshape(nocc_b,-1)
@@ -1531,55 +2094,57 @@ def define_H_ip(direct_adc,t_amp):
 
         precond[s_bbb:f_bbb] = temp[:,ij_ind_b[0],ij_ind_b[1]].reshape(-1).copy()
 
-    #Calculate sigma vector
-    def sigma_(r):
+    #Calculate sigma vectors of the rows of r
+    def sigma_block(r):
 
         if direct_adc.algorithm == "cvs" or direct_adc.algorithm == "mom_conventional":
-            r = cvs_projector(direct_adc, r)
+            r = np.array([cvs_projector(direct_adc, x) for x in r])
+
+        nvec = r.shape[0]
 
         s = None
         if direct_adc.algorithm == "GF":
-            z = np.zeros((dim))
-            s = np.array(z,dtype = complex)
-            s.imag = z
+            s = np.zeros((nvec,dim),dtype = complex)
         else:
-            s = np.zeros((dim))
+            s = np.zeros((nvec,dim))
+
+        r_a = r[:,s_a:f_a]
+        r_b = r[:,s_b:f_b]
+        r_aaa = r[:,s_aaa:f_aaa]
+        r_bab = r[:,s_bab:f_bab]
+        r_aba = r[:,s_aba:f_aba]
+        r_bbb = r[:,s_bbb:f_bbb]
 
-        r_a = r[s_a:f_a]
-        r_b = r[s_b:f_b]
-        r_aaa = r[s_aaa:f_aaa]
-        r_bab = r[s_bab:f_bab]
-        r_aba = r[s_aba:f_aba]
-        r_bbb = r[s_bbb:f_bbb]
+        nbytes_read = direct_adc.v2e.io_stats.nbytes
 
         #r_bab = r_bab.reshape(nvir_b,nocc_a,nocc_b)
 
 ############ ADC(2) ij block ############################
 
-        s[s_a:f_a] = np.einsum('ij,j->i',M_ij_a,r_a)
-        s[s_b:f_b] = np.einsum('ij,j->i',M_ij_b,r_b)
+        s[:,s_a:f_a] = einsum(direct_adc, 'ij,Zj->Zi',M_ij_a,r_a)
+        s[:,s_b:f_b] = einsum(direct_adc, 'ij,Zj->Zi',M_ij_b,r_b)
 
 ############ ADC(2) i - kja block #########################
 
-        s[s_a:f_a] += np.einsum('ip,p->i', v2e_vooo_1_a, r_aaa, optimize = True)
-        s[s_a:f_a] -= np.einsum('ip,p->i', v2e_vooo_1_ab_a, r_bab, optimize = True)
+        s[:,s_a:f_a] += einsum(direct_adc, 'ip,Zp->Zi', v2e_vooo_1_a, r_aaa)
+        s[:,s_a:f_a] -= einsum(direct_adc, 'ip,Zp->Zi', v2e_vooo_1_ab_a, r_bab)
 
-        s[s_b:f_b] += np.einsum('ip,p->i', v2e_vooo_1_b, r_bbb, optimize = True)
-        s[s_b:f_b] -= np.einsum('ip,p->i', v2e_vooo_1_ab_b, r_aba, optimize = True)
+        s[:,s_b:f_b] += einsum(direct_adc, 'ip,Zp->Zi', v2e_vooo_1_b, r_bbb)
+        s[:,s_b:f_b] -= einsum(direct_adc, 'ip,Zp->Zi', v2e_vooo_1_ab_b, r_aba)
 
 ################ ADC(2) ajk - i block ############################
 
-        s[s_aaa:f_aaa] += np.einsum('api,i->ap', v2e_oovo_1_a, r_a, optimize = True).reshape(-1)
-        s[s_bab:f_bab] -= np.einsum('ajki,i->ajk', v2e_oovo_1_ab, r_a, optimize = True).reshape(-1)
-        s[s_aba:f_aba] -= np.einsum('ajki,i->ajk', v2e_oovo_2_ab, r_b, optimize = True).reshape(-1)
-        s[s_bbb:f_bbb] += np.einsum('api,i->ap', v2e_oovo_1_b, r_b, optimize = True).reshape(-1)
+        s[:,s_aaa:f_aaa] += einsum(direct_adc, 'api,Zi->Zap', v2e_oovo_1_a, r_a).reshape(nvec,-1)
+        s[:,s_bab:f_bab] -= einsum(direct_adc, 'ajki,Zi->Zajk', v2e_oovo_1_ab, r_a).reshape(nvec,-1)
+        s[:,s_aba:f_aba] -= einsum(direct_adc, 'ajki,Zi->Zajk', v2e_oovo_2_ab, r_b).reshape(nvec,-1)
+        s[:,s_bbb:f_bbb] += einsum(direct_adc, 'api,Zi->Zap', v2e_oovo_1_b, r_b).reshape(nvec,-1)
 
 ################ ADC(2) ajk - bil block ############################
 
-        s[s_aaa:f_aaa] += D_aij_a * r_aaa
-        s[s_bab:f_bab] += D_aij_bab * r_bab.reshape(-1)
-        s[s_aba:f_aba] += D_aij_aba * r_aba.reshape(-1)
-        s[s_bbb:f_bbb] += D_aij_b * r_bbb
+        s[:,s_aaa:f_aaa] += D_aij_a * r_aaa
+        s[:,s_bab:f_bab] += D_aij_bab * r_bab.reshape(nvec,-1)
+        s[:,s_aba:f_aba] += D_aij_aba * r_aba.reshape(nvec,-1)
+        s[:,s_bbb:f_bbb] += D_aij_b * r_bbb
 
 ############### ADC(3) ajk - bil block ############################
 
@@ -1589,99 +2154,99 @@ def define_H_ip(direct_adc,t_amp):
 
               #print("Calculating additional terms for adc(2)-e")
 
-               r_aaa = r_aaa.reshape(nvir_a,-1)
-               r_bab = r_bab.reshape(nvir_b,nocc_b,nocc_a)
-               r_aba = r_aba.reshape(nvir_a,nocc_a,nocc_b)
-               r_bbb = r_bbb.reshape(nvir_b,-1)
+               r_aaa = r_aaa.reshape(nvec,nvir_a,-1)
+               r_bab = r_bab.reshape(nvec,nvir_b,nocc_b,nocc_a)
+               r_aba = r_aba.reshape(nvec,nvir_a,nocc_a,nocc_b)
+               r_bbb = r_bbb.reshape(nvec,nvir_b,-1)
 
                r_aaa_u = None
                if direct_adc.algorithm == "GF":
-                   r_aaa_u = np.zeros((nvir_a,nocc_a,nocc_a),dtype=complex)
+                   r_aaa_u = np.zeros((nvec,nvir_a,nocc_a,nocc_a),dtype=complex)
                else:
-                   r_aaa_u = np.zeros((nvir_a,nocc_a,nocc_a))
-               r_aaa_u[:,ij_ind_a[0],ij_ind_a[1]]= r_aaa.copy()
-               r_aaa_u[:,ij_ind_a[1],ij_ind_a[0]]= -r_aaa.copy()
+                   r_aaa_u = np.zeros((nvec,nvir_a,nocc_a,nocc_a))
+               r_aaa_u[:,:,ij_ind_a[0],ij_ind_a[1]]= r_aaa.copy()
+               r_aaa_u[:,:,ij_ind_a[1],ij_ind_a[0]]= -r_aaa.copy()
 
                r_bbb_u = None
                if direct_adc.algorithm == "GF":
-                   r_bbb_u = np.zeros((nvir_b,nocc_b,nocc_b),dtype=complex)
+                   r_bbb_u = np.zeros((nvec,nvir_b,nocc_b,nocc_b),dtype=complex)
                else:
-                   r_bbb_u = np.zeros((nvir_b,nocc_b,nocc_b))
+                   r_bbb_u = np.zeros((nvec,nvir_b,nocc_b,nocc_b))
 
-               r_bbb_u[:,ij_ind_b[0],ij_ind_b[1]]= r_bbb.copy()
-               r_bbb_u[:,ij_ind_b[1],ij_ind_b[0]]= -r_bbb.copy()
+               r_bbb_u[:,:,ij_ind_b[0],ij_ind_b[1]]= r_bbb.copy()
+               r_bbb_u[:,:,ij_ind_b[1],ij_ind_b[0]]= -r_bbb.copy()
 
-               temp = 0.5*np.einsum('jkli,ail->ajk',v2e_oooo_a,r_aaa_u ,optimize = True)
-               s[s_aaa:f_aaa] += temp[:,ij_ind_a[0],ij_ind_a[1]].reshape(-1)
+               temp = 0.5*einsum(direct_adc, 'jkli,Zail->Zajk',v2e_oooo_a,r_aaa_u )
+               s[:,s_aaa:f_aaa] += temp[:,:,ij_ind_a[0],ij_ind_a[1]].reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('jkli,ail->ajk',v2e_oooo_b,r_bbb_u,optimize = True)
-               s[s_bbb:f_bbb] += temp[:,ij_ind_b[0],ij_ind_b[1]].reshape(-1)
+               temp = 0.5*einsum(direct_adc, 'jkli,Zail->Zajk',v2e_oooo_b,r_bbb_u)
+               s[:,s_bbb:f_bbb] += temp[:,:,ij_ind_b[0],ij_ind_b[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] -= 0.5*np.einsum('kjil,ali->ajk',v2e_oooo_ab,r_bab,optimize = True).reshape(-1)
-               s[s_bab:f_bab] -= 0.5*np.einsum('kjli,ail->ajk',v2e_oooo_ab,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'kjil,Zali->Zajk',v2e_oooo_ab,r_bab).reshape(nvec,-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'kjli,Zail->Zajk',v2e_oooo_ab,r_bab).reshape(nvec,-1)
 
-               s[s_aba:f_aba] -= 0.5*np.einsum('jkli,ali->ajk',v2e_oooo_ab,r_aba,optimize = True).reshape(-1)
-               s[s_aba:f_aba] -= 0.5*np.einsum('jkil,ail->ajk',v2e_oooo_ab,r_aba,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'jkli,Zali->Zajk',v2e_oooo_ab,r_aba).reshape(nvec,-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'jkil,Zail->Zajk',v2e_oooo_ab,r_aba).reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('bkal,bjl->ajk',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp += 0.5* np.einsum('kbal,blj->ajk',v2e_ovvo_ab,r_bab,optimize = True)
+               temp = 0.5*einsum(direct_adc, 'bkal,Zbjl->Zajk',v2e_vovo_a,r_aaa_u)
+               temp += 0.5* einsum(direct_adc, 'kbal,Zblj->Zajk',v2e_ovvo_ab,r_bab)
 
-               s[s_aaa:f_aaa] += temp[:,ij_ind_a[0],ij_ind_a[1]].reshape(-1)
+               s[:,s_aaa:f_aaa] += temp[:,:,ij_ind_a[0],ij_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] += 0.5*np.einsum('kbla,bjl->ajk',v2e_ovov_ab,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] += 0.5*einsum(direct_adc, 'kbla,Zbjl->Zajk',v2e_ovov_ab,r_bab).reshape(nvec,-1)
 
-               temp_1 = 0.5*np.einsum('bkal,bjl->ajk',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp_1 += 0.5*np.einsum('bkla,blj->ajk',v2e_voov_ab,r_aba,optimize = True)
+               temp_1 = 0.5*einsum(direct_adc, 'bkal,Zbjl->Zajk',v2e_vovo_b,r_bbb_u)
+               temp_1 += 0.5*einsum(direct_adc, 'bkla,Zblj->Zajk',v2e_voov_ab,r_aba)
 
-               s[s_bbb:f_bbb] += temp_1[:,ij_ind_b[0],ij_ind_b[1]].reshape(-1)
+               s[:,s_bbb:f_bbb] += temp_1[:,:,ij_ind_b[0],ij_ind_b[1]].reshape(nvec,-1)
 
-               s[s_aba:f_aba] += 0.5*np.einsum('bkal,bjl->ajk',v2e_vovo_ab,r_aba,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] += 0.5*einsum(direct_adc, 'bkal,Zbjl->Zajk',v2e_vovo_ab,r_aba).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('bjal,bkl->ajk',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp -= 0.5*np.einsum('jbal,blk->ajk',v2e_ovvo_ab,r_bab,optimize = True)
+               temp = -0.5*einsum(direct_adc, 'bjal,Zbkl->Zajk',v2e_vovo_a,r_aaa_u)
+               temp -= 0.5*einsum(direct_adc, 'jbal,Zblk->Zajk',v2e_ovvo_ab,r_bab)
 
-               s[s_aaa:f_aaa] += temp[:,ij_ind_a[0],ij_ind_a[1]].reshape(-1)
+               s[:,s_aaa:f_aaa] += temp[:,:,ij_ind_a[0],ij_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] +=  0.5*np.einsum('bjla,bkl->ajk',v2e_voov_ab,r_aaa_u,optimize = True).reshape(-1)
-               s[s_bab:f_bab] +=  0.5*np.einsum('bjal,blk->ajk',v2e_vovo_b,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] +=  0.5*einsum(direct_adc, 'bjla,Zbkl->Zajk',v2e_voov_ab,r_aaa_u).reshape(nvec,-1)
+               s[:,s_bab:f_bab] +=  0.5*einsum(direct_adc, 'bjal,Zblk->Zajk',v2e_vovo_b,r_bab).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('bjal,bkl->ajk',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp -= 0.5*np.einsum('bjla,blk->ajk',v2e_voov_ab,r_aba,optimize = True)
+               temp = -0.5*einsum(direct_adc, 'bjal,Zbkl->Zajk',v2e_vovo_b,r_bbb_u)
+               temp -= 0.5*einsum(direct_adc, 'bjla,Zblk->Zajk',v2e_voov_ab,r_aba)
 
-               s[s_bbb:f_bbb] += temp[:,ij_ind_b[0],ij_ind_b[1]].reshape(-1)
+               s[:,s_bbb:f_bbb] += temp[:,:,ij_ind_b[0],ij_ind_b[1]].reshape(nvec,-1)
 
-               s[s_aba:f_aba] += 0.5*np.einsum('bjal,blk->ajk',v2e_vovo_a,r_aba,optimize = True).reshape(-1)
-               s[s_aba:f_aba] += 0.5*np.einsum('jbal,bkl->ajk',v2e_ovvo_ab,r_bbb_u,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] += 0.5*einsum(direct_adc, 'bjal,Zblk->Zajk',v2e_vovo_a,r_aba).reshape(nvec,-1)
+               s[:,s_aba:f_aba] += 0.5*einsum(direct_adc, 'jbal,Zbkl->Zajk',v2e_ovvo_ab,r_bbb_u).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('bkai,bij->ajk',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp += 0.5*np.einsum('kbai,bij->ajk',v2e_ovvo_ab,r_bab,optimize = True)
+               temp = -0.5*einsum(direct_adc, 'bkai,Zbij->Zajk',v2e_vovo_a,r_aaa_u)
+               temp += 0.5*einsum(direct_adc, 'kbai,Zbij->Zajk',v2e_ovvo_ab,r_bab)
 
-               s[s_aaa:f_aaa] += temp[:,ij_ind_a[0],ij_ind_a[1]].reshape(-1)
+               s[:,s_aaa:f_aaa] += temp[:,:,ij_ind_a[0],ij_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] += 0.5*np.einsum('kbia,bji->ajk',v2e_ovov_ab,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] += 0.5*einsum(direct_adc, 'kbia,Zbji->Zajk',v2e_ovov_ab,r_bab).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('bkai,bij->ajk',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp += 0.5*np.einsum('bkia,bij->ajk',v2e_voov_ab,r_aba,optimize = True)
+               temp = -0.5*einsum(direct_adc, 'bkai,Zbij->Zajk',v2e_vovo_b,r_bbb_u)
+               temp += 0.5*einsum(direct_adc, 'bkia,Zbij->Zajk',v2e_voov_ab,r_aba)
 
-               s[s_bbb:f_bbb] += temp[:,ij_ind_b[0],ij_ind_b[1]].reshape(-1)
+               s[:,s_bbb:f_bbb] += temp[:,:,ij_ind_b[0],ij_ind_b[1]].reshape(nvec,-1)
 
-               s[s_aba:f_aba] += 0.5*np.einsum('bkai,bji->ajk',v2e_vovo_ab,r_aba,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] += 0.5*einsum(direct_adc, 'bkai,Zbji->Zajk',v2e_vovo_ab,r_aba).reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('bjai,bik->ajk',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp -= 0.5*np.einsum('jbai,bik->ajk',v2e_ovvo_ab,r_bab,optimize = True)
+               temp = 0.5*einsum(direct_adc, 'bjai,Zbik->Zajk',v2e_vovo_a,r_aaa_u)
+               temp -= 0.5*einsum(direct_adc, 'jbai,Zbik->Zajk',v2e_ovvo_ab,r_bab)
 
-               s[s_aaa:f_aaa] += temp[:,ij_ind_a[0],ij_ind_a[1]].reshape(-1)
+               s[:,s_aaa:f_aaa] += temp[:,:,ij_ind_a[0],ij_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] += 0.5*np.einsum('bjai,bik->ajk',v2e_vovo_b,r_bab,optimize = True).reshape(-1)
-               s[s_bab:f_bab] -= 0.5*np.einsum('bjia,bik->ajk',v2e_voov_ab,r_aaa_u,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] += 0.5*einsum(direct_adc, 'bjai,Zbik->Zajk',v2e_vovo_b,r_bab).reshape(nvec,-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'bjia,Zbik->Zajk',v2e_voov_ab,r_aaa_u).reshape(nvec,-1)
 
-               s[s_aba:f_aba] += 0.5*np.einsum('bjai,bik->ajk',v2e_vovo_a,r_aba,optimize = True).reshape(-1)
-               s[s_aba:f_aba] -= 0.5*np.einsum('jbai,bik->ajk',v2e_ovvo_ab,r_bbb_u,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] += 0.5*einsum(direct_adc, 'bjai,Zbik->Zajk',v2e_vovo_a,r_aba).reshape(nvec,-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'jbai,Zbik->Zajk',v2e_ovvo_ab,r_bbb_u).reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('bjai,bik->ajk',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp -= 0.5*np.einsum('bjia,bik->ajk',v2e_voov_ab,r_aba,optimize = True)
+               temp = 0.5*einsum(direct_adc, 'bjai,Zbik->Zajk',v2e_vovo_b,r_bbb_u)
+               temp -= 0.5*einsum(direct_adc, 'bjia,Zbik->Zajk',v2e_voov_ab,r_aba)
 
-               s[s_bbb:f_bbb] += temp[:,ij_ind_b[0],ij_ind_b[1]].reshape(-1)
+               s[:,s_bbb:f_bbb] += temp[:,:,ij_ind_b[0],ij_ind_b[1]].reshape(nvec,-1)
 
         if (method == "adc(3)"):
 
@@ -1694,123 +2259,139 @@ def define_H_ip(direct_adc,t_amp):
                #r_aaa = r_aaa.reshape(nvir_a,-1)
                #s[s_a:f_a] += 0.5*np.einsum('pai,ap->i',temp, r_aaa, optimize=True)
 
-               r_aaa = r_aaa.reshape(nvir_a,-1)
+               v2e_terms = {}
+
+               r_aaa = r_aaa.reshape(nvec,nvir_a,-1)
                t2_1_a_t = t2_1_a[ij_ind_a[0],ij_ind_a[1],:,:].copy()
-               temp = np.einsum('pbc,ap->abc',t2_1_a_t,r_aaa, optimize=True)
-               s[s_a:f_a] += 0.5*np.einsum('abc,bcai->i',temp, v2e_vvvo_a, optimize=True)
+               temp = einsum(direct_adc, 'pbc,Zap->Zabc',t2_1_a_t,r_aaa)
+               v2e_terms["i_aaa"] = ('Zabc,bcai->Zi',temp, v2e_vvvo_a)
 
-               temp_1 = np.einsum('kjcb,ajk->abc',t2_1_ab,r_bab, optimize=True)
-               s[s_a:f_a] += np.einsum('abc,cbia->i',temp_1, v2e_vvov_ab, optimize=True)
+               temp_1 = einsum(direct_adc, 'kjcb,Zajk->Zabc',t2_1_ab,r_bab)
+               v2e_terms["i_bab"] = ('Zabc,cbia->Zi',temp_1, v2e_vvov_ab)
 
                #t2_1_b_t = t2_1_b[ij_ind_b[0],ij_ind_b[1],:,:]
                #temp = np.einsum('pbc,bcai->pai',t2_1_b_t,v2e_vvvo_b)
                #r_bbb = r_bbb.reshape(nvir_b,-1)
                #s[s_b:f_b] += 0.5*np.einsum('pai,ap->i',temp, r_bbb, optimize=True)
 
-               r_bbb = r_bbb.reshape(nvir_b,-1)
+               r_bbb = r_bbb.reshape(nvec,nvir_b,-1)
                t2_1_b_t = t2_1_b[ij_ind_b[0],ij_ind_b[1],:,:].copy()
-               temp = np.einsum('pbc,ap->abc',t2_1_b_t,r_bbb, optimize=True)
-               s[s_b:f_b] += 0.5*np.einsum('abc,bcai->i',temp, v2e_vvvo_b, optimize=True)
+               temp = einsum(direct_adc, 'pbc,Zap->Zabc',t2_1_b_t,r_bbb)
+               v2e_terms["i_bbb"] = ('Zabc,bcai->Zi',temp, v2e_vvvo_b)
 
-               temp_1 = np.einsum('jkbc,ajk->abc',t2_1_ab,r_aba, optimize=True)
-               s[s_b:f_b] += np.einsum('abc,bcai->i',temp_1, v2e_vvvo_ab, optimize=True)
+               temp_1 = einsum(direct_adc, 'jkbc,Zajk->Zabc',t2_1_ab,r_aba)
+               v2e_terms["i_aba"] = ('Zabc,bcai->Zi',temp_1, v2e_vvvo_ab)
+
+               # Terms of the ajk - i block below, so that vvvo and vvov
+               # are read once per call
+               v2e_terms["bca_a"] = ('Zi,bcai->Zbca',r_a,v2e_vvvo_a)
+               v2e_terms["cba_a"] = ('Zi,cbia->Zcba',r_a,v2e_vvov_ab)
+               v2e_terms["bca_b"] = ('Zi,bcai->Zbca',r_b,v2e_vvvo_b)
+               v2e_terms["bca_ab"] = ('Zi,bcai->Zbca',r_b,v2e_vvvo_ab)
+
+               v2e_terms = block_einsums(direct_adc, v2e_terms)
+
+               s[:,s_a:f_a] += 0.5*v2e_terms["i_aaa"]
+               s[:,s_a:f_a] += v2e_terms["i_bab"]
+               s[:,s_b:f_b] += 0.5*v2e_terms["i_bbb"]
+               s[:,s_b:f_b] += v2e_terms["i_aba"]
 
                if direct_adc.algorithm == "GF":
-                   r_aaa_u = np.zeros((nvir_a,nocc_a,nocc_a),dtype=complex)
+                   r_aaa_u = np.zeros((nvec,nvir_a,nocc_a,nocc_a),dtype=complex)
                else:
-                   r_aaa_u = np.zeros((nvir_a,nocc_a,nocc_a))
-               r_aaa_u[:,ij_ind_a[0],ij_ind_a[1]]= r_aaa.copy()
-               r_aaa_u[:,ij_ind_a[1],ij_ind_a[0]]= -r_aaa.copy()
+                   r_aaa_u = np.zeros((nvec,nvir_a,nocc_a,nocc_a))
+               r_aaa_u[:,:,ij_ind_a[0],ij_ind_a[1]]= r_aaa.copy()
+               r_aaa_u[:,:,ij_ind_a[1],ij_ind_a[0]]= -r_aaa.copy()
 
                if direct_adc.algorithm == "GF":
-                   r_bbb_u = np.zeros((nvir_b,nocc_b,nocc_b),dtype=complex)
+                   r_bbb_u = np.zeros((nvec,nvir_b,nocc_b,nocc_b),dtype=complex)
                else:
-                   r_bbb_u = np.zeros((nvir_b,nocc_b,nocc_b))
-               r_bbb_u[:,ij_ind_b[0],ij_ind_b[1]]= r_bbb.copy()
-               r_bbb_u[:,ij_ind_b[1],ij_ind_b[0]]= -r_bbb.copy()
+                   r_bbb_u = np.zeros((nvec,nvir_b,nocc_b,nocc_b))
+               r_bbb_u[:,:,ij_ind_b[0],ij_ind_b[1]]= r_bbb.copy()
+               r_bbb_u[:,:,ij_ind_b[1],ij_ind_b[0]]= -r_bbb.copy()
 
-               r_bab = r_bab.reshape(nvir_b,nocc_b,nocc_a)
-               r_aba = r_aba.reshape(nvir_a,nocc_a,nocc_b)
+               r_bab = r_bab.reshape(nvec,nvir_b,nocc_b,nocc_a)
+               r_aba = r_aba.reshape(nvec,nvir_a,nocc_a,nocc_b)
 
                if direct_adc.algorithm == "GF":
                    temp = np.zeros_like(r_bab,dtype=complex)
                else:
                    temp = np.zeros_like(r_bab)
-               temp = np.einsum('jlab,ajk->blk',t2_1_a,r_aaa_u,optimize=True)
-               temp += np.einsum('ljba,ajk->blk',t2_1_ab,r_bab,optimize=True)
+               temp = einsum(direct_adc, 'jlab,Zajk->Zblk',t2_1_a,r_aaa_u)
+               temp += einsum(direct_adc, 'ljba,Zajk->Zblk',t2_1_ab,r_bab)
 
                if direct_adc.algorithm == "GF":
                    temp_1 = np.zeros_like(r_bab,dtype=complex)
                else:
                    temp_1 = np.zeros_like(r_bab)
-               temp_1 = np.einsum('jlab,ajk->blk',t2_1_ab,r_aaa_u,optimize=True)
-               temp_1 += np.einsum('jlab,ajk->blk',t2_1_b,r_bab,optimize=True)
+               temp_1 = einsum(direct_adc, 'jlab,Zajk->Zblk',t2_1_ab,r_aaa_u)
+               temp_1 += einsum(direct_adc, 'jlab,Zajk->Zblk',t2_1_b,r_bab)
 
-               temp_2 = np.einsum('jlba,akj->blk',t2_1_ab,r_bab, optimize=True)
+               temp_2 = einsum(direct_adc, 'jlba,Zakj->Zblk',t2_1_ab,r_bab)
 
-               s[s_a:f_a] += 0.5*np.einsum('blk,ilkb->i',temp,v2e_ooov_a,optimize=True)
-               s[s_a:f_a] += 0.5*np.einsum('blk,ilkb->i',temp_1,v2e_ooov_ab,optimize=True)
-               s[s_a:f_a] -= 0.5*np.einsum('blk,ilbk->i',temp_2,v2e_oovo_ab,optimize=True)
+               s[:,s_a:f_a] += 0.5*einsum(direct_adc, 'Zblk,ilkb->Zi',temp,v2e_ooov_a)
+               s[:,s_a:f_a] += 0.5*einsum(direct_adc, 'Zblk,ilkb->Zi',temp_1,v2e_ooov_ab)
+               s[:,s_a:f_a] -= 0.5*einsum(direct_adc, 'Zblk,ilbk->Zi',temp_2,v2e_oovo_ab)
 
                if direct_adc.algorithm == "GF":
                    temp = np.zeros_like(r_aba,dtype=complex)
                else:
                    temp = np.zeros_like(r_aba)
-               temp = np.einsum('jlab,ajk->blk',t2_1_b,r_bbb_u,optimize=True)
-               temp += np.einsum('jlab,ajk->blk',t2_1_ab,r_aba,optimize=True)
+               temp = einsum(direct_adc, 'jlab,Zajk->Zblk',t2_1_b,r_bbb_u)
+               temp += einsum(direct_adc, 'jlab,Zajk->Zblk',t2_1_ab,r_aba)
 
                if direct_adc.algorithm == "GF":
                    temp_1 = np.zeros_like(r_aba,dtype=complex)
                else:
                    temp_1 = np.zeros_like(r_aba)
-               temp_1 = np.einsum('ljba,ajk->blk',t2_1_ab,r_bbb_u,optimize=True)
-               temp_1 += np.einsum('jlab,ajk->blk',t2_1_a,r_aba,optimize=True)
+               temp_1 = einsum(direct_adc, 'ljba,Zajk->Zblk',t2_1_ab,r_bbb_u)
+               temp_1 += einsum(direct_adc, 'jlab,Zajk->Zblk',t2_1_a,r_aba)
 
-               temp_2 = np.einsum('ljab,akj->blk',t2_1_ab,r_aba,optimize=True)
+               temp_2 = einsum(direct_adc, 'ljab,Zakj->Zblk',t2_1_ab,r_aba)
 
-               s[s_b:f_b] += 0.5*np.einsum('blk,ilkb->i',temp,v2e_ooov_b,optimize=True)
-               s[s_b:f_b] += 0.5*np.einsum('blk,libk->i',temp_1,v2e_oovo_ab,optimize=True)
-               s[s_b:f_b] -= 0.5*np.einsum('blk,likb->i',temp_2,v2e_ooov_ab,optimize=True)
+               s[:,s_b:f_b] += 0.5*einsum(direct_adc, 'Zblk,ilkb->Zi',temp,v2e_ooov_b)
+               s[:,s_b:f_b] += 0.5*einsum(direct_adc, 'Zblk,libk->Zi',temp_1,v2e_oovo_ab)
+               s[:,s_b:f_b] -= 0.5*einsum(direct_adc, 'Zblk,likb->Zi',temp_2,v2e_ooov_ab)
 
                if direct_adc.algorithm == "GF":
                    temp = np.zeros_like(r_bab,dtype=complex)
                else:
                    temp = np.zeros_like(r_bab)
-               temp = -np.einsum('klab,akj->blj',t2_1_a,r_aaa_u,optimize=True)
-               temp -= np.einsum('lkba,akj->blj',t2_1_ab,r_bab,optimize=True)
+               temp = -einsum(direct_adc, 'klab,Zakj->Zblj',t2_1_a,r_aaa_u)
+               temp -= einsum(direct_adc, 'lkba,Zakj->Zblj',t2_1_ab,r_bab)
 
                if direct_adc.algorithm == "GF":
                    temp_1 = np.zeros_like(r_bab,dtype=complex)
                else:
                    temp_1 = np.zeros_like(r_bab)
-               temp_1 = -np.einsum('klab,akj->blj',t2_1_ab,r_aaa_u,optimize=True)
-               temp_1 -= np.einsum('klab,akj->blj',t2_1_b,r_bab,optimize=True)
+               temp_1 = -einsum(direct_adc, 'klab,Zakj->Zblj',t2_1_ab,r_aaa_u)
+               temp_1 -= einsum(direct_adc, 'klab,Zakj->Zblj',t2_1_b,r_bab)
 
-               temp_2 = -np.einsum('klba,ajk->blj',t2_1_ab,r_bab,optimize=True)
+               temp_2 = -einsum(direct_adc, 'klba,Zajk->Zblj',t2_1_ab,r_bab)
 
-               s[s_a:f_a] -= 0.5*np.einsum('blj,iljb->i',temp,v2e_ooov_a,optimize=True)
-               s[s_a:f_a] -= 0.5*np.einsum('blj,iljb->i',temp_1,v2e_ooov_ab,optimize=True)
-               s[s_a:f_a] += 0.5*np.einsum('blj,ilbj->i',temp_2,v2e_oovo_ab,optimize=True)
+               s[:,s_a:f_a] -= 0.5*einsum(direct_adc, 'Zblj,iljb->Zi',temp,v2e_ooov_a)
+               s[:,s_a:f_a] -= 0.5*einsum(direct_adc, 'Zblj,iljb->Zi',temp_1,v2e_ooov_ab)
+               s[:,s_a:f_a] += 0.5*einsum(direct_adc, 'Zblj,ilbj->Zi',temp_2,v2e_oovo_ab)
 
                if direct_adc.algorithm == "GF":
                    temp = np.zeros_like(r_aba,dtype=complex)
                else:
                    temp = np.zeros_like(r_aba)
-               temp = -np.einsum('klab,akj->blj',t2_1_b,r_bbb_u,optimize=True)
-               temp -= np.einsum('klab,akj->blj',t2_1_ab,r_aba,optimize=True)
+               temp = -einsum(direct_adc, 'klab,Zakj->Zblj',t2_1_b,r_bbb_u)
+               temp -= einsum(direct_adc, 'klab,Zakj->Zblj',t2_1_ab,r_aba)
 
                if direct_adc.algorithm == "GF":
                    temp_1 = np.zeros_like(r_bab,dtype=complex)
                else:
                    temp_1 = np.zeros_like(r_bab)
-               temp_1 = -np.einsum('lkba,akj->blj',t2_1_ab,r_bbb_u,optimize=True)
-               temp_1 -= np.einsum('klab,akj->blj',t2_1_a,r_aba,optimize=True)
+               temp_1 = -einsum(direct_adc, 'lkba,Zakj->Zblj',t2_1_ab,r_bbb_u)
+               temp_1 -= einsum(direct_adc, 'klab,Zakj->Zblj',t2_1_a,r_aba)
 
-               temp_2 = -np.einsum('lkab,ajk->blj',t2_1_ab,r_aba,optimize=True)
+               temp_2 = -einsum(direct_adc, 'lkab,Zajk->Zblj',t2_1_ab,r_aba)
 
-               s[s_b:f_b] -= 0.5*np.einsum('blj,iljb->i',temp,v2e_ooov_b,optimize=True)
-               s[s_b:f_b] -= 0.5*np.einsum('blj,libj->i',temp_1,v2e_oovo_ab,optimize=True)
-               s[s_b:f_b] += 0.5*np.einsum('blj,lijb->i',temp_2,v2e_ooov_ab,optimize=True)
+               s[:,s_b:f_b] -= 0.5*einsum(direct_adc, 'Zblj,iljb->Zi',temp,v2e_ooov_b)
+               s[:,s_b:f_b] -= 0.5*einsum(direct_adc, 'Zblj,libj->Zi',temp_1,v2e_oovo_ab)
+               s[:,s_b:f_b] += 0.5*einsum(direct_adc, 'Zblj,lijb->Zi',temp_2,v2e_ooov_ab)
 
 ################ ADC(3) ajk - i block ############################
                #t2_1_a_t = t2_1_a[ij_ind_a[0],ij_ind_a[1],:,:]
@@ -1818,88 +2399,94 @@ def define_H_ip(direct_adc,t_amp):
                #s[s_aaa:f_aaa] += np.einsum('api,i->ap',temp, r_a, optimize=True).reshape(-1)
 
                t2_1_a_t = t2_1_a[ij_ind_a[0],ij_ind_a[1],:,:].copy()
-               temp = np.einsum('i,bcai->bca',r_a,v2e_vvvo_a,optimize=True)
-               s[s_aaa:f_aaa] += 0.5*np.einsum('bca,pbc->ap',temp,t2_1_a_t,optimize=True).reshape(-1)
+               temp = v2e_terms["bca_a"]
+               s[:,s_aaa:f_aaa] += 0.5*einsum(direct_adc, 'Zbca,pbc->Zap',temp,t2_1_a_t).reshape(nvec,-1)
 
                #temp_1 = np.einsum('kjcb,cbia->iajk',t2_1_ab,v2e_vvov_ab)
                #temp_1 = temp_1.reshape(nocc_a,-1)
                #s[s_bab:f_bab] += np.einsum('ip,i->p',temp_1, r_a, optimize=True).reshape(-1)
 
-               temp_1 = np.einsum('i,cbia->cba',r_a,v2e_vvov_ab,optimize=True)
-               s[s_bab:f_bab] += np.einsum('cba,kjcb->ajk',temp_1, t2_1_ab, optimize=True).reshape(-1)
+               temp_1 = v2e_terms["cba_a"]
+               s[:,s_bab:f_bab] += einsum(direct_adc, 'Zcba,kjcb->Zajk',temp_1, t2_1_ab).reshape(nvec,-1)
 
                #t2_1_b_t = t2_1_b[ij_ind_b[0],ij_ind_b[1],:,:]
                #temp = 0.5*np.einsum('pbc,bcai->api',t2_1_b_t,v2e_vvvo_b)
                #s[s_bbb:f_bbb] += np.einsum('api,i->ap',temp, r_b, optimize=True).reshape(-1)
 
                t2_1_b_t = t2_1_b[ij_ind_b[0],ij_ind_b[1],:,:].copy()
-               temp = np.einsum('i,bcai->bca',r_b,v2e_vvvo_b,optimize=True)
-               s[s_bbb:f_bbb] += 0.5*np.einsum('bca,pbc->ap',temp,t2_1_b_t,optimize=True).reshape(-1)
+               temp = v2e_terms["bca_b"]
+               s[:,s_bbb:f_bbb] += 0.5*einsum(direct_adc, 'Zbca,pbc->Zap',temp,t2_1_b_t).reshape(nvec,-1)
 
                #temp_1 = np.einsum('jkbc,bcai->iajk',t2_1_ab,v2e_vvvo_ab)
                #temp_1 = temp_1.reshape(nocc_b,-1)
                #s[s_aba:f_aba] += np.einsum('ip,i->p',temp_1, r_b, optimize=True).reshape(-1)
 
-               temp_1 = np.einsum('i,bcai->bca',r_b,v2e_vvvo_ab,optimize=True)
-               s[s_aba:f_aba] += np.einsum('bca,jkbc->ajk',temp_1, t2_1_ab, optimize=True).reshape(-1)
+               temp_1 = v2e_terms["bca_ab"]
+               s[:,s_aba:f_aba] += einsum(direct_adc, 'Zbca,jkbc->Zajk',temp_1, t2_1_ab).reshape(nvec,-1)
 
-               temp_1 = np.einsum('i,kbil->kbl',r_a, v2e_ovoo_a)
-               temp_2 = np.einsum('i,kbil->kbl',r_a, v2e_ovoo_ab)
+               temp_1 = einsum(direct_adc, 'Zi,kbil->Zkbl',r_a, v2e_ovoo_a)
+               temp_2 = einsum(direct_adc, 'Zi,kbil->Zkbl',r_a, v2e_ovoo_ab)
 
-               temp  = np.einsum('kbl,jlab->ajk',temp_1,t2_1_a,optimize=True)
-               temp += np.einsum('kbl,jlab->ajk',temp_2,t2_1_ab,optimize=True)
-               s[s_aaa:f_aaa] += temp[:,ij_ind_a[0],ij_ind_a[1] ].reshape(-1)
+               temp  = einsum(direct_adc, 'Zkbl,jlab->Zajk',temp_1,t2_1_a)
+               temp += einsum(direct_adc, 'Zkbl,jlab->Zajk',temp_2,t2_1_ab)
+               s[:,s_aaa:f_aaa] += temp[:,:,ij_ind_a[0],ij_ind_a[1] ].reshape(nvec,-1)
 
-               temp_1  = np.einsum('i,kbil->kbl',r_a,v2e_ovoo_a)
-               temp_2  = np.einsum('i,kbil->kbl',r_a,v2e_ovoo_ab)
+               temp_1  = einsum(direct_adc, 'Zi,kbil->Zkbl',r_a,v2e_ovoo_a)
+               temp_2  = einsum(direct_adc, 'Zi,kbil->Zkbl',r_a,v2e_ovoo_ab)
 
-               temp  = np.einsum('kbl,ljba->ajk',temp_1,t2_1_ab,optimize=True)
-               temp += np.einsum('kbl,jlab->ajk',temp_2,t2_1_b,optimize=True)
-               s[s_bab:f_bab] += temp.reshape(-1)
+               temp  = einsum(direct_adc, 'Zkbl,ljba->Zajk',temp_1,t2_1_ab)
+               temp += einsum(direct_adc, 'Zkbl,jlab->Zajk',temp_2,t2_1_b)
+               s[:,s_bab:f_bab] += temp.reshape(nvec,-1)
 
-               temp_1 = np.einsum('i,kbil->kbl',r_b, v2e_ovoo_b)
-               temp_2 = np.einsum('i,bkli->kbl',r_b, v2e_vooo_ab)
+               temp_1 = einsum(direct_adc, 'Zi,kbil->Zkbl',r_b, v2e_ovoo_b)
+               temp_2 = einsum(direct_adc, 'Zi,bkli->Zkbl',r_b, v2e_vooo_ab)
 
-               temp  = np.einsum('kbl,jlab->ajk',temp_1,t2_1_b,optimize=True)
-               temp += np.einsum('kbl,ljba->ajk',temp_2,t2_1_ab,optimize=True)
-               s[s_bbb:f_bbb] += temp[:,ij_ind_b[0],ij_ind_b[1] ].reshape(-1)
+               temp  = einsum(direct_adc, 'Zkbl,jlab->Zajk',temp_1,t2_1_b)
+               temp += einsum(direct_adc, 'Zkbl,ljba->Zajk',temp_2,t2_1_ab)
+               s[:,s_bbb:f_bbb] += temp[:,:,ij_ind_b[0],ij_ind_b[1] ].reshape(nvec,-1)
 
-               temp_1  = np.einsum('i,kbil->kbl',r_b,v2e_ovoo_b)
-               temp_2  = np.einsum('i,bkli->kbl',r_b,v2e_vooo_ab)
+               temp_1  = einsum(direct_adc, 'Zi,kbil->Zkbl',r_b,v2e_ovoo_b)
+               temp_2  = einsum(direct_adc, 'Zi,bkli->Zkbl',r_b,v2e_vooo_ab)
 
-               temp  = np.einsum('kbl,jlab->ajk',temp_1,t2_1_ab,optimize=True)
-               temp += np.einsum('kbl,jlab->ajk',temp_2,t2_1_a,optimize=True)
-               s[s_aba:f_aba] += temp.reshape(-1)
+               temp  = einsum(direct_adc, 'Zkbl,jlab->Zajk',temp_1,t2_1_ab)
+               temp += einsum(direct_adc, 'Zkbl,jlab->Zajk',temp_2,t2_1_a)
+               s[:,s_aba:f_aba] += temp.reshape(nvec,-1)
 
-               temp_1 = np.einsum('i,jbil->jbl',r_a, v2e_ovoo_a)
-               temp_2 = np.einsum('i,jbil->jbl',r_a, v2e_ovoo_ab)
+               temp_1 = einsum(direct_adc, 'Zi,jbil->Zjbl',r_a, v2e_ovoo_a)
+               temp_2 = einsum(direct_adc, 'Zi,jbil->Zjbl',r_a, v2e_ovoo_ab)
 
-               temp  = np.einsum('jbl,klab->ajk',temp_1,t2_1_a,optimize=True)
-               temp += np.einsum('jbl,klab->ajk',temp_2,t2_1_ab,optimize=True)
-               s[s_aaa:f_aaa] -= temp[:,ij_ind_a[0],ij_ind_a[1] ].reshape(-1)
+               temp  = einsum(direct_adc, 'Zjbl,klab->Zajk',temp_1,t2_1_a)
+               temp += einsum(direct_adc, 'Zjbl,klab->Zajk',temp_2,t2_1_ab)
+               s[:,s_aaa:f_aaa] -= temp[:,:,ij_ind_a[0],ij_ind_a[1] ].reshape(nvec,-1)
 
-               temp  = -np.einsum('i,bjil->jbl',r_a,v2e_vooo_ab,optimize=True)
-               temp_1 = -np.einsum('jbl,klba->ajk',temp,t2_1_ab,optimize=True)
-               s[s_bab:f_bab] -= temp_1.reshape(-1)
+               temp  = -einsum(direct_adc, 'Zi,bjil->Zjbl',r_a,v2e_vooo_ab)
+               temp_1 = -einsum(direct_adc, 'Zjbl,klba->Zajk',temp,t2_1_ab)
+               s[:,s_bab:f_bab] -= temp_1.reshape(nvec,-1)
 
-               temp_1 = np.einsum('i,jbil->jbl',r_b, v2e_ovoo_b)
-               temp_2 = np.einsum('i,bjli->jbl',r_b, v2e_vooo_ab)
+               temp_1 = einsum(direct_adc, 'Zi,jbil->Zjbl',r_b, v2e_ovoo_b)
+               temp_2 = einsum(direct_adc, 'Zi,bjli->Zjbl',r_b, v2e_vooo_ab)
 
-               temp  = np.einsum('jbl,klab->ajk',temp_1,t2_1_b,optimize=True)
-               temp += np.einsum('jbl,lkba->ajk',temp_2,t2_1_ab,optimize=True)
-               s[s_bbb:f_bbb] -= temp[:,ij_ind_b[0],ij_ind_b[1] ].reshape(-1)
+               temp  = einsum(direct_adc, 'Zjbl,klab->Zajk',temp_1,t2_1_b)
+               temp += einsum(direct_adc, 'Zjbl,lkba->Zajk',temp_2,t2_1_ab)
+               s[:,s_bbb:f_bbb] -= temp[:,:,ij_ind_b[0],ij_ind_b[1] ].reshape(nvec,-1)
 
-               temp  = -np.einsum('i,jbli->jbl',r_b,v2e_ovoo_ab,optimize=True)
-               temp_1 = -np.einsum('jbl,lkab->ajk',temp,t2_1_ab,optimize=True)
-               s[s_aba:f_aba] -= temp_1.reshape(-1)
+               temp  = -einsum(direct_adc, 'Zi,jbli->Zjbl',r_b,v2e_ovoo_ab)
+               temp_1 = -einsum(direct_adc, 'Zjbl,lkab->Zajk',temp,t2_1_ab)
+               s[:,s_aba:f_aba] -= temp_1.reshape(nvec,-1)
+
+        direct_adc.v2e.io_stats.add_call(direct_adc.v2e.io_stats.nbytes - nbytes_read)
 
         s *= -1.0
 
         if direct_adc.algorithm == "cvs" or direct_adc.algorithm == "mom_conventional":
-            s = cvs_projector(direct_adc, s)
+            s = np.array([cvs_projector(direct_adc, x) for x in s])
 
         return s
 
+    def sigma_(r):
+
+        return apply_blocks(direct_adc, sigma_block, r)
+
     precond_ = -precond.copy()
     M_ij_a_ = -M_ij_a.copy()
     M_ij_b_ = -M_ij_b.copy()
@@ -1909,6 +2496,7 @@ def define_H_ip(direct_adc,t_amp):
 #################################################
 ##### Precompute Mab block for EA ###############
 #################################################
+@integral_stage("M_ab")
 def get_Mab(direct_adc,t_amp):
 
     method = direct_adc.method
@@ -1934,71 +2522,69 @@ def get_Mab(direct_adc,t_amp):
     idn_vir_b = np.identity(nvir_b)
 
     v2e_oovv_a,v2e_oovv_ab,v2e_oovv_b = direct_adc.v2e.oovv
-    v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
-    v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
-    v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b = direct_adc.v2e.ovoo
-    v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
-    v2e_vvoo_a,v2e_vvoo_ab,v2e_vvoo_b = direct_adc.v2e.vvoo
-    v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b = direct_adc.v2e.vvvv
-    v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
-    v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
-    v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
-    v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b = direct_adc.v2e.vvvo
-    v2e_vovv_a,v2e_vovv_ab,v2e_vovv_b = direct_adc.v2e.vovv
-    v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b = direct_adc.v2e.oovo
-    v2e_ovvv_a,v2e_ovvv_ab,v2e_ovvv_b = direct_adc.v2e.ovvv
-    v2e_vvov_a,v2e_vvov_ab,v2e_vvov_b = direct_adc.v2e.vvov
+
+    if (method == "adc(3)"):
+        v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
+        v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
+        v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b = direct_adc.v2e.vvvv
+        v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
+        v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
+        v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
+        v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b = direct_adc.v2e.vvvo
+        v2e_vovv_a,v2e_vovv_ab,v2e_vovv_b = direct_adc.v2e.vovv
+        v2e_ovvv_a,v2e_ovvv_ab,v2e_ovvv_b = direct_adc.v2e.ovvv
+        v2e_vvov_a,v2e_vvov_ab,v2e_vvov_b = direct_adc.v2e.vvov
 
     # a-b block
     # Zeroth-order terms
-    M_ab_a = np.einsum('ab,a->ab', idn_vir_a, e_vir_a)
-    M_ab_b = np.einsum('ab,a->ab', idn_vir_b, e_vir_b)
+    M_ab_a = einsum(direct_adc, 'ab,a->ab', idn_vir_a, e_vir_a)
+    M_ab_b = einsum(direct_adc, 'ab,a->ab', idn_vir_b, e_vir_b)
 
    # Second-order terms
 
-    M_ab_a +=  np.einsum('l,lmad,lmbd->ab',e_occ_a,t2_1_a, t2_1_a)
-    M_ab_a +=  np.einsum('l,lmad,lmbd->ab',e_occ_a,t2_1_ab, t2_1_ab)
-    M_ab_a +=  np.einsum('l,mlad,mlbd->ab',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ab_a +=  einsum(direct_adc, 'l,lmad,lmbd->ab',e_occ_a,t2_1_a, t2_1_a)
+    M_ab_a +=  einsum(direct_adc, 'l,lmad,lmbd->ab',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ab_a +=  einsum(direct_adc, 'l,mlad,mlbd->ab',e_occ_b,t2_1_ab, t2_1_ab)
 
-    M_ab_b +=  np.einsum('l,lmad,lmbd->ab',e_occ_b,t2_1_b, t2_1_b)
-    M_ab_b +=  np.einsum('l,mlda,mldb->ab',e_occ_b,t2_1_ab, t2_1_ab)
-    M_ab_b +=  np.einsum('l,lmda,lmdb->ab',e_occ_a,t2_1_ab, t2_1_ab)
+    M_ab_b +=  einsum(direct_adc, 'l,lmad,lmbd->ab',e_occ_b,t2_1_b, t2_1_b)
+    M_ab_b +=  einsum(direct_adc, 'l,mlda,mldb->ab',e_occ_b,t2_1_ab, t2_1_ab)
+    M_ab_b +=  einsum(direct_adc, 'l,lmda,lmdb->ab',e_occ_a,t2_1_ab, t2_1_ab)
 
-    M_ab_a -= 0.5 *  np.einsum('d,lmad,lmbd->ab',e_vir_a,t2_1_a, t2_1_a)
-    M_ab_a -= 0.5 *  np.einsum('d,lmad,lmbd->ab',e_vir_b,t2_1_ab, t2_1_ab)
-    M_ab_a -= 0.5 *  np.einsum('d,mlad,mlbd->ab',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ab_a -= 0.5 *  einsum(direct_adc, 'd,lmad,lmbd->ab',e_vir_a,t2_1_a, t2_1_a)
+    M_ab_a -= 0.5 *  einsum(direct_adc, 'd,lmad,lmbd->ab',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ab_a -= 0.5 *  einsum(direct_adc, 'd,mlad,mlbd->ab',e_vir_b,t2_1_ab, t2_1_ab)
 
-    M_ab_b -= 0.5 *  np.einsum('d,lmad,lmbd->ab',e_vir_b,t2_1_b, t2_1_b)
-    M_ab_b -= 0.5 *  np.einsum('d,mlda,mldb->ab',e_vir_a,t2_1_ab, t2_1_ab)
-    M_ab_b -= 0.5 *  np.einsum('d,lmda,lmdb->ab',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ab_b -= 0.5 *  einsum(direct_adc, 'd,lmad,lmbd->ab',e_vir_b,t2_1_b, t2_1_b)
+    M_ab_b -= 0.5 *  einsum(direct_adc, 'd,mlda,mldb->ab',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ab_b -= 0.5 *  einsum(direct_adc, 'd,lmda,lmdb->ab',e_vir_a,t2_1_ab, t2_1_ab)
 
-    M_ab_a -= 0.25 *  np.einsum('a,lmad,lmbd->ab',e_vir_a,t2_1_a, t2_1_a)
-    M_ab_a -= 0.25 *  np.einsum('a,lmad,lmbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
-    M_ab_a -= 0.25 *  np.einsum('a,mlad,mlbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ab_a -= 0.25 *  einsum(direct_adc, 'a,lmad,lmbd->ab',e_vir_a,t2_1_a, t2_1_a)
+    M_ab_a -= 0.25 *  einsum(direct_adc, 'a,lmad,lmbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ab_a -= 0.25 *  einsum(direct_adc, 'a,mlad,mlbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
 
-    M_ab_b -= 0.25 *  np.einsum('a,lmad,lmbd->ab',e_vir_b,t2_1_b, t2_1_b)
-    M_ab_b -= 0.25 *  np.einsum('a,mlda,mldb->ab',e_vir_b,t2_1_ab, t2_1_ab)
-    M_ab_b -= 0.25 *  np.einsum('a,lmda,lmdb->ab',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ab_b -= 0.25 *  einsum(direct_adc, 'a,lmad,lmbd->ab',e_vir_b,t2_1_b, t2_1_b)
+    M_ab_b -= 0.25 *  einsum(direct_adc, 'a,mlda,mldb->ab',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ab_b -= 0.25 *  einsum(direct_adc, 'a,lmda,lmdb->ab',e_vir_b,t2_1_ab, t2_1_ab)
 
-    M_ab_a -= 0.25 *  np.einsum('b,lmad,lmbd->ab',e_vir_a,t2_1_a, t2_1_a)
-    M_ab_a -= 0.25 *  np.einsum('b,lmad,lmbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
-    M_ab_a -= 0.25 *  np.einsum('b,mlad,mlbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ab_a -= 0.25 *  einsum(direct_adc, 'b,lmad,lmbd->ab',e_vir_a,t2_1_a, t2_1_a)
+    M_ab_a -= 0.25 *  einsum(direct_adc, 'b,lmad,lmbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
+    M_ab_a -= 0.25 *  einsum(direct_adc, 'b,mlad,mlbd->ab',e_vir_a,t2_1_ab, t2_1_ab)
 
-    M_ab_b -= 0.25 *  np.einsum('b,lmad,lmbd->ab',e_vir_b,t2_1_b, t2_1_b)
-    M_ab_b -= 0.25 *  np.einsum('b,mlda,mldb->ab',e_vir_b,t2_1_ab, t2_1_ab)
-    M_ab_b -= 0.25 *  np.einsum('b,lmda,lmdb->ab',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ab_b -= 0.25 *  einsum(direct_adc, 'b,lmad,lmbd->ab',e_vir_b,t2_1_b, t2_1_b)
+    M_ab_b -= 0.25 *  einsum(direct_adc, 'b,mlda,mldb->ab',e_vir_b,t2_1_ab, t2_1_ab)
+    M_ab_b -= 0.25 *  einsum(direct_adc, 'b,lmda,lmdb->ab',e_vir_b,t2_1_ab, t2_1_ab)
 
-    M_ab_a -= 0.5 *  np.einsum('lmad,lmbd->ab',t2_1_a, v2e_oovv_a)
-    M_ab_a -=        np.einsum('lmad,lmbd->ab',t2_1_ab, v2e_oovv_ab)
+    M_ab_a -= 0.5 *  einsum(direct_adc, 'lmad,lmbd->ab',t2_1_a, v2e_oovv_a)
+    M_ab_a -=        einsum(direct_adc, 'lmad,lmbd->ab',t2_1_ab, v2e_oovv_ab)
 
-    M_ab_b -= 0.5 *  np.einsum('lmad,lmbd->ab',t2_1_b, v2e_oovv_b)
-    M_ab_b -=        np.einsum('mlda,mldb->ab',t2_1_ab, v2e_oovv_ab)
+    M_ab_b -= 0.5 *  einsum(direct_adc, 'lmad,lmbd->ab',t2_1_b, v2e_oovv_b)
+    M_ab_b -=        einsum(direct_adc, 'mlda,mldb->ab',t2_1_ab, v2e_oovv_ab)
 
-    M_ab_a -= 0.5 *  np.einsum('lmbd,lmad->ab',t2_1_a, v2e_oovv_a)
-    M_ab_a -=        np.einsum('lmbd,lmad->ab',t2_1_ab, v2e_oovv_ab)
+    M_ab_a -= 0.5 *  einsum(direct_adc, 'lmbd,lmad->ab',t2_1_a, v2e_oovv_a)
+    M_ab_a -=        einsum(direct_adc, 'lmbd,lmad->ab',t2_1_ab, v2e_oovv_ab)
 
-    M_ab_b -= 0.5 *  np.einsum('lmbd,lmad->ab',t2_1_b, v2e_oovv_b)
-    M_ab_b -=        np.einsum('mldb,mlda->ab',t2_1_ab, v2e_oovv_ab)
+    M_ab_b -= 0.5 *  einsum(direct_adc, 'lmbd,lmad->ab',t2_1_b, v2e_oovv_b)
+    M_ab_b -=        einsum(direct_adc, 'mldb,mlda->ab',t2_1_ab, v2e_oovv_ab)
 
     #Third-order terms
 
@@ -2006,167 +2592,167 @@ def get_Mab(direct_adc,t_amp):
 
         t2_2_a, t2_2_ab, t2_2_b = t2_2
 
-        M_ab_a +=  np.einsum('ld,albd->ab',t1_2_a, v2e_vovv_a)
-        M_ab_a +=  np.einsum('ld,albd->ab',t1_2_b, v2e_vovv_ab)
+        M_ab_a +=  block_einsum(direct_adc, 'ld,albd->ab',t1_2_a, v2e_vovv_a)
+        M_ab_a +=  block_einsum(direct_adc, 'ld,albd->ab',t1_2_b, v2e_vovv_ab)
 
-        M_ab_b +=  np.einsum('ld,albd->ab',t1_2_b, v2e_vovv_b)
-        M_ab_b +=  np.einsum('ld,ladb->ab',t1_2_a, v2e_ovvv_ab)
+        M_ab_b +=  block_einsum(direct_adc, 'ld,albd->ab',t1_2_b, v2e_vovv_b)
+        M_ab_b +=  block_einsum(direct_adc, 'ld,ladb->ab',t1_2_a, v2e_ovvv_ab)
 
-        M_ab_a += np.einsum('ld,adbl->ab',t1_2_a, v2e_vvvo_a)
-        M_ab_a += np.einsum('ld,adbl->ab',t1_2_b, v2e_vvvo_ab)
+        M_ab_a += block_einsum(direct_adc, 'ld,adbl->ab',t1_2_a, v2e_vvvo_a)
+        M_ab_a += block_einsum(direct_adc, 'ld,adbl->ab',t1_2_b, v2e_vvvo_ab)
 
-        M_ab_b += np.einsum('ld,adbl->ab',t1_2_b, v2e_vvvo_b)
-        M_ab_b += np.einsum('ld,dalb->ab',t1_2_a, v2e_vvov_ab)
+        M_ab_b += block_einsum(direct_adc, 'ld,adbl->ab',t1_2_b, v2e_vvvo_b)
+        M_ab_b += block_einsum(direct_adc, 'ld,dalb->ab',t1_2_a, v2e_vvov_ab)
 
-        M_ab_a -=0.5* np.einsum('lmbd,lmad->ab',t2_2_a,v2e_oovv_a)
-        M_ab_a -= np.einsum('lmbd,lmad->ab',t2_2_ab,v2e_oovv_ab)
+        M_ab_a -=0.5* einsum(direct_adc, 'lmbd,lmad->ab',t2_2_a,v2e_oovv_a)
+        M_ab_a -= einsum(direct_adc, 'lmbd,lmad->ab',t2_2_ab,v2e_oovv_ab)
 
-        M_ab_b -=0.5* np.einsum('lmbd,lmad->ab',t2_2_b,v2e_oovv_b)
-        M_ab_b -= np.einsum('mldb,mlda->ab',t2_2_ab,v2e_oovv_ab)
+        M_ab_b -=0.5* einsum(direct_adc, 'lmbd,lmad->ab',t2_2_b,v2e_oovv_b)
+        M_ab_b -= einsum(direct_adc, 'mldb,mlda->ab',t2_2_ab,v2e_oovv_ab)
 
-        M_ab_a -=0.5* np.einsum('lmad,lmbd->ab',t2_2_a,v2e_oovv_a)
-        M_ab_a -= np.einsum('lmad,lmbd->ab',t2_2_ab,v2e_oovv_ab)
+        M_ab_a -=0.5* einsum(direct_adc, 'lmad,lmbd->ab',t2_2_a,v2e_oovv_a)
+        M_ab_a -= einsum(direct_adc, 'lmad,lmbd->ab',t2_2_ab,v2e_oovv_ab)
 
-        M_ab_b -=0.5* np.einsum('lmad,lmbd->ab',t2_2_b,v2e_oovv_b)
-        M_ab_b -= np.einsum('mlda,mldb->ab',t2_2_ab,v2e_oovv_ab)
+        M_ab_b -=0.5* einsum(direct_adc, 'lmad,lmbd->ab',t2_2_b,v2e_oovv_b)
+        M_ab_b -= einsum(direct_adc, 'mlda,mldb->ab',t2_2_ab,v2e_oovv_ab)
 
-        M_ab_a += np.einsum('l,lmbd,lmad->ab',e_occ_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a += np.einsum('l,lmbd,lmad->ab',e_occ_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a += np.einsum('l,mlbd,mlad->ab',e_occ_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a += einsum(direct_adc, 'l,lmbd,lmad->ab',e_occ_a, t2_1_a, t2_2_a)
+        M_ab_a += einsum(direct_adc, 'l,lmbd,lmad->ab',e_occ_a, t2_1_ab, t2_2_ab)
+        M_ab_a += einsum(direct_adc, 'l,mlbd,mlad->ab',e_occ_b, t2_1_ab, t2_2_ab)
 
-        M_ab_b += np.einsum('l,lmbd,lmad->ab',e_occ_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b += np.einsum('l,mldb,mlda->ab',e_occ_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b += np.einsum('l,lmdb,lmda->ab',e_occ_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b += einsum(direct_adc, 'l,lmbd,lmad->ab',e_occ_b, t2_1_b, t2_2_b)
+        M_ab_b += einsum(direct_adc, 'l,mldb,mlda->ab',e_occ_b, t2_1_ab, t2_2_ab)
+        M_ab_b += einsum(direct_adc, 'l,lmdb,lmda->ab',e_occ_a, t2_1_ab, t2_2_ab)
 
-        M_ab_a += np.einsum('l,lmad,lmbd->ab',e_occ_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a += np.einsum('l,lmad,lmbd->ab',e_occ_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a += np.einsum('l,mlad,mlbd->ab',e_occ_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a += einsum(direct_adc, 'l,lmad,lmbd->ab',e_occ_a, t2_1_a, t2_2_a)
+        M_ab_a += einsum(direct_adc, 'l,lmad,lmbd->ab',e_occ_a, t2_1_ab, t2_2_ab)
+        M_ab_a += einsum(direct_adc, 'l,mlad,mlbd->ab',e_occ_b, t2_1_ab, t2_2_ab)
 
-        M_ab_b += np.einsum('l,lmad,lmbd->ab',e_occ_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b += np.einsum('l,mlda,mldb->ab',e_occ_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b += np.einsum('l,lmda,lmdb->ab',e_occ_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b += einsum(direct_adc, 'l,lmad,lmbd->ab',e_occ_b, t2_1_b, t2_2_b)
+        M_ab_b += einsum(direct_adc, 'l,mlda,mldb->ab',e_occ_b, t2_1_ab, t2_2_ab)
+        M_ab_b += einsum(direct_adc, 'l,lmda,lmdb->ab',e_occ_a, t2_1_ab, t2_2_ab)
 
-        M_ab_a -= 0.5*np.einsum('d,lmbd,lmad->ab', e_vir_a, t2_1_a ,t2_2_a, optimize=True)
-        M_ab_a -= 0.5*np.einsum('d,lmbd,lmad->ab', e_vir_b, t2_1_ab ,t2_2_ab, optimize=True)
-        M_ab_a -= 0.5*np.einsum('d,mlbd,mlad->ab', e_vir_b, t2_1_ab ,t2_2_ab, optimize=True)
+        M_ab_a -= 0.5*einsum(direct_adc, 'd,lmbd,lmad->ab', e_vir_a, t2_1_a ,t2_2_a)
+        M_ab_a -= 0.5*einsum(direct_adc, 'd,lmbd,lmad->ab', e_vir_b, t2_1_ab ,t2_2_ab)
+        M_ab_a -= 0.5*einsum(direct_adc, 'd,mlbd,mlad->ab', e_vir_b, t2_1_ab ,t2_2_ab)
 
-        M_ab_b -= 0.5*np.einsum('d,lmbd,lmad->ab', e_vir_b, t2_1_b ,t2_2_b, optimize=True)
-        M_ab_b -= 0.5*np.einsum('d,mldb,mlda->ab', e_vir_a, t2_1_ab ,t2_2_ab, optimize=True)
-        M_ab_b -= 0.5*np.einsum('d,lmdb,lmda->ab', e_vir_a, t2_1_ab ,t2_2_ab, optimize=True)
+        M_ab_b -= 0.5*einsum(direct_adc, 'd,lmbd,lmad->ab', e_vir_b, t2_1_b ,t2_2_b)
+        M_ab_b -= 0.5*einsum(direct_adc, 'd,mldb,mlda->ab', e_vir_a, t2_1_ab ,t2_2_ab)
+        M_ab_b -= 0.5*einsum(direct_adc, 'd,lmdb,lmda->ab', e_vir_a, t2_1_ab ,t2_2_ab)
 
-        M_ab_a -= 0.5*np.einsum('d,lmad,lmbd->ab', e_vir_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a -= 0.5*np.einsum('d,lmad,lmbd->ab', e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a -= 0.5*np.einsum('d,mlad,mlbd->ab', e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a -= 0.5*einsum(direct_adc, 'd,lmad,lmbd->ab', e_vir_a, t2_1_a, t2_2_a)
+        M_ab_a -= 0.5*einsum(direct_adc, 'd,lmad,lmbd->ab', e_vir_b, t2_1_ab, t2_2_ab)
+        M_ab_a -= 0.5*einsum(direct_adc, 'd,mlad,mlbd->ab', e_vir_b, t2_1_ab, t2_2_ab)
 
-        M_ab_b -= 0.5*np.einsum('d,lmad,lmbd->ab', e_vir_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b -= 0.5*np.einsum('d,mlda,mldb->ab', e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b -= 0.5*np.einsum('d,lmda,lmdb->ab', e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b -= 0.5*einsum(direct_adc, 'd,lmad,lmbd->ab', e_vir_b, t2_1_b, t2_2_b)
+        M_ab_b -= 0.5*einsum(direct_adc, 'd,mlda,mldb->ab', e_vir_a, t2_1_ab, t2_2_ab)
+        M_ab_b -= 0.5*einsum(direct_adc, 'd,lmda,lmdb->ab', e_vir_a, t2_1_ab, t2_2_ab)
 
-        M_ab_a -= 0.25*np.einsum('a,lmbd,lmad->ab',e_vir_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a -= 0.25*np.einsum('a,lmbd,lmad->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a -= 0.25*np.einsum('a,mlbd,mlad->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a -= 0.25*einsum(direct_adc, 'a,lmbd,lmad->ab',e_vir_a, t2_1_a, t2_2_a)
+        M_ab_a -= 0.25*einsum(direct_adc, 'a,lmbd,lmad->ab',e_vir_a, t2_1_ab, t2_2_ab)
+        M_ab_a -= 0.25*einsum(direct_adc, 'a,mlbd,mlad->ab',e_vir_a, t2_1_ab, t2_2_ab)
 
-        M_ab_b -= 0.25*np.einsum('a,lmbd,lmad->ab',e_vir_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b -= 0.25*np.einsum('a,mldb,mlda->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b -= 0.25*np.einsum('a,lmdb,lmda->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b -= 0.25*einsum(direct_adc, 'a,lmbd,lmad->ab',e_vir_b, t2_1_b, t2_2_b)
+        M_ab_b -= 0.25*einsum(direct_adc, 'a,mldb,mlda->ab',e_vir_b, t2_1_ab, t2_2_ab)
+        M_ab_b -= 0.25*einsum(direct_adc, 'a,lmdb,lmda->ab',e_vir_b, t2_1_ab, t2_2_ab)
 
-        M_ab_a -= 0.25*np.einsum('a,lmad,lmbd->ab',e_vir_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a -= 0.25*np.einsum('a,lmad,lmbd->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a -= 0.25*np.einsum('a,mlad,mlbd->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a -= 0.25*einsum(direct_adc, 'a,lmad,lmbd->ab',e_vir_a, t2_1_a, t2_2_a)
+        M_ab_a -= 0.25*einsum(direct_adc, 'a,lmad,lmbd->ab',e_vir_a, t2_1_ab, t2_2_ab)
+        M_ab_a -= 0.25*einsum(direct_adc, 'a,mlad,mlbd->ab',e_vir_a, t2_1_ab, t2_2_ab)
 
-        M_ab_b -= 0.25*np.einsum('a,lmad,lmbd->ab',e_vir_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b -= 0.25*np.einsum('a,mlda,mldb->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b -= 0.25*np.einsum('a,lmda,lmdb->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b -= 0.25*einsum(direct_adc, 'a,lmad,lmbd->ab',e_vir_b, t2_1_b, t2_2_b)
+        M_ab_b -= 0.25*einsum(direct_adc, 'a,mlda,mldb->ab',e_vir_b, t2_1_ab, t2_2_ab)
+        M_ab_b -= 0.25*einsum(direct_adc, 'a,lmda,lmdb->ab',e_vir_b, t2_1_ab, t2_2_ab)
 
-        M_ab_a -= 0.25*np.einsum('b,lmbd,lmad->ab',e_vir_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a -= 0.25*np.einsum('b,lmbd,lmad->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a -= 0.25*np.einsum('b,mlbd,mlad->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a -= 0.25*einsum(direct_adc, 'b,lmbd,lmad->ab',e_vir_a, t2_1_a, t2_2_a)
+        M_ab_a -= 0.25*einsum(direct_adc, 'b,lmbd,lmad->ab',e_vir_a, t2_1_ab, t2_2_ab)
+        M_ab_a -= 0.25*einsum(direct_adc, 'b,mlbd,mlad->ab',e_vir_a, t2_1_ab, t2_2_ab)
 
-        M_ab_b -= 0.25*np.einsum('b,lmbd,lmad->ab',e_vir_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b -= 0.25*np.einsum('b,mldb,mlda->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b -= 0.25*np.einsum('b,lmdb,lmda->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b -= 0.25*einsum(direct_adc, 'b,lmbd,lmad->ab',e_vir_b, t2_1_b, t2_2_b)
+        M_ab_b -= 0.25*einsum(direct_adc, 'b,mldb,mlda->ab',e_vir_b, t2_1_ab, t2_2_ab)
+        M_ab_b -= 0.25*einsum(direct_adc, 'b,lmdb,lmda->ab',e_vir_b, t2_1_ab, t2_2_ab)
 
-        M_ab_a -= 0.25*np.einsum('b,lmad,lmbd->ab',e_vir_a, t2_1_a, t2_2_a, optimize=True)
-        M_ab_a -= 0.25*np.einsum('b,lmad,lmbd->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_a -= 0.25*np.einsum('b,mlad,mlbd->ab',e_vir_a, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_a -= 0.25*einsum(direct_adc, 'b,lmad,lmbd->ab',e_vir_a, t2_1_a, t2_2_a)
+        M_ab_a -= 0.25*einsum(direct_adc, 'b,lmad,lmbd->ab',e_vir_a, t2_1_ab, t2_2_ab)
+        M_ab_a -= 0.25*einsum(direct_adc, 'b,mlad,mlbd->ab',e_vir_a, t2_1_ab, t2_2_ab)
 
-        M_ab_b -= 0.25*np.einsum('b,lmad,lmbd->ab',e_vir_b, t2_1_b, t2_2_b, optimize=True)
-        M_ab_b -= 0.25*np.einsum('b,mlda,mldb->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
-        M_ab_b -= 0.25*np.einsum('b,lmda,lmdb->ab',e_vir_b, t2_1_ab, t2_2_ab, optimize=True)
+        M_ab_b -= 0.25*einsum(direct_adc, 'b,lmad,lmbd->ab',e_vir_b, t2_1_b, t2_2_b)
+        M_ab_b -= 0.25*einsum(direct_adc, 'b,mlda,mldb->ab',e_vir_b, t2_1_ab, t2_2_ab)
+        M_ab_b -= 0.25*einsum(direct_adc, 'b,lmda,lmdb->ab',e_vir_b, t2_1_ab, t2_2_ab)
 
-        M_ab_a -= np.einsum('lned,mlbd,anem->ab',t2_1_a, t2_1_a, v2e_vovo_a, optimize=True)
-        M_ab_a += np.einsum('nled,mlbd,anem->ab',t2_1_ab, t2_1_ab, v2e_vovo_a, optimize=True)
-        M_ab_a -= np.einsum('lnde,mlbd,anme->ab',t2_1_ab, t2_1_a, v2e_voov_ab, optimize=True)
-        M_ab_a += np.einsum('lned,mlbd,anme->ab',t2_1_b, t2_1_ab, v2e_voov_ab, optimize=True)
-        M_ab_a += np.einsum('lned,lmbd,anem->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab, optimize=True)
+        M_ab_a -= einsum(direct_adc, 'lned,mlbd,anem->ab',t2_1_a, t2_1_a, v2e_vovo_a)
+        M_ab_a += einsum(direct_adc, 'nled,mlbd,anem->ab',t2_1_ab, t2_1_ab, v2e_vovo_a)
+        M_ab_a -= einsum(direct_adc, 'lnde,mlbd,anme->ab',t2_1_ab, t2_1_a, v2e_voov_ab)
+        M_ab_a += einsum(direct_adc, 'lned,mlbd,anme->ab',t2_1_b, t2_1_ab, v2e_voov_ab)
+        M_ab_a += einsum(direct_adc, 'lned,lmbd,anem->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab)
 
-        M_ab_b -= np.einsum('lned,mlbd,anem->ab',t2_1_b, t2_1_b, v2e_vovo_b, optimize=True)
-        M_ab_b += np.einsum('lnde,lmdb,anem->ab',t2_1_ab, t2_1_ab, v2e_vovo_b, optimize=True)
-        M_ab_b -= np.einsum('nled,mlbd,naem->ab',t2_1_ab, t2_1_b, v2e_ovvo_ab, optimize=True)
-        M_ab_b += np.einsum('lned,lmdb,naem->ab',t2_1_a, t2_1_ab, v2e_ovvo_ab, optimize=True)
-        M_ab_b += np.einsum('nlde,mldb,name->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab, optimize=True)
+        M_ab_b -= einsum(direct_adc, 'lned,mlbd,anem->ab',t2_1_b, t2_1_b, v2e_vovo_b)
+        M_ab_b += einsum(direct_adc, 'lnde,lmdb,anem->ab',t2_1_ab, t2_1_ab, v2e_vovo_b)
+        M_ab_b -= einsum(direct_adc, 'nled,mlbd,naem->ab',t2_1_ab, t2_1_b, v2e_ovvo_ab)
+        M_ab_b += einsum(direct_adc, 'lned,lmdb,naem->ab',t2_1_a, t2_1_ab, v2e_ovvo_ab)
+        M_ab_b += einsum(direct_adc, 'nlde,mldb,name->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab)
 
-        M_ab_a -= np.einsum('mled,lnad,enbm->ab',t2_1_a, t2_1_a, v2e_vovo_a, optimize=True)
-        M_ab_a -= np.einsum('mled,nlad,nebm->ab',t2_1_b, t2_1_ab, v2e_ovvo_ab, optimize=True)
-        M_ab_a += np.einsum('mled,nlad,enbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_a, optimize=True)
-        M_ab_a += np.einsum('lmde,lnad,nebm->ab',t2_1_ab, t2_1_a, v2e_ovvo_ab, optimize=True)
-        M_ab_a += np.einsum('lmed,lnad,enbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab, optimize=True)
+        M_ab_a -= einsum(direct_adc, 'mled,lnad,enbm->ab',t2_1_a, t2_1_a, v2e_vovo_a)
+        M_ab_a -= einsum(direct_adc, 'mled,nlad,nebm->ab',t2_1_b, t2_1_ab, v2e_ovvo_ab)
+        M_ab_a += einsum(direct_adc, 'mled,nlad,enbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_a)
+        M_ab_a += einsum(direct_adc, 'lmde,lnad,nebm->ab',t2_1_ab, t2_1_a, v2e_ovvo_ab)
+        M_ab_a += einsum(direct_adc, 'lmed,lnad,enbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab)
 
-        M_ab_b -= np.einsum('mled,lnad,enbm->ab',t2_1_b, t2_1_b, v2e_vovo_b, optimize=True)
-        M_ab_b -= np.einsum('mled,lnda,enmb->ab',t2_1_a, t2_1_ab, v2e_voov_ab, optimize=True)
-        M_ab_b += np.einsum('lmde,lnda,enbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_b, optimize=True)
-        M_ab_b += np.einsum('mled,lnad,enmb->ab',t2_1_ab, t2_1_b, v2e_voov_ab, optimize=True)
-        M_ab_b += np.einsum('mlde,nlda,nemb->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab, optimize=True)
+        M_ab_b -= einsum(direct_adc, 'mled,lnad,enbm->ab',t2_1_b, t2_1_b, v2e_vovo_b)
+        M_ab_b -= einsum(direct_adc, 'mled,lnda,enmb->ab',t2_1_a, t2_1_ab, v2e_voov_ab)
+        M_ab_b += einsum(direct_adc, 'lmde,lnda,enbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_b)
+        M_ab_b += einsum(direct_adc, 'mled,lnad,enmb->ab',t2_1_ab, t2_1_b, v2e_voov_ab)
+        M_ab_b += einsum(direct_adc, 'mlde,nlda,nemb->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab)
 
-        M_ab_a -= np.einsum('mlbd,lnae,dnem->ab',t2_1_a, t2_1_a, v2e_vovo_a, optimize=True)
-        M_ab_a += np.einsum('lmbd,lnae,dnem->ab',t2_1_ab, t2_1_ab, v2e_vovo_b, optimize=True)
-        M_ab_a += np.einsum('mlbd,lnae,dnme->ab',t2_1_a, t2_1_ab, v2e_voov_ab, optimize=True)
-        M_ab_a -= np.einsum('lmbd,lnae,ndem->ab',t2_1_ab, t2_1_a, v2e_ovvo_ab, optimize=True)
-        M_ab_a += np.einsum('mlbd,nlae,ndme->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab, optimize=True)
-
-        M_ab_b -= np.einsum('mlbd,lnae,dnem->ab',t2_1_b, t2_1_b, v2e_vovo_b, optimize=True)
-        M_ab_b += np.einsum('mldb,nlea,dnem->ab',t2_1_ab, t2_1_ab, v2e_vovo_a, optimize=True)
-        M_ab_b += np.einsum('mlbd,nlea,ndem->ab',t2_1_b, t2_1_ab, v2e_ovvo_ab, optimize=True)
-        M_ab_b -= np.einsum('mldb,lnae,dnme->ab',t2_1_ab, t2_1_b, v2e_voov_ab, optimize=True)
-        M_ab_b += np.einsum('lmdb,lnea,dnem->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab, optimize=True)
-
-        M_ab_a -= 0.25*np.einsum('mlef,mlbd,adef->ab',t2_1_a, t2_1_a, v2e_vvvv_a, optimize=True)
-        M_ab_a -= np.einsum('mlef,mlbd,adef->ab',t2_1_ab, t2_1_ab, v2e_vvvv_ab, optimize=True)
-
-        M_ab_b -= 0.25*np.einsum('mlef,mlbd,adef->ab',t2_1_b, t2_1_b, v2e_vvvv_b, optimize=True)
-        M_ab_b -= np.einsum('mlef,mldb,daef->ab',t2_1_ab, t2_1_ab, v2e_vvvv_ab, optimize=True)
-
-        M_ab_a -= 0.25*np.einsum('mled,mlaf,edbf->ab',t2_1_a, t2_1_a, v2e_vvvv_a, optimize=True)
-        M_ab_a -= np.einsum('mled,mlaf,edbf->ab',t2_1_ab, t2_1_ab, v2e_vvvv_ab, optimize=True)
-
-        M_ab_b -= 0.25*np.einsum('mled,mlaf,edbf->ab',t2_1_b, t2_1_b, v2e_vvvv_b, optimize=True)
-        M_ab_b -= np.einsum('mled,mlfa,edfb->ab',t2_1_ab, t2_1_ab, v2e_vvvv_ab, optimize=True)
-
-        M_ab_a -= 0.25*np.einsum('mlbd,noad,noml->ab',t2_1_a, t2_1_a, v2e_oooo_a, optimize=True)
-        M_ab_a -= np.einsum('mlbd,noad,noml->ab',t2_1_ab, t2_1_ab, v2e_oooo_ab, optimize=True)
-
-        M_ab_b -= 0.25*np.einsum('mlbd,noad,noml->ab',t2_1_b, t2_1_b, v2e_oooo_b, optimize=True)
-        M_ab_b -= np.einsum('lmdb,onda,onlm->ab',t2_1_ab, t2_1_ab, v2e_oooo_ab, optimize=True)
-
-        M_ab_a += 0.5*np.einsum('lned,mled,anbm->ab',t2_1_a, t2_1_a, v2e_vovo_a, optimize=True)
-        M_ab_a += 0.5*np.einsum('lned,mled,anbm->ab',t2_1_b, t2_1_b, v2e_vovo_ab, optimize=True)
-        M_ab_a -= np.einsum('lned,lmed,anbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab, optimize=True)
-        M_ab_a -= np.einsum('nled,mled,anbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_a, optimize=True)
-
-        M_ab_b += 0.5*np.einsum('lned,mled,anbm->ab',t2_1_b, t2_1_b, v2e_vovo_b, optimize=True)
-        M_ab_b += 0.5*np.einsum('lned,mled,namb->ab',t2_1_a, t2_1_a, v2e_ovov_ab, optimize=True)
-        M_ab_b -= np.einsum('nled,mled,namb->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab, optimize=True)
-        M_ab_b -= np.einsum('lned,lmed,anbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_b, optimize=True)
-
-        M_ab_a -= 0.5*np.einsum('mldf,mled,aebf->ab',t2_1_a, t2_1_a, v2e_vvvv_a, optimize=True)
-        M_ab_a -= 0.5*np.einsum('mldf,mled,aebf->ab',t2_1_b, t2_1_b, v2e_vvvv_ab, optimize=True)
-        M_ab_a += np.einsum('mldf,mlde,aebf->ab',t2_1_ab, t2_1_ab, v2e_vvvv_ab, optimize=True)
-        M_ab_a += np.einsum('mlfd,mled,aebf->ab',t2_1_ab, t2_1_ab, v2e_vvvv_a, optimize=True)
-
-        M_ab_b -= 0.5*np.einsum('mldf,mled,aebf->ab',t2_1_b, t2_1_b, v2e_vvvv_b, optimize=True)
-        M_ab_b -= 0.5*np.einsum('mldf,mled,eafb->ab',t2_1_a, t2_1_a, v2e_vvvv_ab, optimize=True)
-        M_ab_b += np.einsum('mlfd,mled,eafb->ab',t2_1_ab, t2_1_ab, v2e_vvvv_ab, optimize=True)
-        M_ab_b += np.einsum('mldf,mlde,aebf->ab',t2_1_ab, t2_1_ab, v2e_vvvv_b, optimize=True)
+        M_ab_a -= einsum(direct_adc, 'mlbd,lnae,dnem->ab',t2_1_a, t2_1_a, v2e_vovo_a)
+        M_ab_a += einsum(direct_adc, 'lmbd,lnae,dnem->ab',t2_1_ab, t2_1_ab, v2e_vovo_b)
+        M_ab_a += einsum(direct_adc, 'mlbd,lnae,dnme->ab',t2_1_a, t2_1_ab, v2e_voov_ab)
+        M_ab_a -= einsum(direct_adc, 'lmbd,lnae,ndem->ab',t2_1_ab, t2_1_a, v2e_ovvo_ab)
+        M_ab_a += einsum(direct_adc, 'mlbd,nlae,ndme->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab)
+
+        M_ab_b -= einsum(direct_adc, 'mlbd,lnae,dnem->ab',t2_1_b, t2_1_b, v2e_vovo_b)
+        M_ab_b += einsum(direct_adc, 'mldb,nlea,dnem->ab',t2_1_ab, t2_1_ab, v2e_vovo_a)
+        M_ab_b += einsum(direct_adc, 'mlbd,nlea,ndem->ab',t2_1_b, t2_1_ab, v2e_ovvo_ab)
+        M_ab_b -= einsum(direct_adc, 'mldb,lnae,dnme->ab',t2_1_ab, t2_1_b, v2e_voov_ab)
+        M_ab_b += einsum(direct_adc, 'lmdb,lnea,dnem->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab)
+
+        M_ab_a -= 0.25*vvvv_einsum(direct_adc, 'mlef,mlbd,adef->ab', t2_1_a, t2_1_a, v2e_vvvv_a)
+        M_ab_a -= vvvv_einsum(direct_adc, 'mlef,mlbd,adef->ab', t2_1_ab, t2_1_ab, v2e_vvvv_ab)
+
+        M_ab_b -= 0.25*vvvv_einsum(direct_adc, 'mlef,mlbd,adef->ab', t2_1_b, t2_1_b, v2e_vvvv_b)
+        M_ab_b -= vvvv_einsum(direct_adc, 'mlef,mldb,daef->ab', t2_1_ab, t2_1_ab, v2e_vvvv_ab)
+
+        M_ab_a -= 0.25*vvvv_einsum(direct_adc, 'mled,mlaf,edbf->ab', t2_1_a, t2_1_a, v2e_vvvv_a)
+        M_ab_a -= vvvv_einsum(direct_adc, 'mled,mlaf,edbf->ab', t2_1_ab, t2_1_ab, v2e_vvvv_ab)
+
+        M_ab_b -= 0.25*vvvv_einsum(direct_adc, 'mled,mlaf,edbf->ab', t2_1_b, t2_1_b, v2e_vvvv_b)
+        M_ab_b -= vvvv_einsum(direct_adc, 'mled,mlfa,edfb->ab', t2_1_ab, t2_1_ab, v2e_vvvv_ab)
+
+        M_ab_a -= 0.25*einsum(direct_adc, 'mlbd,noad,noml->ab',t2_1_a, t2_1_a, v2e_oooo_a)
+        M_ab_a -= einsum(direct_adc, 'mlbd,noad,noml->ab',t2_1_ab, t2_1_ab, v2e_oooo_ab)
+
+        M_ab_b -= 0.25*einsum(direct_adc, 'mlbd,noad,noml->ab',t2_1_b, t2_1_b, v2e_oooo_b)
+        M_ab_b -= einsum(direct_adc, 'lmdb,onda,onlm->ab',t2_1_ab, t2_1_ab, v2e_oooo_ab)
+
+        M_ab_a += 0.5*einsum(direct_adc, 'lned,mled,anbm->ab',t2_1_a, t2_1_a, v2e_vovo_a)
+        M_ab_a += 0.5*einsum(direct_adc, 'lned,mled,anbm->ab',t2_1_b, t2_1_b, v2e_vovo_ab)
+        M_ab_a -= einsum(direct_adc, 'lned,lmed,anbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_ab)
+        M_ab_a -= einsum(direct_adc, 'nled,mled,anbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_a)
+
+        M_ab_b += 0.5*einsum(direct_adc, 'lned,mled,anbm->ab',t2_1_b, t2_1_b, v2e_vovo_b)
+        M_ab_b += 0.5*einsum(direct_adc, 'lned,mled,namb->ab',t2_1_a, t2_1_a, v2e_ovov_ab)
+        M_ab_b -= einsum(direct_adc, 'nled,mled,namb->ab',t2_1_ab, t2_1_ab, v2e_ovov_ab)
+        M_ab_b -= einsum(direct_adc, 'lned,lmed,anbm->ab',t2_1_ab, t2_1_ab, v2e_vovo_b)
+
+        M_ab_a -= 0.5*vvvv_einsum(direct_adc, 'mldf,mled,aebf->ab', t2_1_a, t2_1_a, v2e_vvvv_a)
+        M_ab_a -= 0.5*vvvv_einsum(direct_adc, 'mldf,mled,aebf->ab', t2_1_b, t2_1_b, v2e_vvvv_ab)
+        M_ab_a += vvvv_einsum(direct_adc, 'mldf,mlde,aebf->ab', t2_1_ab, t2_1_ab, v2e_vvvv_ab)
+        M_ab_a += vvvv_einsum(direct_adc, 'mlfd,mled,aebf->ab', t2_1_ab, t2_1_ab, v2e_vvvv_a)
+
+        M_ab_b -= 0.5*vvvv_einsum(direct_adc, 'mldf,mled,aebf->ab', t2_1_b, t2_1_b, v2e_vvvv_b)
+        M_ab_b -= 0.5*vvvv_einsum(direct_adc, 'mldf,mled,eafb->ab', t2_1_a, t2_1_a, v2e_vvvv_ab)
+        M_ab_b += vvvv_einsum(direct_adc, 'mlfd,mled,eafb->ab', t2_1_ab, t2_1_ab, v2e_vvvv_ab)
+        M_ab_b += vvvv_einsum(direct_adc, 'mldf,mlde,aebf->ab', t2_1_ab, t2_1_ab, v2e_vvvv_b)
 
     M_ab = (M_ab_a, M_ab_b)
 
@@ -2176,6 +2762,7 @@ def get_Mab(direct_adc,t_amp):
 # Compute sigma vector for EA #
 ###########################################
 
+@integral_stage("EA sigma")
 def define_H_ea(direct_adc,t_amp):
 
     method = direct_adc.method
@@ -2212,26 +2799,29 @@ def define_H_ea(direct_adc,t_amp):
     idn_vir_a = np.identity(nvir_a)
     idn_vir_b = np.identity(nvir_b)
 
-    v2e_oovv_a,v2e_oovv_ab,v2e_oovv_b = direct_adc.v2e.oovv
-    v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
-    v2e_oooo_a,v2e_oooo_ab,v2e_oooo_b = direct_adc.v2e.oooo
-    v2e_ovoo_a,v2e_ovoo_ab,v2e_ovoo_b = direct_adc.v2e.ovoo
-    v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
-    v2e_vvoo_a,v2e_vvoo_ab,v2e_vvoo_b = direct_adc.v2e.vvoo
-    v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b = direct_adc.v2e.vvvv
-    v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
-    v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
-    v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
-    v2e_vvvo_a,v2e_vvvo_ab,v2e_vvvo_b = direct_adc.v2e.vvvo
     v2e_vovv_a,v2e_vovv_ab,v2e_vovv_b = direct_adc.v2e.vovv
-    v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b = direct_adc.v2e.oovo
     v2e_ovvv_a,v2e_ovvv_ab,v2e_ovvv_b = direct_adc.v2e.ovvv
 
-    v2e_vovv_1_a = v2e_vovv_a[:][:,:,ab_ind_a[0],ab_ind_a[1]].reshape(nvir_a,-1)
-    v2e_vovv_1_b = v2e_vovv_b[:][:,:,ab_ind_b[0],ab_ind_b[1]].reshape(nvir_b,-1)
+    if (method == "adc(2)-e" or method == "adc(3)"):
+        v2e_ovov_a,v2e_ovov_ab,v2e_ovov_b = direct_adc.v2e.ovov
+        v2e_vvvv_a,v2e_vvvv_ab,v2e_vvvv_b = direct_adc.v2e.vvvv
+        v2e_voov_a,v2e_voov_ab,v2e_voov_b = direct_adc.v2e.voov
+        v2e_ovvo_a,v2e_ovvo_ab,v2e_ovvo_b = direct_adc.v2e.ovvo
+        v2e_vovo_a,v2e_vovo_ab,v2e_vovo_b = direct_adc.v2e.vovo
+
+    if (method == "adc(3)"):
+        v2e_ooov_a,v2e_ooov_ab,v2e_ooov_b = direct_adc.v2e.ooov
+        v2e_oovo_a,v2e_oovo_ab,v2e_oovo_b = direct_adc.v2e.oovo
 
+    # Packed vovv pairs are held in memory and read once
     v2e_vovv_2_a = v2e_vovv_a[:][:,:,ab_ind_a[0],ab_ind_a[1]]
-    v2e_vovv_2_b = v2e_vovv_b[:][:,:,ab_ind_b[0],ab_ind_b[1]]
+    if v2e_vovv_b is v2e_vovv_a:
+        v2e_vovv_2_b = v2e_vovv_2_a
+    else:
+        v2e_vovv_2_b = v2e_vovv_b[:][:,:,ab_ind_b[0],ab_ind_b[1]]
+
+    v2e_vovv_1_a = v2e_vovv_2_a.reshape(nvir_a,-1)
+    v2e_vovv_1_b = v2e_vovv_2_b.reshape(nvir_b,-1)
 
     d_i_a = e_occ_a[:,None]
     d_ab_a = e_vir_a[:,None] + e_vir_a
@@ -2286,53 +2876,125 @@ def define_H_ea(direct_adc,t_amp):
     precond[s_aba:f_aba] = D_iab_aba
     precond[s_bbb:f_bbb] = D_iab_b
 
-    #Calculate sigma vector
-    def sigma_(r):
+    #Calculate sigma vectors of the rows of r
+    def sigma_block(r):
+
+        nvec = r.shape[0]
 
         s = None
         if direct_adc.algorithm == "GF":
-            z = np.zeros((dim))
-            s = np.array(z,dtype = complex)
-            s.imag = z
+            s = np.zeros((nvec,dim),dtype = complex)
         else:
-            s = np.zeros((dim))
+            s = np.zeros((nvec,dim))
+
+        r_a = r[:,s_a:f_a]
+        r_b = r[:,s_b:f_b]
 
-        r_a = r[s_a:f_a]
-        r_b = r[s_b:f_b]
+        r_aaa = r[:,s_aaa:f_aaa]
+        r_bab = r[:,s_bab:f_bab]
+        r_aba = r[:,s_aba:f_aba]
+        r_bbb = r[:,s_bbb:f_bbb]
 
-        r_aaa = r[s_aaa:f_aaa]
-        r_bab = r[s_bab:f_bab]
-        r_aba = r[s_aba:f_aba]
-        r_bbb = r[s_bbb:f_bbb]
+        r_aba = r_aba.reshape(nvec,nocc_a,nvir_b,nvir_a)
+        r_bab = r_bab.reshape(nvec,nocc_b,nvir_a,nvir_b)
 
-        r_aba = r_aba.reshape(nocc_a,nvir_b,nvir_a)
-        r_bab = r_bab.reshape(nocc_b,nvir_a,nvir_b)
+        nbytes_read = direct_adc.v2e.io_stats.nbytes
+
+        if (method == "adc(2)-e" or method == "adc(3)"):
+
+               r_aaa_u = None
+               if direct_adc.algorithm == "GF":
+                   r_aaa_u = np.zeros((nvec,nocc_a,nvir_a,nvir_a),dtype=complex)
+               else:
+                   r_aaa_u = np.zeros((nvec,nocc_a,nvir_a,nvir_a))
+               r_aaa_u[:,:,ab_ind_a[0],ab_ind_a[1]]= r_aaa.reshape(nvec,nocc_a,-1).copy()
+               r_aaa_u[:,:,ab_ind_a[1],ab_ind_a[0]]= -r_aaa.reshape(nvec,nocc_a,-1).copy()
+
+               r_bbb_u = None
+               if direct_adc.algorithm == "GF":
+                   r_bbb_u = np.zeros((nvec,nocc_b,nvir_b,nvir_b),dtype=complex)
+               else:
+                   r_bbb_u = np.zeros((nvec,nocc_b,nvir_b,nvir_b))
+               r_bbb_u[:,:,ab_ind_b[0],ab_ind_b[1]]= r_bbb.reshape(nvec,nocc_b,-1).copy()
+               r_bbb_u[:,:,ab_ind_b[1],ab_ind_b[0]]= -r_bbb.reshape(nvec,nocc_b,-1).copy()
+
+############ vovv and ovvv terms ############################
+        # All contractions with vovv_ab/ovvv_ab (and vovv_a/vovv_b in ADC(3))
+        # are evaluated together, so that disk blocks are read once per call
+
+        v2e_terms = {}
+        v2e_terms["a_bab"] = ('aibc,Zibc->Za', v2e_vovv_ab, r_bab)
+        v2e_terms["b_aba"] = ('iacb,Zibc->Za', v2e_ovvv_ab, r_aba)
+        v2e_terms["bab_a"] = ('aibc,Za->Zibc', v2e_vovv_ab, r_a)
+        v2e_terms["aba_b"] = ('iacb,Za->Zibc', v2e_ovvv_ab, r_b)
+
+        if (method == "adc(3)"):
+
+               # ADC(3) a - ibc block: the lwd terms equal the lzd terms
+               # with z and w exchanged, they are included with a factor of 2
+               temp = einsum(direct_adc, 'jlwd,Zjzw->Zlzd',t2_1_a,r_aaa_u)
+               temp += einsum(direct_adc, 'ljdw,Zjzw->Zlzd',t2_1_ab,r_bab)
+
+               temp_1 = einsum(direct_adc, 'jlwd,Zjzw->Zlzd',t2_1_ab,r_aaa_u)
+               temp_1 += einsum(direct_adc, 'jlwd,Zjzw->Zlzd',t2_1_b,r_bab)
+
+               temp_a = t2_1_ab.transpose(0,3,1,2).copy()
+               temp_b = temp_a.reshape(nocc_a*nvir_b,nocc_b*nvir_a)
+               r_bab_t = r_bab.reshape(nvec,nocc_b*nvir_a,-1)
+               temp_c = einsum(direct_adc, 'pq,Zqy->Zpy',temp_b,r_bab_t).reshape(nvec,nocc_a,nvir_b,nvir_b)
+               temp_2 = temp_c.transpose(0,1,3,2).copy()
+
+               v2e_terms["a_aaa"] = ('Zlzd,zlad->Za', temp, v2e_vovv_a)
+               v2e_terms["a_bab_1"] = ('Zlzd,zlad->Za', temp_1, v2e_vovv_ab)
+               v2e_terms["a_bab_2"] = ('Zlzd,lzad->Za', temp_2, v2e_ovvv_ab)
+
+               temp = einsum(direct_adc, 'jlwd,Zjzw->Zlzd',t2_1_b,r_bbb_u)
+               temp += einsum(direct_adc, 'jlwd,Zjzw->Zlzd',t2_1_ab,r_aba)
+
+               temp_1 = einsum(direct_adc, 'ljdw,Zjzw->Zlzd',t2_1_ab,r_bbb_u)
+               temp_1 += einsum(direct_adc, 'jlwd,Zjzw->Zlzd',t2_1_a,r_aba)
+
+               temp_2 = einsum(direct_adc, 'jldw,Zjwz->Zlzd',t2_1_ab,r_aba)
+
+               v2e_terms["b_bbb"] = ('Zlzd,zlad->Za', temp, v2e_vovv_b)
+               v2e_terms["b_aba_1"] = ('Zlzd,lzda->Za', temp_1, v2e_ovvv_ab)
+               v2e_terms["b_aba_2"] = ('Zlzd,zlda->Za', temp_2, v2e_vovv_ab)
+
+               # ADC(3) ibc - a block
+               v2e_terms["lxd_a"] = ('xlbd,Zb->Zlxd', v2e_vovv_a, r_a)
+               v2e_terms["lxd_ab"] = ('xlbd,Zb->Zlxd', v2e_vovv_ab, r_a)
+               v2e_terms["lxd_b"] = ('xlbd,Zb->Zlxd', v2e_vovv_b, r_b)
+               v2e_terms["lxd_ba"] = ('lxdb,Zb->Zlxd', v2e_ovvv_ab, r_b)
+               v2e_terms["lyd_ab"] = ('lybd,Zb->Zlyd', v2e_ovvv_ab, r_a)
+               v2e_terms["lyd_ba"] = ('yldb,Zb->Zlyd', v2e_vovv_ab, r_b)
+
+        v2e_terms = block_einsums(direct_adc, v2e_terms)
 
 ############ ADC(2) ab block ############################
 
-        s[s_a:f_a] = np.einsum('ab,b->a',M_ab_a,r_a)
-        s[s_b:f_b] = np.einsum('ab,b->a',M_ab_b,r_b)
+        s[:,s_a:f_a] = einsum(direct_adc, 'ab,Zb->Za',M_ab_a,r_a)
+        s[:,s_b:f_b] = einsum(direct_adc, 'ab,Zb->Za',M_ab_b,r_b)
 
 ############ ADC(2) a - ibc block #########################
 
-        s[s_a:f_a] += np.einsum('ap,p->a',v2e_vovv_1_a, r_aaa, optimize = True)
-        s[s_a:f_a] += np.einsum('aibc,ibc->a', v2e_vovv_ab, r_bab, optimize = True)
+        s[:,s_a:f_a] += einsum(direct_adc, 'ap,Zp->Za',v2e_vovv_1_a, r_aaa)
+        s[:,s_a:f_a] += v2e_terms["a_bab"]
 
-        s[s_b:f_b] += np.einsum('ap,p->a', v2e_vovv_1_b, r_bbb, optimize = True)
-        s[s_b:f_b] += np.einsum('iacb,ibc->a', v2e_ovvv_ab, r_aba, optimize = True)
+        s[:,s_b:f_b] += einsum(direct_adc, 'ap,Zp->Za', v2e_vovv_1_b, r_bbb)
+        s[:,s_b:f_b] += v2e_terms["b_aba"]
 
 ############### ADC(2) ibc - a block ############################
 
-        s[s_aaa:f_aaa] += np.einsum('aip,a->ip', v2e_vovv_2_a, r_a, optimize = True).reshape(-1)
-        s[s_bab:f_bab] += np.einsum('aibc,a->ibc', v2e_vovv_ab, r_a, optimize = True).reshape(-1)
-        s[s_aba:f_aba] += np.einsum('iacb,a->ibc', v2e_ovvv_ab, r_b, optimize = True).reshape(-1)
-        s[s_bbb:f_bbb] += np.einsum('aip,a->ip', v2e_vovv_2_b, r_b, optimize = True).reshape(-1)
+        s[:,s_aaa:f_aaa] += einsum(direct_adc, 'aip,Za->Zip', v2e_vovv_2_a, r_a).reshape(nvec,-1)
+        s[:,s_bab:f_bab] += v2e_terms["bab_a"].reshape(nvec,-1)
+        s[:,s_aba:f_aba] += v2e_terms["aba_b"].reshape(nvec,-1)
+        s[:,s_bbb:f_bbb] += einsum(direct_adc, 'aip,Za->Zip', v2e_vovv_2_b, r_b).reshape(nvec,-1)
 
 ################ ADC(2) iab - jcd block ############################
-        s[s_aaa:f_aaa] += D_iab_a * r_aaa
-        s[s_bab:f_bab] += D_iab_bab * r_bab.reshape(-1)
-        s[s_aba:f_aba] += D_iab_aba * r_aba.reshape(-1)
-        s[s_bbb:f_bbb] += D_iab_b * r_bbb
+        s[:,s_aaa:f_aaa] += D_iab_a * r_aaa
+        s[:,s_bab:f_bab] += D_iab_bab * r_bab.reshape(nvec,-1)
+        s[:,s_aba:f_aba] += D_iab_aba * r_aba.reshape(nvec,-1)
+        s[:,s_bbb:f_bbb] += D_iab_b * r_bbb
 
 ############### ADC(3) iab - jcd block ############################
 
@@ -2340,24 +3002,8 @@ def define_H_ea(direct_adc,t_amp):
 
                t2_2_a, t2_2_ab, t2_2_b = t2_2
 
-               r_aaa = r_aaa.reshape(nocc_a,-1)
-               r_bbb = r_bbb.reshape(nocc_b,-1)
-
-               r_aaa_u = None
-               if direct_adc.algorithm == "GF":
-                   r_aaa_u = np.zeros((nocc_a,nvir_a,nvir_a),dtype=complex)
-               else:
-                   r_aaa_u = np.zeros((nocc_a,nvir_a,nvir_a))
-               r_aaa_u[:,ab_ind_a[0],ab_ind_a[1]]= r_aaa.copy()
-               r_aaa_u[:,ab_ind_a[1],ab_ind_a[0]]= -r_aaa.copy()
-
-               r_bbb_u = None
-               if direct_adc.algorithm == "GF":
-                   r_bbb_u = np.zeros((nocc_b,nvir_b,nvir_b),dtype=complex)
-               else:
-                   r_bbb_u = np.zeros((nocc_b,nvir_b,nvir_b))
-               r_bbb_u[:,ab_ind_b[0],ab_ind_b[1]]= r_bbb.copy()
-               r_bbb_u[:,ab_ind_b[1],ab_ind_b[0]]= -r_bbb.copy()
+               r_aaa = r_aaa.reshape(nvec,nocc_a,-1)
+               r_bbb = r_bbb.reshape(nvec,nocc_b,-1)
 
                #temp = 0.5*np.einsum('yxwz,izw->ixy',v2e_vvvv_a,r_aaa_u ,optimize = True)
                #####temp = -0.5*np.einsum('yxzw,izw->ixy',v2e_vvvv_a,r_aaa_u )
@@ -2367,19 +3013,17 @@ def define_H_ea(direct_adc,t_amp):
                #r_aaa_t = r_aaa_u.reshape(nocc_a,-1)
                #s[s_aaa:f_aaa] += 0.5*np.dot(r_aaa_t,temp.T).reshape(-1)
 
-               temp = v2e_vvvv_a[:].reshape(nvir_a*nvir_a,nvir_a*nvir_a)
-               r_aaa_t = r_aaa_u.reshape(nocc_a,-1)
-               temp_1 = np.dot(r_aaa_t,temp.T).reshape(nocc_a,nvir_a,nvir_a)
-               del temp
-               temp_1 = temp_1[:,ab_ind_a[0],ab_ind_a[1]]
-               s[s_aaa:f_aaa] += 0.5*temp_1.reshape(-1)
-
-               temp = v2e_vvvv_b[:].reshape(nvir_b*nvir_b,nvir_b*nvir_b)
-               r_bbb_t = r_bbb_u.reshape(nocc_b,-1)
-               temp_1 = np.dot(r_bbb_t,temp.T).reshape(nocc_b,nvir_b,nvir_b)
-               del temp
-               temp_1 = temp_1[:,ab_ind_b[0],ab_ind_b[1]]
-               s[s_bbb:f_bbb] += 0.5*temp_1.reshape(-1)
+               # Closed shells share the vvvv_a block: one pass for both spins
+               # The rows of all vectors are contracted together (one GEMM per slab)
+               r_aaa_t = r_aaa.reshape(nvec*nocc_a,-1)
+               r_bbb_t = r_bbb.reshape(nvec*nocc_b,-1)
+               if v2e_vvvv_b is v2e_vvvv_a:
+                   temp = vvvv_pair_dot(direct_adc,np.vstack((r_aaa_t,r_bbb_t)),v2e_vvvv_a)
+                   s[:,s_aaa:f_aaa] += temp[:nvec*nocc_a].reshape(nvec,-1)
+                   s[:,s_bbb:f_bbb] += temp[nvec*nocc_a:].reshape(nvec,-1)
+               else:
+                   s[:,s_aaa:f_aaa] += vvvv_pair_dot(direct_adc,r_aaa_t,v2e_vvvv_a).reshape(nvec,-1)
+                   s[:,s_bbb:f_bbb] += vvvv_pair_dot(direct_adc,r_bbb_t,v2e_vvvv_b).reshape(nvec,-1)
 
                #temp = v2e_vvvv_b[ab_ind_b[0],ab_ind_b[1],:,:]
                #temp = temp.reshape(-1,nvir_b*nvir_b)
@@ -2392,76 +3036,73 @@ def define_H_ea(direct_adc,t_amp):
 
                #s[s_bab:f_bab] += np.einsum('xyzw,izw->ixy',v2e_vvvv_ab,r_bab,optimize = True).reshape(-1)
                #s[s_bab:f_bab] += np.einsum('xyzw,izw->ixy',v2e_vvvv_ab,r_bab).reshape(-1)
-               temp = v2e_vvvv_ab[:].reshape(nvir_a*nvir_b,nvir_a*nvir_b)
-               r_bab_t = r_bab.reshape(nocc_b,-1)
-               s[s_bab:f_bab] += np.dot(r_bab_t,temp.T).reshape(-1)
-               del temp
-
                #s[s_aba:f_aba] += np.einsum('yxwz,izw->ixy',v2e_vvvv_ab,r_aba,optimize = True).reshape(-1)
                #temp = v2e_vvvv_ab.transpose(3,2,1,0)
                #temp = temp.reshape(nvir_a*nvir_b,nvir_a*nvir_b)
                #r_aba_t = r_aba.reshape(nocc_a,-1)
                #s[s_aba:f_aba] += np.dot(r_aba_t,temp).reshape(-1)
 
-               temp = v2e_vvvv_ab[:].reshape(nvir_a*nvir_b,nvir_a*nvir_b)
-               r_aba_t = r_aba.transpose(0,2,1).reshape(nocc_a,-1)
-               temp_1 = np.dot(r_aba_t,temp.T).reshape(nocc_a, nvir_a,nvir_b)
-               s[s_aba:f_aba] += temp_1.transpose(0,2,1).copy().reshape(-1)
-               del temp
+               # bab and aba in one pass over vvvv_ab
+               r_bab_t = r_bab.reshape(nvec*nocc_b,-1)
+               r_aba_t = r_aba.transpose(0,1,3,2).reshape(nvec*nocc_a,-1)
+               temp = vvvv_dot(direct_adc,np.vstack((r_bab_t,r_aba_t)),v2e_vvvv_ab)
+               s[:,s_bab:f_bab] += temp[:nvec*nocc_b].reshape(nvec,-1)
+               temp_1 = temp[nvec*nocc_b:].reshape(nvec,nocc_a,nvir_a,nvir_b)
+               s[:,s_aba:f_aba] += temp_1.transpose(0,1,3,2).copy().reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('yjzi,jzx->ixy',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp +=0.5*np.einsum('yjiz,jxz->ixy',v2e_voov_ab,r_bab,optimize = True)
-               s[s_aaa:f_aaa] += temp[:,ab_ind_a[0],ab_ind_a[1]].reshape(-1)
+               temp = 0.5*einsum(direct_adc, 'yjzi,Zjzx->Zixy',v2e_vovo_a,r_aaa_u)
+               temp +=0.5*einsum(direct_adc, 'yjiz,Zjxz->Zixy',v2e_voov_ab,r_bab)
+               s[:,s_aaa:f_aaa] += temp[:,:,ab_ind_a[0],ab_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] -= 0.5*np.einsum('jyzi,jzx->ixy',v2e_ovvo_ab,r_aaa_u,optimize = True).reshape(-1)
-               s[s_bab:f_bab] -= 0.5*np.einsum('yjzi,jxz->ixy',v2e_vovo_b,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'jyzi,Zjzx->Zixy',v2e_ovvo_ab,r_aaa_u).reshape(nvec,-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'yjzi,Zjxz->Zixy',v2e_vovo_b,r_bab).reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('yjzi,jzx->ixy',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp +=0.5* np.einsum('jyzi,jxz->ixy',v2e_ovvo_ab,r_aba,optimize = True)
-               s[s_bbb:f_bbb] += temp[:,ab_ind_b[0],ab_ind_b[1]].reshape(-1)
+               temp = 0.5*einsum(direct_adc, 'yjzi,Zjzx->Zixy',v2e_vovo_b,r_bbb_u)
+               temp +=0.5* einsum(direct_adc, 'jyzi,Zjxz->Zixy',v2e_ovvo_ab,r_aba)
+               s[:,s_bbb:f_bbb] += temp[:,:,ab_ind_b[0],ab_ind_b[1]].reshape(nvec,-1)
 
-               s[s_aba:f_aba] -= 0.5*np.einsum('yjzi,jxz->ixy',v2e_vovo_a,r_aba,optimize = True).reshape(-1)
-               s[s_aba:f_aba] -= 0.5*np.einsum('yjiz,jzx->ixy',v2e_voov_ab,r_bbb_u,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'yjzi,Zjxz->Zixy',v2e_vovo_a,r_aba).reshape(nvec,-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'yjiz,Zjzx->Zixy',v2e_voov_ab,r_bbb_u).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('xjzi,jzy->ixy',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp -= 0.5*np.einsum('xjiz,jyz->ixy',v2e_voov_ab,r_bab,optimize = True)
-               s[s_aaa:f_aaa] += temp[:,ab_ind_a[0],ab_ind_a[1]].reshape(-1)
+               temp = -0.5*einsum(direct_adc, 'xjzi,Zjzy->Zixy',v2e_vovo_a,r_aaa_u)
+               temp -= 0.5*einsum(direct_adc, 'xjiz,Zjyz->Zixy',v2e_voov_ab,r_bab)
+               s[:,s_aaa:f_aaa] += temp[:,:,ab_ind_a[0],ab_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] -=  0.5*np.einsum('xjzi,jzy->ixy',v2e_vovo_ab,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] -=  0.5*einsum(direct_adc, 'xjzi,Zjzy->Zixy',v2e_vovo_ab,r_bab).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('xjzi,jzy->ixy',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp -= 0.5*np.einsum('jxzi,jyz->ixy',v2e_ovvo_ab,r_aba,optimize = True)
-               s[s_bbb:f_bbb] += temp[:,ab_ind_b[0],ab_ind_b[1]].reshape(-1)
+               temp = -0.5*einsum(direct_adc, 'xjzi,Zjzy->Zixy',v2e_vovo_b,r_bbb_u)
+               temp -= 0.5*einsum(direct_adc, 'jxzi,Zjyz->Zixy',v2e_ovvo_ab,r_aba)
+               s[:,s_bbb:f_bbb] += temp[:,:,ab_ind_b[0],ab_ind_b[1]].reshape(nvec,-1)
 
-               s[s_aba:f_aba] -= 0.5*np.einsum('jxiz,jzy->ixy',v2e_ovov_ab,r_aba,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'jxiz,Zjzy->Zixy',v2e_ovov_ab,r_aba).reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('xjwi,jyw->ixy',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp -= 0.5*np.einsum('xjiw,jyw->ixy',v2e_voov_ab,r_bab,optimize = True)
+               temp = 0.5*einsum(direct_adc, 'xjwi,Zjyw->Zixy',v2e_vovo_a,r_aaa_u)
+               temp -= 0.5*einsum(direct_adc, 'xjiw,Zjyw->Zixy',v2e_voov_ab,r_bab)
 
-               s[s_aaa:f_aaa] += temp[:,ab_ind_a[0],ab_ind_a[1]].reshape(-1)
+               s[:,s_aaa:f_aaa] += temp[:,:,ab_ind_a[0],ab_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] -= 0.5*np.einsum('xjwi,jwy->ixy',v2e_vovo_ab,r_bab,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'xjwi,Zjwy->Zixy',v2e_vovo_ab,r_bab).reshape(nvec,-1)
 
-               temp = 0.5*np.einsum('xjwi,jyw->ixy',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp -= 0.5*np.einsum('jxwi,jyw->ixy',v2e_ovvo_ab,r_aba,optimize = True)
-               s[s_bbb:f_bbb] += temp[:,ab_ind_b[0],ab_ind_b[1]].reshape(-1)
+               temp = 0.5*einsum(direct_adc, 'xjwi,Zjyw->Zixy',v2e_vovo_b,r_bbb_u)
+               temp -= 0.5*einsum(direct_adc, 'jxwi,Zjyw->Zixy',v2e_ovvo_ab,r_aba)
+               s[:,s_bbb:f_bbb] += temp[:,:,ab_ind_b[0],ab_ind_b[1]].reshape(nvec,-1)
 
-               s[s_aba:f_aba] -= 0.5*np.einsum('jxiw,jwy->ixy',v2e_ovov_ab,r_aba,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'jxiw,Zjwy->Zixy',v2e_ovov_ab,r_aba).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('yjwi,jxw->ixy',v2e_vovo_a,r_aaa_u,optimize = True)
-               temp += 0.5*np.einsum('yjiw,jxw->ixy',v2e_voov_ab,r_bab,optimize = True)
+               temp = -0.5*einsum(direct_adc, 'yjwi,Zjxw->Zixy',v2e_vovo_a,r_aaa_u)
+               temp += 0.5*einsum(direct_adc, 'yjiw,Zjxw->Zixy',v2e_voov_ab,r_bab)
 
-               s[s_aaa:f_aaa] += temp[:,ab_ind_a[0],ab_ind_a[1]].reshape(-1)
+               s[:,s_aaa:f_aaa] += temp[:,:,ab_ind_a[0],ab_ind_a[1]].reshape(nvec,-1)
 
-               s[s_bab:f_bab] -= 0.5*np.einsum('yjwi,jxw->ixy',v2e_vovo_b,r_bab,optimize = True).reshape(-1)
-               s[s_bab:f_bab] += 0.5*np.einsum('jywi,jxw->ixy',v2e_ovvo_ab,r_aaa_u,optimize = True).reshape(-1)
+               s[:,s_bab:f_bab] -= 0.5*einsum(direct_adc, 'yjwi,Zjxw->Zixy',v2e_vovo_b,r_bab).reshape(nvec,-1)
+               s[:,s_bab:f_bab] += 0.5*einsum(direct_adc, 'jywi,Zjxw->Zixy',v2e_ovvo_ab,r_aaa_u).reshape(nvec,-1)
 
-               s[s_aba:f_aba] -= 0.5*np.einsum('yjwi,jxw->ixy',v2e_vovo_a,r_aba,optimize = True).reshape(-1)
-               s[s_aba:f_aba] += 0.5*np.einsum('yjiw,jxw->ixy',v2e_voov_ab,r_bbb_u,optimize = True).reshape(-1)
+               s[:,s_aba:f_aba] -= 0.5*einsum(direct_adc, 'yjwi,Zjxw->Zixy',v2e_vovo_a,r_aba).reshape(nvec,-1)
+               s[:,s_aba:f_aba] += 0.5*einsum(direct_adc, 'yjiw,Zjxw->Zixy',v2e_voov_ab,r_bbb_u).reshape(nvec,-1)
 
-               temp = -0.5*np.einsum('yjwi,jxw->ixy',v2e_vovo_b,r_bbb_u,optimize = True)
-               temp += 0.5*np.einsum('jywi,jxw->ixy',v2e_ovvo_ab,r_aba,optimize = True)
-               s[s_bbb:f_bbb] += temp[:,ab_ind_b[0],ab_ind_b[1]].reshape(-1)
+               temp = -0.5*einsum(direct_adc, 'yjwi,Zjxw->Zixy',v2e_vovo_b,r_bbb_u)
+               temp += 0.5*einsum(direct_adc, 'jywi,Zjxw->Zixy',v2e_ovvo_ab,r_aba)
+               s[:,s_bbb:f_bbb] += temp[:,:,ab_ind_b[0],ab_ind_b[1]].reshape(nvec,-1)
 
         if (method == "adc(3)"):
 
@@ -2475,12 +3116,12 @@ def define_H_ea(direct_adc,t_amp):
                #s[s_a:f_a] += np.einsum('ajp,jp->a',temp, r_aaa, optimize=True)
 
                t2_1_a_t = t2_1_a[:,:,ab_ind_a[0],ab_ind_a[1]]
-               r_aaa = r_aaa.reshape(nocc_a,-1)
-               temp = 0.5*np.einsum('lmp,jp->lmj',t2_1_a_t,r_aaa)
-               s[s_a:f_a] += np.einsum('lmj,lmaj->a',temp, v2e_oovo_a, optimize=True)
+               r_aaa = r_aaa.reshape(nvec,nocc_a,-1)
+               temp = 0.5*einsum(direct_adc, 'lmp,Zjp->Zlmj',t2_1_a_t,r_aaa)
+               s[:,s_a:f_a] += einsum(direct_adc, 'Zlmj,lmaj->Za',temp, v2e_oovo_a)
 
-               temp_1 = -np.einsum('lmzw,jzw->jlm',t2_1_ab,r_bab)
-               s[s_a:f_a] -= np.einsum('jlm,lmaj->a',temp_1, v2e_oovo_ab, optimize=True)
+               temp_1 = -einsum(direct_adc, 'lmzw,Zjzw->Zjlm',t2_1_ab,r_bab)
+               s[:,s_a:f_a] -= einsum(direct_adc, 'Zjlm,lmaj->Za',temp_1, v2e_oovo_ab)
 
                #temp = -0.5*np.einsum('lmwz,lmaj->ajzw',t2_1_b,v2e_oovo_b)
                #temp = temp[:,:,ab_ind_b[0],ab_ind_b[1]]
@@ -2488,124 +3129,20 @@ def define_H_ea(direct_adc,t_amp):
                #s[s_b:f_b] += np.einsum('ajp,jp->a',temp, r_bbb, optimize=True)
 
                t2_1_b_t = t2_1_b[:,:,ab_ind_b[0],ab_ind_b[1]]
-               r_bbb = r_bbb.reshape(nocc_b,-1)
-               temp = 0.5*np.einsum('lmp,jp->lmj',t2_1_b_t,r_bbb)
-               s[s_b:f_b] += np.einsum('lmj,lmaj->a',temp, v2e_oovo_b, optimize=True)
+               r_bbb = r_bbb.reshape(nvec,nocc_b,-1)
+               temp = 0.5*einsum(direct_adc, 'lmp,Zjp->Zlmj',t2_1_b_t,r_bbb)
+               s[:,s_b:f_b] += einsum(direct_adc, 'Zlmj,lmaj->Za',temp, v2e_oovo_b)
 
-               temp_1 = -np.einsum('mlwz,jzw->jlm',t2_1_ab,r_aba)
-               s[s_b:f_b] -= np.einsum('jlm,mlja->a',temp_1, v2e_ooov_ab, optimize=True)
+               temp_1 = -einsum(direct_adc, 'mlwz,Zjzw->Zjlm',t2_1_ab,r_aba)
+               s[:,s_b:f_b] -= einsum(direct_adc, 'Zjlm,mlja->Za',temp_1, v2e_ooov_ab)
 
-               if direct_adc.algorithm == "GF":
-                   r_aaa_u = np.zeros((nocc_a,nvir_a,nvir_a),dtype=complex)
-               else:
-                   r_aaa_u = np.zeros((nocc_a,nvir_a,nvir_a))
-               r_aaa_u[:,ab_ind_a[0],ab_ind_a[1]]= r_aaa.copy()
-               r_aaa_u[:,ab_ind_a[1],ab_ind_a[0]]= -r_aaa.copy()
+               s[:,s_a:f_a] += v2e_terms["a_aaa"]
+               s[:,s_a:f_a] += v2e_terms["a_bab_1"]
+               s[:,s_a:f_a] -= v2e_terms["a_bab_2"]
 
-               if direct_adc.algorithm == "GF":
-                   r_bbb_u = np.zeros((nocc_b,nvir_b,nvir_b),dtype=complex)
-               else:
-                   r_bbb_u = np.zeros((nocc_b,nvir_b,nvir_b))
-               r_bbb_u[:,ab_ind_b[0],ab_ind_b[1]]= r_bbb.copy()
-               r_bbb_u[:,ab_ind_b[1],ab_ind_b[0]]= -r_bbb.copy()
-
-               r_bab = r_bab.reshape(nocc_b,nvir_a,nvir_b)
-               r_aba = r_aba.reshape(nocc_a,nvir_b,nvir_a)
-
-               if direct_adc.algorithm == "GF":
-                   temp = np.zeros_like(r_bab,dtype=complex)
-               else:
-                   temp = np.zeros_like(r_bab)
-
-               temp = np.einsum('jlwd,jzw->lzd',t2_1_a,r_aaa_u,optimize=True)
-               temp += np.einsum('ljdw,jzw->lzd',t2_1_ab,r_bab,optimize=True)
-
-               if direct_adc.algorithm == "GF":
-                   temp_1 = np.zeros_like(r_bab,dtype=complex)
-               else:
-                   temp_1 = np.zeros_like(r_bab)
-
-               temp_1 = np.einsum('jlwd,jzw->lzd',t2_1_ab,r_aaa_u,optimize=True)
-               temp_1 += np.einsum('jlwd,jzw->lzd',t2_1_b,r_bab,optimize=True)
-
-               #temp_2 = np.einsum('ljwd,jwz->lzd',t2_1_ab,r_bab)
-
-               temp_a = t2_1_ab.transpose(0,3,1,2).copy()
-               temp_b = temp_a.reshape(nocc_a*nvir_b,nocc_b*nvir_a)
-               r_bab_t = r_bab.reshape(nocc_b*nvir_a,-1)
-               temp_c = np.dot(temp_b,r_bab_t).reshape(nocc_a,nvir_b,nvir_b)
-               temp_2 = temp_c.transpose(0,2,1).copy()
-
-               s[s_a:f_a] += 0.5*np.einsum('lzd,zlad->a',temp,v2e_vovv_a,optimize=True)
-               s[s_a:f_a] += 0.5*np.einsum('lzd,zlad->a',temp_1,v2e_vovv_ab,optimize=True)
-               s[s_a:f_a] -= 0.5*np.einsum('lzd,lzad->a',temp_2,v2e_ovvv_ab,optimize=True)
-
-               if direct_adc.algorithm == "GF":
-                   temp = np.zeros_like(r_aba,dtype=complex)
-               else:
-                   temp = np.zeros_like(r_aba)
-               temp = np.einsum('jlwd,jzw->lzd',t2_1_b,r_bbb_u,optimize=True)
-               temp += np.einsum('jlwd,jzw->lzd',t2_1_ab,r_aba,optimize=True)
-
-               if direct_adc.algorithm == "GF":
-                   temp_1 = np.zeros_like(r_aba,dtype=complex)
-               else:
-                   temp_1 = np.zeros_like(r_aba)
-               temp_1 = np.einsum('ljdw,jzw->lzd',t2_1_ab,r_bbb_u,optimize=True)
-               temp_1 += np.einsum('jlwd,jzw->lzd',t2_1_a,r_aba,optimize=True)
-
-               temp_2 = np.einsum('jldw,jwz->lzd',t2_1_ab,r_aba,optimize=True)
-
-               s[s_b:f_b] += 0.5*np.einsum('lzd,zlad->a',temp,v2e_vovv_b,optimize=True)
-               #s[s_b:f_b] += 0.5*np.einsum('lzd,lzda->a',temp_1,v2e_ovvv_ab,optimize=True)
-               temp_a = temp_1.reshape(-1)
-               temp_b = v2e_ovvv_ab[:].reshape(nocc_a*nvir_b*nvir_a,-1)
-               s[s_b:f_b] += 0.5*np.dot(temp_a,temp_b)
-               del temp_b
-               s[s_b:f_b] -= 0.5*np.einsum('lzd,zlda->a',temp_2,v2e_vovv_ab,optimize=True)
-               if direct_adc.algorithm == "GF":
-                   temp = np.zeros_like(r_bab,dtype=complex)
-               else:
-                   temp = np.zeros_like(r_bab)
-               temp = -np.einsum('jlzd,jwz->lwd',t2_1_a,r_aaa_u,optimize=True)
-               temp += -np.einsum('ljdz,jwz->lwd',t2_1_ab,r_bab,optimize=True)
-
-               if direct_adc.algorithm == "GF":
-                   temp_1 = np.zeros_like(r_bab,dtype=complex)
-               else:
-                   temp_1 = np.zeros_like(r_bab)
-               temp_1 = -np.einsum('jlzd,jwz->lwd',t2_1_ab,r_aaa_u,optimize=True)
-               temp_1 += -np.einsum('jlzd,jwz->lwd',t2_1_b,r_bab,optimize=True)
-
-               temp_2 = -np.einsum('ljzd,jzw->lwd',t2_1_ab,r_bab,optimize=True)
-
-               s[s_a:f_a] -= 0.5*np.einsum('lwd,wlad->a',temp,v2e_vovv_a,optimize=True)
-               s[s_a:f_a] -= 0.5*np.einsum('lwd,wlad->a',temp_1,v2e_vovv_ab,optimize=True)
-               s[s_a:f_a] += 0.5*np.einsum('lwd,lwad->a',temp_2,v2e_ovvv_ab,optimize=True)
-
-               if direct_adc.algorithm == "GF":
-                   temp = np.zeros_like(r_aba,dtype=complex)
-               else:
-                   temp = np.zeros_like(r_aba)
-               temp = -np.einsum('jlzd,jwz->lwd',t2_1_b,r_bbb_u,optimize=True)
-               temp += -np.einsum('jlzd,jwz->lwd',t2_1_ab,r_aba,optimize=True)
-
-               if direct_adc.algorithm == "GF":
-                   temp_1 = np.zeros_like(r_bab,dtype=complex)
-               else:
-                   temp_1 = np.zeros_like(r_bab)
-               temp_1 = -np.einsum('ljdz,jwz->lwd',t2_1_ab,r_bbb_u,optimize=True)
-               temp_1 += -np.einsum('jlzd,jwz->lwd',t2_1_a,r_aba,optimize=True)
-
-               temp_2 = -np.einsum('jldz,jzw->lwd',t2_1_ab,r_aba,optimize=True)
-
-               s[s_b:f_b] -= 0.5*np.einsum('lwd,wlad->a',temp,v2e_vovv_b,optimize=True)
-               #s[s_b:f_b] -= 0.5*np.einsum('lwd,lwda->a',temp_1,v2e_ovvv_ab,optimize=True)
-               temp_a = temp_1.reshape(-1)
-               temp_b = v2e_ovvv_ab[:].reshape(nocc_a*nvir_b*nvir_a,-1)
-               s[s_b:f_b] -= 0.5*np.dot(temp_a,temp_b)
-               del temp_b
-               s[s_b:f_b] += 0.5*np.einsum('lwd,wlda->a',temp_2,v2e_vovv_ab,optimize=True)
+               s[:,s_b:f_b] += v2e_terms["b_bbb"]
+               s[:,s_b:f_b] += v2e_terms["b_aba_1"]
+               s[:,s_b:f_b] -= v2e_terms["b_aba_2"]
 
 ################ ADC(3) ibc - a block ############################
 
@@ -2614,78 +3151,84 @@ def define_H_ea(direct_adc,t_amp):
                #s[s_aaa:f_aaa] += 0.5*np.einsum('bip,b->ip',temp, r_a, optimize=True).reshape(-1)
 
                t2_1_a_t = t2_1_a[:,:,ab_ind_a[0],ab_ind_a[1]]
-               temp = np.einsum('b,lmbi->lmi',r_a,v2e_oovo_a)
-               s[s_aaa:f_aaa] += 0.5*np.einsum('lmi,lmp->ip',temp, t2_1_a_t, optimize=True).reshape(-1)
+               temp = einsum(direct_adc, 'Zb,lmbi->Zlmi',r_a,v2e_oovo_a)
+               s[:,s_aaa:f_aaa] += 0.5*einsum(direct_adc, 'Zlmi,lmp->Zip',temp, t2_1_a_t).reshape(nvec,-1)
 
                #temp_1 = np.einsum('lmxy,lmbi->bixy',t2_1_ab,v2e_oovo_ab)
                #s[s_bab:f_bab] += np.einsum('bixy,b->ixy',temp_1, r_a, optimize=True).reshape(-1)
 
-               temp_1 = np.einsum('b,lmbi->lmi',r_a,v2e_oovo_ab)
-               s[s_bab:f_bab] += np.einsum('lmi,lmxy->ixy',temp_1, t2_1_ab, optimize=True).reshape(-1)
+               temp_1 = einsum(direct_adc, 'Zb,lmbi->Zlmi',r_a,v2e_oovo_ab)
+               s[:,s_bab:f_bab] += einsum(direct_adc, 'Zlmi,lmxy->Zixy',temp_1, t2_1_ab).reshape(nvec,-1)
 
                #t2_1_b_t = t2_1_b[:,:,ab_ind_b[0],ab_ind_b[1]]
                #temp = np.einsum('lmp,lmbi->bip',t2_1_b_t,v2e_oovo_b)
                #s[s_bbb:f_bbb] += 0.5*np.einsum('bip,b->ip',temp, r_b, optimize=True).reshape(-1)
 
                t2_1_b_t = t2_1_b[:,:,ab_ind_b[0],ab_ind_b[1]]
-               temp = np.einsum('b,lmbi->lmi',r_b,v2e_oovo_b)
-               s[s_bbb:f_bbb] += 0.5*np.einsum('lmi,lmp->ip',temp, t2_1_b_t, optimize=True).reshape(-1)
+               temp = einsum(direct_adc, 'Zb,lmbi->Zlmi',r_b,v2e_oovo_b)
+               s[:,s_bbb:f_bbb] += 0.5*einsum(direct_adc, 'Zlmi,lmp->Zip',temp, t2_1_b_t).reshape(nvec,-1)
 
                #temp_1 = np.einsum('mlyx,mlib->bixy',t2_1_ab,v2e_ooov_ab)
                #s[s_aba:f_aba] += np.einsum('bixy,b->ixy',temp_1, r_b, optimize=True).reshape(-1)
 
-               temp_1 = np.einsum('b,mlib->mli',r_b,v2e_ooov_ab)
-               s[s_aba:f_aba] += np.einsum('mli,mlyx->ixy',temp_1, t2_1_ab, optimize=True).reshape(-1)
+               temp_1 = einsum(direct_adc, 'Zb,mlib->Zmli',r_b,v2e_ooov_ab)
+               s[:,s_aba:f_aba] += einsum(direct_adc, 'Zmli,mlyx->Zixy',temp_1, t2_1_ab).reshape(nvec,-1)
+
+               temp_1 = v2e_terms["lxd_a"]
+               temp_2 = v2e_terms["lxd_ab"]
 
-               temp_1 = np.einsum('xlbd,b->lxd', v2e_vovv_a,r_a,optimize=True)
-               temp_2 = np.einsum('xlbd,b->lxd', v2e_vovv_ab,r_a,optimize=True)
+               temp  = einsum(direct_adc, 'Zlxd,ilyd->Zixy',temp_1,t2_1_a)
+               temp += einsum(direct_adc, 'Zlxd,ilyd->Zixy',temp_2,t2_1_ab)
+               s[:,s_aaa:f_aaa] += temp[:,:,ab_ind_a[0],ab_ind_a[1] ].reshape(nvec,-1)
 
-               temp  = np.einsum('lxd,ilyd->ixy',temp_1,t2_1_a,optimize=True)
-               temp += np.einsum('lxd,ilyd->ixy',temp_2,t2_1_ab,optimize=True)
-               s[s_aaa:f_aaa] += temp[:,ab_ind_a[0],ab_ind_a[1] ].reshape(-1)
+               temp  = einsum(direct_adc, 'Zlxd,lidy->Zixy',temp_1,t2_1_ab)
+               temp  += einsum(direct_adc, 'Zlxd,ilyd->Zixy',temp_2,t2_1_b)
+               s[:,s_bab:f_bab] += temp.reshape(nvec,-1)
 
-               temp  = np.einsum('lxd,lidy->ixy',temp_1,t2_1_ab,optimize=True)
-               temp  += np.einsum('lxd,ilyd->ixy',temp_2,t2_1_b,optimize=True)
-               s[s_bab:f_bab] += temp.reshape(-1)
+               temp_1 = v2e_terms["lxd_b"]
+               temp_2 = v2e_terms["lxd_ba"]
 
-               temp_1 = np.einsum('xlbd,b->lxd', v2e_vovv_b,r_b,optimize=True)
-               temp_2 = np.einsum('lxdb,b->lxd', v2e_ovvv_ab,r_b,optimize=True)
+               temp  = einsum(direct_adc, 'Zlxd,ilyd->Zixy',temp_1,t2_1_b)
+               temp += einsum(direct_adc, 'Zlxd,lidy->Zixy',temp_2,t2_1_ab)
+               s[:,s_bbb:f_bbb] += temp[:,:,ab_ind_b[0],ab_ind_b[1] ].reshape(nvec,-1)
 
-               temp  = np.einsum('lxd,ilyd->ixy',temp_1,t2_1_b,optimize=True)
-               temp += np.einsum('lxd,lidy->ixy',temp_2,t2_1_ab,optimize=True)
-               s[s_bbb:f_bbb] += temp[:,ab_ind_b[0],ab_ind_b[1] ].reshape(-1)
+               temp  = einsum(direct_adc, 'Zlxd,ilyd->Zixy',temp_1,t2_1_ab)
+               temp  += einsum(direct_adc, 'Zlxd,ilyd->Zixy',temp_2,t2_1_a)
+               s[:,s_aba:f_aba] += temp.reshape(nvec,-1)
 
-               temp  = np.einsum('lxd,ilyd->ixy',temp_1,t2_1_ab,optimize=True)
-               temp  += np.einsum('lxd,ilyd->ixy',temp_2,t2_1_a,optimize=True)
-               s[s_aba:f_aba] += temp.reshape(-1)
+               temp_1 = v2e_terms["lxd_a"]
+               temp_2 = v2e_terms["lxd_ab"]
 
-               temp_1 = np.einsum('ylbd,b->lyd', v2e_vovv_a,r_a,optimize=True)
-               temp_2 = np.einsum('ylbd,b->lyd', v2e_vovv_ab,r_a,optimize=True)
+               temp  = einsum(direct_adc, 'Zlyd,ilxd->Zixy',temp_1,t2_1_a)
+               temp += einsum(direct_adc, 'Zlyd,ilxd->Zixy',temp_2,t2_1_ab)
+               s[:,s_aaa:f_aaa] -= temp[:,:,ab_ind_a[0],ab_ind_a[1] ].reshape(nvec,-1)
 
-               temp  = np.einsum('lyd,ilxd->ixy',temp_1,t2_1_a,optimize=True)
-               temp += np.einsum('lyd,ilxd->ixy',temp_2,t2_1_ab,optimize=True)
-               s[s_aaa:f_aaa] -= temp[:,ab_ind_a[0],ab_ind_a[1] ].reshape(-1)
+               temp  = -v2e_terms["lyd_ab"]
+               temp_1= -einsum(direct_adc, 'Zlyd,lixd->Zixy',temp,t2_1_ab)
+               s[:,s_bab:f_bab] -= temp_1.reshape(nvec,-1)
 
-               temp  = -np.einsum('lybd,b->lyd',v2e_ovvv_ab,r_a,optimize=True)
-               temp_1= -np.einsum('lyd,lixd->ixy',temp,t2_1_ab,optimize=True)
-               s[s_bab:f_bab] -= temp_1.reshape(-1)
+               temp_1 = v2e_terms["lxd_b"]
+               temp_2 = v2e_terms["lxd_ba"]
 
-               temp_1 = np.einsum('ylbd,b->lyd', v2e_vovv_b,r_b,optimize=True)
-               temp_2 = np.einsum('lydb,b->lyd', v2e_ovvv_ab,r_b,optimize=True)
+               temp  = einsum(direct_adc, 'Zlyd,ilxd->Zixy',temp_1,t2_1_b)
+               temp += einsum(direct_adc, 'Zlyd,lidx->Zixy',temp_2,t2_1_ab)
+               s[:,s_bbb:f_bbb] -= temp[:,:,ab_ind_b[0],ab_ind_b[1] ].reshape(nvec,-1)
 
-               temp  = np.einsum('lyd,ilxd->ixy',temp_1,t2_1_b,optimize=True)
-               temp += np.einsum('lyd,lidx->ixy',temp_2,t2_1_ab,optimize=True)
-               s[s_bbb:f_bbb] -= temp[:,ab_ind_b[0],ab_ind_b[1] ].reshape(-1)
+               temp  = -v2e_terms["lyd_ba"]
+               temp_1= -einsum(direct_adc, 'Zlyd,ildx->Zixy',temp,t2_1_ab)
+               s[:,s_aba:f_aba] -= temp_1.reshape(nvec,-1)
 
-               temp  = -np.einsum('yldb,b->lyd',v2e_vovv_ab,r_b,optimize=True)
-               temp_1= -np.einsum('lyd,ildx->ixy',temp,t2_1_ab,optimize=True)
-               s[s_aba:f_aba] -= temp_1.reshape(-1)
+        direct_adc.v2e.io_stats.add_call(direct_adc.v2e.io_stats.nbytes - nbytes_read)
 
         if (direct_adc.algorithm == "GF"):
             s *= -1.0
 
         return s
 
+    def sigma_(r):
+
+        return apply_blocks(direct_adc, sigma_block, r)
+
     if (direct_adc.algorithm == "GF"):
 
         precond_ = -precond.copy()
@@ -2773,10 +3316,88 @@ def solve_conjugate_gradients(direct_adc,apply_H,precond,T,r,omega,orb):
 
     return r
 
+# Conjugate gradients for the rows of T (one orbital each) at one frequency.
+# Every row has its own coefficients, as in solve_conjugate_gradients; the
+# sigma vectors of all unconverged rows are formed in one block call.
+def solve_conjugate_gradients_block(direct_adc,apply_H,precond,T,r,omega):
+
+    maxiter = direct_adc.maxiter
+    iomega = omega + direct_adc.broadening*1j
+
+    def rows_dot(x, y):
+        return np.array([np.dot(np.ravel(a), np.ravel(b)) for a, b in zip(x, y)])
+
+    def rows_rms(x):
+        return np.array([np.linalg.norm(a)/np.sqrt(a.size) for a in x])
+
+    # Compute residuals
+
+    r = np.array(r, dtype=complex)
+    res = T - (iomega*r + apply_H(r))
+
+    active = np.flatnonzero(rows_rms(res) >= 1e-8)
+    if len(active) == 0:
+        return r
+
+    res = res[active]
+    d = (precond+omega)**(-1)*res
+    delta_new = rows_dot(res, d)
+
+    for imacro in range(maxiter):
+
+        q = iomega*d + apply_H(d)
+
+        alpha = delta_new / rows_dot(d, q)
+
+        r[active] = r[active] + alpha[:,None] * d
+
+        res = res - alpha[:,None] * q
+        s = (precond+omega)**(-1)*res
+
+        delta_old = delta_new
+        delta_new = rows_dot(res, s)
+
+        beta = delta_new/delta_old
+
+        d = s + beta[:,None] * d
+
+        # Compute RMS of the residuals; converged rows are dropped
+        rms = rows_rms(res)
+
+        print ("freq","   ",iomega,"   ","Iteration ", imacro, "  ",": RMS = %8.4e" % np.max(rms), " (%d unconverged)" % np.count_nonzero(rms >= direct_adc.tol))
+
+        keep = rms >= direct_adc.tol
+        active, res, d, delta_new = active[keep], res[keep], d[keep], delta_new[keep]
+        if len(active) == 0:
+            break
+
+    if len(active) == 0:
+        print ("Iterations converged")
+    else:
+        raise Exception("Iterations did not converge")
+
+    return r
+
 #############
 # Davidson #
 #############
 
+# pyscf's davidson1 passes all new trial vectors of an iteration to aop at
+# once, so they are applied to H as one block. A davidson function set by the
+# user is called as before, with one vector per sigma call.
+def davidson(direct_adc, apply_H, x0, precond):
+
+    kwargs = dict(nroots = direct_adc.nstates, verbose = direct_adc.verbose, max_cycle = direct_adc.max_cycle, max_space = direct_adc.max_space)
+    if direct_adc.davidson is not linalg_helper.davidson:
+        return direct_adc.davidson(apply_H, x0, precond, **kwargs)
+
+    aop = lambda xs: list(apply_H(np.array(xs)))
+    conv, E, U = linalg_helper.davidson1(aop, x0, precond, **kwargs)
+    if direct_adc.nstates == 1:
+        return E[0], U[0]
+
+    return E, U
+
 def setup_davidson_ip(direct_adc, t_amp):
 
     apply_H = None
@@ -2952,6 +3573,7 @@ def spec_factors_ip(direct_adc, t_amp, U):
 
     U = np.array(U)
 
+    # Frozen orbitals do not couple to the active-space states and add nothing
     for orb in range(nmo_a):
 
             T_a = calculate_T_ip(direct_adc, t_amp, orb, spin = "alpha")
@@ -2986,6 +3608,7 @@ def spec_factors_ea(direct_adc, t_amp, U):
 
     U = np.array(U)
 
+    # Frozen orbitals do not couple to the active-space states and add nothing
     for orb in range(nmo_a):
 
             T_a = calculate_T_ea(direct_adc, t_amp, orb, spin = "alpha")
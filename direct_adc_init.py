@@ -8,6 +8,18 @@ import pyscf.ao2mo
 import pyscf.lib
 import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
 import direct_adc_spin_integrated.disk_helper as disk_helper
+import direct_adc_spin_integrated.df_helper as df_helper
+import direct_adc_spin_integrated.pack_helper as pack_helper
+import direct_adc_spin_integrated.cache_helper as cache_helper
+import direct_adc_spin_integrated.memory_helper as memory_helper
+import direct_adc_spin_integrated.parallel_helper as parallel_helper
+import direct_adc_spin_integrated.ao_helper as ao_helper
+import direct_adc_spin_integrated.precision_helper as precision_helper
+import direct_adc_spin_integrated.sparse_helper as sparse_helper
+import direct_adc_spin_integrated.fno_helper as fno_helper
+import direct_adc_spin_integrated.einsum_helper as einsum_helper
+import direct_adc_spin_integrated.shm_helper as shm_helper
+import direct_adc_spin_integrated.transform_helper as transform_helper
 
 class DirectADC:
     def __init__(self, mf):
@@ -77,6 +89,14 @@ class DirectADC:
         else:
             raise Exception("ADC code is not implemented for this reference")
 
+        # Full orbital spaces, restricted to the active orbitals by freeze_orbitals
+        self.nmo_a_full = self.nmo_a
+        self.nmo_b_full = self.nmo_b
+        self.mo_a_full = self.mo_a
+        self.mo_b_full = self.mo_b
+        self.mo_energy_a_full = self.mo_energy_a
+        self.mo_energy_b_full = self.mo_energy_b
+
 	##########################################################
         ### ADC specific variables for different implementations##
 	##########################################################
@@ -90,6 +110,32 @@ class DirectADC:
         self.method = "adc(3)" # Order of ADC used. Can be ADC(2), ADC(3) or ADC(2)-E
         self.algorithm = "conventional" # Implementation used. Can be conventional, GF (for Green's Function) or CVS
         self.disk = False    # Whether to use disk
+        self.disk_backend = "hdf5" # Can be hdf5 (one chunked HDF5 file) or memmap (np.memmap files)
+        self.scratch_dir = None  # Directory for the scratch file (default: system temporary directory)
+        self.compression = None  # HDF5 compression of scratch datasets, e.g. "gzip" or "lzf"
+        self.scratch = None      # Scratch store, opened by transform_integrals when disk = True
+        self.closed_shell = "RHF" in str(type(mf)) # Alias beta integral and amplitude blocks to alpha (RHF only)
+        self.max_memory = 2000 # Memory (MB) for integral blocks assembled on the fly
+        self.precision = "double" # Can be double or mixed (float32 integrals and t2 amplitudes, float64 contractions)
+        self.screening = 0.0     # Blocks of in-memory vvvv, vvvo, vvov integrals with no element above this magnitude are dropped, such blocks of the dense t2_1 are zeroed (0: no screening)
+        self.screening_block = 8 # Tile size (orbitals, or orbital pairs for packed vvvv) along the first two indices for screening
+        self.frozen_core = 0     # Number of lowest spatial orbitals kept frozen (not correlated, not ionized)
+        self.frozen_virtual = 0  # Number of highest spatial orbitals left out of the calculation
+        self.fno = False         # Truncate the active virtual space to MP2 frozen natural orbitals
+        self.fno_threshold = 1e-4 # MP2 natural occupation below which virtual orbitals are dropped with fno = True
+
+        # Two-electron integrals
+        self.integrals = "exact"  # Can be exact, DF (density fitting) or CD (Cholesky decomposition)
+        self.auxbasis = None      # Auxiliary basis for DF (default: MP2-fitting basis)
+        self.cd_threshold = 1e-6  # Threshold for CD
+        self.vvvv_integrals = "MO" # Can be MO (transformed vvvv class) or AO (AO-direct vvvv contractions, exact integrals only)
+        self.cache_dir = None     # Directory of the persistent integral cache (None: no cache, exact integrals only)
+        self.cache_size = 10000   # Size limit (MB) of the integral cache, least recently used entries are removed
+        self.amplitude_file = None # HDF5 checkpoint of the amplitudes: read if it matches the job (skipping their computation), else written once they are computed
+        self.transform_workers = 1  # Threads running independent transformation jobs (spin blocks, classes)
+        self.blas_threads = None    # OpenMP/BLAS threads per transform worker (default: all threads / transform_workers)
+        self.einsum_backend = "tensordot" # Contractions with plans cached per job: einsum (uncached np.einsum), numpy (cached paths), tensordot (cached GEMM steps) or opt_einsum
+        self.memory_report = False # Print the peak memory allocated in each amplitude stage (traced with tracemalloc)
 
 	### Conventional ADC ###
         self.davidson = pyscf.lib.linalg_helper.davidson #Use of Davidson iterative algorithm for solving eigenvalue equation
@@ -97,6 +143,7 @@ class DirectADC:
         self.verbose = 6     # Verbose level
         self.max_cycle = 150 # Maximum number of iterations
         self.max_space = 12  # Space size to hold trial vectors
+        self.sigma_block = 16 # Vectors H is applied to in one sigma call (block Davidson, GF orbitals solved together); 1: one vector at a time
 
 	### Green's Function ADC ###
         self.step = 0.01 # Step size
@@ -105,6 +152,7 @@ class DirectADC:
         self.tol = 1e-6               #Threshold for linear equations convergence
         self.maxiter = 200            #Maximum number of iterations
         self.freq_outer_loop = True   #True if frequency forms the outer loop. If False, orbitals form the outer loop
+        self.gf_workers = 1           # Processes computing orbitals of the GF, sharing integrals and amplitudes in shared memory
 
 	### CVS-ADC for core-ionization ###
         self.n_core = 5 # number of core spatial orbitals
@@ -112,8 +160,9 @@ class DirectADC:
 	#################################
 	########## Integrals ############
 	#################################
-        self.v2e = lambda:None
+        self.v2e = None # IntegralRegistry, set up by transform_integrals
         self.h1e_ao = mf.get_hcore()
+        self.mol = mf.mol
         if mf._eri is None:
             self.v2e_ao = mf.mol
         else:
@@ -121,120 +170,651 @@ class DirectADC:
 
     def kernel(self):
 
-        self.transform_integrals()
-        if self.algorithm == "GF":
-            direct_adc_compute.kernel(self)
-        elif self.algorithm == "conventional" or self.algorithm == "cvs":
-            direct_adc_compute.conventional(self)
+        # The scratch store is removed when the calculation ends, also on errors
+        with disk_helper.scratch_store(self.disk_backend, self.scratch_dir, self.compression, self.storage_dtype()) as self.scratch:
+            self.transform_integrals()
+            if self.algorithm == "GF":
+                direct_adc_compute.kernel(self)
+            elif self.algorithm == "conventional" or self.algorithm == "cvs":
+                direct_adc_compute.conventional(self)
+            else:
+                raise Exception("Algorithm is not recognized")
+
+        self.scratch = None
+
+    ### Active orbital space ###
+    # Frozen orbitals are dropped from the MOs and orbital energies, so the
+    # integrals, amplitudes and IP/EA spaces only span the active orbitals.
+    # The full orbitals are kept for the frozen-orbital part of the GF trace.
+    def freeze_orbitals(self):
+
+        ncore = self.frozen_core
+        nfrozen_vir = self.frozen_virtual
+
+        if ncore < 0 or nfrozen_vir < 0:
+            raise Exception("Number of frozen orbitals must not be negative")
+        if ncore >= min(self.nelec_a, self.nelec_b):
+            raise Exception("At least one occupied orbital of each spin must be active")
+        if nfrozen_vir >= min(self.nmo_a_full - self.nelec_a, self.nmo_b_full - self.nelec_b):
+            raise Exception("At least one virtual orbital of each spin must be active")
+        if ncore > 0 and self.algorithm == "cvs":
+            raise Exception("Frozen core orbitals are not available with CVS")
+
+        self.nmo_a = self.nmo_a_full - ncore - nfrozen_vir
+        self.nmo_b = self.nmo_b_full - ncore - nfrozen_vir
+        self.mo_a = self.mo_a_full[:,ncore:ncore+self.nmo_a]
+        self.mo_b = self.mo_b_full[:,ncore:ncore+self.nmo_b]
+        self.mo_energy_a = self.mo_energy_a_full[ncore:ncore+self.nmo_a]
+        self.mo_energy_b = self.mo_energy_b_full[ncore:ncore+self.nmo_b]
+        self.nocc_a = self.nelec_a - ncore
+        self.nocc_b = self.nelec_b - ncore
+        self.nvir_a = self.nmo_a - self.nocc_a
+        self.nvir_b = self.nmo_b - self.nocc_b
+        self.fno_energy_a = np.zeros(0)
+        self.fno_energy_b = np.zeros(0)
+
+    ### MP2 frozen natural orbitals ###
+    # The first-order amplitudes of the active space are built from the oovv
+    # class alone. Virtual orbitals with an MP2 natural occupation below
+    # fno_threshold are dropped and the kept ones replace the active virtuals,
+    # semicanonicalized so that the orbital energies stay diagonal. The dropped
+    # orbitals enter the GF trace as bare poles, like frozen virtual orbitals.
+    def frozen_natural_orbitals(self):
+
+        nocc = (self.nocc_a, self.nocc_b)
+
+        if self.integrals == "exact":
+            v2e_oovv = oovv_integrals(self.v2e_ao, (self.mo_a, self.mo_b), nocc, self.closed_shell, self.max_memory)
+        elif self.integrals == "DF" or self.integrals == "CD":
+            v2e = df_helper.blocks(self.load_factors(), nocc, "oovv", self.closed_shell)
+            v2e_a = np.asarray(v2e[0])
+            v2e_oovv = (v2e_a, np.asarray(v2e[1]), v2e_a if self.closed_shell else np.asarray(v2e[2]))
         else:
-            raise Exception("Algorithm is not recognized")
+            raise Exception("Integral type is not recognized")
+
+        e_occ = (self.mo_energy_a[:self.nocc_a], self.mo_energy_b[:self.nocc_b])
+        e_vir = (self.mo_energy_a[self.nocc_a:], self.mo_energy_b[self.nocc_b:])
 
-        if self.disk:
-            disk_helper.remove_dataset(self.v2e.vvvv[0])
-            disk_helper.remove_dataset(self.v2e.vvvv[1])
-            disk_helper.remove_dataset(self.v2e.vvvv[2])
+        t2_1 = fno_helper.mp2_amplitudes(v2e_oovv, e_occ, e_vir)
+        e_mp2 = fno_helper.mp2_energy(v2e_oovv, t2_1)
+
+        dm_a, dm_b = fno_helper.virtual_density(t2_1, self.closed_shell)
+        rot_a, e_vir_a, self.fno_energy_a, occ_a = fno_helper.truncate(dm_a, e_vir[0], self.fno_threshold)
+        if self.closed_shell:
+            rot_b, e_vir_b, self.fno_energy_b, occ_b = rot_a, e_vir_a, self.fno_energy_a, occ_a
+        else:
+            rot_b, e_vir_b, self.fno_energy_b, occ_b = fno_helper.truncate(dm_b, e_vir[1], self.fno_threshold)
+        del t2_1
+
+        # MP2 energy in the kept space, from the rotated oovv class
+        v2e_oovv = (fno_helper.rotate_oovv(v2e_oovv[0], rot_a, rot_a),
+                    fno_helper.rotate_oovv(v2e_oovv[1], rot_a, rot_b),
+                    fno_helper.rotate_oovv(v2e_oovv[2], rot_b, rot_b))
+        e_vir_fno = (e_vir_a, e_vir_b)
+        e_mp2_fno = fno_helper.mp2_energy(v2e_oovv, fno_helper.mp2_amplitudes(v2e_oovv, e_occ, e_vir_fno))
+
+        self.fno_info = {"nvir": (self.nvir_a, self.nvir_b), "nkeep": (len(e_vir_a), len(e_vir_b)),
+                         "occupations": (occ_a, occ_b), "e_mp2": e_mp2, "e_mp2_fno": e_mp2_fno}
+
+        self.mo_a = np.hstack((self.mo_a[:,:self.nocc_a], np.dot(self.mo_a[:,self.nocc_a:], rot_a)))
+        self.mo_b = np.hstack((self.mo_b[:,:self.nocc_b], np.dot(self.mo_b[:,self.nocc_b:], rot_b)))
+        self.mo_energy_a = np.concatenate((e_occ[0], e_vir_a))
+        self.mo_energy_b = np.concatenate((e_occ[1], e_vir_b))
+        self.nvir_a = len(e_vir_a)
+        self.nvir_b = len(e_vir_b)
+        self.nmo_a = self.nocc_a + self.nvir_a
+        self.nmo_b = self.nocc_b + self.nvir_b
 
     ### Integral transformation ###
+    # With fno = True the integrals are transformed in the truncated virtual space
     def transform_integrals(self):
+        self.freeze_orbitals()
+
+        self.scheduler = parallel_helper.Scheduler(self.transform_workers, self.blas_threads)
+        self.contractions = einsum_helper.ContractionPlans(self.einsum_backend)
+        self.amplitude_allocations = memory_helper.StageAllocations(self.memory_report)
+
+        if self.fno:
+            self.frozen_natural_orbitals()
+
         h1e_ao = self.h1e_ao
         self.h1e_a = reduce(np.dot, (self.mo_a.T, h1e_ao, self.mo_a))
         self.h1e_b = reduce(np.dot, (self.mo_b.T, h1e_ao, self.mo_b))
 
-        occ_a = self.mo_a[:,:self.nocc_a].copy()
-        occ_b = self.mo_b[:,:self.nocc_b].copy()
-        vir_a = self.mo_a[:,self.nocc_a:].copy()
-        vir_b = self.mo_b[:,self.nocc_b:].copy()
-
-        occ = occ_a, occ_b
-        vir = vir_a, vir_b
-
-        self.v2e.oovv = transform_antisymmetrize_integrals(self.v2e_ao, (occ,occ,vir,vir))
-        self.v2e.vvvv = transform_antisymmetrize_integrals(self.v2e_ao, (vir,vir,vir,vir))
-        self.v2e.oooo = transform_antisymmetrize_integrals(self.v2e_ao, (occ,occ,occ,occ))
-        self.v2e.voov = transform_antisymmetrize_integrals(self.v2e_ao, (vir,occ,occ,vir))
-        self.v2e.ooov = transform_antisymmetrize_integrals(self.v2e_ao, (occ,occ,occ,vir))
-        self.v2e.vovv = transform_antisymmetrize_integrals(self.v2e_ao, (vir,occ,vir,vir), self.disk)
-        self.v2e.vvoo = transform_antisymmetrize_integrals(self.v2e_ao, (vir,vir,occ,occ))
-        self.v2e.vvvo = transform_antisymmetrize_integrals(self.v2e_ao, (vir,vir,vir,occ), self.disk)
-        self.v2e.ovoo = transform_antisymmetrize_integrals(self.v2e_ao, (occ,vir,occ,occ))
-        self.v2e.ovov = transform_antisymmetrize_integrals(self.v2e_ao, (occ,vir,occ,vir))
-        self.v2e.vooo = transform_antisymmetrize_integrals(self.v2e_ao, (vir,occ,occ,occ))
-        self.v2e.oovo = transform_antisymmetrize_integrals(self.v2e_ao, (occ,occ,vir,occ))
-        self.v2e.vovo = transform_antisymmetrize_integrals(self.v2e_ao, (vir,occ,vir,occ))
-        self.v2e.vvov = transform_antisymmetrize_integrals(self.v2e_ao, (vir,vir,occ,vir), self.disk)
-        self.v2e.ovvo = transform_antisymmetrize_integrals(self.v2e_ao, (occ,vir,vir,occ))
-        self.v2e.ovvv = transform_antisymmetrize_integrals(self.v2e_ao, (occ,vir,vir,vir), self.disk)
-
-def transform_antisymmetrize_integrals(v2e_ao, mo, disk = False):
-
-    mo_1, mo_2, mo_3, mo_4 = mo
-
-    mo_1_a, mo_1_b = mo_1
-    mo_2_a, mo_2_b = mo_2
-    mo_3_a, mo_3_b = mo_3
-    mo_4_a, mo_4_b = mo_4
-
-    v2e_a = None
-#    if mf._eri is None:
-#        v2e_a = pyscf.ao2mo.general(mf.mol, (mo_1_a, mo_3_a, mo_2_a, mo_4_a), compact=False)
-#    else :
-#        v2e_a = pyscf.ao2mo.general(mf._eri, (mo_1_a, mo_3_a, mo_2_a, mo_4_a), compact=False)
-    v2e_a = pyscf.ao2mo.general(v2e_ao, (mo_1_a, mo_3_a, mo_2_a, mo_4_a), compact=False)
-    v2e_a = v2e_a.reshape(mo_1_a.shape[1], mo_3_a.shape[1], mo_2_a.shape[1], mo_4_a.shape[1])
-    v2e_a = v2e_a.transpose(0,2,1,3).copy()
-
-    if (mo_1_a is mo_2_a):
-        v2e_a -= v2e_a.transpose(1,0,2,3).copy()
-    elif (mo_3_a is mo_4_a):
-        v2e_a -= v2e_a.transpose(0,1,3,2).copy()
-    else:
-        v2e_temp = None
-#        if mf._eri is None:
-#            v2e_temp = pyscf.ao2mo.general(mf.mol, (mo_1_a, mo_4_a, mo_2_a, mo_3_a), compact=False)
-#        else :
-#            v2e_temp = pyscf.ao2mo.general(mf._eri, (mo_1_a, mo_4_a, mo_2_a, mo_3_a), compact=False)
-        v2e_temp = pyscf.ao2mo.general(v2e_ao, (mo_1_a, mo_4_a, mo_2_a, mo_3_a), compact=False)
-        v2e_temp = v2e_temp.reshape(mo_1_a.shape[1], mo_4_a.shape[1], mo_2_a.shape[1], mo_3_a.shape[1])
-        v2e_a -= v2e_temp.transpose(0,2,3,1).copy()
-        del v2e_temp
-
-    v2e_a = disk_helper.dataset(v2e_a) if disk else v2e_a
-
-    v2e_b = None
-#    if mf._eri is None:
-#        v2e_b = pyscf.ao2mo.general(mf.mol, (mo_1_b, mo_3_b, mo_2_b, mo_4_b), compact=False)
-#    else:
-#        v2e_b = pyscf.ao2mo.general(mf._eri, (mo_1_b, mo_3_b, mo_2_b, mo_4_b), compact=False)
-    v2e_b = pyscf.ao2mo.general(v2e_ao, (mo_1_b, mo_3_b, mo_2_b, mo_4_b), compact=False)
-    v2e_b = v2e_b.reshape(mo_1_b.shape[1], mo_3_b.shape[1], mo_2_b.shape[1], mo_4_b.shape[1])
-    v2e_b = v2e_b.transpose(0,2,1,3).copy()
-
-    if (mo_1_b is mo_2_b):
-        v2e_b -= v2e_b.transpose(1,0,2,3).copy()
-    elif (mo_3_b is mo_4_b):
-        v2e_b -= v2e_b.transpose(0,1,3,2).copy()
+        if self.precision != "double" and self.precision != "mixed":
+            raise Exception("Precision is not recognized")
+
+        if self.disk and self.scratch is None:
+            self.scratch = disk_helper.scratch_store(self.disk_backend, self.scratch_dir, self.compression, self.storage_dtype())
+
+        if self.vvvv_integrals != "MO" and self.vvvv_integrals != "AO":
+            raise Exception("vvvv integral type is not recognized")
+
+        # Integral classes are only transformed when first used
+        if self.integrals == "exact" and self.cache_dir is not None:
+            self.integral_cache = cache_helper.IntegralCache(self.cache_dir, self.cache_size, self.max_memory)
+            self.fingerprint = cache_helper.fingerprint((self.mo_a, self.mo_b), (self.nocc_a, self.nocc_b), self.v2e_ao, self.closed_shell, self.precision)
+            self.v2e = IntegralRegistry(self.load_mo_integrals, self.build_mo_integrals, self.load_cached_integrals, self.store_cached_integrals, self.scheduler, self.plan_mo_integrals)
+        elif self.integrals == "exact":
+            self.v2e = IntegralRegistry(self.load_mo_integrals, self.build_mo_integrals, scheduler=self.scheduler, plan=self.plan_mo_integrals)
+        elif self.integrals == "DF" or self.integrals == "CD":
+            if self.vvvv_integrals == "AO":
+                raise Exception("AO-direct vvvv requires exact integrals")
+            self.v2e = IntegralRegistry(self.load_factors, self.build_factorized_integrals, scheduler=self.scheduler)
+        else:
+            raise Exception("Integral type is not recognized")
+
+        # The cache holds the unscreened classes
+        if self.screening > 0.0:
+            self.v2e.screen = self.screened
+
+        # Amplitudes depend on the active orbitals and every setting of their equations
+        if self.amplitude_file is not None:
+            options = (self.method, self.integrals, self.auxbasis, self.cd_threshold, self.screening, self.screening_block)
+            self.amplitude_fingerprint = cache_helper.fingerprint((self.mo_a, self.mo_b, self.mo_energy_a, self.mo_energy_b), (self.nocc_a, self.nocc_b), self.v2e_ao, self.closed_shell, self.precision, options)
+
+    def load_mo_integrals(self):
+
+        return transform_helper.MOIntegrals(self.v2e_ao, (self.mo_a, self.mo_b), (self.nocc_a, self.nocc_b), self.closed_shell, self.max_memory, self.scheduler, self.v2e.transformed)
+
+    def plan_mo_integrals(self, source, classes):
+
+        if self.vvvv_integrals == "AO":
+            classes = [x for x in classes if x != "vvvv"]
+
+        source.plan(classes)
+
+    def build_mo_integrals(self, source, spaces):
+
+        nocc = (self.nocc_a, self.nocc_b)
+
+        if spaces == "vvvv" and self.vvvv_integrals == "AO":
+            return ao_helper.blocks(self.mol, (self.mo_a, self.mo_b), nocc, self.closed_shell, self.max_memory)
+        scratch = self.scratch if self.disk and spaces in DISK_CLASSES else None
+
+        v2e = antisymmetrize_integrals(source, spaces, scratch, self.closed_shell, self.max_memory, self.scheduler, self.storage_dtype())
+
+        return self.stored(v2e)
+
+    def load_cached_integrals(self, spaces):
+
+        if spaces == "vvvv" and self.vvvv_integrals == "AO":
+            return None
+
+        scratch = self.scratch if self.disk and spaces in DISK_CLASSES else None
+
+        v2e = self.integral_cache.load(self.fingerprint, spaces, scratch, self.closed_shell)
+        if v2e is not None and self.closed_shell:
+            v2e = (v2e[0], v2e[1], direct_adc_compute.readonly_view(v2e[0]))
+
+        return self.stored(v2e)
+
+    def store_cached_integrals(self, spaces, v2e):
+
+        if spaces == "vvvv" and self.vvvv_integrals == "AO":
+            return
+
+        self.integral_cache.store(self.fingerprint, spaces, v2e, self.closed_shell)
+
+    ### Density-fitted or Cholesky-decomposed integrals ###
+    # Only the three-index MO factors B^Q_pq are stored. The vvvv and ovvv-type
+    # classes are assembled from them on demand; the smaller classes are built once.
+    def load_factors(self):
+
+        if self.integrals == "DF":
+            cderi = df_helper.density_fitting_eri(self.mol, self.auxbasis)
+        else:
+            cderi = df_helper.cholesky_eri(self.mol, self.cd_threshold)
+
+        jobs = [("a", lambda cderi=cderi, mo=self.mo_a: df_helper.mo_factors(cderi, mo))]
+        if not self.closed_shell:
+            jobs.append(("b", lambda cderi=cderi, mo=self.mo_b: df_helper.mo_factors(cderi, mo)))
+        B = self.scheduler.run(jobs)
+        del cderi
+
+        return (B["a"], B["a"] if self.closed_shell else B["b"])
+
+    def build_factorized_integrals(self, factors, spaces):
+
+        nocc = (self.nocc_a, self.nocc_b)
+
+        v2e = df_helper.blocks(factors, nocc, spaces, self.closed_shell)
+        if spaces not in DF_CLASSES:
+            names = ("a", "ab") if self.closed_shell else ("a", "ab", "b")
+            v2e = self.scheduler.run([(name, block.__array__) for name, block in zip(names, v2e)])
+            v2e_b = direct_adc_compute.readonly_view(v2e["a"]) if self.closed_shell else v2e["b"]
+            v2e = self.stored((v2e["a"], v2e["ab"], v2e_b))
+
+        return v2e
+
+    ### Storage precision ###
+    def storage_dtype(self):
+
+        return np.float32 if self.precision == "mixed" else None
+
+    def stored(self, v2e):
+
+        if self.precision == "mixed":
+            return precision_helper.single_blocks(v2e, self.closed_shell)
+
+        return v2e
+
+    ### Magnitude screening ###
+    def screened(self, spaces, v2e):
+
+        if spaces not in SCREENED_CLASSES:
+            return v2e
+
+        return sparse_helper.screen_blocks(v2e, self.screening, self.screening_block, self.closed_shell)
+
+    ### Worker processes ###
+    # The integral classes built so far and t_amp are published in the shared
+    # store; the options and orbital data are copied. Classes that a worker
+    # needs must have been built before share() is called.
+    def share(self, store, t_amp):
+
+        v2e = dict((spaces, store.publish(self.v2e.blocks[spaces]))
+                   for spaces in self.v2e.blocks if spaces not in DERIVED_CLASSES)
+        state = dict((key, value) for key, value in self.__dict__.items() if key not in NOT_SHARED)
+
+        return state, {"v2e": v2e, "t_amp": store.publish(t_amp)}
+
+    @classmethod
+    def attach(cls, state, manifest, segments):
+
+        direct_adc = cls.__new__(cls)
+        direct_adc.__dict__.update(state)
+
+        v2e = dict((spaces, shm_helper.attach(desc, segments)) for spaces, desc in manifest["v2e"].items())
+
+        def not_shared():
+            raise Exception("Integral class was not built before the workers were started")
+
+        direct_adc.v2e = IntegralRegistry(not_shared, None, v2e.get)
+        direct_adc.scratch = None
+        direct_adc.scheduler = None
+        direct_adc.contractions = einsum_helper.ContractionPlans(direct_adc.einsum_backend)
+
+        t_amp = shm_helper.attach(manifest["t_amp"], segments)
+
+        return direct_adc, t_amp
+
+
+##########################################
+### Lazy registry of integral classes ###
+##########################################
+# direct_adc.v2e.<class> returns the (a, ab, b) blocks of <pq||rs>. A class is
+# built from the shared source (MO integrals or DF/CD factors) on first access,
+# or read from the persistent cache when one is set up. Classes in
+# DERIVED_CLASSES are transposed views of their parent class.
+# The stage attribute is set by the compute functions to record which classes
+# each stage of the calculation touches. prefetch() builds several classes at
+# once on the transform scheduler, after passing them to plan, when set, so
+# that the source can drop data that no later class needs. io_stats collects the chunked reads of
+# blocks that are not held in memory. screen, when set, is applied to each
+# class after it is built or read from the cache; screening collects the
+# tiles kept per screened block; transformed, the intermediates the source
+# made.
+class IntegralRegistry:
+
+    def __init__(self, load_source, build, load_cached = None, store_cached = None, scheduler = None, plan = None):
+
+        self.load_source = load_source
+        self.plan = plan
+        self.build = build
+        self.load_cached = load_cached
+        self.store_cached = store_cached
+        self.scheduler = scheduler
+        self.source = None
+        self.blocks = {}
+        self.cached = []
+        self.stage = None
+        self.usage = {}
+        self.io_stats = disk_helper.IOStats()
+        self.screen = None
+        self.screening = {}
+        self.transformed = []
+
+    def __getattr__(self, spaces):
+
+        if spaces not in V2E_CLASSES:
+            raise AttributeError(spaces)
+
+        v2e = self.load(spaces)
+
+        usage = self.usage.setdefault(self.stage, [])
+        if spaces not in usage:
+            usage.append(spaces)
+
+        return v2e
+
+    def load(self, spaces):
+
+        if spaces in DERIVED_CLASSES and spaces not in self.blocks:
+            parent, axes = DERIVED_CLASSES[spaces]
+            self.blocks[spaces] = tuple(transposed(x, axes) for x in self.load(parent))
+
+        if spaces not in self.blocks:
+            v2e = None
+            if self.load_cached is not None:
+                v2e = self.load_cached(spaces)
+
+            if v2e is not None:
+                self.cached.append(spaces)
+            else:
+                if self.source is None:
+                    self.source = self.load_source()
+                v2e = self.build(self.source, spaces)
+                if self.store_cached is not None:
+                    self.store_cached(spaces, v2e)
+
+            self.blocks[spaces] = self.screened(spaces, v2e)
+
+        return self.blocks[spaces]
+
+    # Classes that are neither cached nor views are built as concurrent jobs,
+    # which split max_memory between them (Scheduler.job_memory)
+    def prefetch(self, classes):
+
+        todo = []
+        for spaces in classes:
+            if spaces in DERIVED_CLASSES:
+                spaces = DERIVED_CLASSES[spaces][0]
+            if spaces in self.blocks or spaces in todo:
+                continue
+            v2e = None
+            if self.load_cached is not None:
+                v2e = self.load_cached(spaces)
+            if v2e is not None:
+                self.cached.append(spaces)
+                self.blocks[spaces] = self.screened(spaces, v2e)
+            else:
+                todo.append(spaces)
+
+        if len(todo) > 0 and self.scheduler is not None:
+            if self.source is None:
+                self.source = self.load_source()
+            source = self.source
+            if self.plan is not None:
+                self.plan(source, todo)
+            jobs = [(spaces, lambda spaces=spaces: self.build(source, spaces)) for spaces in todo]
+            for spaces, v2e in self.scheduler.run(jobs).items():
+                if self.store_cached is not None:
+                    self.store_cached(spaces, v2e)
+                self.blocks[spaces] = self.screened(spaces, v2e)
+
+        for spaces in classes:
+            self.load(spaces)
+
+    def screened(self, spaces, v2e):
+
+        if self.screen is None:
+            return v2e
+
+        v2e = self.screen(spaces, v2e)
+        names = ("a", "ab") if v2e[2] is v2e[0] else ("a", "ab", "b")
+        for name, block in zip(names, v2e):
+            if isinstance(block, pack_helper.TrilBlock):
+                block = block.packed
+            if isinstance(block, sparse_helper.SparseBlock):
+                self.screening[spaces + "_" + name] = (len(block.tiles), block.ntiles, block.size * block.dtype.itemsize, block.nbytes)
+
+        return v2e
+
+    # Drop the shared source once all classes needed for setup have been built.
+    # Classes requested afterwards trigger a new transformation.
+    def release(self):
+
+        self.source = None
+
+    def nbytes(self, spaces):
+
+        in_memory = 0
+        on_disk = 0
+        seen = []
+
+        # Views share the storage of their parent class
+        if spaces in DERIVED_CLASSES:
+            return in_memory, on_disk
+
+        for v2e in self.blocks[spaces]:
+            if isinstance(v2e, pack_helper.TrilBlock):
+                v2e = v2e.packed
+            base = v2e
+            while isinstance(base, np.ndarray) and isinstance(base.base, np.ndarray):
+                base = base.base
+            if any(base is x for x in seen):
+                continue
+            seen.append(base)
+
+            if isinstance(v2e, np.memmap):
+                on_disk += v2e.nbytes
+            elif isinstance(v2e, (np.ndarray, sparse_helper.SparseBlock)):
+                in_memory += v2e.nbytes
+            elif not isinstance(v2e, (df_helper.DFBlock, ao_helper.AOBlock)):
+                on_disk += v2e.size * v2e.dtype.itemsize
+
+        return in_memory, on_disk
+
+    def report(self):
+
+        print ("Integral classes used per stage:")
+        for stage, classes in self.usage.items():
+            print ("  %-12s" % stage, " ".join(classes))
+
+        print ("Integral classes held (MB):     memory       disk")
+        for spaces in V2E_CLASSES:
+            if spaces in DERIVED_CLASSES and spaces in self.blocks:
+                print ("  %-28s %21s" % (spaces, "view of " + DERIVED_CLASSES[spaces][0]))
+            elif spaces in self.blocks:
+                in_memory, on_disk = self.nbytes(spaces)
+                print ("  %-28s %10.2f %10.2f" % (spaces, in_memory/1e6, on_disk/1e6))
+
+        skipped = [x for x in V2E_CLASSES if x not in self.blocks]
+        if self.load_cached is not None:
+            print ("Integral classes read from cache:", " ".join(self.cached))
+        print ("Integral classes not transformed:", " ".join(skipped))
+        if len(self.transformed) > 0:
+            print ("Half-transformed intermediates (MB):", " ".join("%s %.2f" % (name, nbytes/1e6) for name, nbytes in self.transformed))
+        if len(self.screening) > 0:
+            print ("Screened blocks:          tiles kept   compression")
+            for name, (kept, total, dense, nbytes) in self.screening.items():
+                ratio = "%.2f" % (dense / nbytes) if nbytes > 0 else "all dropped"
+                print ("  %-22s %6d/%-6d %14s" % (name, kept, total, ratio))
+        if self.scheduler is not None:
+            self.scheduler.report()
+        self.io_stats.report()
+        print ()
+
+def transposed(v2e, axes):
+
+    if isinstance(v2e, np.ndarray):
+        return v2e.transpose(axes)
+
+    return TransposedBlock(v2e, axes)
+
+
+# Transposed view of a block that is not an in-memory array (on disk, DF).
+# Slices and integer indices are mapped onto the parent block.
+class TransposedBlock:
+
+    def __init__(self, base, axes):
+
+        self.base = base
+        self.axes = tuple(axes)
+
+        self.shape = tuple(base.shape[i] for i in self.axes)
+        self.ndim = len(self.shape)
+        self.dtype = base.dtype
+        self.size = base.size
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if any(not isinstance(k, (slice, int, np.integer)) for k in key):
+            return self[:][key]
+
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        base_key = [None] * self.ndim
+        for i, k in enumerate(key):
+            base_key[self.axes[i]] = k
+        v2e = self.base[tuple(base_key)]
+
+        # Axes that survive indexing, in parent order, brought into the order of this view
+        kept = [self.axes[i] for i, k in enumerate(key) if isinstance(k, slice)]
+        order = sorted(kept)
+        return v2e.transpose([order.index(x) for x in kept])
+
+    def __array__(self, dtype=None, copy=None):
+
+        v2e = self[:]
+        return v2e if dtype is None else v2e.astype(dtype)
+
+
+# Integral classes built by transform_integrals (index order of <pq||rs>)
+V2E_CLASSES = ("oovv", "vvvv", "oooo", "voov", "ooov", "vovv", "vvoo", "vvvo",
+               "ovoo", "ovov", "vooo", "oovo", "vovo", "vvov", "ovvo", "ovvv")
+
+# <pq||rs> = <rs||pq> for real orbitals, also for the ab blocks: these classes
+# are transposed views of a parent class instead of being built themselves
+DERIVED_CLASSES = {
+    "vvoo": ("oovv", (2, 3, 0, 1)),
+    "ovoo": ("ooov", (2, 3, 0, 1)),
+    "vooo": ("oovo", (2, 3, 0, 1)),
+    "vovv": ("vvvo", (2, 3, 0, 1)),
+    "ovvv": ("vvov", (2, 3, 0, 1)),
+    "ovvo": ("voov", (2, 3, 0, 1)),
+}
+
+# Attributes that are not copied to worker processes
+NOT_SHARED = ("v2e", "v2e_ao", "h1e_ao", "mol", "scratch", "scheduler", "integral_cache", "contractions")
+
+# Classes stored on disk when disk = True
+DISK_CLASSES = ("vvvv", "vovv", "vvvo", "vvov", "ovvv")
+
+# Classes screened by block magnitude when screening > 0
+SCREENED_CLASSES = ("vvvv", "vvvo", "vvov")
+
+# Same-spin blocks stored as packed antisymmetric pairs
+PACKED_CLASSES = ("vvvv",)
+
+# Classes assembled on demand from DF/CD factors
+DF_CLASSES = DISK_CLASSES
+
+# <ij||ab> alone, from the (ov| intermediates only
+def oovv_integrals(v2e_ao, mo, nocc, closed_shell = False, max_memory = 2000):
+
+    source = transform_helper.MOIntegrals(v2e_ao, mo, nocc, closed_shell, max_memory)
+
+    return antisymmetrize_integrals(source, "oovv", None, closed_shell, max_memory)
+
+def run_jobs(scheduler, jobs):
+
+    if scheduler is None:
+        return dict((name, func()) for name, func in jobs)
+
+    return scheduler.run(jobs)
+
+def job_memory(scheduler, max_memory):
+
+    if scheduler is None:
+        return max_memory
+
+    return scheduler.job_memory(max_memory)
+
+### Antisymmetrized classes from the per-space MO integrals ###
+# Each spin block is assembled one slab of its first index at a time, in
+# memory or in the scratch store; same-spin vvvv is packed on pairs a > b, c > d.
+# In memory the blocks are written in dtype (float32 for mixed precision).
+def antisymmetrize_integrals(source, spaces, scratch = None, closed_shell = False, max_memory = 2000, scheduler = None, dtype = None):
+
+    # The memory cap is shared by the jobs running at the same time: the spin
+    # blocks here, or the classes of a prefetch batch when they run nested
+    def block(spin):
+        shape = source.shape(spaces, spin)
+        rows = lambda p0, p1: source.antisymmetrized(spaces, spin, p0, p1)
+        if spaces in PACKED_CLASSES and spin != "ab":
+            return write_packed(scratch, spaces + "/" + spin, shape[0], rows, job_memory(scheduler, max_memory), dtype)
+        return write_blocked(scratch, spaces + "/" + spin, shape, rows, job_memory(scheduler, max_memory), dtype)
+
+    if closed_shell:
+        v2e = run_jobs(scheduler, [("a", lambda: closed_shell_blocks(source, spaces, scratch, job_memory(scheduler, max_memory), dtype))])
+        v2e = dict(zip(("a", "ab"), v2e["a"]))
     else:
-        v2e_temp = None
-#        if mf._eri is None :
-#            v2e_temp = pyscf.ao2mo.general(mf.mol, (mo_1_b, mo_4_b, mo_2_b, mo_3_b), compact=False)
-#        else : 
-#            v2e_temp = pyscf.ao2mo.general(mf._eri, (mo_1_b, mo_4_b, mo_2_b, mo_3_b), compact=False)
-        v2e_temp = pyscf.ao2mo.general(v2e_ao, (mo_1_b, mo_4_b, mo_2_b, mo_3_b), compact=False)
-        v2e_temp = v2e_temp.reshape(mo_1_b.shape[1], mo_4_b.shape[1], mo_2_b.shape[1], mo_3_b.shape[1])
-        v2e_b -= v2e_temp.transpose(0,2,3,1).copy()
-        del v2e_temp
-
-    v2e_b = disk_helper.dataset(v2e_b) if disk else v2e_b
-
-    v2e_ab = None
-#    if mf._eri is None :
-#        v2e_ab = pyscf.ao2mo.general(mf.mol, (mo_1_a, mo_3_a, mo_2_b, mo_4_b), compact=False)
-#    else :
-#        v2e_ab = pyscf.ao2mo.general(mf._eri, (mo_1_a, mo_3_a, mo_2_b, mo_4_b), compact=False)
-    v2e_ab = pyscf.ao2mo.general(v2e_ao, (mo_1_a, mo_3_a, mo_2_b, mo_4_b), compact=False)
-    v2e_ab = v2e_ab.reshape(mo_1_a.shape[1], mo_3_a.shape[1], mo_2_b.shape[1], mo_4_b.shape[1])
-    v2e_ab = v2e_ab.transpose(0,2,1,3).copy()
-
-    v2e_ab = disk_helper.dataset(v2e_ab) if disk else v2e_ab
-
-    return (v2e_a, v2e_ab, v2e_b)
+        v2e = run_jobs(scheduler, [(spin, lambda spin=spin: block(spin)) for spin in ("a", "ab", "b")])
+
+    source.done(spaces)
+
+    if closed_shell and spaces in PACKED_CLASSES:
+        v2e["b"] = v2e["a"]
+    elif closed_shell:
+        v2e["b"] = direct_adc_compute.readonly_view(v2e["a"])
+
+    return (v2e["a"], v2e["ab"], v2e["b"])
+
+# Closed shells: the same-spin block is <pq|rs> - <pq|sr> of the ab block, so
+# both are written from one pass over slabs of the direct integrals
+def closed_shell_blocks(source, spaces, scratch = None, max_memory = 2000, dtype = None):
+
+    shape = source.shape(spaces, "ab")
+    packed = spaces in PACKED_CLASSES
+    npair = shape[0] * (shape[0] - 1) // 2
+
+    v2e_ab = empty_block(scratch, spaces + "/ab", shape, dtype)
+    v2e_a = empty_block(scratch, spaces + "/a", (npair, npair) if packed else shape, dtype)
+
+    for p0, p1 in row_blocks(shape[0], 4 * int(np.prod(shape[1:])) * 8, max_memory):
+        v2e = source.direct(spaces, "a", "b", p0, p1)
+        v2e_ab[p0:p1] = v2e
+        v2e = v2e - source.exchange(spaces, "a", v2e, p0, p1)
+        if packed:
+            pack_helper.antisymmetrized_pairs(lambda *rows: v2e, shape[0], [(p0, p1)], v2e_a)
+        else:
+            v2e_a[p0:p1] = v2e
+
+    if packed:
+        v2e_a = pack_helper.TrilBlock(v2e_a, shape[0], shape[0])
+
+    return v2e_a, v2e_ab
+
+# A block of the given shape assembled by rows(p0, p1) one slab of its first
+# index at a time, in memory or in the scratch store; max_memory (MB) bounds
+# a slab together with its temporaries
+def write_blocked(scratch, name, shape, rows, max_memory = 2000, dtype = None):
+
+    out = empty_block(scratch, name, shape, dtype)
+
+    for p0, p1 in row_blocks(shape[0], 3 * int(np.prod(shape[1:])) * 8, max_memory):
+        out[p0:p1] = rows(p0, p1)
+
+    return out
+
+# Packed pairs of an antisymmetric block of n x n x n x n, assembled from
+# rows(p0, p1) of the full block in slabs of its first index
+def write_packed(scratch, name, n, rows, max_memory = 2000, dtype = None):
+
+    npair = n * (n - 1) // 2
+    out = empty_block(scratch, name, (npair, npair), dtype)
+
+    # A slab of rows of vvvv with its half-transformed AO integrals
+    chunks = row_blocks(n, 4 * n**3 * 8, max_memory)
+    pack_helper.antisymmetrized_pairs(rows, n, chunks, out)
+
+    return pack_helper.TrilBlock(out, n, n)
+
+# The scratch store keeps its own storage dtype
+def empty_block(scratch, name, shape, dtype = None):
+
+    if scratch is not None:
+        return scratch.empty_dataset(name, shape)
+
+    return np.empty(shape, dtype=dtype)
+
+def row_blocks(nrow, row_size, max_memory = 2000):
+
+    blksize = max(1, int(max_memory * 1e6 / max(1, row_size)))
+    for p0 in range(0, nrow, blksize):
+        yield p0, min(p0 + blksize, nrow)
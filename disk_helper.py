@@ -1,19 +1,262 @@
 import os
+import sys
+import time
 import h5py
+import shutil
 import tempfile
+import threading
+import weakref
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
+# Target size of one HDF5 chunk
+CHUNK_BYTES = 1 << 20
 
-def empty_dataset(shape):
-    _, fname = tempfile.mkstemp()
-    f = h5py.File(fname, mode='w')
-    return f.create_dataset('data', shape)
 
+# Chunks span whole trailing dimensions and as many slices of the leading
+# index as fit in CHUNK_BYTES, matching reads of [p0:p1] row slabs
+def chunk_shape(shape, itemsize):
 
-def dataset(data):
-    _, fname = tempfile.mkstemp()
-    f = h5py.File(fname, mode='w')
-    return f.create_dataset('data', data=data)
+    if 0 in shape:
+        return None
 
+    chunks = []
+    for i, n in enumerate(shape):
+        row_bytes = itemsize * int(np.prod(shape[i+1:]))
+        if row_bytes <= CHUNK_BYTES:
+            chunks.append(max(1, min(n, CHUNK_BYTES // row_bytes)))
+            chunks.extend(shape[i+1:])
+            break
+        chunks.append(1)
 
-def remove_dataset(dataset):
-    os.remove(dataset.file.filename)
+    return tuple(chunks)
+
+
+def remove_file(f, filename):
+    f.close()
+    os.remove(filename)
+
+
+def remove_dir(dirname):
+    shutil.rmtree(dirname, ignore_errors=True)
+
+
+def scratch_store(backend="hdf5", scratch_dir=None, compression=None, dtype=None):
+
+    if backend == "hdf5":
+        return ScratchFile(scratch_dir, compression, dtype)
+    elif backend == "memmap":
+        return MemmapScratch(scratch_dir, dtype)
+    else:
+        raise Exception("Disk backend is not recognized")
+
+
+#####################################################
+### One scratch HDF5 file holding all disk blocks ###
+#####################################################
+# The file is created on the first dataset and removed by close() or on
+# leaving the with-block; otherwise when the object is collected or at exit.
+# If dtype is set, floating-point datasets are stored with that precision.
+class ScratchFile:
+
+    def __init__(self, scratch_dir=None, compression=None, dtype=None):
+
+        self.scratch_dir = scratch_dir
+        self.compression = compression
+        self.dtype = dtype
+        self.filename = None
+        self.file = None
+        self.finalizer = None
+        self.lock = threading.Lock()
+
+    def open(self):
+
+        with self.lock:
+            if self.file is None:
+                fd, self.filename = tempfile.mkstemp(prefix='direct_adc_', suffix='.h5', dir=self.scratch_dir)
+                os.close(fd)
+                self.file = h5py.File(self.filename, mode='w')
+                self.finalizer = weakref.finalize(self, remove_file, self.file, self.filename)
+
+        return self.file
+
+    def empty_dataset(self, name, shape, dtype='f8'):
+
+        f = self.open()
+        if name in f:
+            del f[name]
+
+        if self.dtype is not None and np.dtype(dtype).kind == 'f':
+            dtype = self.dtype
+
+        chunks = chunk_shape(shape, np.dtype(dtype).itemsize)
+        compression = self.compression if chunks is not None else None
+
+        return f.create_dataset(name, shape, dtype=dtype, chunks=chunks, compression=compression)
+
+    def dataset(self, name, data):
+
+        dset = self.empty_dataset(name, data.shape, data.dtype)
+        if data.size > 0:
+            dset[...] = data
+
+        return dset
+
+    def close(self):
+
+        if self.finalizer is not None:
+            self.finalizer()
+
+        self.finalizer = None
+        self.file = None
+        self.filename = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+
+####################################################################
+### Scratch directory of memory-mapped .npy files, one per block ###
+####################################################################
+# Same interface as ScratchFile. Blocks are np.memmap arrays, so slices are
+# read through the page cache without an HDF5 copy. No compression.
+class MemmapScratch:
+
+    def __init__(self, scratch_dir=None, dtype=None):
+
+        self.scratch_dir = scratch_dir
+        self.dtype = dtype
+        self.dirname = None
+        self.finalizer = None
+        self.lock = threading.Lock()
+
+    def open(self):
+
+        with self.lock:
+            if self.dirname is None:
+                self.dirname = tempfile.mkdtemp(prefix='direct_adc_', dir=self.scratch_dir)
+                self.finalizer = weakref.finalize(self, remove_dir, self.dirname)
+
+        return self.dirname
+
+    def empty_dataset(self, name, shape, dtype='f8'):
+
+        if self.dtype is not None and np.dtype(dtype).kind == 'f':
+            dtype = self.dtype
+
+        # Empty blocks cannot be mapped
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+
+        filename = os.path.join(self.open(), name.replace('/', '_') + '.npy')
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+
+    def dataset(self, name, data):
+
+        dset = self.empty_dataset(name, data.shape, data.dtype)
+        if data.size > 0:
+            dset[...] = data
+            dset.flush()
+
+        return dset
+
+    def close(self):
+
+        if self.finalizer is not None:
+            self.finalizer()
+
+        self.finalizer = None
+        self.dirname = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+
+def read_rows(block, p0, p1, axis = 0):
+
+    rows = block[(slice(None),) * axis + (slice(p0, p1),)]
+
+    # Slices of a memmap are only paged in when used
+    if isinstance(rows, np.memmap):
+        return np.array(rows)
+
+    return np.asarray(rows)
+
+
+###################################################
+### Double-buffered reader for row slabs ###
+###################################################
+# Yields (p0, p1, rows) for the given chunks of one index. The next
+# chunk is read on a background thread while the caller works on the current
+# one, so at most two chunks are held. Time spent waiting for a chunk counts
+# as I/O wait, time between chunks as compute.
+def prefetch_rows(block, chunks, stats = None, axis = 0):
+
+    chunks = list(chunks)
+    if len(chunks) == 0:
+        return
+
+    with ThreadPoolExecutor(1) as pool:
+        future = pool.submit(read_rows, block, *chunks[0], axis)
+        for n, (p0, p1) in enumerate(chunks):
+            t_start = time.time()
+            rows = future.result()
+            t_read = time.time()
+            if n + 1 < len(chunks):
+                future = pool.submit(read_rows, block, *chunks[n+1], axis)
+
+            yield p0, p1, rows
+
+            if stats is not None:
+                stats.add(rows.nbytes, t_read - t_start, time.time() - t_read)
+
+
+class IOStats:
+
+    def __init__(self):
+
+        self.nreads = 0
+        self.nbytes = 0
+        self.wait_time = 0.0
+        self.compute_time = 0.0
+        self.ncalls = 0
+        self.call_nbytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, nbytes, wait_time, compute_time):
+
+        with self.lock:
+            self.nreads += 1
+            self.nbytes += nbytes
+            self.wait_time += wait_time
+            self.compute_time += compute_time
+
+    # Bytes read during one sigma call
+    def add_call(self, nbytes):
+
+        with self.lock:
+            self.ncalls += 1
+            self.call_nbytes += nbytes
+
+    def report(self):
+
+        if self.nreads == 0:
+            return
+
+        print ("Chunked integral reads:            ", self.nreads)
+        print ("Chunked integral data (MB):         %.2f" % (self.nbytes / 1e6))
+        print ("I/O wait (sec):                     %.2f" % self.wait_time)
+        print ("Compute on chunks (sec):            %.2f" % self.compute_time)
+        if self.ncalls > 0:
+            print ("Integral data per sigma call (MB):  %.2f" % (self.call_nbytes / self.ncalls / 1e6))
+        sys.stdout.flush()
@@ -0,0 +1,194 @@
+import time
+import numpy as np
+
+try:
+    import opt_einsum
+except ImportError:
+    opt_einsum = None
+
+
+def parse(subscripts):
+
+    subscripts = subscripts.replace(" ", "")
+    if "->" in subscripts:
+        inputs, output = subscripts.split("->")
+    else:
+        # Implicit output: indices appearing once, in alphabetical order
+        inputs = subscripts
+        letters = inputs.replace(",", "")
+        output = "".join(sorted(x for x in set(letters) if letters.count(x) == 1))
+
+    return inputs.split(","), output
+
+
+#################################################
+### Pairwise contraction compiled to tensordot ###
+#################################################
+# Contracts operands a and b, keeping the indices in keep. Plain contractions
+# run as np.tensordot (one GEMM) and give the free indices of a followed by
+# those of b; steps with batch indices, traces or indices summed over one
+# operand only run as np.einsum.
+class PairStep:
+
+    def __init__(self, idx_a, idx_b, keep):
+
+        shared = [x for x in idx_a if x in idx_b]
+        single = [x for x in idx_a + idx_b if x not in keep and x not in shared]
+        repeated = len(set(idx_a)) < len(idx_a) or len(set(idx_b)) < len(idx_b)
+        self.gemm = not repeated and len(single) == 0 and all(x not in keep for x in shared)
+
+        if self.gemm:
+            self.axes = ([idx_a.index(x) for x in shared], [idx_b.index(x) for x in shared])
+            self.output = "".join(x for x in idx_a + idx_b if x not in shared)
+        else:
+            self.output = "".join(x for x in dict.fromkeys(idx_a + idx_b) if x in keep)
+            self.subscripts = idx_a + "," + idx_b + "->" + self.output
+
+    def __call__(self, a, b):
+
+        if self.gemm:
+            return np.tensordot(a, b, axes=self.axes)
+
+        return np.einsum(self.subscripts, a, b)
+
+
+# Contraction path of np.einsum(..., optimize=True), with every pairwise step
+# compiled once. Intermediates keep the index order tensordot gives them;
+# only the final result is transposed to the requested output.
+class GemmPlan:
+
+    def __init__(self, inputs, output, path):
+
+        self.steps = []
+        idx = list(inputs)
+        for contract in path:
+            contract = sorted(contract, reverse=True)
+            taken = [idx.pop(x) for x in contract]
+            keep = set(output).union(*idx)
+            if len(taken) == 1:
+                step = "".join(x for x in dict.fromkeys(taken[0]) if x in keep)
+                self.steps.append((contract, taken[0] + "->" + step))
+            else:
+                step = PairStep(taken[0], taken[1], keep)
+                self.steps.append((contract, step))
+                step = step.output
+            idx.append(step)
+
+        self.transpose = [idx[0].index(x) for x in output]
+
+    def __call__(self, *operands):
+
+        operands = list(operands)
+        for contract, step in self.steps:
+            taken = [operands.pop(x) for x in contract]
+            if isinstance(step, str):
+                operands.append(np.einsum(step, taken[0]))
+            else:
+                operands.append(step(*taken))
+
+        result = operands[0]
+        if len(self.transpose) == 0:
+            return result[()]
+        if self.transpose != list(range(len(self.transpose))):
+            result = result.transpose(self.transpose)
+
+        return result
+
+
+class PathPlan:
+
+    def __init__(self, subscripts, path):
+
+        self.subscripts = subscripts
+        self.path = path
+
+    def __call__(self, *operands):
+
+        return np.einsum(self.subscripts, *operands, optimize=self.path)
+
+
+############################################
+### Contraction plans reused across a job ###
+############################################
+# einsum() looks up a plan by subscripts and operand shapes. A plan is made
+# once (path search, and for the tensordot backend the pairwise steps) and
+# reused by every later call with the same shapes, e.g. in each sigma call of
+# Davidson or CG. Backends:
+#   einsum      np.einsum(..., optimize=True), searching the path on every call
+#   numpy       np.einsum with the cached path
+#   tensordot   cached pairwise steps run as np.tensordot (GEMM) where possible
+#   opt_einsum  cached opt_einsum contract expressions (optional dependency)
+class ContractionPlans:
+
+    def __init__(self, backend = "tensordot"):
+
+        if backend not in ("einsum", "numpy", "tensordot", "opt_einsum"):
+            raise Exception("Contraction backend is not recognized")
+        if backend == "opt_einsum" and opt_einsum is None:
+            raise Exception("Contraction backend opt_einsum requires the opt_einsum package")
+
+        self.backend = backend
+        self.plans = {}
+        self.nplans = 0
+        self.ncalls = 0
+        self.plan_time = 0.0
+        self.exec_time = 0.0
+
+    def plan(self, subscripts, operands):
+
+        if self.backend == "einsum":
+            return PathPlan(subscripts, True)
+
+        inputs, output = parse(subscripts)
+        shapes = [np.shape(x) for x in operands]
+
+        if self.backend == "opt_einsum":
+            return opt_einsum.contract_expression(",".join(inputs) + "->" + output, *shapes, optimize="greedy")
+
+        path = np.einsum_path(subscripts, *operands, optimize="greedy")[0]
+
+        if self.backend == "numpy":
+            return PathPlan(subscripts, path)
+
+        return GemmPlan(inputs, output, path[1:])
+
+    # Contraction path of least cost (optimal search, meant for a few operands)
+    # for the shapes of operands, which need not be arrays (e.g. blocks on disk)
+    def path(self, subscripts, *operands):
+
+        t_start = time.perf_counter()
+        key = ("path", subscripts) + tuple(x.shape for x in operands)
+        path = self.plans.get(key)
+        if path is None:
+            shapes = [np.broadcast_to(np.zeros(()), x.shape) for x in operands]
+            path = self.plans[key] = np.einsum_path(subscripts, *shapes, optimize="optimal")[0][1:]
+        self.plan_time += time.perf_counter() - t_start
+
+        return path
+
+    def einsum(self, subscripts, *operands):
+
+        t_start = time.perf_counter()
+        key = (subscripts,) + tuple(np.shape(x) for x in operands)
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = self.plans[key] = self.plan(subscripts, operands)
+            self.nplans += 1
+        t_plan = time.perf_counter()
+
+        result = plan(*operands)
+        t_end = time.perf_counter()
+
+        self.ncalls += 1
+        self.plan_time += t_plan - t_start
+        self.exec_time += t_end - t_plan
+
+        return result
+
+    def report(self):
+
+        print ("Contraction backend:                ", self.backend)
+        print ("Contractions (calls, plans made):   ", self.ncalls, self.nplans)
+        print ("Planning and lookup time (sec):     ", round(self.plan_time, 3))
+        print ("Contraction time (sec):             ", round(self.exec_time, 3))
+        print ()
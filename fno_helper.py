@@ -0,0 +1,73 @@
+import numpy as np
+
+
+# Virtual-virtual block of the MP2 one-particle density for each spin
+def virtual_density(t2_1, closed_shell = False):
+
+    t2_1_a, t2_1_ab, t2_1_b = t2_1
+
+    dm_a = 0.5 * np.einsum('ijac,ijbc->ab', t2_1_a, t2_1_a)
+    dm_a += np.einsum('ijac,ijbc->ab', t2_1_ab, t2_1_ab)
+    if closed_shell:
+        return dm_a, dm_a
+
+    dm_b = 0.5 * np.einsum('ijac,ijbc->ab', t2_1_b, t2_1_b)
+    dm_b += np.einsum('ijca,ijcb->ab', t2_1_ab, t2_1_ab)
+
+    return dm_a, dm_b
+
+
+# Natural virtuals with occupation >= threshold (at least one is kept),
+# semicanonicalized within the kept and within the dropped space.
+# Returns the rotation of the canonical virtuals to the kept orbitals, their
+# orbital energies, the energies of the dropped orbitals and the occupations.
+def truncate(dm, e_vir, threshold):
+
+    occ, no = np.linalg.eigh(dm)
+    order = np.argsort(occ)[::-1]
+    occ, no = occ[order], no[:,order]
+
+    nkeep = max(1, int(np.count_nonzero(occ >= threshold)))
+
+    def semicanonical(u):
+        e, w = np.linalg.eigh(np.dot(u.T * e_vir, u))
+        return np.dot(u, w), e
+
+    rot, e_kept = semicanonical(no[:,:nkeep])
+    e_dropped = semicanonical(no[:,nkeep:])[1]
+
+    return rot, e_kept, e_dropped, occ
+
+
+# <ij||ab> with both virtual indices rotated to the kept orbitals
+def rotate_oovv(v2e_oovv, rot_1, rot_2):
+
+    return np.einsum('ijab,ac,bd->ijcd', v2e_oovv, rot_1, rot_2, optimize=True)
+
+
+def denominator(e_1, e_2, e_3, e_4):
+
+    return e_1[:,None,None,None] + e_2[None,:,None,None] - e_3[None,None,:,None] - e_4[None,None,None,:]
+
+
+# First-order doubles amplitudes of canonical or semicanonical orbitals
+def mp2_amplitudes(v2e_oovv, e_occ, e_vir):
+
+    v2e_a, v2e_ab, v2e_b = v2e_oovv
+    e_occ_a, e_occ_b = e_occ
+    e_vir_a, e_vir_b = e_vir
+
+    t2_1_a = v2e_a / denominator(e_occ_a, e_occ_a, e_vir_a, e_vir_a)
+    t2_1_ab = v2e_ab / denominator(e_occ_a, e_occ_b, e_vir_a, e_vir_b)
+    t2_1_b = v2e_b / denominator(e_occ_b, e_occ_b, e_vir_b, e_vir_b)
+
+    return (t2_1_a, t2_1_ab, t2_1_b)
+
+
+def mp2_energy(v2e_oovv, t2_1):
+
+    e_mp2 = 0.25 * np.einsum('ijab,ijab', t2_1[0], v2e_oovv[0])
+    e_mp2 += np.einsum('ijab,ijab', t2_1[1], v2e_oovv[1])
+    e_mp2 += 0.25 * np.einsum('ijab,ijab', t2_1[2], v2e_oovv[2])
+
+    return e_mp2
@@ -0,0 +1,56 @@
+import tracemalloc
+
+
+###############################################
+### Peak memory allocated in each stage ###
+###############################################
+# Allocations are traced with tracemalloc, which also sees the data of numpy
+# arrays. mark() closes a stage: it records the peak allocated since the
+# previous mark and the memory still held, both relative to start().
+class StageAllocations:
+
+    def __init__(self, enabled = False):
+
+        self.enabled = enabled
+        self.stages = []
+        self.started = False
+        self.base = 0
+
+    def start(self):
+
+        if not self.enabled:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        tracemalloc.reset_peak()
+        self.base = tracemalloc.get_traced_memory()[0]
+
+    def mark(self, stage):
+
+        if not self.enabled:
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        self.stages.append((stage, peak - self.base, current - self.base))
+        tracemalloc.reset_peak()
+
+    def stop(self):
+
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+
+    def report(self, title, result_nbytes = None):
+
+        if not self.stages:
+            return
+
+        print (title)
+        print ("%20s %14s %14s" % ("stage", "peak (MB)", "held (MB)"))
+        for stage, peak, held in self.stages:
+            print ("%20s %14.2f %14.2f" % (stage, peak / 1e6, held / 1e6))
+        if result_nbytes is not None:
+            print ("Size of the result (MB):           ", round(result_nbytes / 1e6, 2))
+        print ()
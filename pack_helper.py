@@ -0,0 +1,98 @@
+import numpy as np
+
+
+### Pairs p > q, in the same order as np.tril_indices(n, k=-1) ###
+def pair_indices(n):
+
+    return np.tril_indices(n, k=-1)
+
+
+def pack_pairs(a):
+
+    n = a.shape[-1]
+    ind = pair_indices(n)
+    return a[...,ind[0],ind[1]]
+
+
+def unpack_pairs(a, n):
+
+    ind = pair_indices(n)
+    out = np.zeros(a.shape[:-1] + (n, n), dtype=a.dtype)
+    out[...,ind[0],ind[1]] = a
+    out[...,ind[1],ind[0]] = -a
+    return out
+
+
+# <pq||rs> for p > q and r > s, built in row blocks of p: rows(p0, p1) gives
+# <pq||rs> for p0 <= p < p1 and all q, r, s. The pairs p > q with p in
+# [p0, p1) are rows p0*(p0-1)/2 ... p1*(p1-1)/2 of the packed block in out.
+def antisymmetrized_pairs(rows, n, chunks, out):
+
+    ind = pair_indices(n)
+
+    for p0, p1 in chunks:
+        v2e = rows(p0, p1)
+        q0, q1 = p0 * (p0 - 1) // 2, p1 * (p1 - 1) // 2
+        out[q0:q1] = v2e[ind[0][q0:q1]-p0,ind[1][q0:q1]][:,ind[0],ind[1]]
+
+    return out
+
+
+#############################################################
+### Same-spin block stored as packed antisymmetric pairs ###
+#############################################################
+# Holds <pq||rs> for p > q, r > s only. Slicing along the first index unpacks
+# the requested rows, so the block can be used wherever a full array is read.
+class TrilBlock:
+
+    def __init__(self, packed, n_1, n_2):
+
+        self.packed = packed
+
+        self.shape = (n_1, n_1, n_2, n_2)
+        self.ndim = 4
+        self.dtype = packed.dtype
+        self.size = n_1 * n_1 * n_2 * n_2
+        self.nbytes = packed.nbytes
+
+        ind = pair_indices(n_1)
+        self.pair_index = np.zeros((n_1, n_1), dtype=int)
+        self.pair_index[ind[0],ind[1]] = np.arange(len(ind[0]))
+        self.pair_index[ind[1],ind[0]] = np.arange(len(ind[0]))
+        self.pair_sign = np.zeros((n_1, n_1))
+        self.pair_sign[ind[0],ind[1]] = 1.0
+        self.pair_sign[ind[1],ind[0]] = -1.0
+
+    def _rows(self, ind):
+
+        n_1, n_2 = self.shape[1], self.shape[2]
+
+        rows = self.pair_index[ind].reshape(-1)
+        sign = self.pair_sign[ind].reshape(-1)
+        mask = sign != 0
+
+        # Unique rows in increasing order, as required when the block is on disk
+        uniq, inv = np.unique(rows[mask], return_inverse=True)
+
+        v2e = np.zeros((len(rows), self.packed.shape[1]), dtype=self.dtype)
+        if len(uniq) > 0:
+            v2e[mask] = self.packed[uniq][inv] * sign[mask,None]
+        v2e = unpack_pairs(v2e, n_2)
+
+        return v2e.reshape(len(ind), n_1, n_2, n_2)
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        ind = np.arange(self.shape[0])[key[0]]
+        if np.ndim(ind) == 0:
+            return self._rows([ind])[0][key[1:]]
+
+        return self._rows(ind)[(slice(None),) + key[1:]]
+
+    def __array__(self, dtype=None, copy=None):
+
+        v2e = self[:]
+        return v2e if dtype is None else v2e.astype(dtype)
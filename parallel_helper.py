@@ -0,0 +1,109 @@
+import sys
+import time
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import pyscf.lib
+
+try:
+    import threadpoolctl
+except ImportError:
+    threadpoolctl = None
+
+
+def blas_limits(nthreads):
+
+    if threadpoolctl is None:
+        return contextlib.nullcontext()
+
+    return threadpoolctl.threadpool_limits(limits=nthreads, user_api="blas")
+
+
+####################################################
+### Thread pool for independent transform jobs ###
+####################################################
+# Jobs are (name, function) pairs without shared output, e.g. the aa, ab and bb
+# ao2mo transformations or the spin blocks of one integral class. They run on
+# nworkers threads; ao2mo and BLAS release the GIL. Each worker gets
+# blas_threads OpenMP/BLAS threads, so nworkers * blas_threads threads are busy
+# (default: the pyscf thread count split between the workers). Batches that run
+# on one worker (a single job, or nworkers = 1) get all nthreads threads, and
+# a batch of fewer jobs than workers shares them among its jobs. run() records
+# the summed job time and the wall time of every batch for report(). Batches
+# submitted from inside a job run serially on that worker. A memory budget is
+# split between the jobs of a batch that run at the same time (job_memory).
+class Scheduler:
+
+    def __init__(self, nworkers = 1, blas_threads = None):
+
+        if nworkers < 1:
+            raise Exception("Number of transform workers must be positive")
+
+        self.nworkers = nworkers
+        self.nthreads = pyscf.lib.num_threads()
+        if blas_threads is None:
+            blas_threads = max(1, self.nthreads // nworkers)
+        self.blas_threads = blas_threads
+
+        self.job_time = 0.0
+        self.wall_time = 0.0
+        self.njobs = 0
+        self.worker = threading.local()
+        self.lock = threading.Lock()
+
+    def run_job(self, func, nthreads, nconcurrent = 1):
+
+        self.worker.busy = True
+        self.worker.nconcurrent = nconcurrent
+        t_start = time.time()
+        try:
+            with pyscf.lib.with_omp_threads(nthreads):
+                result = func()
+        finally:
+            self.worker.busy = False
+            self.worker.nconcurrent = 1
+
+        return result, time.time() - t_start
+
+    def run(self, jobs):
+
+        # Nested batch: already timed as part of the enclosing job
+        if getattr(self.worker, "busy", False):
+            return dict((name, func()) for name, func in jobs)
+
+        t_start = time.time()
+
+        if self.nworkers == 1 or len(jobs) < 2:
+            done = [self.run_job(func, self.nthreads) for name, func in jobs]
+        else:
+            nworkers = min(self.nworkers, len(jobs))
+            nthreads = max(self.blas_threads, self.nthreads // nworkers)
+            with blas_limits(nthreads), ThreadPoolExecutor(nworkers) as pool:
+                futures = [pool.submit(self.run_job, func, nthreads, nworkers) for name, func in jobs]
+                done = [f.result() for f in futures]
+
+        with self.lock:
+            self.wall_time += time.time() - t_start
+            self.job_time += sum(x[1] for x in done)
+            self.njobs += len(jobs)
+
+        return dict((name, x[0]) for (name, func), x in zip(jobs, done))
+
+    # Share (MB) of max_memory of the calling job; nested batches run serially
+    # and keep the share of their enclosing job
+    def job_memory(self, max_memory):
+
+        return max_memory / getattr(self.worker, "nconcurrent", 1)
+
+    def report(self):
+
+        if self.njobs == 0:
+            return
+
+        print ("Transform workers x BLAS threads:  %d x %d" % (self.nworkers, self.blas_threads))
+        print ("Transform jobs:                    ", self.njobs)
+        print ("Transform job time (sec):           %.2f" % self.job_time)
+        print ("Transform wall time (sec):          %.2f" % self.wall_time)
+        if self.wall_time > 0.0:
+            print ("Transform speedup:                  %.2f" % (self.job_time / self.wall_time))
+        sys.stdout.flush()
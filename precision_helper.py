@@ -0,0 +1,91 @@
+import numpy as np
+import direct_adc_spin_integrated.pack_helper as pack_helper
+
+
+# Contractions that are carried out in float64 when an operand is stored in float32
+CONTRACTIONS = (np.einsum, np.dot, np.tensordot, np.inner, np.vdot, np.outer)
+
+# Integral blocks are contracted in at least this many slabs, each upcast on its own
+UPCAST_SLABS = 8
+
+
+def upcast(x):
+
+    if isinstance(x, np.ndarray) and x.dtype == np.float32:
+        return np.asarray(x, dtype=np.float64)
+    if isinstance(x, (list, tuple)):
+        return type(x)(upcast(y) for y in x)
+
+    return x
+
+
+########################################################
+### float32 storage with float64 contractions ###
+########################################################
+# Slicing, reshaping and elementwise arithmetic stay in float32. Contractions
+# (np.einsum, np.dot, ..., matmul) convert all float32 operands, stored or
+# sliced from disk, to float64 first, so sums are accumulated in double
+# precision while the stored blocks take half the memory. Integral blocks
+# reach the contractions one slab at a time (see block_chunks in
+# direct_adc_compute), so the float64 copy is never of a whole block.
+class Single(np.ndarray):
+
+    def __array_function__(self, func, types, args, kwargs):
+
+        if func in CONTRACTIONS:
+            return func(*upcast(args), **upcast(kwargs))
+
+        return super().__array_function__(func, types, args, kwargs)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+
+        inputs = tuple(x.view(np.ndarray) if isinstance(x, Single) else x for x in inputs)
+        if ufunc is np.matmul:
+            inputs = upcast(inputs)
+
+        out = kwargs.get("out", None)
+        if out is not None:
+            kwargs["out"] = tuple(x.view(np.ndarray) if isinstance(x, Single) else x for x in out)
+
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+
+        if out is not None:
+            return out[0] if len(out) == 1 else out
+        if isinstance(result, np.ndarray) and result.dtype == np.float32:
+            return result.view(Single)
+
+        return result
+
+
+def single(v2e):
+
+    if isinstance(v2e, pack_helper.TrilBlock):
+        if isinstance(v2e.packed, np.ndarray) and not isinstance(v2e.packed, np.memmap):
+            return pack_helper.TrilBlock(single(v2e.packed), v2e.shape[0], v2e.shape[2])
+        return v2e
+
+    if not isinstance(v2e, np.ndarray) or isinstance(v2e, np.memmap):
+        return v2e
+    if v2e.dtype != np.float64 and v2e.dtype != np.float32:
+        return v2e
+
+    return np.ascontiguousarray(v2e, dtype=np.float32).view(Single)
+
+
+# The b block of closed shells stays a read-only alias of the a block
+def single_blocks(v2e, closed_shell = False):
+
+    if v2e is None:
+        return None
+
+    v2e_a = single(v2e[0])
+    v2e_ab = single(v2e[1])
+    if closed_shell and isinstance(v2e_a, np.ndarray):
+        v2e_b = v2e_a.view()
+        v2e_b.flags.writeable = False
+    elif closed_shell:
+        v2e_b = v2e_a
+    else:
+        v2e_b = single(v2e[2])
+
+    return (v2e_a, v2e_ab, v2e_b)
@@ -0,0 +1,134 @@
+import numpy as np
+from multiprocessing import shared_memory
+import direct_adc_spin_integrated.pack_helper as pack_helper
+import direct_adc_spin_integrated.precision_helper as precision_helper
+import direct_adc_spin_integrated.sparse_helper as sparse_helper
+
+
+# Workers are started by multiprocessing and share the resource tracker of
+# the publishing process, which removes the segments
+def open_segment(name):
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+##################################################################
+### Integrals and amplitudes published once for worker processes ###
+##################################################################
+# publish() copies the arrays of a nested tuple/list structure (integral
+# blocks, t_amp) into shared memory segments and returns a picklable manifest.
+# Workers call attach() on the manifest and get the same structure back with
+# read-only views of the segments, so N workers hold one copy of the data.
+# Closed-shell aliases (the same array or a view of it) are published once.
+# memmap blocks are passed by file name, packed blocks as their packed array,
+# screened blocks as their kept tiles, float32 arrays of precision = "mixed"
+# keep their float64 contractions.
+# The segments are removed by close() in the publishing process.
+class SharedStore:
+
+    def __init__(self):
+
+        self.segments = []
+        self.objects = []
+        self.published = {}
+        self.nbytes = 0
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def publish(self, obj):
+
+        if obj is None:
+            return ("none",)
+
+        if isinstance(obj, (tuple, list)):
+            return ("tuple", [self.publish(x) for x in obj])
+
+        if isinstance(obj, pack_helper.TrilBlock):
+            return ("tril", self.publish(obj.packed), obj.shape[0], obj.shape[2])
+
+        if isinstance(obj, sparse_helper.SparseBlock):
+            tiles = [(key, self.publish(x)) for key, x in obj.tiles.items()]
+            return ("sparse", obj.shape, obj.dtype.str, obj.tile, tiles)
+
+        if not isinstance(obj, np.ndarray):
+            raise Exception("GF workers need integral blocks held in memory or on disk with disk_backend = \"memmap\"")
+
+        # A read-only alias is a view with the layout of its base
+        base = obj.base
+        if not isinstance(base, np.ndarray) or base.shape != obj.shape or base.strides != obj.strides:
+            base = obj
+        for x in (obj, base):
+            if id(x) in self.published:
+                return self.published[id(x)]
+
+        if isinstance(obj, np.memmap):
+            if not obj.flags.c_contiguous or obj.filename is None:
+                raise Exception("Only whole memmap files can be shared with workers")
+            desc = ("memmap", obj.filename, obj.offset, obj.shape, obj.dtype.str)
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(1, obj.nbytes))
+            view = np.ndarray(obj.shape, dtype=obj.dtype, buffer=shm.buf)
+            view[...] = obj
+            self.segments.append(shm)
+            self.nbytes += obj.nbytes
+            desc = ("array", shm.name, obj.shape, obj.dtype.str, isinstance(obj, precision_helper.Single))
+
+        # Keep the object alive so that its id is not reused
+        self.published[id(obj)] = desc
+        self.objects.append(obj)
+
+        return desc
+
+    def close(self):
+
+        for shm in self.segments:
+            shm.close()
+            shm.unlink()
+
+        self.segments = []
+        self.objects = []
+        self.published = {}
+
+
+def attach(desc, segments):
+
+    kind = desc[0]
+
+    if kind == "none":
+        return None
+
+    if kind == "tuple":
+        return tuple(attach(x, segments) for x in desc[1])
+
+    if kind == "tril":
+        return pack_helper.TrilBlock(attach(desc[1], segments), desc[2], desc[3])
+
+    if kind == "sparse":
+        shape, dtype, tile, tiles = desc[1:]
+        block = sparse_helper.SparseBlock(shape, np.dtype(dtype), tile)
+        block.tiles = dict((key, attach(x, segments)) for key, x in tiles)
+        return block
+
+    if kind == "memmap":
+        filename, offset, shape, dtype = desc[1:]
+        return np.memmap(filename, dtype=np.dtype(dtype), mode="r", offset=offset, shape=shape)
+
+    name, shape, dtype, single = desc[1:]
+    shm = open_segment(name)
+    segments.append(shm)
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    view.flags.writeable = False
+
+    if single:
+        return view.view(precision_helper.Single)
+
+    return view
@@ -0,0 +1,123 @@
+import numpy as np
+import direct_adc_spin_integrated.pack_helper as pack_helper
+
+
+def tile_ranges(n, tile):
+
+    return [(p0, min(p0 + tile, n)) for p0 in range(0, n, tile)]
+
+
+####################################################################
+### Block-sparse storage of a tensor screened by block magnitude ###
+####################################################################
+# The first two indices are cut into tiles of `tile` orbitals (pairs for
+# packed blocks). Only tiles with an element of magnitude >= threshold are
+# kept. Slicing returns dense arrays with zeros in place of dropped tiles;
+# block_einsums in direct_adc_compute contracts the kept tiles one by one.
+class SparseBlock:
+
+    def __init__(self, shape, dtype, tile):
+
+        self.shape = tuple(shape)
+        self.ndim = len(self.shape)
+        self.dtype = np.dtype(dtype)
+        self.size = int(np.prod(self.shape))
+        self.tile = tile
+        self.tiles = {}
+
+        self.ntiles = len(tile_ranges(self.shape[0], tile)) * len(tile_ranges(self.shape[1], tile))
+
+    @property
+    def nbytes(self):
+
+        return sum(x.nbytes for x in self.tiles.values())
+
+    # Kept tiles as ((p0, p1), (q0, q1), tile)
+    def items(self):
+
+        for (p0, q0), x in sorted(self.tiles.items()):
+            yield (p0, p0 + x.shape[0]), (q0, q0 + x.shape[1]), x
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) == 0:
+            key = (slice(None),)
+
+        rows = np.arange(self.shape[0])[key[0]]
+        scalar = np.ndim(rows) == 0
+        rows = np.atleast_1d(rows)
+
+        out = np.zeros((len(rows),) + self.shape[1:], dtype=self.dtype)
+        for (p0, p1), (q0, q1), x in self.items():
+            mask = (rows >= p0) & (rows < p1)
+            if np.any(mask):
+                out[mask,q0:q1] = x[rows[mask] - p0]
+
+        if scalar:
+            return out[0][key[1:]]
+
+        return out[(slice(None),) + key[1:]]
+
+    def __array__(self, dtype=None, copy=None):
+
+        v2e = self[:]
+        return v2e if dtype is None else v2e.astype(dtype)
+
+
+def screen(a, threshold, tile):
+
+    block = SparseBlock(a.shape, a.dtype, tile)
+    for p0, p1 in tile_ranges(a.shape[0], tile):
+        for q0, q1 in tile_ranges(a.shape[1], tile):
+            x = a[p0:p1,q0:q1]
+            if x.size > 0 and np.max(np.absolute(x)) >= threshold:
+                block.tiles[(p0, q0)] = x.copy()
+
+    return block
+
+
+# In-memory blocks of an integral class. Blocks on disk, density-fitted or
+# AO-direct are kept as they are; the b block of closed shells stays an alias.
+def screen_block(v2e, threshold, tile):
+
+    if isinstance(v2e, pack_helper.TrilBlock):
+        if isinstance(v2e.packed, np.ndarray) and not isinstance(v2e.packed, np.memmap):
+            return pack_helper.TrilBlock(screen(v2e.packed, threshold, tile), v2e.shape[0], v2e.shape[2])
+        return v2e
+
+    if not isinstance(v2e, np.ndarray) or isinstance(v2e, np.memmap):
+        return v2e
+
+    return screen(v2e, threshold, tile)
+
+
+def screen_blocks(v2e, threshold, tile, closed_shell = False):
+
+    v2e_a = screen_block(v2e[0], threshold, tile)
+    v2e_ab = screen_block(v2e[1], threshold, tile)
+    if closed_shell and not isinstance(v2e_a, np.ndarray):
+        v2e_b = v2e_a
+    else:
+        v2e_b = screen_block(v2e[2], threshold, tile)
+
+    return (v2e_a, v2e_ab, v2e_b)
+
+
+# Dense amplitudes: tiles below threshold are set to zero in place.
+# Returns the number of kept and total tiles.
+def screen_dense(a, threshold, tile):
+
+    kept = 0
+    total = 0
+    for p0, p1 in tile_ranges(a.shape[0], tile):
+        for q0, q1 in tile_ranges(a.shape[1], tile):
+            x = a[p0:p1,q0:q1]
+            total += 1
+            if x.size > 0 and np.max(np.absolute(x)) >= threshold:
+                kept += 1
+            else:
+                x[...] = 0.0
+
+    return kept, total
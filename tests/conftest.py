@@ -0,0 +1,140 @@
+#############################################################
+### Regression tests: each option against the default path ###
+#############################################################
+# Small molecules (water, RHF, and OH, UHF, in 6-31G) so that every option
+# can be compared with the default calculation to TOL.
+# Run from the directory containing direct_adc_spin_integrated:
+#   python -m pytest direct_adc_spin_integrated/tests
+import contextlib
+import io
+import numpy as np
+import pytest
+import pyscf.ao2mo
+from pyscf import gto, scf
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+
+WATER = "O 0 0 0; H 0 0.757 0.587; H 0 -0.757 0.587"
+OH = "O 0 0 0; H 0 0 0.97"
+
+# Agreement expected between options that change only how the same numbers are stored or contracted
+TOL = 1e-10
+
+
+def run_scf(atom, spin, basis = "6-31g"):
+
+    mol = gto.M(atom=atom, basis=basis, spin=spin, verbose=0)
+    mf = scf.RHF(mol) if spin == 0 else scf.UHF(mol)
+    mf.conv_tol = 1e-12
+    mf.kernel()
+
+    return mf
+
+@pytest.fixture(scope="session")
+def rhf():
+
+    return run_scf(WATER, 0)
+
+@pytest.fixture(scope="session")
+def uhf():
+
+    return run_scf(OH, 1)
+
+@pytest.fixture(scope="session", params=["rhf", "uhf"])
+def mf(request):
+
+    return request.getfixturevalue(request.param)
+
+def quiet():
+
+    return contextlib.redirect_stdout(io.StringIO())
+
+# DirectADC with options set as attributes and its integral registry set up
+def setup(mf, method = "adc(3)", **options):
+
+    with quiet():
+        direct_adc = direct_adc_init.DirectADC(mf)
+    direct_adc.method = method
+    direct_adc.nstates = 3
+    direct_adc.verbose = 0
+    for key, value in options.items():
+        setattr(direct_adc, key, value)
+
+    with quiet():
+        direct_adc.transform_integrals()
+
+    return direct_adc
+
+def dense(x):
+
+    return np.array(x, dtype=np.float64)
+
+# MP2 energy, amplitudes, and for IP and EA the sigma of fixed vectors, M and
+# the preconditioner, keyed by name
+def compute(mf, method = "adc(3)", **options):
+
+    direct_adc = setup(mf, method, **options)
+    results = {}
+
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        results["mp2"] = np.array(direct_adc_compute.compute_mp2_energy(direct_adc, t_amp))
+
+        for n, t in enumerate(t_amp):
+            if t is not None:
+                for k, x in enumerate(t):
+                    results["t%d_%d" % (n, k)] = dense(x)
+
+        for kind in ("ip", "ea"):
+            apply_H, precond, M = getattr(direct_adc_compute, "define_H_" + kind)(direct_adc, t_amp)
+            r = np.random.RandomState(7).rand(2, precond.size) - 0.5
+            results[kind + "_sigma"] = np.array([apply_H(x) for x in r])
+            results[kind + "_precond"] = dense(precond)
+            # M is one array for closed shells, (alpha, beta) otherwise
+            if isinstance(M, tuple):
+                for k, x in enumerate(M):
+                    results["%s_M%d" % (kind, k)] = dense(x)
+            elif M is not None:
+                results[kind + "_M"] = dense(M)
+
+    return results
+
+_defaults = {}
+
+# Results of the default options, computed once per reference and method
+def default(mf, method = "adc(3)"):
+
+    key = (id(mf), method)
+    if key not in _defaults:
+        _defaults[key] = compute(mf, method)
+
+    return _defaults[key]
+
+def assert_agree(ref, new, tol = TOL):
+
+    assert sorted(ref) == sorted(new)
+    for key in ref:
+        assert ref[key].shape == new[key].shape, key
+        assert np.max(np.absolute(ref[key] - new[key]), initial=0.0) < tol, key
+
+# <pq||rs> of one class from ao2mo.general, one pass per spin block and exchange term
+def reference_integrals(direct_adc, spaces):
+
+    occ = direct_adc.mo_a[:,:direct_adc.nocc_a], direct_adc.mo_b[:,:direct_adc.nocc_b]
+    vir = direct_adc.mo_a[:,direct_adc.nocc_a:], direct_adc.mo_b[:,direct_adc.nocc_b:]
+    space = {"o": occ, "v": vir}
+
+    def block(mo_1, mo_2, mo_3, mo_4, antisymmetrize):
+        n_1, n_2, n_3, n_4 = (x.shape[1] for x in (mo_1, mo_2, mo_3, mo_4))
+        v2e = pyscf.ao2mo.general(direct_adc.v2e_ao, (mo_1, mo_3, mo_2, mo_4), compact=False)
+        v2e = v2e.reshape(n_1, n_3, n_2, n_4).transpose(0,2,1,3)
+        if antisymmetrize:
+            v2e_ex = pyscf.ao2mo.general(direct_adc.v2e_ao, (mo_1, mo_4, mo_2, mo_3), compact=False)
+            v2e = v2e - v2e_ex.reshape(n_1, n_4, n_2, n_3).transpose(0,2,3,1)
+        return v2e
+
+    mo_1, mo_2, mo_3, mo_4 = (space[x] for x in spaces)
+
+    return (block(mo_1[0], mo_2[0], mo_3[0], mo_4[0], True),
+            block(mo_1[0], mo_2[1], mo_3[0], mo_4[1], False),
+            block(mo_1[1], mo_2[1], mo_3[1], mo_4[1], True))
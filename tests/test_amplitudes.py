@@ -0,0 +1,62 @@
+import numpy as np
+from pyscf import scf
+from pyscf.adc import uadc
+from pyscf.adc import uadc_amplitudes
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import TOL, setup, dense, quiet
+
+
+def amplitudes(direct_adc):
+
+    with quiet():
+        return direct_adc_compute.compute_amplitudes(direct_adc)
+
+# Dividing in place row by row gives the values of the full denominators
+def test_t2_1_matches_full_denominators(mf):
+
+    direct_adc = setup(mf)
+    t2_1 = amplitudes(direct_adc)[0]
+
+    nocc = (direct_adc.nocc_a, direct_adc.nocc_b)
+    e_occ = (direct_adc.mo_energy_a[:nocc[0]], direct_adc.mo_energy_b[:nocc[1]])
+    e_vir = (direct_adc.mo_energy_a[nocc[0]:], direct_adc.mo_energy_b[nocc[1]:])
+
+    for t2, v2e, (s, r) in zip(t2_1, direct_adc.v2e.oovv, [(0, 0), (0, 1), (1, 1)]):
+        D2 = (e_occ[s][:,None] + e_occ[r]).reshape(-1,1) - (e_vir[s][:,None] + e_vir[r]).reshape(-1)
+        assert np.array_equal(t2, dense(v2e) / D2.reshape(t2.shape))
+
+def test_t2_2_matches_pyscf(mf):
+
+    t2_2 = amplitudes(setup(mf))[1]
+
+    myadc = uadc.UADC(scf.addons.convert_to_uhf(mf))
+    myadc.method = "adc(3)"
+    myadc.verbose = 0
+    t2 = uadc_amplitudes.compute_amplitudes(myadc, myadc.transform_integrals())[1]
+
+    for ref, new in zip(t2[1], t2_2):
+        assert np.max(np.absolute(np.asarray(ref) - new)) < TOL
+
+def test_add_antisymmetrized():
+
+    temp = np.random.RandomState(6).rand(3, 3, 4, 4)
+    out = np.ones_like(temp)
+
+    direct_adc_compute.add_antisymmetrized(out, temp, np.empty_like(temp))
+
+    ref = 1.0 + temp - temp.transpose(1,0,2,3) - temp.transpose(0,1,3,2) + temp.transpose(1,0,3,2)
+    assert np.max(np.absolute(out - ref)) < TOL
+
+# At the end of the t2_1 stage little more than t2_1 is held, and no more than
+# one copy of it was allocated on top
+def test_t2_1_stage_memory(mf):
+
+    direct_adc = setup(mf, memory_report=True)
+    t_amp = amplitudes(direct_adc)
+    stages = dict((stage, (peak, held)) for stage, peak, held in direct_adc.amplitude_allocations.stages)
+    t2_1_nbytes = direct_adc_compute.amplitude_nbytes(t_amp[:1])
+
+    assert list(stages) == ["t2_1", "t1_2", "t2_2", "t1_3"]
+    peak, held = stages["t2_1"]
+    assert held < 1.25 * t2_1_nbytes
+    assert peak < 2 * t2_1_nbytes
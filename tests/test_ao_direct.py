@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.ao_helper as ao_helper
+import direct_adc_spin_integrated.einsum_helper as einsum_helper
+from conftest import TOL, setup, compute, default, dense, assert_agree
+
+
+@pytest.mark.parametrize("method", ["adc(2)-e", "adc(3)"])
+def test_ao_vvvv_matches_mo(mf, method):
+
+    assert_agree(default(mf, method), compute(mf, method, vvvv_integrals="AO"))
+
+# Only the (ov| and (oo| intermediates are made; vvvv is never transformed
+def test_ao_vvvv_not_transformed(mf):
+
+    direct_adc = setup(mf, vvvv_integrals="AO")
+
+    assert all(isinstance(x, ao_helper.AOBlock) for x in direct_adc.v2e.vvvv)
+    assert all(name[:2] != "vv" for name, nbytes in direct_adc.v2e.transformed)
+
+@pytest.mark.parametrize("backend", ["einsum", "numpy", "tensordot"])
+def test_ao_einsum_through_plans(mf, backend):
+
+    direct_adc = setup(mf)
+    v2e_vvvv = direct_adc.v2e.vvvv[1]
+    nocc = direct_adc.nocc_a
+    block = ao_helper.blocks(direct_adc.mol, (direct_adc.mo_a, direct_adc.mo_b), (direct_adc.nocc_a, direct_adc.nocc_b))[1]
+    contractions = einsum_helper.ContractionPlans(backend)
+
+    x = np.random.RandomState(2).rand(nocc, nocc, block.shape[2], block.shape[3])
+    ref = np.einsum('ijcd,abcd->ijab', x, dense(v2e_vvvv))
+    new = block.einsum('ijcd,abcd->ijab', x, contractions=contractions)
+
+    assert np.max(np.absolute(ref - new)) < TOL
+    assert contractions.ncalls > 0
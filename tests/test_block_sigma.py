@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import TOL, setup, quiet
+
+
+def define_H(mf, method, kind, **options):
+
+    direct_adc = setup(mf, method, **options)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H, precond, M = getattr(direct_adc_compute, "define_H_" + kind)(direct_adc, t_amp)
+
+    return direct_adc, t_amp, apply_H, precond
+
+# A block of vectors gives the sigma vectors of its rows
+@pytest.mark.parametrize("method", ["adc(2)", "adc(2)-e", "adc(3)"])
+@pytest.mark.parametrize("kind", ["ip", "ea"])
+def test_block_sigma_matches_rows(mf, method, kind):
+
+    direct_adc, t_amp, apply_H, precond = define_H(mf, method, kind, sigma_block=4)
+    r = np.random.RandomState(8).rand(7, precond.size) - 0.5
+
+    block = apply_H(r)
+    rows = np.array([apply_H(x) for x in r])
+
+    assert block.shape == r.shape
+    assert np.max(np.absolute(block - rows)) < TOL
+
+def test_apply_blocks_sizes(rhf):
+
+    direct_adc = setup(rhf, sigma_block=3)
+    sizes = []
+
+    def sigma_block(r):
+        sizes.append(r.shape[0])
+        return 2 * r
+
+    r = np.arange(14.0).reshape(7, 2)
+    assert np.array_equal(direct_adc_compute.apply_blocks(direct_adc, sigma_block, r), 2 * r)
+    assert np.array_equal(direct_adc_compute.apply_blocks(direct_adc, sigma_block, r[0]), 2 * r[0])
+    assert sizes == [3, 3, 1, 1]
+
+@pytest.mark.parametrize("kind", ["ip", "ea"])
+def test_block_davidson_matches_single(mf, kind):
+
+    E = []
+    for sigma_block in (1, 16):
+        direct_adc = setup(mf, sigma_block=sigma_block, nstates=4)
+        with quiet():
+            t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+            apply_H, precond, x0 = getattr(direct_adc_compute, "setup_davidson_" + kind)(direct_adc, t_amp)
+            E.append(direct_adc_compute.davidson(direct_adc, apply_H, x0, precond)[0])
+
+    assert np.max(np.absolute(E[0] - E[1])) < 1e-8
+
+# Orbitals solved together by block CG reach the same threshold as one by one
+def test_block_gf_matches_single(mf):
+
+    dos = []
+    for sigma_block in (1, 16):
+        direct_adc = setup(mf, "adc(2)", algorithm="GF", freq_range=(-0.6, -0.4), step=0.1, tol=1e-10, sigma_block=sigma_block)
+        with quiet():
+            t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+            apply_H_ip, precond_ip, M_ij = direct_adc_compute.define_H_ip(direct_adc, t_amp)
+            apply_H_ea, precond_ea, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+            dos.append(np.array(direct_adc_compute.calc_density_of_states(direct_adc, apply_H_ip, apply_H_ea, precond_ip, precond_ea, t_amp)))
+
+    assert np.max(np.absolute(dos[0] - dos[1])) < 1e-8
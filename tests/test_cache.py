@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.cache_helper as cache_helper
+from conftest import setup, compute, default, assert_agree
+
+
+def build_all(direct_adc):
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        getattr(direct_adc.v2e, spaces)
+
+def test_cached_integrals_match(mf, tmp_path):
+
+    assert_agree(default(mf), compute(mf, cache_dir=str(tmp_path)))
+
+    # Second job: every class is read from the cache
+    assert_agree(default(mf), compute(mf, cache_dir=str(tmp_path)))
+    direct_adc = setup(mf, cache_dir=str(tmp_path))
+    build_all(direct_adc)
+    assert "vvvv" in direct_adc.v2e.cached
+    assert direct_adc.v2e.source is None
+
+def test_cache_read_into_scratch(mf, tmp_path):
+
+    compute(mf, cache_dir=str(tmp_path))
+
+    assert_agree(default(mf), compute(mf, cache_dir=str(tmp_path), disk=True))
+
+# Other orbitals give another fingerprint: nothing is read
+def test_cache_keyed_by_orbitals(mf, tmp_path):
+
+    compute(mf, cache_dir=str(tmp_path))
+
+    direct_adc = setup(mf, cache_dir=str(tmp_path), frozen_core=1)
+    build_all(direct_adc)
+    assert direct_adc.v2e.cached == []
+
+# Entries beyond max_size are removed least recently used first; a read
+# counts as a use
+def test_cache_evicts_least_recently_used(tmp_path):
+
+    v2e = np.zeros((50, 50, 50))
+    cache = cache_helper.IntegralCache(str(tmp_path), max_size=2.5 * v2e.nbytes / 1e6)
+
+    for n, key in enumerate(("x", "y")):
+        cache.store(key, "oovv", (v2e, v2e[:1], v2e[:1]), closed_shell=True)
+        os.utime(cache.path(key, "oovv"), (n, n))
+    assert cache.load("x", "oovv", closed_shell=True) is not None
+
+    cache.store("z", "oovv", (v2e, v2e[:1], v2e[:1]), closed_shell=True)
+
+    assert os.path.exists(cache.path("x", "oovv"))
+    assert not os.path.exists(cache.path("y", "oovv"))
+    assert os.path.exists(cache.path("z", "oovv"))
@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import TOL, setup, dense, quiet
+
+
+def amplitudes(mf, method = "adc(3)", **options):
+
+    direct_adc = setup(mf, method, **options)
+    with quiet():
+        return direct_adc_compute.checkpointed_amplitudes(direct_adc)
+
+# Amplitudes read back are bitwise equal to those written; recomputed ones
+# agree to TOL (the pairs of staged_einsum are ordered by object id)
+def assert_same(ref, new, tol = 0.0):
+
+    assert len(ref) == len(new)
+    for x, y in zip(ref, new):
+        assert (x is None) == (y is None)
+        if x is not None:
+            for a, b in zip(x, y):
+                assert np.max(np.absolute(dense(a) - dense(b)), initial=0.0) <= tol
+
+def test_checkpoint_written_and_read(mf, tmp_path, monkeypatch):
+
+    path = str(tmp_path / "t_amp.h5")
+    ref = amplitudes(mf)
+    written = amplitudes(mf, amplitude_file=path)
+    assert os.path.exists(path)
+    assert_same(ref, written, TOL)
+
+    # A matching job reads the amplitudes instead of computing them
+    def compute_amplitudes(direct_adc):
+        raise Exception("Amplitudes were computed")
+    monkeypatch.setattr(direct_adc_compute, "compute_amplitudes", compute_amplitudes)
+
+    read = amplitudes(mf, amplitude_file=path)
+    assert_same(written, read)
+    if mf.mol.spin == 0:
+        assert np.shares_memory(read[0][0], read[0][2])
+
+@pytest.mark.parametrize("options", [{"method": "adc(2)"}, {"frozen_core": 1}, {"precision": "mixed"}])
+def test_checkpoint_of_other_job_not_read(mf, tmp_path, monkeypatch, options):
+
+    path = str(tmp_path / "t_amp.h5")
+    amplitudes(mf, amplitude_file=path)
+
+    calls = []
+    compute_amplitudes = direct_adc_compute.compute_amplitudes
+    def counted(direct_adc):
+        calls.append(direct_adc)
+        return compute_amplitudes(direct_adc)
+    monkeypatch.setattr(direct_adc_compute, "compute_amplitudes", counted)
+
+    ref = amplitudes(mf, **options)
+    new = amplitudes(mf, amplitude_file=path, **options)
+    assert len(calls) == 2
+    assert_same(ref, new, TOL)
+
+    # The file now holds the amplitudes of the last job
+    assert_same(new, amplitudes(mf, amplitude_file=path, **options))
+    assert len(calls) == 2
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import setup, compute, default, assert_agree, quiet
+
+
+@pytest.mark.parametrize("method", ["adc(2)", "adc(3)"])
+def test_closed_shell_matches_spin_blocks(rhf, method):
+
+    assert_agree(default(rhf, method), compute(rhf, method, closed_shell=False))
+
+def test_beta_blocks_alias_alpha(rhf):
+
+    direct_adc = setup(rhf)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+
+    for spaces in ("oovv", "ooov", "vvvo", "oooo"):
+        v2e_a, v2e_ab, v2e_b = getattr(direct_adc.v2e, spaces)
+        assert np.shares_memory(v2e_a, v2e_b)
+        assert not v2e_b.flags.writeable
+
+    t2_1 = t_amp[0]
+    assert np.shares_memory(t2_1[0], t2_1[2])
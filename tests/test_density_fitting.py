@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.df_helper as df_helper
+from conftest import TOL, setup, compute, default, dense, assert_agree
+
+
+# <pq||rs> of one class from the MO factors B^Q_pq, (pr|qs) = sum_Q B^Q_pr B^Q_qs
+def factorized_integrals(direct_adc, factors, spaces):
+
+    nocc = (direct_adc.nocc_a, direct_adc.nocc_b)
+
+    def sl(x, spin):
+        return slice(0, nocc[spin]) if x == "o" else slice(nocc[spin], None)
+
+    def direct(spin_1, spin_2, P, Q, R, S):
+        B_1, B_2 = factors[spin_1], factors[spin_2]
+        return np.einsum('Lpr,Lqs->pqrs', B_1[:,sl(P,spin_1),sl(R,spin_1)], B_2[:,sl(Q,spin_2),sl(S,spin_2)])
+
+    P, Q, R, S = spaces
+    blocks = []
+    for spin in (0, 1):
+        blocks.append(direct(spin, spin, P, Q, R, S) - direct(spin, spin, P, Q, S, R).transpose(0,1,3,2))
+
+    return (blocks[0], direct(0, 1, P, Q, R, S), blocks[1])
+
+def load_factors(direct_adc):
+
+    if direct_adc.integrals == "DF":
+        cderi = df_helper.density_fitting_eri(direct_adc.mol, direct_adc.auxbasis)
+    else:
+        cderi = df_helper.cholesky_eri(direct_adc.mol, direct_adc.cd_threshold)
+
+    return df_helper.mo_factors(cderi, direct_adc.mo_a), df_helper.mo_factors(cderi, direct_adc.mo_b)
+
+@pytest.mark.parametrize("integrals", ["DF", "CD"])
+def test_blocks_match_factors(mf, integrals):
+
+    direct_adc = setup(mf, integrals=integrals)
+    factors = load_factors(direct_adc)
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for ref, new in zip(factorized_integrals(direct_adc, factors, spaces), getattr(direct_adc.v2e, spaces)):
+            assert np.max(np.absolute(ref - dense(new)), initial=0.0) < TOL, spaces
+
+# A tight Cholesky threshold reproduces the exact integrals
+def test_cholesky_converges_to_exact(mf):
+
+    assert_agree(default(mf), compute(mf, integrals="CD", cd_threshold=1e-12), 1e-6)
+
+def test_density_fitting_mp2_error(mf):
+
+    assert abs(compute(mf, integrals="DF")["mp2"] - default(mf)["mp2"]) < 1e-3
+
+# The large classes are assembled from the factors when read, never stored
+def test_large_classes_not_stored(mf):
+
+    direct_adc = setup(mf, integrals="DF")
+
+    for spaces in ("vvvv", "vvvo", "vvov"):
+        assert all(isinstance(x, df_helper.DFBlock) for x in getattr(direct_adc.v2e, spaces))
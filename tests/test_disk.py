@@ -0,0 +1,98 @@
+import os
+import h5py
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.disk_helper as disk_helper
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import setup, compute, default, assert_agree, quiet
+
+
+# max_memory (MB) small enough for slabs of one or two rows
+SLAB_MEMORY = 0.01
+
+@pytest.mark.parametrize("method", ["adc(2)", "adc(3)"])
+def test_disk_matches_memory(mf, method):
+
+    assert_agree(default(mf, method), compute(mf, method, disk=True, max_memory=SLAB_MEMORY))
+
+# vvvv is streamed into the store from the AO integrals, without a (vv| intermediate
+def test_vvvv_streamed_to_disk(mf):
+
+    direct_adc = setup(mf, disk=True, max_memory=SLAB_MEMORY)
+
+    assert all(isinstance(x.packed if hasattr(x, "packed") else x, h5py.Dataset) for x in direct_adc.v2e.vvvv)
+    assert all(name[:2] != "vv" for name, nbytes in direct_adc.v2e.transformed)
+
+# All disk classes are datasets of one scratch file, removed by close()
+def test_one_scratch_file(mf):
+
+    direct_adc = setup(mf, disk=True)
+
+    filenames = set()
+    for spaces in direct_adc_init.DISK_CLASSES:
+        for x in getattr(direct_adc.v2e, spaces):
+            x = x.packed if hasattr(x, "packed") else x
+            x = x.base if hasattr(x, "axes") else x
+            filenames.add(x.file.filename)
+    assert filenames == {direct_adc.scratch.filename}
+
+    filename = direct_adc.scratch.filename
+    direct_adc.scratch.close()
+    assert not os.path.exists(filename)
+
+def test_memmap_matches_memory(mf):
+
+    assert_agree(default(mf), compute(mf, disk=True, disk_backend="memmap", max_memory=SLAB_MEMORY))
+
+def test_memmap_blocks(mf):
+
+    direct_adc = setup(mf, disk=True, disk_backend="memmap")
+    v2e = direct_adc.v2e.vvvv[1]
+    assert isinstance(v2e, np.memmap)
+
+    dirname = direct_adc.scratch.dirname
+    direct_adc.scratch.close()
+    assert not os.path.exists(dirname)
+
+# The double-buffered reader yields every slab in order and records each read
+@pytest.mark.parametrize("backend", ["hdf5", "memmap"])
+def test_prefetch_rows(backend):
+
+    data = np.random.RandomState(4).rand(7, 3, 5)
+    chunks = [(0, 3), (3, 6), (6, 7)]
+    stats = disk_helper.IOStats()
+
+    with disk_helper.scratch_store(backend) as scratch:
+        block = scratch.dataset("x", data)
+        slabs = list(disk_helper.prefetch_rows(block, chunks, stats))
+        rows = list(disk_helper.prefetch_rows(block, [(0, 2), (2, 5)], axis=2))
+
+    assert [(p0, p1) for p0, p1, x in slabs] == chunks
+    assert np.array_equal(np.concatenate([x for p0, p1, x in slabs]), data)
+    assert np.array_equal(np.concatenate([x for p0, p1, x in rows], axis=2), data)
+    assert stats.nreads == 3
+    assert stats.nbytes == data.nbytes
+
+# Each disk block is read at most once per sigma call, for one vector or a block
+@pytest.mark.parametrize("kind", ["ip", "ea"])
+def test_disk_reads_per_sigma_call(mf, kind):
+
+    direct_adc = setup(mf, disk=True, max_memory=SLAB_MEMORY)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H, precond, M = getattr(direct_adc_compute, "define_H_" + kind)(direct_adc, t_amp)
+
+    parents = [x for x in direct_adc_init.DISK_CLASSES if x not in direct_adc_init.DERIVED_CLASSES]
+    blocks = [x.packed if hasattr(x, "packed") else x for spaces in parents for x in getattr(direct_adc.v2e, spaces)]
+    nbytes = sum(x.size * x.dtype.itemsize for x in blocks)
+
+    r = np.random.RandomState(3).rand(3, precond.size)
+    calls = []
+    for x in (r[0], r[1], r):
+        stats = direct_adc.v2e.io_stats = disk_helper.IOStats()
+        apply_H(x)
+        calls.append(stats.call_nbytes)
+
+    assert calls[0] == calls[1] == calls[2]
+    assert calls[0] <= nbytes
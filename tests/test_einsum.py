@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.einsum_helper as einsum_helper
+from conftest import TOL, compute, default, assert_agree
+
+BACKENDS = ["einsum", "numpy", "tensordot",
+            pytest.param("opt_einsum", marks=pytest.mark.skipif(einsum_helper.opt_einsum is None, reason="opt_einsum is not installed"))]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backend_matches_default(mf, backend):
+
+    assert_agree(default(mf), compute(mf, einsum_backend=backend))
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("subscripts, shapes", [
+    ("ijab,jb->ia", [(3, 4, 5, 6), (4, 6)]),
+    ("ijcd,abcd->ijab", [(3, 4, 5, 6), (2, 7, 5, 6)]),
+    ("ikac,jkbc->ijab", [(3, 4, 5, 6), (2, 4, 7, 6)]),
+    ("ia,jb,ijab->ba", [(3, 5), (4, 6), (3, 4, 5, 6)]),
+    ("iajb,b,ic->cja", [(3, 5, 4, 6), (6,), (3, 2)]),
+])
+def test_plans_match_einsum(backend, subscripts, shapes):
+
+    rng = np.random.RandomState(5)
+    operands = [rng.rand(*shape) for shape in shapes]
+    contractions = einsum_helper.ContractionPlans(backend)
+
+    ref = np.einsum(subscripts, *operands)
+    for n in range(2):
+        new = contractions.einsum(subscripts, *operands)
+        assert new.shape == ref.shape
+        assert np.max(np.absolute(ref - new)) < TOL
+
+    # The plan of the first call is reused
+    assert contractions.ncalls == 2
+    assert contractions.nplans == 1
+
+def test_unknown_backend():
+
+    with pytest.raises(Exception):
+        einsum_helper.ContractionPlans("blas")
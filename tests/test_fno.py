@@ -0,0 +1,68 @@
+import numpy as np
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import TOL, setup, quiet
+
+
+def energies(direct_adc):
+
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        e_mp2 = direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+        E = []
+        for kind in ("ip", "ea"):
+            apply_H, precond, x0 = getattr(direct_adc_compute, "setup_davidson_" + kind)(direct_adc, t_amp)
+            E.append(np.sort(direct_adc_compute.davidson(direct_adc, apply_H, x0, precond)[0]))
+
+    return e_mp2, E
+
+# Keeping every natural virtual only rotates the virtual space, which leaves
+# the energies unchanged; amplitudes and M differ by the rotation
+def test_fno_keep_all_matches_default(mf):
+
+    direct_adc = setup(mf, fno=True, fno_threshold=0.0)
+    e_mp2, E = energies(direct_adc)
+    e_mp2_ref, E_ref = energies(setup(mf))
+
+    assert direct_adc.fno_info["nkeep"] == direct_adc.fno_info["nvir"]
+    assert abs(e_mp2 - e_mp2_ref) < TOL
+    for x, y in zip(E, E_ref):
+        assert np.max(np.absolute(x - y)) < 1e-8
+
+def test_fno_truncates_virtuals(mf):
+
+    direct_adc = setup(mf, fno=True, fno_threshold=1e-3)
+    nvir = direct_adc.fno_info["nvir"]
+    nkeep = direct_adc.fno_info["nkeep"]
+    e_mp2, E = energies(direct_adc)
+
+    assert nkeep[0] < nvir[0] and nkeep[1] < nvir[1]
+    assert (direct_adc.nvir_a, direct_adc.nvir_b) == nkeep
+    assert len(direct_adc.fno_energy_a) == nvir[0] - nkeep[0]
+    assert direct_adc.v2e.vvvv[1].shape == (nkeep[0], nkeep[1], nkeep[0], nkeep[1])
+
+    # The MP2 energy of the kept space is most of the full one
+    assert abs(e_mp2 - direct_adc.fno_info["e_mp2_fno"]) < TOL
+    assert abs(e_mp2) < abs(direct_adc.fno_info["e_mp2"])
+    assert abs(e_mp2) > 0.9 * abs(direct_adc.fno_info["e_mp2"])
+
+# Dropped natural virtuals enter the EA part of the DOS as bare poles at their
+# semicanonical energies
+def test_fno_dropped_poles_in_dos(rhf):
+
+    direct_adc = setup(rhf, "adc(2)", fno=True, fno_threshold=1e-3)
+    e_p = np.max(direct_adc.fno_energy_a)
+
+    direct_adc = setup(rhf, "adc(2)", fno=True, fno_threshold=1e-3, algorithm="GF",
+                       freq_range=(e_p - 0.1, e_p + 0.1), step=0.01, tol=1e-10)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H_ip, precond_ip, M_ij = direct_adc_compute.define_H_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+        ip, ea = direct_adc_compute.calc_density_of_states(direct_adc, apply_H_ip, apply_H_ea, precond_ip, precond_ea, t_amp)
+
+    grid = np.arange(e_p - 0.1, e_p + 0.1, 0.01)
+    peak = np.argmax(ea)
+    assert abs(grid[peak] - e_p) < 0.01
+    # Both spins of the pole, 1/(pi*eta) each at its centre
+    assert ea[peak] > 0.5 * 2/(np.pi*direct_adc.broadening)
+    assert np.max(ip) < 0.01 * ea[peak]
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from pyscf import adc, scf
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import setup, quiet
+
+
+def energies(mf, method, frozen_core, frozen_virtual):
+
+    direct_adc = setup(mf, method, frozen_core=frozen_core, frozen_virtual=frozen_virtual)
+
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        e_mp2 = direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+        E = []
+        for kind in ("ip", "ea"):
+            apply_H, precond, x0 = getattr(direct_adc_compute, "setup_davidson_" + kind)(direct_adc, t_amp)
+            E.append(np.sort(direct_adc_compute.davidson(direct_adc, apply_H, x0, precond)[0]))
+
+    return e_mp2, E
+
+# pyscf's UADC with the same frozen orbitals; closed shells are converted to UHF
+# so that the spin-integrated roots line up
+def pyscf_energies(mf, method, frozen_core, frozen_virtual, nroots = 3):
+
+    mf = scf.addons.convert_to_uhf(mf)
+    nmo = mf.mo_coeff[0].shape[1]
+    frozen = list(range(frozen_core)) + list(range(nmo - frozen_virtual, nmo))
+
+    E = []
+    for kind in ("ip", "ea"):
+        myadc = adc.ADC(mf, frozen=(frozen, frozen))
+        myadc.method = method
+        myadc.method_type = kind
+        myadc.verbose = 0
+        myadc.conv_tol = 1e-12
+        E.append(np.sort(myadc.kernel(nroots=nroots)[0]))
+
+    return myadc.e_corr, E
+
+@pytest.mark.parametrize("method", ["adc(2)", "adc(3)"])
+@pytest.mark.parametrize("frozen_core, frozen_virtual", [(1, 0), (1, 1)])
+def test_frozen_matches_pyscf(mf, method, frozen_core, frozen_virtual):
+
+    e_mp2, E = energies(mf, method, frozen_core, frozen_virtual)
+    e_corr, E_ref = pyscf_energies(mf, method, frozen_core, frozen_virtual)
+
+    # pyscf reports the MP3 correlation energy for ADC(3)
+    if method == "adc(2)":
+        assert abs(e_mp2 - e_corr) < 1e-10
+    for x, y in zip(E, E_ref):
+        assert np.max(np.absolute(x - y)) < 1e-8
+
+# -Im G of one orbital on a frequency grid, from the active-space GF equations
+def gf_peak(direct_adc, kind, orb, grid):
+
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H, precond, M = getattr(direct_adc_compute, "define_H_" + kind)(direct_adc, t_amp)
+        T = np.array([getattr(direct_adc_compute, "calculate_T_" + kind)(direct_adc, t_amp, orb, spin = "alpha")])
+        r = None
+        gf = []
+        for omega in grid:
+            g, r = direct_adc_compute.calculate_GF_block(direct_adc, apply_H, precond, omega, T, r)
+            gf.append(g[0])
+
+    return grid[np.argmax(-np.imag(gf))]
+
+# A frozen orbital's bare pole sits at e_p, next to the peak of the same orbital
+# when it is not frozen: the core orbital in the IP part, the top virtual in the EA part
+@pytest.mark.parametrize("kind, frozen_core, frozen_virtual", [("ip", 1, 0), ("ea", 0, 1)])
+def test_frozen_pole_matches_unfrozen_peak(rhf, kind, frozen_core, frozen_virtual):
+
+    direct_adc = setup(rhf, "adc(2)", algorithm="GF", tol=1e-10)
+    orb = 0 if kind == "ip" else direct_adc.nmo_a - 1
+    e_p = direct_adc.mo_energy_a[orb]
+    grid = e_p + np.arange(-1.0, 1.0, 0.01)
+    peak = gf_peak(direct_adc, kind, orb, grid)
+
+    direct_adc = setup(rhf, "adc(2)", algorithm="GF", frozen_core=frozen_core, frozen_virtual=frozen_virtual)
+    gf = direct_adc_compute.frozen_gf(direct_adc, grid + direct_adc.broadening*1j, "alpha", kind.upper())
+    frozen_peak = grid[np.argmax(-gf.imag)]
+
+    assert abs(frozen_peak - e_p) < 0.01
+    assert abs(frozen_peak - peak) < 0.8
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.pack_helper as pack_helper
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import TOL, setup, dense
+
+
+# <pq||rs>-like block: antisymmetric in p, q and in r, s
+def antisymmetric(n, seed = 3):
+
+    x = np.random.RandomState(seed).rand(n, n, n, n)
+    x = x - x.transpose(1,0,2,3)
+
+    return x - x.transpose(0,1,3,2)
+
+@pytest.mark.parametrize("blksize", [1, 2, 3, 7])
+def test_pairs_built_in_row_blocks(blksize):
+
+    n = 7
+    v2e = antisymmetric(n)
+    chunks = [(p0, min(p0 + blksize, n)) for p0 in range(0, n, blksize)]
+    out = np.empty((n*(n-1)//2, n*(n-1)//2))
+
+    pack_helper.antisymmetrized_pairs(lambda p0, p1: v2e[p0:p1], n, chunks, out)
+
+    assert np.array_equal(out, pack_helper.pack_pairs(pack_helper.pack_pairs(v2e).transpose(2,0,1)).T)
+
+def test_tril_block_indexing():
+
+    n = 6
+    v2e = antisymmetric(n)
+    block = pack_helper.TrilBlock(pack_helper.pack_pairs(pack_helper.pack_pairs(v2e).transpose(2,0,1)).T.copy(), n, n)
+
+    assert np.array_equal(np.asarray(block), v2e)
+    assert np.array_equal(block[2], v2e[2])
+    assert np.array_equal(block[1:4,2], v2e[1:4,2])
+    assert np.array_equal(block[[4,0,4]], v2e[[4,0,4]])
+
+# Packed same-spin vvvv against its unpacked array in the vvvv contractions
+def test_vvvv_contractions(mf):
+
+    direct_adc = setup(mf)
+    v2e_vvvv = direct_adc.v2e.vvvv[0]
+    assert isinstance(v2e_vvvv, pack_helper.TrilBlock)
+
+    full = dense(v2e_vvvv)
+    nvir = full.shape[0]
+    x = np.random.RandomState(5).rand(4, nvir*nvir)
+
+    ref = np.dot(x, full.reshape(nvir*nvir, -1).T)
+    new = direct_adc_compute.vvvv_dot(direct_adc, x, v2e_vvvv)
+    assert np.max(np.absolute(ref - new)) < TOL
+
+    x = pack_helper.pack_pairs(x.reshape(-1, nvir, nvir) - x.reshape(-1, nvir, nvir).transpose(0,2,1))
+    ref = direct_adc_compute.vvvv_pair_dot(direct_adc, x, full)
+    new = direct_adc_compute.vvvv_pair_dot(direct_adc, x, v2e_vvvv)
+    assert np.max(np.absolute(ref - new)) < TOL
+
+# Only the a < b, c < d pairs of same-spin vvvv are stored
+def test_packed_storage(mf):
+
+    direct_adc = setup(mf)
+    v2e_vvvv_a, v2e_vvvv_ab, v2e_vvvv_b = direct_adc.v2e.vvvv
+    npair = direct_adc.nvir_a * (direct_adc.nvir_a - 1) // 2
+
+    assert v2e_vvvv_a.packed.shape == (npair, npair)
+    assert v2e_vvvv_a.nbytes < v2e_vvvv_ab.nbytes / 3
@@ -0,0 +1,70 @@
+import pyscf.lib
+import pytest
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.parallel_helper as parallel_helper
+from conftest import setup, compute, default, assert_agree
+
+
+@pytest.mark.parametrize("method", ["adc(2)", "adc(3)"])
+def test_transform_workers_match_serial(mf, method):
+
+    assert_agree(default(mf, method), compute(mf, method, transform_workers=3))
+
+def test_disk_transform_workers_match_serial(mf):
+
+    assert_agree(default(mf), compute(mf, transform_workers=3, disk=True, max_memory=0.01))
+
+# Jobs that run alone get every thread, the others share them
+def test_scheduler_threads():
+
+    with pyscf.lib.with_omp_threads(4):
+        scheduler = parallel_helper.Scheduler(4)
+    threads = lambda: pyscf.lib.num_threads()
+
+    assert scheduler.blas_threads == 1
+    assert scheduler.run([("a", threads)]) == {"a": 4}
+    assert scheduler.run([("a", threads), ("b", threads)]) == {"a": 2, "b": 2}
+    assert scheduler.run([(x, threads) for x in "abcd"]) == dict((x, 1) for x in "abcd")
+
+    serial = parallel_helper.Scheduler(1, 1)
+    assert serial.run([("a", threads), ("b", threads)]) == {"a": serial.nthreads, "b": serial.nthreads}
+
+def test_nested_batches_run_in_job():
+
+    scheduler = parallel_helper.Scheduler(2)
+    inner = lambda: scheduler.run([("x", lambda: 1), ("y", lambda: 2)])
+
+    assert scheduler.run([("a", inner), ("b", inner)]) == {"a": {"x": 1, "y": 2}, "b": {"x": 1, "y": 2}}
+    assert scheduler.njobs == 2
+
+# max_memory is split between the jobs that run at the same time; nested
+# batches run serially and keep the share of their job
+def test_scheduler_job_memory():
+
+    scheduler = parallel_helper.Scheduler(4)
+    memory = lambda: scheduler.job_memory(120.0)
+    inner = lambda: scheduler.run([("x", memory), ("y", memory)])
+
+    assert memory() == 120.0
+    assert scheduler.run([("a", memory)]) == {"a": 120.0}
+    assert scheduler.run([(x, memory) for x in "ab"]) == {"a": 60.0, "b": 60.0}
+    assert scheduler.run([(x, memory) for x in "abcdef"]) == dict((x, 30.0) for x in "abcdef")
+    assert scheduler.run([(x, inner) for x in "abc"]) == dict((x, {"x": 40.0, "y": 40.0}) for x in "abc")
+
+# The classes of a prefetch batch (five for ADC(2)) run on four workers, so
+# their slabs are sized for a quarter of max_memory each
+def test_prefetch_job_memory(mf, monkeypatch):
+
+    calls = []
+    row_blocks = direct_adc_init.row_blocks
+    def recorded(nrow, row_size, max_memory = 2000):
+        calls.append(max_memory)
+        return row_blocks(nrow, row_size, max_memory)
+    monkeypatch.setattr(direct_adc_init, "row_blocks", recorded)
+
+    direct_adc = setup(mf, "adc(2)", transform_workers=4, max_memory=100)
+    direct_adc.v2e.prefetch(direct_adc_compute.METHOD_CLASSES["adc(2)"])
+
+    assert len(calls) > 0
+    assert set(calls) == {25.0}
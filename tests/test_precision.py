@@ -0,0 +1,67 @@
+import tracemalloc
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.precision_helper as precision_helper
+from conftest import WATER, run_scf, setup, compute, default, assert_agree, quiet
+
+
+# float32 storage with float64 contractions: errors of the order of single precision
+@pytest.mark.parametrize("disk", [False, True])
+def test_mixed_precision_error(mf, disk):
+
+    assert_agree(default(mf), compute(mf, precision="mixed", disk=disk), 1e-6)
+
+@pytest.mark.parametrize("disk", [False, True])
+def test_mixed_precision_storage(mf, disk):
+
+    direct_adc = setup(mf, precision="mixed", disk=disk)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for x in getattr(direct_adc.v2e, spaces):
+            assert x.dtype == np.float32, spaces
+    for x in t_amp[0]:
+        assert x.dtype == np.float32
+
+    # Contractions with in-memory blocks are carried out in float64
+    v2e_oovv = direct_adc.v2e.oovv[1]
+    assert isinstance(v2e_oovv, precision_helper.Single)
+    assert np.einsum('ijab,ijab', v2e_oovv, v2e_oovv).dtype == np.float64
+
+# float32 storage halves the bytes held by every class
+def test_mixed_precision_halves_storage(mf):
+
+    double = setup(mf)
+    mixed = setup(mf, precision="mixed")
+    double.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+    mixed.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        assert 2 * mixed.v2e.nbytes(spaces)[0] == double.v2e.nbytes(spaces)[0], spaces
+
+# Bytes allocated at the peak of one EA sigma call
+def sigma_peak(mf, precision):
+
+    direct_adc = setup(mf, "adc(2)-e", precision=precision)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H, precond, M = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+
+    r = np.random.RandomState(2).rand(precond.size)
+    apply_H(r)
+    tracemalloc.start()
+    apply_H(r)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak
+
+# float32 blocks are upcast a slab at a time, so a sigma call needs no more
+# scratch than in double precision
+def test_mixed_precision_sigma_peak():
+
+    mf = run_scf(WATER, 0, "cc-pvdz")
+    assert sigma_peak(mf, "mixed") < 1.25 * sigma_peak(mf, "double")
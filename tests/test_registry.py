@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import setup, dense, quiet
+
+
+def run_stages(direct_adc):
+
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        direct_adc_compute.compute_mp2_energy(direct_adc, t_amp)
+        direct_adc_compute.define_H_ip(direct_adc, t_amp)
+        direct_adc_compute.define_H_ea(direct_adc, t_amp)
+
+# Classes are built on first use: those read by the method are its METHOD_CLASSES
+@pytest.mark.parametrize("method", ["adc(2)", "adc(2)-e", "adc(3)"])
+def test_classes_built_per_method(mf, method):
+
+    direct_adc = setup(mf, method)
+    run_stages(direct_adc)
+
+    parents = set(direct_adc_init.DERIVED_CLASSES.get(x, (x,))[0] for x in direct_adc.v2e.blocks)
+    assert parents == set(direct_adc_compute.METHOD_CLASSES[method])
+
+def test_adc2_transforms_ov_only(mf):
+
+    direct_adc = setup(mf, "adc(2)")
+    run_stages(direct_adc)
+
+    assert "vvvv" not in direct_adc.v2e.blocks
+    assert set(name[:2] for name, nbytes in direct_adc.v2e.transformed) == {"ov"}
+
+def test_prefetch_matches_lazy_build(mf):
+
+    lazy = setup(mf)
+    direct_adc = setup(mf, transform_workers=3)
+    direct_adc.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for x, y in zip(getattr(lazy.v2e, spaces), getattr(direct_adc.v2e, spaces)):
+            assert np.array_equal(dense(x), dense(y)), spaces
+
+# Derived classes are transposed views of their parent, in memory and on disk
+@pytest.mark.parametrize("disk", [False, True])
+def test_derived_classes_are_views(mf, disk):
+
+    direct_adc = setup(mf, disk=disk)
+
+    for spaces, (parent, axes) in direct_adc_init.DERIVED_CLASSES.items():
+        for x, y in zip(getattr(direct_adc.v2e, spaces), getattr(direct_adc.v2e, parent)):
+            if isinstance(y, np.ndarray):
+                assert np.shares_memory(x, y), spaces
+            assert np.array_equal(dense(x), dense(y).transpose(axes)), spaces
+            assert np.array_equal(dense(x[1:3]), dense(y).transpose(axes)[1:3]), spaces
@@ -0,0 +1,58 @@
+import numpy as np
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.sparse_helper as sparse_helper
+from conftest import setup, compute, default, assert_agree, quiet
+
+
+# Only tiles that are zero by symmetry fall below this threshold
+def test_small_threshold_matches_default(mf):
+
+    assert_agree(default(mf), compute(mf, screening=1e-4, screening_block=2))
+
+# Dropping tiles below 1e-3 changes the results by about that much
+def test_screening_error_bounded(mf):
+
+    new = compute(mf, screening=1e-3, screening_block=2)
+
+    assert_agree(default(mf), new, 5e-3)
+    assert abs(default(mf)["mp2"] - new["mp2"]) < 1e-4
+
+def test_screening_statistics(mf):
+
+    direct_adc = setup(mf, screening=1e-3, screening_block=2)
+    direct_adc.v2e.prefetch(["vvvv", "vvvo", "vvov"])
+
+    kept, total, dense, nbytes = direct_adc.v2e.screening["vvvv_a"]
+    assert kept < total
+    assert nbytes < dense
+
+# Kept tiles hold the dense values; the dropped ones are all below threshold
+def test_sparse_block_matches_dense():
+
+    a = np.random.RandomState(3).rand(10, 7, 3) - 0.5
+    a[:4,4:] *= 1e-3
+    block = sparse_helper.screen(a, 1e-2, 4)
+
+    assert block.ntiles == 6
+    assert (0, 4) not in block.tiles
+    assert len(block.tiles) == 5
+    assert np.array_equal(block[:][:4,:4], a[:4,:4])
+    assert np.array_equal(block[2:9,1], a[2:9,1])
+    assert np.array_equal(block[3,5:], np.zeros((2, 3)))
+
+    full = np.asarray(block)
+    dropped = full != a
+    assert np.max(np.absolute(a[dropped]), initial=0.0) < 1e-2
+    assert np.array_equal(full[~dropped], a[~dropped])
+
+# t2_1 stays dense: its small tiles are zeroed but take the same memory
+def test_t2_1_tiles_zeroed(mf):
+
+    direct_adc = setup(mf, screening=1e-3, screening_block=2)
+    with quiet():
+        t2_1 = direct_adc_compute.compute_amplitudes(direct_adc)[0]
+
+    for name, t2 in zip(("t2_1_a", "t2_1_ab"), t2_1):
+        kept, total, dense, nbytes = direct_adc.v2e.screening[name]
+        assert type(t2) is np.ndarray
+        assert nbytes == dense == t2.nbytes
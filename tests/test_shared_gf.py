@@ -0,0 +1,50 @@
+import numpy as np
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+import direct_adc_spin_integrated.shm_helper as shm_helper
+from conftest import setup, dense, quiet
+
+
+def density_of_states(mf, gf_workers):
+
+    direct_adc = setup(mf, "adc(2)", algorithm="GF", freq_range=(-0.6, -0.4), step=0.1, gf_workers=gf_workers, tol=1e-10)
+
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+        apply_H_ip, precond_ip, M_ij = direct_adc_compute.define_H_ip(direct_adc, t_amp)
+        apply_H_ea, precond_ea, M_ab = direct_adc_compute.define_H_ea(direct_adc, t_amp)
+        dos = direct_adc_compute.calc_density_of_states(direct_adc, apply_H_ip, apply_H_ea, precond_ip, precond_ea, t_amp)
+
+    return np.array(dos)
+
+# The workers solve the same linear equations with other initial guesses, so
+# the agreement is that of the CG threshold
+def test_gf_workers_match_serial(mf):
+
+    serial = density_of_states(mf, 1)
+    shared = density_of_states(mf, 2)
+
+    assert np.max(np.absolute(serial - shared)) < 1e-8
+
+# Workers see the published blocks and amplitudes unchanged and read-only,
+# with closed-shell aliases published once
+def test_shared_store_round_trip(mf):
+
+    direct_adc = setup(mf, "adc(2)")
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+    blocks = tuple(direct_adc.v2e.oovv) + tuple(t_amp[0])
+
+    with shm_helper.SharedStore() as store:
+        manifest = store.publish(blocks)
+        segments = []
+        attached = shm_helper.attach(manifest, segments)
+
+        for x, y in zip(blocks, attached):
+            assert np.array_equal(dense(x), dense(y))
+            assert not y.flags.writeable
+        if direct_adc.nelec_a == direct_adc.nelec_b:
+            assert len(store.segments) < len(blocks)
+
+        del attached
+        for shm in segments:
+            shm.close()
@@ -0,0 +1,41 @@
+import tracemalloc
+import numpy as np
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+from conftest import WATER, run_scf, setup, compute, default, assert_agree
+
+
+def test_small_slabs_match_default(mf):
+
+    assert_agree(default(mf), compute(mf, max_memory=0.01))
+
+# Slabs of rows are sized so that max_memory (MB) holds one with its temporaries
+def test_slab_size_bounded():
+
+    shape = (10, 6, 5, 4)
+    v2e = np.random.RandomState(1).rand(*shape)
+    slabs = []
+
+    def rows(p0, p1):
+        slabs.append(p1 - p0)
+        return v2e[p0:p1]
+
+    row_size = 3 * 6 * 5 * 4 * 8
+    out = direct_adc_init.write_blocked(None, "v2e", shape, rows, 3 * row_size / 1e6)
+
+    assert np.array_equal(out, v2e)
+    assert slabs == [3, 3, 3, 1]
+
+# With the classes on disk in small slabs, what the transform holds beyond the
+# in-memory classes (intermediates and slabs) stays well below one nmo^4 block
+def test_disk_transform_peak():
+
+    mf = run_scf(WATER, 0, "cc-pvdz")
+    nmo = mf.mol.nao_nr()
+
+    tracemalloc.start()
+    direct_adc = setup(mf, disk=True, max_memory=0.01)
+    direct_adc.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak - held < nmo**4 * 8 / 4
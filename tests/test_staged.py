@@ -0,0 +1,45 @@
+import numpy as np
+from pyscf import scf
+from pyscf.adc import uadc
+from pyscf.adc import uadc_amplitudes
+import direct_adc_spin_integrated.direct_adc_compute as direct_adc_compute
+from conftest import TOL, setup, dense, quiet
+
+
+# First- and second-order singles of pyscf's UADC, on the same orbitals
+def test_t1_matches_pyscf(mf):
+
+    direct_adc = setup(mf)
+    with quiet():
+        t_amp = direct_adc_compute.compute_amplitudes(direct_adc)
+
+    myadc = uadc.UADC(scf.addons.convert_to_uhf(mf))
+    myadc.method = "adc(3)"
+    myadc.verbose = 0
+    t1 = uadc_amplitudes.compute_amplitudes(myadc, myadc.transform_integrals())[0]
+
+    for ref, new in zip(t1[0] + t1[1], t_amp[2] + t_amp[3]):
+        assert np.max(np.absolute(np.asarray(ref) - dense(new))) < TOL
+
+# Terms with the same first pair of operands, up to index names, share it
+def test_staged_einsum_shares_intermediates(rhf):
+
+    direct_adc = setup(rhf)
+    rng = np.random.RandomState(4)
+    t2 = rng.rand(3, 3, 5, 5)
+    v2e = rng.rand(5, 5, 5, 3)
+    t2_x = rng.rand(3, 3, 5, 5)
+    shared = {}
+
+    terms = [('ildf,aefm,lmde->ia', (t2, v2e, t2)),
+             ('ilaf,defm,lmde->ia', (t2, v2e, t2)),
+             ('jkeg,bfgn,knef->jb', (t2, v2e, t2)),
+             ('ilfd,aefm,mled->ia', (t2, v2e, t2_x))]
+
+    for subscripts, operands in terms:
+        ref = np.einsum(subscripts, *operands)
+        new = direct_adc_compute.staged_einsum(direct_adc, shared, subscripts, *operands)
+        assert np.max(np.absolute(ref - new)) < TOL
+
+    # The third term reuses the pair of the first under other index names
+    assert len(shared) == len(terms) - 1
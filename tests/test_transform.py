@@ -0,0 +1,30 @@
+import numpy as np
+import direct_adc_spin_integrated.direct_adc_init as direct_adc_init
+from conftest import TOL, setup, dense, reference_integrals
+
+
+def test_classes_match_ao2mo(mf):
+
+    direct_adc = setup(mf)
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for ref, new in zip(reference_integrals(direct_adc, spaces), getattr(direct_adc.v2e, spaces)):
+            assert np.max(np.absolute(ref - dense(new)), initial=0.0) < TOL, spaces
+
+def test_integral_direct_source(mf):
+
+    ref = setup(mf)
+    direct_adc = setup(mf, v2e_ao=mf.mol)
+
+    for spaces in direct_adc_init.V2E_CLASSES:
+        for x, y in zip(getattr(ref.v2e, spaces), getattr(direct_adc.v2e, spaces)):
+            assert np.max(np.absolute(dense(x) - dense(y)), initial=0.0) < TOL, spaces
+
+# The half-transformed intermediates are dropped once every class is built
+def test_intermediates_released(mf):
+
+    direct_adc = setup(mf)
+    direct_adc.v2e.prefetch(direct_adc_init.V2E_CLASSES)
+
+    assert direct_adc.v2e.source.half == {}
+    assert direct_adc.v2e.source.users == {}
@@ -0,0 +1,255 @@
+import threading
+import numpy as np
+import pyscf.ao2mo
+from pyscf.ao2mo import _ao2mo
+
+
+# Orbital pairs of the half-transformed intermediates; (vo| is read from (ov|
+PAIRS = {"oo": "oo", "ov": "ov", "vo": "ov", "vv": "vv"}
+
+# Preferred pair to hold when both pairs of a chemist block (XY|ZW) have one;
+# (vv|vv) has none and is streamed from the AO integrals
+HELD_ORDER = ("ov", "oo")
+
+
+# Batches of shells [sh0, sh1) holding at most max_memory (MB) of rows of row_size bytes
+def shell_blocks(ao_loc, row_size, max_memory = 2000):
+
+    blksize = max(1, int(max_memory * 1e6 / max(1, row_size)))
+    nbas = len(ao_loc) - 1
+
+    sh0 = 0
+    while sh0 < nbas:
+        sh1 = sh0 + 1
+        while sh1 < nbas and ao_loc[sh1+1] - ao_loc[sh0] <= blksize:
+            sh1 += 1
+        yield sh0, sh1
+        sh0 = sh1
+
+
+### First half of the transformation: (ij|ls) with the AO pair ls packed ###
+# From the stored AO integrals (mf._eri), or integral-direct from the molecule
+# in batches of shells of the first AO index
+def half_transform(v2e_ao, c_1, c_2, max_memory = 2000):
+
+    if isinstance(v2e_ao, np.ndarray):
+        return pyscf.ao2mo.incore.half_e1(v2e_ao, (c_1, c_2), compact=False)
+
+    mol = v2e_ao
+    nao = mol.nao_nr()
+    nao_pair = nao * (nao + 1) // 2
+    ao_loc = mol.ao_loc_nr()
+    nbas = mol.nbas
+
+    v2e = np.zeros((c_1.shape[1], c_2.shape[1], nao_pair))
+    for sh0, sh1 in shell_blocks(ao_loc, 2 * nao * nao_pair * 8, max_memory):
+        m0, m1 = ao_loc[sh0], ao_loc[sh1]
+        eri = mol.intor('int2e', aosym='s2kl', shls_slice=(sh0,sh1,0,nbas,0,nbas,0,nbas))
+        eri = np.tensordot(c_1[m0:m1], eri.reshape(m1-m0, nao, nao_pair), axes=(0,0))
+        v2e += np.tensordot(eri, c_2, axes=(1,0)).transpose(0,2,1)
+
+    return v2e.reshape(-1, nao_pair)
+
+### Second half: rows of (ij|ls) transformed to (ij|kl) ###
+def second_half(v2e, c_3, c_4):
+
+    n_3 = c_3.shape[1]
+    mo = np.hstack((c_3, c_4))
+
+    return _ao2mo.nr_e2(np.ascontiguousarray(v2e), mo, (0, n_3, n_3, n_3 + c_4.shape[1]), aosym='s2', mosym='s1')
+
+
+##############################################################
+### MO integrals transformed per orbital space and spin ###
+##############################################################
+# The first half of the transformation is done once per spin and orbital
+# pair, (oo|ls) or (ov|ls), and shared by all integral classes: every chemist
+# block (XY|ZW) other than (vv|vv) is the second half of the intermediate of
+# one of its pairs, preferably (ov|. (vv|vv) is transformed from the AO
+# integrals one slab of its first index at a time, so that vvvv is streamed
+# into its store without an intermediate of size nvir^2 nao^2. Antisymmetrized
+# classes are assembled from these blocks one slab of their first index at a
+# time. An intermediate is only made when a class needs it. plan() makes the
+# intermediates of the classes about to be built as concurrent jobs; an
+# intermediate is dropped once the last of them that needs it is done().
+# transformed lists the intermediates made, with their size. Nothing of size
+# nmo^4 is formed.
+class MOIntegrals:
+
+    def __init__(self, v2e_ao, mo, nocc, closed_shell = False, max_memory = 2000, scheduler = None, transformed = None):
+
+        self.v2e_ao = v2e_ao
+        self.closed_shell = closed_shell
+        self.max_memory = max_memory
+        self.scheduler = scheduler
+        self.transformed = [] if transformed is None else transformed
+
+        self.coeff = {}
+        for spin, c, n in zip("ab", mo, nocc):
+            self.coeff[spin, "o"] = c[:,:n]
+            self.coeff[spin, "v"] = c[:,n:]
+
+        self.half = {}
+        self.users = {}
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    # Share of max_memory of the calling job on the scheduler
+    def job_memory(self):
+
+        if self.scheduler is None:
+            return self.max_memory
+
+        return self.scheduler.job_memory(self.max_memory)
+
+    # Closed shells: the beta intermediates are the alpha ones
+    def key(self, spin, pair):
+
+        return ("a" if self.closed_shell else spin, PAIRS[pair])
+
+    def transform(self, key):
+
+        spin, pair = key
+        c_1, c_2 = self.coeff[spin, pair[0]], self.coeff[spin, pair[1]]
+        v2e = half_transform(self.v2e_ao, c_1, c_2, self.job_memory())
+        self.transformed.append((pair + "_" + spin, v2e.nbytes))
+
+        return v2e.reshape(c_1.shape[1], c_2.shape[1], -1)
+
+    # Made on first use, or again if it was dropped before a class outside
+    # the plan asked for it
+    def intermediate(self, spin, pair):
+
+        key = self.key(spin, pair)
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+
+        with lock:
+            v2e = self.half.get(key)
+            if v2e is None:
+                v2e = self.half[key] = self.transform(key)
+
+        return v2e
+
+    def size(self, spin, x):
+
+        return self.coeff[spin, x].shape[1]
+
+    # Side (0: XY, 1: ZW) whose intermediate gives (XY|ZW), None for (vv|vv)
+    def held(self, XY, ZW):
+
+        for pair in HELD_ORDER:
+            if PAIRS[XY] == pair:
+                return 0
+            if PAIRS[ZW] == pair:
+                return 1
+
+        return None
+
+    # (XY|ZW) for rows x0 <= x < x1 of X, X and Y of spin_1, Z and W of spin_2
+    def chemist(self, spin_1, XY, spin_2, ZW, x0, x1):
+
+        C = self.coeff
+        held = self.held(XY, ZW)
+
+        if held is None:
+            v2e = half_transform(self.v2e_ao, C[spin_1, XY[0]][:,x0:x1], C[spin_1, XY[1]], self.job_memory())
+            v2e = second_half(v2e, C[spin_2, ZW[0]], C[spin_2, ZW[1]])
+            return v2e.reshape(x1-x0, self.size(spin_1, XY[1]), self.size(spin_2, ZW[0]), self.size(spin_2, ZW[1]))
+
+        if held == 0:
+            v2e = self.intermediate(spin_1, XY)
+            if XY != PAIRS[XY]:
+                v2e = v2e.transpose(1,0,2)
+            v2e = v2e[x0:x1].reshape(-1, v2e.shape[2])
+            v2e = second_half(v2e, C[spin_2, ZW[0]], C[spin_2, ZW[1]])
+            return v2e.reshape(x1-x0, self.size(spin_1, XY[1]), self.size(spin_2, ZW[0]), self.size(spin_2, ZW[1]))
+
+        v2e = self.intermediate(spin_2, ZW)
+        n_1, n_2 = v2e.shape[:2]
+        v2e = second_half(v2e.reshape(n_1*n_2, -1), C[spin_1, XY[0]][:,x0:x1], C[spin_1, XY[1]])
+        v2e = v2e.reshape(n_1, n_2, x1-x0, self.size(spin_1, XY[1]))
+        if ZW != PAIRS[ZW]:
+            v2e = v2e.transpose(1,0,2,3)
+
+        return v2e.transpose(2,3,0,1)
+
+    # Spin block of <pq||rs>: "a" and "b" same spin, "ab" with p, r alpha and q, s beta
+    def shape(self, spaces, spin):
+
+        if spin == "ab":
+            spins = ("a", "b", "a", "b")
+        else:
+            spins = (spin,) * 4
+
+        return tuple(self.size(s, x) for s, x in zip(spins, spaces))
+
+    # Rows p0 <= p < p1 of <pq|rs> = (pr|qs), with p, r of spin_1 and q, s of spin_2
+    def direct(self, spaces, spin_1, spin_2, p0, p1):
+
+        P, Q, R, S = spaces
+
+        return self.chemist(spin_1, P+R, spin_2, Q+S, p0, p1).transpose(0,2,1,3)
+
+    # Same rows of <pq|sr> = (ps|qr), same spin; v2e holds the direct rows
+    def exchange(self, spaces, spin, v2e, p0, p1):
+
+        P, Q, R, S = spaces
+
+        # Same space for r and s: (ps|qr) is the direct block with r and s swapped
+        if R == S:
+            return v2e.transpose(0,1,3,2)
+
+        return self.chemist(spin, P+S, spin, Q+R, p0, p1).transpose(0,2,3,1)
+
+    # Rows p0 <= p < p1 of <pq||rs> = <pq|rs> - <pq|sr>, or of <pq|rs> for ab
+    def antisymmetrized(self, spaces, spin, p0, p1):
+
+        if spin == "ab":
+            return self.direct(spaces, "a", "b", p0, p1)
+
+        v2e = self.direct(spaces, spin, spin, p0, p1)
+        return v2e - self.exchange(spaces, spin, v2e, p0, p1)
+
+    # Intermediates the spin blocks of a class are built from
+    def needs(self, spaces):
+
+        P, Q, R, S = spaces
+        spins = ("a",) if self.closed_shell else ("a", "b")
+
+        terms = [("a", P+R, "b", Q+S)]
+        for spin in spins:
+            terms += [(spin, P+R, spin, Q+S), (spin, P+S, spin, Q+R)]
+
+        keys = set()
+        for spin_1, XY, spin_2, ZW in terms:
+            held = self.held(XY, ZW)
+            if held == 0:
+                keys.add(self.key(spin_1, XY))
+            elif held == 1:
+                keys.add(self.key(spin_2, ZW))
+
+        return keys
+
+    def plan(self, classes):
+
+        with self.lock:
+            for spaces in classes:
+                for key in self.needs(spaces):
+                    self.users[key] = self.users.get(key, 0) + 1
+            todo = [key for key in self.users if key not in self.half]
+
+        jobs = [(key, lambda key=key: self.intermediate(*key)) for key in todo]
+        if self.scheduler is not None and len(jobs) > 0:
+            self.scheduler.run(jobs)
+
+    def done(self, spaces):
+
+        with self.lock:
+            for key in self.needs(spaces):
+                if key not in self.users:
+                    continue
+                self.users[key] -= 1
+                if self.users[key] == 0:
+                    del self.users[key]
+                    self.half.pop(key, None)